@@ -15,6 +15,14 @@
 
 from sys import version_info
 
+try:
+    from fastbencode._bencode_rs import bdecode as _bdecode_c
+except ImportError:
+    try:
+        from fastbencode._bencode_pyx import bdecode as _bdecode_c
+    except ImportError:
+        _bdecode_c = None
+
 PY2 = version_info.major == 2
 
 
@@ -28,68 +36,260 @@ class BTFailure(Exception):
 LIST_DELIM = b'l'
 BYTE_SEP = b':'
 
+_DIGITS = frozenset(b'0123456789'[i : i + 1] for i in range(10))
+# The key of the stack entry of a list.
+_LIST = object()
+
+
+class _Incomplete(Exception):
+    """The data ends inside the value starting at `offset`.
+
+    Args:
+        offset (int): The start of the incomplete value.
+        needed (int): The length of data needed to decode it, if known.
+
+    """
+
+    def __init__(self, offset, needed=0):
+        super(_Incomplete, self).__init__(offset, needed)
+        self.offset = offset
+        self.needed = needed
+
+
+def _as_bytes(x):
+    """The data to decode as bytes, copying buffers like memoryview."""
+    if isinstance(x, bytes):
+        return x
+    return memoryview(x).tobytes()
+
+
+def decode_next(x, f, stack):
+    """Decode the value of `x` at offset `f`.
 
-def decode_int(x, f):
-    f += 1
-    newf = x.index(END_DELIM, f)
-    n = int(x[f:newf])
-    if x[f : f + 1] == b'-' and x[f + 1 : f + 2] == b'0':
-        raise ValueError
-    elif x[f : f + 1] == b'0' and newf != f + 1:
-        raise ValueError
-    return (n, newf + 1)
-
-
-def decode_string(x, f):
-    colon = x.index(BYTE_SEP, f)
-    n = int(x[f:colon])
-    if x[f : f + 1] == b'0' and colon != f + 1:
-        raise ValueError
-    colon += 1
-    return (x[colon : colon + n], colon + n)
-
-
-def decode_list(x, f):
-    r, f = [], f + 1
-    while x[f : f + 1] != END_DELIM:
-        v, f = decode_func[x[f : f + 1]](x, f)
-        r.append(v)
-    return (r, f + 1)
-
-
-def decode_dict(x, f):
-    r, f = {}, f + 1
-    while x[f : f + 1] != END_DELIM:
-        k, f = decode_string(x, f)
-        r[k], f = decode_func[x[f : f + 1]](x, f)
-    return (r, f + 1)
-
-
-decode_func = {}
-decode_func[LIST_DELIM] = decode_list
-decode_func[DICT_DELIM] = decode_dict
-decode_func[INT_DELIM] = decode_int
-decode_func[b'0'] = decode_string
-decode_func[b'1'] = decode_string
-decode_func[b'2'] = decode_string
-decode_func[b'3'] = decode_string
-decode_func[b'4'] = decode_string
-decode_func[b'5'] = decode_string
-decode_func[b'6'] = decode_string
-decode_func[b'7'] = decode_string
-decode_func[b'8'] = decode_string
-decode_func[b'9'] = decode_string
+    The open lists and dicts are kept on `stack` rather than recursing, each
+    as a (container, key) entry, so deeply nested data does not reach the
+    recursion limit and a value cut short by the end of the data can be
+    resumed when more arrives.
+
+    Args:
+        x (bytes): The bencoded data.
+        f (int): The offset of the value, or where the decoding of the values
+            on `stack` stopped.
+        stack (list): The containers being decoded, empty for a new value.
+
+    Returns:
+        tuple: The value and the offset after it.
+
+    Raises:
+        ValueError: The data is not valid bencode.
+        _Incomplete: The data ends before the value.
+
+    """
+    size = len(x)
+    find = x.find
+    # The innermost container and its key, _LIST for a list and None for a
+    # dict waiting for a key.
+    if stack:
+        top, key = stack.pop()
+    else:
+        top = key = None
+    try:
+        while True:
+            c = x[f : f + 1]
+            if key is None and top is not None:
+                if c == END_DELIM:
+                    value = top
+                    top, key = stack.pop() if stack else (None, None)
+                    f += 1
+                else:
+                    # Keys are decoded here as they can only be strings.
+                    colon = find(BYTE_SEP, f)
+                    if colon == -1:
+                        raise _Incomplete(f)
+                    n = int(x[f:colon])
+                    if c not in _DIGITS or n < 0 or (c == b'0' and colon != f + 1):
+                        raise ValueError
+                    end = colon + 1 + n
+                    if end > size:
+                        raise _Incomplete(f, end - f)
+                    key = x[colon + 1 : end]
+                    f = end
+                    continue
+            elif c in _DIGITS:
+                colon = find(BYTE_SEP, f)
+                if colon == -1:
+                    raise _Incomplete(f)
+                n = int(x[f:colon])
+                if n < 0 or (c == b'0' and colon != f + 1):
+                    raise ValueError
+                end = colon + 1 + n
+                if end > size:
+                    raise _Incomplete(f, end - f)
+                value = x[colon + 1 : end]
+                f = end
+            elif c == INT_DELIM:
+                end = find(END_DELIM, f)
+                if end == -1:
+                    raise _Incomplete(f)
+                digits = x[f + 1 : end]
+                value = int(digits)
+                if digits[:2] == b'-0' or (digits[:1] == b'0' and end != f + 2):
+                    raise ValueError
+                f = end + 1
+            elif c == LIST_DELIM:
+                if top is not None:
+                    stack.append((top, key))
+                top, key = [], _LIST
+                f += 1
+                continue
+            elif c == DICT_DELIM:
+                if top is not None:
+                    stack.append((top, key))
+                top, key = {}, None
+                f += 1
+                continue
+            elif c == END_DELIM:
+                if key is not _LIST:
+                    raise ValueError
+                value = top
+                top, key = stack.pop() if stack else (None, None)
+                f += 1
+            elif not c:
+                raise _Incomplete(f)
+            else:
+                raise ValueError
+
+            if key is _LIST:
+                top.append(value)
+            elif key is not None:
+                top[key] = value
+                key = None
+            else:
+                return value, f
+    except _Incomplete:
+        if top is not None:
+            stack.append((top, key))
+        raise
 
 
 def bdecode(x):
+    if _bdecode_c is not None and type(x) is bytes:
+        try:
+            return _bdecode_c(x)
+        except ValueError:
+            # Also raised for data valid here, such as trailing data or
+            # unsorted keys, so decode it again below.
+            pass
     try:
-        r, __ = decode_func[x[0:1]](x, 0)
-    except (LookupError, TypeError, ValueError):
+        r, __ = decode_next(_as_bytes(x), 0, [])
+    except (_Incomplete, LookupError, TypeError, ValueError):
         raise BTFailure('Not a valid bencoded string')
     else:
         return r
 
 
+def bdecode_info(x):
+    """Decode a torrent file and locate the bencoded info dict in it.
+
+    The info hash is the hash of the info dict as it is in the file, taking
+    those bytes avoids encoding the decoded dict again.
+
+    Returns:
+        tuple: The decoded dict and the (start, end) offsets of the info
+            value, None when there is no info key.
+
+    """
+    span = None
+    try:
+        x = _as_bytes(x)
+        if x[0:1] != DICT_DELIM:
+            raise ValueError
+        r, f = {}, 1
+        while x[f : f + 1] != END_DELIM:
+            k, f = decode_next(x, f, [])
+            if not isinstance(k, bytes):
+                raise ValueError
+            start = f
+            r[k], f = decode_next(x, f, [])
+            if k == b'info':
+                span = (start, f)
+    except (_Incomplete, LookupError, TypeError, ValueError):
+        raise BTFailure('Not a valid bencoded string')
+    return r, span
+
+
+class BDecoder(object):
+    """Decode bencoded values from data arriving in chunks.
+
+    Only the data not decoded yet is kept, so a large file can be decoded
+    while it is read without holding both all of its bytes and the values.
+
+    Example:
+        decoder = BDecoder()
+        for chunk in iter(lambda: _file.read(65536), b''):
+            values.extend(decoder.feed(chunk))
+        decoder.close()
+
+    """
+
+    def __init__(self):
+        self._stack = []
+        self._chunks = []
+        self._size = 0
+        # The data needed to decode the next value, when known.
+        self._needed = 0
+
+    def feed(self, data):
+        """Decode a chunk of data.
+
+        Args:
+            data (bytes): The next chunk of bencoded data.
+
+        Returns:
+            list: The values completed by the chunk.
+
+        Raises:
+            BTFailure: The data is not valid bencode.
+
+        """
+        if not data:
+            return []
+        self._chunks.append(_as_bytes(data))
+        self._size += len(data)
+        if self._size < self._needed:
+            return []
+
+        x = b''.join(self._chunks)
+        values = []
+        f = 0
+        try:
+            while f < len(x):
+                value, f = decode_next(x, f, self._stack)
+                values.append(value)
+        except _Incomplete as ex:
+            f = ex.offset
+            self._needed = ex.needed
+        except (LookupError, TypeError, ValueError):
+            raise BTFailure('Not a valid bencoded string')
+        else:
+            self._needed = 0
+
+        rest = x[f:] if f else x
+        self._chunks = [rest] if rest else []
+        self._size = len(rest)
+        return values
+
+    def close(self):
+        """Check the data did not end inside a value.
+
+        Raises:
+            BTFailure: The data ends inside a value.
+
+        """
+        if self._stack or self._size:
+            raise BTFailure('Incomplete bencoded data')
+
+
 class Bencached(object):
 
     __slots__ = ['bencoded']
@@ -99,11 +299,11 @@ def __init__(self, s):
 
 
 def encode_bencached(x, r):
-    r.append(x.bencoded)
+    r += x.bencoded
 
 
 def encode_int(x, r):
-    r.extend((INT_DELIM, str(x).encode('utf8'), END_DELIM))
+    r += b'i%de' % x
 
 
 def encode_bool(x, r):
@@ -115,26 +315,28 @@ def encode_string(x, r):
 
 
 def encode_bytes(x, r):
-    r.extend((str(len(x)).encode('utf8'), BYTE_SEP, x))
+    r += b'%d:' % len(x)
+    r += x
 
 
 def encode_list(x, r):
-    r.append(LIST_DELIM)
+    r += LIST_DELIM
     for i in x:
         encode_func[type(i)](i, r)
-    r.append(END_DELIM)
+    r += END_DELIM
 
 
 def encode_dict(x, r):
-    r.append(DICT_DELIM)
+    r += DICT_DELIM
     for k, v in sorted(x.items()):
         try:
             k = k.encode('utf8')
         except AttributeError:
             pass
-        r.extend((str(len(k)).encode('utf8'), BYTE_SEP, k))
+        r += b'%d:' % len(k)
+        r += k
         encode_func[type(v)](v, r)
-    r.append(END_DELIM)
+    r += END_DELIM
 
 
 encode_func = {}
@@ -153,6 +355,6 @@ def encode_dict(x, r):
 
 
 def bencode(x):
-    r = []
+    r = bytearray()
     encode_func[type(x)](x, r)
-    return b''.join(r)
+    return bytes(r)
@@ -8,10 +8,12 @@
 #
 
 """Common functions for various parts of Deluge to use."""
+
 from __future__ import division, print_function, unicode_literals
 
 import base64
 import binascii
+import bisect
 import functools
 import glob
 import locale
@@ -1311,6 +1313,30 @@ def unicode_argv():
         return arg_list
 
 
+def format_profile_stats(profiler, sort='cumulative', limit=None):
+    """
+    Format the stats of a cProfile profiler as text
+
+    Args:
+        profiler (cProfile.Profile): The profiler.
+        sort (str, optional): The pstats sort key. Defaults to 'cumulative'.
+        limit (int, optional): The number of functions to include. Defaults to all.
+
+    Returns:
+        str: The formatted stats.
+    """
+    import pstats
+    from io import StringIO
+
+    strio = StringIO()
+    ps = pstats.Stats(profiler, stream=strio).sort_stats(sort)
+    if limit:
+        ps.print_stats(limit)
+    else:
+        ps.print_stats()
+    return strio.getvalue()
+
+
 def run_profiled(func, *args, **kwargs):
     """
     Profile a function with cProfile
@@ -1334,13 +1360,7 @@ def on_shutdown():
                 log.info('Profile stats saved to %s', output_file)
                 print('Profile stats saved to %s' % output_file)
             else:
-                import pstats
-                from io import StringIO
-
-                strio = StringIO()
-                ps = pstats.Stats(profiler, stream=strio).sort_stats('cumulative')
-                ps.print_stats()
-                print(strio.getvalue())
+                print(format_profile_stats(profiler))
 
         try:
             return profiler.runcall(func, *args)
@@ -1350,6 +1370,75 @@ def on_shutdown():
         return func(*args)
 
 
+class LatencyHistogram(object):
+    """Histogram of durations with logarithmic buckets.
+
+    Recording is O(log buckets) and memory is fixed, so one histogram can be
+    kept per RPC method. Percentiles are estimated as the upper bound of the
+    bucket they fall in.
+    """
+
+    # Upper bounds in seconds: 0.5 ms doubling up to ~65 s, then overflow.
+    BUCKETS = tuple(0.0005 * 2 ** i for i in range(18))
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds, failed=False):
+        """Record a duration.
+
+        Args:
+            seconds (float): The duration.
+            failed (bool, optional): If the timed operation failed.
+        """
+        self.counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if failed:
+            self.errors += 1
+
+    def percentile(self, pct):
+        """Estimate a percentile of the recorded durations.
+
+        Args:
+            pct (float): The percentile, 0-100.
+
+        Returns:
+            float: The duration in seconds, 0 if nothing is recorded.
+        """
+        if not self.count:
+            return 0.0
+        rank = self.count * pct / 100
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= rank and bucket_count:
+                if index < len(self.BUCKETS):
+                    return min(self.BUCKETS[index], self.max)
+                break
+        return self.max
+
+    def to_dict(self):
+        """The histogram summary as a dict suitable for sending over RPC."""
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'buckets': list(self.counts),
+        }
+
+
 def is_process_running(pid):
     """
     Verify if the supplied pid is a running process.
@@ -10,6 +10,7 @@
 from __future__ import unicode_literals
 
 import logging
+import time
 import traceback
 from collections import defaultdict
 
@@ -18,6 +19,8 @@
 from twisted.internet.defer import DeferredList, fail, maybeDeferred, succeed
 from twisted.internet.task import LoopingCall, deferLater
 
+from deluge.common import LatencyHistogram
+
 log = logging.getLogger(__name__)
 
 
@@ -116,9 +119,19 @@ def __del__(self):
 
     def _component_start_timer(self):
         if hasattr(self, 'update'):
-            self._component_timer = LoopingCall(self.update)
+            self._component_timer = LoopingCall(self._component_update)
             self._component_timer.start(self._component_interval)
 
+    def _component_update(self):
+        # Time the synchronous part of update(), this is what blocks the reactor.
+        start = time.time()
+        try:
+            return self.update()
+        finally:
+            _ComponentRegistry.update_stats[self._component_name].add(
+                time.time() - start
+            )
+
     def _component_start(self):
         def on_start(result):
             self._component_state = 'Started'
@@ -260,6 +273,8 @@ def __init__(self):
         self.components = {}
         # Stores all of the components that are dependent on a particular component
         self.dependents = defaultdict(list)
+        # The time taken by the update() calls of each component
+        self.update_stats = defaultdict(LatencyHistogram)
 
     def register(self, obj):
         """Register a component object with the registry.
@@ -453,6 +468,15 @@ def on_stopped(result):
 
         return self.stop(list(self.components)).addCallback(on_stopped)
 
+    def get_update_stats(self):
+        """Get the time taken by the timed update() calls of the components.
+
+        Returns:
+            dict: The :meth:`LatencyHistogram.to_dict` of each component name.
+
+        """
+        return {name: stats.to_dict() for name, stats in self.update_stats.items()}
+
     def update(self):
         """Update all Components that are in a Started state."""
         for component in self.components.items():
@@ -470,6 +494,7 @@ def update(self):
 pause = _ComponentRegistry.pause
 resume = _ComponentRegistry.resume
 update = _ComponentRegistry.update
+get_update_stats = _ComponentRegistry.get_update_stats
 shutdown = _ComponentRegistry.shutdown
 
 
@@ -41,6 +41,7 @@
 from deluge.core.preferencesmanager import PreferencesManager
 from deluge.core.rpcserver import export
 from deluge.core.torrentmanager import TorrentManager
+from deluge.core.watchdog import ReactorWatchdog
 from deluge.decorators import deprecated
 from deluge.error import (
     AddTorrentError,
@@ -147,6 +148,11 @@ def __init__(
         self.torrentmanager = TorrentManager()
         self.filtermanager = FilterManager(self)
         self.authmanager = AuthManager()
+        # The watchdog adds a heartbeat and a thread sampling the reactor stack,
+        # so it is only created when enabled, taking effect on restart.
+        self.watchdog = None
+        if self.preferencesmanager.config['reactor_watchdog']:
+            self.watchdog = ReactorWatchdog()
 
         # New release check information
         self.new_release = None
@@ -625,6 +631,20 @@ def do_remove_torrents():
 
         return task.deferLater(reactor, 0, do_remove_torrents)
 
+    @export
+    def get_reactor_stats(self):
+        """Gets the reactor loop lag, the recent reactor stalls and what
+        caused them, and the time taken by the component updates.
+
+        Returns:
+            dict: See :meth:`deluge.core.watchdog.ReactorWatchdog.get_stats`,
+                only with 'component_updates' unless the `reactor_watchdog`
+                option is enabled.
+        """
+        if self.watchdog is None:
+            return {'component_updates': component.get_update_stats()}
+        return self.watchdog.get_stats()
+
     @export
     def get_session_status(self, keys):
         """Gets the session status values for 'keys', these keys are taking
@@ -798,6 +818,27 @@ def get_filter_tree(self, show_zero_hits=True, hide_cat=None):
         """
         return self.filtermanager.get_filter_tree(show_zero_hits, hide_cat)
 
+    @export
+    def get_filter_tree_changes(self, version=None, show_zero_hits=True, hide_cat=None):
+        """Get the changes of the filter tree since a version.
+
+        Args:
+            version (int, optional): The version of the tree the client has,
+                None for the whole tree.
+            show_zero_hits (bool): Include the values without torrents.
+            hide_cat (list, optional): The fields to leave out.
+
+        Returns:
+            dict: The tree 'version', 'full' if 'changes' is the whole tree,
+                otherwise the {field: [(value, count)]} of the counts which
+                changed in 'changes' and the {field: [value]} of those no
+                longer in the tree in 'removed'.
+
+        """
+        return self.filtermanager.get_filter_tree_changes(
+            version, show_zero_hits, hide_cat
+        )
+
     @export
     def get_session_state(self):
         """Returns a list of torrent_ids in the session."""
@@ -19,6 +19,7 @@
 import deluge.component as component
 from deluge.common import get_version, is_ip, is_process_running, windows_check
 from deluge.configmanager import get_config_dir
+from deluge.core.authmanager import AUTH_LEVEL_ADMIN
 from deluge.core.core import Core
 from deluge.core.rpcserver import RPCServer, export
 from deluge.error import DaemonRunningError
@@ -73,6 +74,7 @@ def __init__(
         port=None,
         standalone=False,
         read_only_config_keys=None,
+        metrics_port=None,
     ):
         """
         Args:
@@ -88,6 +90,8 @@ def __init__(
                 mode otherwise, if False, start the daemon as separate process.
             read_only_config_keys (list of str, optional): A list of config
                 keys that will not be altered by core.set_config() RPC method.
+            metrics_port (int, optional): The localhost port to serve the RPC
+                statistics on in the Prometheus text format.
         """
         self.standalone = standalone
         self.pid_file = get_config_dir('deluged.pid')
@@ -133,6 +137,7 @@ def win_handler(ctrl_type):
             listen=not standalone,
             interface=interface,
         )
+        self.metrics_port = metrics_port
 
         log.debug(
             'Listening to UI on: %s:%s and bittorrent on: %s Making connections out on: %s',
@@ -150,6 +155,9 @@ def start(self):
         # Make sure we start the PreferencesManager first
         component.start('PreferencesManager')
 
+        if self.metrics_port:
+            self.rpcserver.listen_metrics(self.metrics_port)
+
         if not self.standalone:
             log.info('Deluge daemon starting...')
             # Create pid file to track if deluged is running, also includes the port number.
@@ -203,3 +211,45 @@ def authorized_call(self, rpc):
         return self.rpcserver.get_session_auth_level() >= self.rpcserver.get_rpc_auth_level(
             rpc
         )
+
+    @export()
+    def get_rpc_stats(self):
+        """Returns the call statistics of the RPC methods.
+
+        Returns:
+            dict: The per method call count, errors, latency percentiles and
+                payload sizes under 'methods', with the total time spent
+                encoding and decoding messages.
+        """
+        return self.rpcserver.get_rpc_stats()
+
+    @export(AUTH_LEVEL_ADMIN)
+    def reset_rpc_stats(self):
+        """Clears the call statistics of the RPC methods."""
+        self.rpcserver.factory.stats.reset()
+
+    @export(AUTH_LEVEL_ADMIN)
+    def set_rpc_profiling(self, sample_rate):
+        """Starts or stops profiling a sample of the RPC calls.
+
+        Args:
+            sample_rate (float): The fraction of calls to profile, 0 stops
+                profiling and discards the collected profile.
+        """
+        if sample_rate > 0:
+            self.rpcserver.factory.stats.start_profiling(min(sample_rate, 1.0))
+        else:
+            self.rpcserver.factory.stats.stop_profiling()
+
+    @export(AUTH_LEVEL_ADMIN)
+    def get_rpc_profile(self, sort='cumulative', limit=50):
+        """Returns the profile of the sampled RPC calls.
+
+        Args:
+            sort (str): The pstats key to sort the profile by.
+            limit (int): The number of functions to include.
+
+        Returns:
+            str: The formatted profile, empty if profiling is not enabled.
+        """
+        return self.rpcserver.factory.stats.get_profile(sort=sort, limit=limit)
@@ -64,6 +64,13 @@ def add_daemon_options(parser):
         type=str,
         default='',
     )
+    group.add_argument(
+        '--metrics-port',
+        metavar='<port>',
+        action='store',
+        type=int,
+        help=_('Port to serve RPC metrics on for Prometheus, on localhost only'),
+    )
     parser.add_process_arg_group()
 
 
@@ -115,6 +122,7 @@ def run_daemon(options):
                 interface=options.ui_interface,
                 port=options.port,
                 read_only_config_keys=options.read_only_config_keys.split(','),
+                metrics_port=options.metrics_port,
             )
             if skip_start:
                 return daemon
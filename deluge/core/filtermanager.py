@@ -10,15 +10,54 @@
 from __future__ import unicode_literals
 
 import logging
+from collections import OrderedDict
+from time import time
 
 from six import string_types
 
 import deluge.component as component
 from deluge.common import TORRENT_STATE
+from deluge.event import FilterTreeChangedEvent
 
 log = logging.getLogger(__name__)
 
 STATE_SORT = ['All', 'Active'] + TORRENT_STATE
+# The number of previous filter tree versions kept to send the changes from.
+TREE_HISTORY = 10
+# The seconds a counted filter tree is shared by the calls for its changes.
+TREE_MAX_AGE = 1.0
+
+
+def filter_tree_changes(old_tree, new_tree):
+    """The counts of a filter tree which changed since a previous tree.
+
+    Args:
+        old_tree (dict): The {field: {value: count}} of the previous tree.
+        new_tree (dict): The {field: {value: count}} of the current tree.
+
+    Returns:
+        tuple: The {field: {value: count}} of the new and changed counts and
+            the {field: [value]} of the values no longer in the tree, None if
+            the fields differ.
+
+    """
+    if set(old_tree) != set(new_tree):
+        return None
+    changes = {}
+    removed = {}
+    for field, values in new_tree.items():
+        old_values = old_tree[field]
+        changed = {
+            value: count
+            for value, count in values.items()
+            if old_values.get(value) != count
+        }
+        if changed:
+            changes[field] = changed
+        gone = [value for value in old_values if value not in values]
+        if gone:
+            removed[field] = gone
+    return changes, removed
 
 
 # Special purpose filters:
@@ -105,11 +144,18 @@ class FilterManager(component.Component):
     """
 
     def __init__(self, core):
-        component.Component.__init__(self, 'FilterManager')
+        component.Component.__init__(self, 'FilterManager', interval=2)
         log.debug('FilterManager init..')
         self.core = core
         self.torrents = core.torrentmanager
         self.registered_filters = {}
+        # The {field: {value: count}} of the last counted tree and its version.
+        self.tree = None
+        self.tree_version = 0
+        self.tree_time = 0
+        self.emitted_version = 0
+        # Dict of version: tree of the previous versions.
+        self.tree_history = OrderedDict()
         self.register_filter('keyword', filter_keywords)
         self.register_filter('name', filter_by_name)
         self.tree_fields = {}
@@ -193,17 +239,107 @@ def filter_torrent_ids(self, filter_dict):
                     torrent_ids.remove(torrent_id)
         return torrent_ids
 
+    def update(self):
+        # Count the tree for the clients waiting for its changes.
+        try:
+            rpcserver = component.get('RPCServer')
+        except KeyError:
+            # No clients without the RPCServer, e.g. in tests.
+            return
+        if not rpcserver.has_event_interest('FilterTreeChangedEvent'):
+            return
+        self.refresh_tree()
+        # The tree may also have changed when counted for a client call.
+        if self.tree_version != self.emitted_version:
+            self.emitted_version = self.tree_version
+            component.get('EventManager').emit(
+                FilterTreeChangedEvent(self.tree_version)
+            )
+
+    def refresh_tree(self, max_age=0):
+        """Count the filter tree, a new version is kept if the counts changed.
+
+        Args:
+            max_age (float): Reuse a tree counted less than this many seconds ago.
+
+        Returns:
+            bool: True if the tree changed.
+
+        """
+        if self.tree is not None and time() - self.tree_time < max_age:
+            return False
+        tree = self._count_tree(list(self.tree_fields))
+        self.tree_time = time()
+        if tree == self.tree:
+            return False
+        self.tree = tree
+        self.tree_version += 1
+        self.tree_history[self.tree_version] = tree
+        while len(self.tree_history) > TREE_HISTORY:
+            self.tree_history.popitem(last=False)
+        return True
+
+    def _visible_tree(self, tree, show_zero_hits, hide_cat):
+        items = {
+            field: dict(values)
+            for field, values in tree.items()
+            if not hide_cat or field not in hide_cat
+        }
+        if not show_zero_hits:
+            for cat in ['state', 'owner', 'tracker_host']:
+                if cat in items:
+                    self._hide_state_items(items[cat])
+        return items
+
+    def _sort_tree(self, items):
+        """The {field: [(value, count)]} of a tree."""
+        sorted_items = {
+            field: sorted(values.items()) for field, values in items.items()
+        }
+        if 'state' in sorted_items:
+            sorted_items['state'].sort(key=self._sort_state_item)
+        return sorted_items
+
     def get_filter_tree(self, show_zero_hits=True, hide_cat=None):
         """
         returns {field: [(value,count)] }
         for use in sidebar.
         """
-        torrent_ids = self.torrents.get_torrent_list()
-        tree_keys = list(self.tree_fields)
-        if hide_cat:
-            for cat in hide_cat:
-                tree_keys.remove(cat)
+        self.refresh_tree()
+        return self._sort_tree(self._visible_tree(self.tree, show_zero_hits, hide_cat))
+
+    def get_filter_tree_changes(self, version=None, show_zero_hits=True, hide_cat=None):
+        """The changes of the filter tree since a version.
+
+        Args:
+            version (int, optional): The version of the tree the client has.
+            show_zero_hits (bool): Include the values without torrents.
+            hide_cat (list, optional): The fields to leave out.
+
+        Returns:
+            dict: The tree 'version', with 'full' True and the whole tree in
+                'changes' if the version is too old, otherwise the
+                {field: [(value, count)]} of the changed counts in
+                'changes' and the {field: [value]} of those gone in 'removed'.
 
+        """
+        self.refresh_tree(TREE_MAX_AGE)
+        tree = self._visible_tree(self.tree, show_zero_hits, hide_cat)
+        result = {'version': self.tree_version, 'full': True, 'removed': {}}
+        if version in self.tree_history:
+            old_tree = self._visible_tree(
+                self.tree_history[version], show_zero_hits, hide_cat
+            )
+            changes = filter_tree_changes(old_tree, tree)
+            if changes is not None:
+                tree, result['removed'] = changes
+                result['full'] = False
+        result['changes'] = self._sort_tree(tree)
+        return result
+
+    def _count_tree(self, tree_keys):
+        """The {field: {value: count}} of the torrents, with zero counts."""
+        torrent_ids = self.torrents.get_torrent_list()
         torrent_keys, plugin_keys = self.torrents.separate_keys(tree_keys, torrent_ids)
         items = {field: self.tree_fields[field]() for field in tree_keys}
 
@@ -220,19 +356,7 @@ def get_filter_tree(self, show_zero_hits=True, hide_cat=None):
             items['tracker_host']['Error'] = len(
                 tracker_error_filter(torrent_ids, ('Error',))
             )
-
-        if not show_zero_hits:
-            for cat in ['state', 'owner', 'tracker_host']:
-                if cat in tree_keys:
-                    self._hide_state_items(items[cat])
-
-        # Return a dict of tuples:
-        sorted_items = {field: sorted(items[field].items()) for field in tree_keys}
-
-        if 'state' in tree_keys:
-            sorted_items['state'].sort(key=self._sort_state_item)
-
-        return sorted_items
+        return items
 
     def _init_state_tree(self):
         init_state = {}
@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""A single file holding the torrent files of the session."""
+
+from __future__ import unicode_literals
+
+import logging
+import mmap
+import os
+import struct
+import threading
+
+log = logging.getLogger(__name__)
+
+MAGIC = b'DLMD'
+VERSION = 1
+# Magic, version, number of index entries and offset of the index.
+HEADER = struct.Struct('<4sIIQ')
+# Torrent id, offset and length of the torrent file.
+ENTRY = struct.Struct('<40sQQ')
+# Compact when the unused bytes are more than this and the used bytes.
+COMPACT_MIN = 1 << 20
+
+try:
+    replace = os.replace
+except AttributeError:  # PY2
+    replace = os.rename
+
+
+class MetadataStoreError(Exception):
+    pass
+
+
+class MetadataStore(object):
+    """The torrent files of the session packed in one file.
+
+    The torrent files are appended one after the other and followed by an
+    index of the torrent id, offset and length of each, which the header at
+    the start of the file points to. The file is memory mapped and a torrent
+    file is only read when asked for.
+
+    Changes are kept in memory until :meth:`flush` appends the new torrent
+    files and a new index. The header is written last, so the file stays
+    valid if writing is interrupted. The space of replaced and removed torrent
+    files is reclaimed by rewriting the file once it is half unused.
+
+    The methods are safe to call from several threads.
+
+    Args:
+        filepath (str): The path to the store file.
+
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+        # Dict of torrent_id: (offset, length) of the torrent files in the file.
+        self._index = {}
+        # Dict of torrent_id: filedump of the torrent files not flushed.
+        self._pending = {}
+        self._removed = set()
+        self._size = 0
+
+    def __len__(self):
+        return len(self.torrent_ids())
+
+    def __contains__(self, torrent_id):
+        with self._lock:
+            if torrent_id in self._pending:
+                return True
+            return torrent_id in self._index and torrent_id not in self._removed
+
+    def torrent_ids(self):
+        with self._lock:
+            return set(self._index).difference(self._removed).union(self._pending)
+
+    def open(self):
+        """Open the store file and read its index.
+
+        A file which is not a valid store is renamed with a `.bad` suffix and
+        an empty store is used instead.
+        """
+        with self._lock:
+            self._close()
+            self._index = {}
+            if not os.path.isfile(self.filepath):
+                return
+            try:
+                self._open()
+            except (EnvironmentError, ValueError, MetadataStoreError) as ex:
+                log.error('Unable to open %s: %s', self.filepath, ex)
+                self._close()
+                self._index = {}
+                replace(self.filepath, self.filepath + '.bad')
+
+    def _open(self):
+        self._file = open(self.filepath, 'rb')
+        self._size = os.fstat(self._file.fileno()).st_size
+        if self._size < HEADER.size:
+            raise MetadataStoreError('File is too short')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, index_offset = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise MetadataStoreError('Not a metadata store file')
+        if index_offset + count * ENTRY.size > self._size:
+            raise MetadataStoreError('Index is beyond the end of the file')
+
+        for offset in range(
+            index_offset, index_offset + count * ENTRY.size, ENTRY.size
+        ):
+            torrent_id, start, length = ENTRY.unpack_from(self._map, offset)
+            if start + length > index_offset:
+                raise MetadataStoreError('Torrent file is beyond the index')
+            self._index[torrent_id.decode('ascii')] = (start, length)
+
+    def close(self):
+        """Flush the changes and close the store file."""
+        self.flush()
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def get(self, torrent_id):
+        """The torrent file of a torrent.
+
+        Returns:
+            bytes: The bencoded torrent file, None if not in the store.
+
+        """
+        with self._lock:
+            filedump = self._pending.get(torrent_id)
+            if filedump is not None:
+                return filedump
+            if torrent_id in self._removed:
+                return None
+            try:
+                offset, length = self._index[torrent_id]
+            except KeyError:
+                return None
+            return self._map[offset : offset + length]
+
+    def put(self, torrent_id, filedump):
+        """Add or replace the torrent file of a torrent."""
+        if len(torrent_id) != 40:
+            raise ValueError('Invalid torrent_id: %s' % torrent_id)
+        with self._lock:
+            self._pending[torrent_id] = filedump
+            self._removed.discard(torrent_id)
+
+    def remove(self, torrent_id):
+        with self._lock:
+            self._pending.pop(torrent_id, None)
+            if torrent_id in self._index:
+                self._removed.add(torrent_id)
+
+    def flush(self):
+        """Write the changes to the store file."""
+        with self._lock:
+            if not self._pending and not self._removed:
+                return
+            if self._map is None and os.path.isfile(self.filepath):
+                self._open()
+            index = dict(self._index)
+            for torrent_id in self._removed:
+                index.pop(torrent_id, None)
+
+            used = sum(length for __, length in index.values())
+            unused = self._size - HEADER.size - used - len(self._index) * ENTRY.size
+            try:
+                if unused > max(used, COMPACT_MIN):
+                    self._compact(index)
+                else:
+                    self._append(index)
+            except EnvironmentError as ex:
+                # The header still points to the previous index, the changes
+                # are kept to be written by the next flush.
+                log.error('Unable to save %s: %s', self.filepath, ex)
+                if self._map is None:
+                    self._reopen()
+                return
+            self._pending = {}
+            self._removed = set()
+
+    def _append(self, index):
+        # The mapped file cannot be extended on Windows.
+        self._close()
+        mode = 'r+b' if os.path.isfile(self.filepath) else 'w+b'
+        with open(self.filepath, mode) as _file:
+            if mode == 'w+b':
+                _file.write(HEADER.pack(MAGIC, VERSION, 0, HEADER.size))
+            _file.seek(0, os.SEEK_END)
+            for torrent_id, filedump in self._pending.items():
+                index[torrent_id] = (_file.tell(), len(filedump))
+                _file.write(filedump)
+            index_offset = self._write_index(_file, index)
+            # Only point the header to the new index once it is on disk.
+            _file.seek(0)
+            _file.write(HEADER.pack(MAGIC, VERSION, len(index), index_offset))
+            _file.flush()
+            os.fsync(_file.fileno())
+        self._reopen()
+
+    def _compact(self, index):
+        log.debug('Compacting %s', self.filepath)
+        filepath_tmp = self.filepath + '.tmp'
+        new_index = {}
+        with open(filepath_tmp, 'wb') as _file:
+            _file.write(HEADER.pack(MAGIC, VERSION, 0, HEADER.size))
+            for torrent_id, (offset, length) in index.items():
+                filedump = self._pending.get(torrent_id)
+                if filedump is None:
+                    filedump = self._map[offset : offset + length]
+                new_index[torrent_id] = (_file.tell(), len(filedump))
+                _file.write(filedump)
+            for torrent_id, filedump in self._pending.items():
+                if torrent_id not in new_index:
+                    new_index[torrent_id] = (_file.tell(), len(filedump))
+                    _file.write(filedump)
+            index_offset = self._write_index(_file, new_index)
+            _file.seek(0)
+            _file.write(HEADER.pack(MAGIC, VERSION, len(new_index), index_offset))
+            _file.flush()
+            os.fsync(_file.fileno())
+        # The file cannot be replaced while mapped on Windows.
+        self._close()
+        replace(filepath_tmp, self.filepath)
+        self._reopen()
+
+    def _write_index(self, _file, index):
+        index_offset = _file.tell()
+        _file.write(
+            b''.join(
+                ENTRY.pack(torrent_id.encode('ascii'), offset, length)
+                for torrent_id, (offset, length) in index.items()
+            )
+        )
+        _file.flush()
+        os.fsync(_file.fileno())
+        return index_offset
+
+    def _reopen(self):
+        self._close()
+        self._index = {}
+        self._open()
+
+    def delete(self):
+        """Remove the store file and forget its torrent files."""
+        with self._lock:
+            self._close()
+            self._index = {}
+            self._pending = {}
+            self._removed = set()
+            self._size = 0
+            if os.path.isfile(self.filepath):
+                os.remove(self.filepath)
+
+    def import_files(self, state_dir, torrent_ids):
+        """Move the torrent files of the per torrent layout into the store.
+
+        Args:
+            state_dir (str): The directory with the `<torrent_id>.torrent` files.
+            torrent_ids (list): The torrents to import, if not in the store.
+
+        Returns:
+            int: The number of torrent files imported.
+
+        """
+        filepaths = []
+        for torrent_id in torrent_ids:
+            filepath = os.path.join(state_dir, torrent_id + '.torrent')
+            if torrent_id in self or not os.path.isfile(filepath):
+                continue
+            try:
+                with open(filepath, 'rb') as _file:
+                    self.put(torrent_id, _file.read())
+            except (IOError, ValueError) as ex:
+                log.warning('Unable to import torrent file %s: %s', filepath, ex)
+            else:
+                filepaths.append(filepath)
+
+        if filepaths:
+            self.flush()
+            for filepath in filepaths:
+                try:
+                    os.remove(filepath)
+                except OSError as ex:
+                    log.warning('Unable to remove imported %s: %s', filepath, ex)
+        return len(filepaths)
+
+    def export_files(self, state_dir):
+        """Write the torrent files back to the per torrent layout.
+
+        A torrent file changed after the store file is kept as it is newer
+        than the copy in the store. The store file is removed once every
+        torrent file is written.
+
+        Args:
+            state_dir (str): The directory for the `<torrent_id>.torrent` files.
+
+        Returns:
+            int: The number of torrent files written.
+
+        """
+        count = 0
+        try:
+            store_mtime = os.path.getmtime(self.filepath)
+        except OSError:
+            store_mtime = None
+        for torrent_id in self.torrent_ids():
+            filepath = os.path.join(state_dir, torrent_id + '.torrent')
+            if (
+                store_mtime
+                and os.path.isfile(filepath)
+                and os.path.getmtime(filepath) > store_mtime
+            ):
+                log.info('Keeping the newer torrent file %s', filepath)
+                continue
+            try:
+                with open(filepath, 'wb') as _file:
+                    _file.write(self.get(torrent_id))
+            except IOError as ex:
+                log.error('Unable to export torrent file %s: %s', filepath, ex)
+                return count
+            count += 1
+        self.delete()
+        return count
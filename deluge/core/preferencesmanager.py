@@ -57,6 +57,7 @@
     'copy_torrent_file': False,
     'del_copy_torrent_file': False,
     'torrentfiles_location': deluge.common.get_default_download_dir(),
+    'packed_torrent_metadata': False,
     'plugins_location': os.path.join(deluge.configmanager.get_config_dir(), 'plugins'),
     'prioritize_first_last_pieces': False,
     'sequential_download': False,
@@ -127,6 +128,7 @@
     'auto_manage_prefer_seeds': False,
     'shared': False,
     'super_seeding': False,
+    'reactor_watchdog': False,
 }
 
 
@@ -8,12 +8,14 @@
 #
 
 """RPCServer Module"""
+
 from __future__ import unicode_literals
 
 import logging
 import os
 import stat
 import sys
+import time
 import traceback
 from collections import namedtuple
 from types import FunctionType
@@ -29,6 +31,7 @@
     AUTH_LEVEL_DEFAULT,
     AUTH_LEVEL_NONE,
 )
+from deluge.core.rpcstats import RPCStats, listen_metrics
 from deluge.crypto_utils import get_context_factory
 from deluge.error import (
     DelugeError,
@@ -117,6 +120,11 @@ def __init__(self):
         super(DelugeRPCProtocol, self).__init__()
         # namedtuple subclass with auth_level, username for the connected session.
         self.AuthLevel = namedtuple('SessionAuthlevel', 'auth_level, username')
+        # The scheduled dispatch calls and the requests waiting on a Deferred,
+        # by request_id, so they can be cancelled by the client.
+        self._pending_calls = {}
+        self._running_requests = set()
+        self._cancelled_requests = set()
 
     def message_received(self, request):
         """
@@ -137,6 +145,9 @@ def message_received(self, request):
             log.debug('Received invalid message: there are no items')
             return
 
+        self.factory.stats.add_codec_time(decode=self._last_decode_time)
+        # Share the size of the message between the calls it contains.
+        request_size = self._last_message_size // len(request)
         for call in request:
             if len(call) != 4:
                 log.debug(
@@ -145,7 +156,48 @@ def message_received(self, request):
                 )
                 continue
             # log.debug('RPCRequest: %s', format_request(call))
-            reactor.callLater(0, self.dispatch, *call)
+            if call[1] == 'daemon.cancel_request':
+                # Handled right away so it can overtake the scheduled calls.
+                self.cancel_request(call[0], *call[2])
+                continue
+            self._pending_calls[call[0]] = reactor.callLater(
+                0, self._dispatch_pending, request_size, *call
+            )
+
+    def _dispatch_pending(self, request_size, request_id, method, args, kwargs):
+        self._pending_calls.pop(request_id, None)
+        self.dispatch(request_id, method, args, kwargs, request_size=request_size)
+
+    def cancel_request(self, request_id, cancel_id):
+        """
+        Drop a request from the client. If it has not been dispatched yet it
+        is not run, otherwise the response is not sent.
+
+        :param request_id: the request_id of the cancel request
+        :type request_id: int
+        :param cancel_id: the request_id of the request to cancel
+        :type cancel_id: int
+
+        """
+        if not self.valid_session():
+            return
+
+        delayed_call = self._pending_calls.pop(cancel_id, None)
+        if delayed_call and delayed_call.active():
+            log.debug('Cancelled RPC request %s before dispatch', cancel_id)
+            delayed_call.cancel()
+        elif cancel_id in self._running_requests:
+            log.debug('Cancelled RPC request %s, dropping the response', cancel_id)
+            self._cancelled_requests.add(cancel_id)
+        self.sendData((RPC_RESPONSE, request_id, True))
+
+    def _finish_request(self, request_id):
+        """Returns True if the response to the request should be sent."""
+        self._running_requests.discard(request_id)
+        if request_id in self._cancelled_requests:
+            self._cancelled_requests.discard(request_id)
+            return False
+        return True
 
     def sendData(self, data):  # NOQA: N802
         """
@@ -155,13 +207,19 @@ def sendData(self, data):  # NOQA: N802
             be one of the RPC message types.
         :type data: object
 
+        :returns: the number of bytes sent
+        :rtype: int
+
         """
+        encode_time = self._encode_time
         try:
-            self.transfer_message(data)
+            size = self.transfer_message(data)
         except Exception as ex:
             log.warning('Error occurred when sending message: %s.', ex)
             log.exception(ex)
             raise
+        self.factory.stats.add_codec_time(encode=self._encode_time - encode_time)
+        return size or 0
 
     def connectionMade(self):  # NOQA: N802
         """
@@ -199,7 +257,7 @@ def connectionLost(self, reason=connectionDone):  # NOQA: N802
     def valid_session(self):
         return self.transport.sessionno in self.factory.authorized_sessions
 
-    def dispatch(self, request_id, method, args, kwargs):
+    def dispatch(self, request_id, method, args, kwargs, request_size=0):
         """
         This method is run when a RPC Request is made.  It will run the local method
         and will send either a RPC Response or RPC Error back to the client.
@@ -213,6 +271,8 @@ def dispatch(self, request_id, method, args, kwargs):
         :type args: list
         :param kwargs: the keyword-arguments to pass to `method`
         :type kwargs: dict
+        :param request_size: the size of the request on the wire, for the stats
+        :type request_size: int
 
         """
 
@@ -223,7 +283,7 @@ def send_error():
             exc_type, exc_value, dummy_exc_trace = sys.exc_info()
             formated_tb = traceback.format_exc()
             try:
-                self.sendData(
+                return self.sendData(
                     (
                         RPC_ERROR,
                         request_id,
@@ -246,11 +306,17 @@ def send_error():
                         str(exc_value), exc_type.__name__, formated_tb
                     )
                 except WrappedException:
-                    send_error()
+                    return send_error()
             except Exception as ex:
                 log.error(
                     'An exception occurred while sending RPC_ERROR to client: %s', ex
                 )
+            return 0
+
+        def record(response_size, failed=False):
+            self.factory.stats.record(
+                method, time.time() - start, request_size, response_size, failed
+            )
 
         if method == 'daemon.info':
             # This is a special case and used in the initial connection process
@@ -308,6 +374,7 @@ def send_error():
                 return
 
         log.debug('RPC dispatch %s', method)
+        start = time.time()
         try:
             method_auth_requirement = self.factory.methods[method]._rpcserver_auth_level
             auth_level = self.factory.authorized_sessions[
@@ -323,9 +390,9 @@ def send_error():
             # Set the session_id in the factory so that methods can know
             # which session is calling it.
             self.factory.session_id = self.transport.sessionno
-            ret = self.factory.methods[method](*args, **kwargs)
+            ret = self.factory.stats.call(self.factory.methods[method], *args, **kwargs)
         except Exception as ex:
-            send_error()
+            record(send_error(), failed=True)
             # Don't bother printing out DelugeErrors, because they are just
             # for the client
             if not isinstance(ex, DelugeError):
@@ -334,24 +401,29 @@ def send_error():
             # Check if the return value is a deferred, since we'll need to
             # wait for it to fire before sending the RPC_RESPONSE
             if isinstance(ret, defer.Deferred):
+                self._running_requests.add(request_id)
 
                 def on_success(result):
+                    if not self._finish_request(request_id):
+                        return result
                     try:
-                        self.sendData((RPC_RESPONSE, request_id, result))
+                        record(self.sendData((RPC_RESPONSE, request_id, result)))
                     except Exception:
-                        send_error()
+                        record(send_error(), failed=True)
                     return result
 
                 def on_fail(failure):
+                    if not self._finish_request(request_id):
+                        return failure
                     try:
                         failure.raiseException()
                     except Exception:
-                        send_error()
+                        record(send_error(), failed=True)
                     return failure
 
                 ret.addCallbacks(on_success, on_fail)
             else:
-                self.sendData((RPC_RESPONSE, request_id, ret))
+                record(self.sendData((RPC_RESPONSE, request_id, ret)))
 
 
 class RPCServer(component.Component):
@@ -386,6 +458,10 @@ def __init__(self, port=58846, interface='', allow_remote=False, listen=True):
         self.factory.session_protocols = {}
         # Holds the interested event list for the sessions
         self.factory.interested_events = {}
+        # Holds the call statistics of the exported methods
+        self.factory.stats = RPCStats()
+        # The port serving the statistics for Prometheus, if listening.
+        self.metrics_listener = None
 
         self.listen = listen
         if not listen:
@@ -442,7 +518,7 @@ def deregister_object(self, obj):
         :param obj: the object that was previously registered
 
         """
-        for key, value in self.factory.methods.items():
+        for key, value in list(self.factory.methods.items()):
             if value.__self__ == obj:
                 del self.factory.methods[key]
 
@@ -469,6 +545,29 @@ def get_method_list(self):
         """
         return list(self.factory.methods)
 
+    def get_rpc_stats(self):
+        """
+        Returns the call statistics of the exported methods.
+
+        :returns: the statistics, see :meth:`RPCStats.to_dict`
+        :rtype: dict
+
+        """
+        return self.factory.stats.to_dict()
+
+    def listen_metrics(self, port, interface='localhost'):
+        """
+        Serve the call statistics over HTTP for Prometheus scraping until
+        the RPCServer is stopped.
+
+        :param port: the port to listen on
+        :type port: int
+        :param interface: the interface to listen on
+        :type interface: str
+
+        """
+        self.metrics_listener = listen_metrics(self.factory.stats, port, interface)
+
     def get_session_id(self):
         """
         Returns the session id of the current RPC.
@@ -529,6 +628,22 @@ def is_session_valid(self, session_id):
         """
         return session_id in self.factory.authorized_sessions
 
+    def has_event_interest(self, event_name):
+        """
+        Checks if any client is interested in an event.
+
+        :param event_name: the name of the event
+        :type event_name: str
+
+        :returns: True if a session registered interest in the event
+        :rtype: bool
+
+        """
+        return any(
+            event_name in interest
+            for interest in self.factory.interested_events.values()
+        )
+
     def emit_event(self, event):
         """
         Emits the event to interested clients.
@@ -588,6 +703,9 @@ def emit_event_for_session_id(self, session_id, event):
 
     def stop(self):
         self.factory.state = 'stopping'
+        if self.metrics_listener:
+            listener, self.metrics_listener = self.metrics_listener, None
+            return listener.stopListening()
 
 
 def check_ssl_keys():
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""Instrumentation of the RPC methods called on the daemon."""
+
+from __future__ import division, unicode_literals
+
+import logging
+import random
+
+from twisted.web import resource, server
+
+from deluge.common import LatencyHistogram, format_profile_stats
+
+log = logging.getLogger(__name__)
+
+
+class MethodStats(object):
+    """The call statistics of one RPC method."""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def to_dict(self):
+        stats = self.latency.to_dict()
+        stats['request_bytes'] = self.request_bytes
+        stats['response_bytes'] = self.response_bytes
+        return stats
+
+
+class RPCStats(object):
+    """
+    Collects per method call counts, latencies and payload sizes of the RPC
+    server, the time spent encoding and decoding messages and, when enabled,
+    a cProfile of a sample of the calls.
+
+    The latency of a method returning a Deferred is measured until the
+    Deferred fires, while profiling only covers the synchronous part.
+    """
+
+    def __init__(self):
+        self.methods = {}
+        self.encode_time = 0.0
+        self.decode_time = 0.0
+        self.profiler = None
+        self.profile_sample_rate = 0.0
+
+    def record(self, method, seconds, request_bytes=0, response_bytes=0, failed=False):
+        """Record a completed call of a method.
+
+        Args:
+            method (str): The RPC method name.
+            seconds (float): The time until the response was sent.
+            request_bytes (int): The size of the request on the wire.
+            response_bytes (int): The size of the response on the wire.
+            failed (bool): If an error was sent in response.
+        """
+        if method not in self.methods:
+            self.methods[method] = MethodStats()
+        stats = self.methods[method]
+        stats.latency.add(seconds, failed=failed)
+        stats.request_bytes += request_bytes
+        stats.response_bytes += response_bytes
+
+    def add_codec_time(self, encode=0.0, decode=0.0):
+        self.encode_time += encode
+        self.decode_time += decode
+
+    def reset(self):
+        self.methods = {}
+        self.encode_time = 0.0
+        self.decode_time = 0.0
+
+    def to_dict(self):
+        """The statistics as a dict suitable for sending over RPC."""
+        return {
+            'methods': {
+                method: stats.to_dict() for method, stats in self.methods.items()
+            },
+            'encode_time': self.encode_time,
+            'decode_time': self.decode_time,
+            'profiling': self.profiler is not None,
+            'profile_sample_rate': self.profile_sample_rate,
+        }
+
+    def to_prometheus(self):
+        """The statistics in the Prometheus text exposition format.
+
+        The samples of each metric family follow its TYPE line, the format
+        does not allow the families to be interleaved.
+        """
+        methods = [
+            ('method="%s"' % method, self.methods[method])
+            for method in sorted(self.methods)
+        ]
+        lines = []
+        for name, value in (
+            ('calls', lambda stats: stats.latency.count),
+            ('errors', lambda stats: stats.latency.errors),
+            ('request_bytes', lambda stats: stats.request_bytes),
+            ('response_bytes', lambda stats: stats.response_bytes),
+        ):
+            lines.append('# TYPE deluge_rpc_%s_total counter' % name)
+            for label, stats in methods:
+                lines.append('deluge_rpc_%s_total{%s} %d' % (name, label, value(stats)))
+
+        lines.append('# TYPE deluge_rpc_duration_seconds histogram')
+        for label, stats in methods:
+            latency = stats.latency
+            cumulative = 0
+            for bound, count in zip(latency.BUCKETS, latency.counts):
+                cumulative += count
+                lines.append(
+                    'deluge_rpc_duration_seconds_bucket{%s,le="%g"} %d'
+                    % (label, bound, cumulative)
+                )
+            lines.append(
+                'deluge_rpc_duration_seconds_bucket{%s,le="+Inf"} %d'
+                % (label, latency.count)
+            )
+            lines.append(
+                'deluge_rpc_duration_seconds_sum{%s} %f' % (label, latency.total)
+            )
+            lines.append(
+                'deluge_rpc_duration_seconds_count{%s} %d' % (label, latency.count)
+            )
+
+        lines.append('# TYPE deluge_rpc_codec_seconds_total counter')
+        lines.append(
+            'deluge_rpc_codec_seconds_total{op="encode"} %f' % self.encode_time
+        )
+        lines.append(
+            'deluge_rpc_codec_seconds_total{op="decode"} %f' % self.decode_time
+        )
+        return '\n'.join(lines) + '\n'
+
+    def start_profiling(self, sample_rate=0.1):
+        """Start profiling a sample of the RPC calls.
+
+        Args:
+            sample_rate (float): The fraction of calls to profile, 0-1.
+        """
+        import cProfile
+
+        if self.profiler is None:
+            self.profiler = cProfile.Profile()
+        self.profile_sample_rate = sample_rate
+        log.info('RPC profiling started with sample rate %s', sample_rate)
+
+    def stop_profiling(self):
+        """Stop profiling, discarding the collected profile."""
+        self.profiler = None
+        self.profile_sample_rate = 0.0
+        log.info('RPC profiling stopped')
+
+    def get_profile(self, sort='cumulative', limit=50):
+        """The collected profile formatted as text, empty if not profiling."""
+        if self.profiler is None:
+            return ''
+        return format_profile_stats(self.profiler, sort=sort, limit=limit)
+
+    def call(self, func, *args, **kwargs):
+        """Call an RPC method, profiling the call if it is sampled."""
+        if self.profiler is not None and random.random() < self.profile_sample_rate:
+            return self.profiler.runcall(func, *args, **kwargs)
+        return func(*args, **kwargs)
+
+
+class MetricsResource(resource.Resource):
+    """Serves the RPC statistics in the Prometheus text format."""
+
+    isLeaf = True  # NOQA: N815
+
+    def __init__(self, stats):
+        resource.Resource.__init__(self)
+        self.stats = stats
+
+    def render_GET(self, request):  # NOQA: N802
+        request.setHeader(b'content-type', b'text/plain; version=0.0.4')
+        return self.stats.to_prometheus().encode('utf8')
+
+
+def listen_metrics(stats, port, interface='localhost'):
+    """Start serving the RPC statistics over HTTP for Prometheus scraping.
+
+    Args:
+        stats (RPCStats): The statistics to serve.
+        port (int): The port to listen on.
+        interface (str): The interface to listen on.
+
+    Returns:
+        twisted.internet.interfaces.IListeningPort: The listening port.
+    """
+    from twisted.internet import reactor
+
+    log.info('Serving RPC metrics at http://%s:%s/metrics', interface, port)
+    return reactor.listenTCP(
+        port, server.Site(MetricsResource(stats)), interface=interface
+    )
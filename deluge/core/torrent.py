@@ -19,13 +19,14 @@
 import logging
 import os
 import socket
+import time
 
 from twisted.internet.defer import Deferred, DeferredList
 
 import deluge.component as component
 from deluge._libtorrent import lt
 from deluge.common import decode_bytes
-from deluge.configmanager import ConfigManager, get_config_dir
+from deluge.configmanager import ConfigManager
 from deluge.core.authmanager import AUTH_LEVEL_ADMIN
 from deluge.decorators import deprecated
 from deluge.event import (
@@ -59,6 +60,9 @@
     'checking_resume_data': 'Checking',
 }
 
+# Seconds the torrent_info and file lists of a torrent are kept after last use.
+METADATA_KEEP_TIME = 300
+
 
 def sanitize_filepath(filepath, folder=False):
     """Returns a sanitized filepath to pass to libtorrent rename_file().
@@ -90,6 +94,31 @@ def clean_filename(filename):
     return newfilepath
 
 
+def metadata_summary(torrent_info):
+    """The values of the torrent metadata used in the torrent status.
+
+    Args:
+        torrent_info (lt.torrent_info): The libtorrent torrent info.
+
+    Returns:
+        dict: The name, total_size, num_files, num_pieces, piece_length,
+            private, comment and creator of the torrent.
+
+    """
+    # Use the top-level folder as torrent name.
+    filename = decode_bytes(torrent_info.file_at(0).path)
+    return {
+        'name': filename.replace('\\', '/', 1).split('/', 1)[0],
+        'total_size': torrent_info.total_size(),
+        'num_files': torrent_info.num_files(),
+        'num_pieces': torrent_info.num_pieces(),
+        'piece_length': torrent_info.piece_length(),
+        'private': torrent_info.priv(),
+        'comment': decode_bytes(torrent_info.comment()),
+        'creator': decode_bytes(torrent_info.creator()),
+    }
+
+
 def convert_lt_files(files):
     """Indexes and decodes files from libtorrent get_files().
 
@@ -213,7 +242,10 @@ class Torrent(object):
         handle: Holds the libtorrent torrent handle
         magnet (str): The magnet URI used to add this torrent (if available).
         status: Holds status info so that we don"t need to keep getting it from libtorrent.
-        torrent_info: store the torrent info.
+        torrent_info: The libtorrent torrent info, fetched from the handle when used and
+            released when not used for a while.
+        metadata (dict): The summary of the torrent metadata from `metadata_summary`, None
+            until the metadata is available.
         has_metadata (bool): True if the metadata for the torrent is available, False otherwise.
         status_funcs (dict): The function mappings to get torrent status
         prev_status (dict): Previous status dicts returned for this torrent. We use this to return
@@ -250,8 +282,18 @@ def __init__(self, handle, options, state=None, filename=None, magnet=None):
         self.magnet = magnet
         self.status = self.handle.status()
 
-        self.torrent_info = self.handle.get_torrent_info()
         self.has_metadata = self.status.has_metadata
+        self._torrent_info = None
+        self._files = None
+        self._orig_files = None
+        self.metadata_used = 0
+        # The summary saved in the state saves fetching the torrent_info.
+        self.metadata = getattr(state, 'metadata', None)
+        if self.metadata:
+            self.metadata = dict(self.metadata)
+        elif self.has_metadata:
+            self.metadata = metadata_summary(self.torrent_info)
+            self.release_metadata()
 
         self.options = TorrentOptions()
         self.options.update(options)
@@ -289,11 +331,54 @@ def __init__(self, handle, options, state=None, filename=None, magnet=None):
     def on_metadata_received(self):
         """Process the metadata received alert for this torrent"""
         self.has_metadata = True
-        self.torrent_info = self.handle.get_torrent_info()
+        self.release_metadata()
+        self.metadata = metadata_summary(self.torrent_info)
         if self.options['prioritize_first_last_pieces']:
             self.set_prioritize_first_last_pieces(True)
         self.write_torrentfile()
 
+    def on_file_renamed(self, index):
+        """Process the file renamed alert for this torrent.
+
+        Args:
+            index (int): The index of the file renamed.
+
+        """
+        self.release_metadata()
+        if index == 0 and self.metadata:
+            self.metadata['name'] = metadata_summary(self.torrent_info)['name']
+
+    @property
+    def torrent_info(self):
+        """The libtorrent torrent_info, None until the metadata is available."""
+        if self._torrent_info is None and self.has_metadata:
+            self._torrent_info = self.handle.get_torrent_info()
+        self.metadata_used = time.time()
+        return self._torrent_info
+
+    def release_metadata(self, keep_time=0):
+        """Release the torrent_info and file lists, fetched again when used.
+
+        Args:
+            keep_time (int): Only release them when not used for this many seconds.
+
+        Returns:
+            bool: True if they were released.
+
+        """
+        if (
+            self._torrent_info is None
+            and self._files is None
+            and self._orig_files is None
+        ):
+            return False
+        if keep_time and time.time() - self.metadata_used < keep_time:
+            return False
+        self._torrent_info = None
+        self._files = None
+        self._orig_files = None
+        return True
+
     # --- Options methods ---
     def set_options(self, options):
         """Set the torrent options.
@@ -512,7 +597,7 @@ def set_file_priorities(self, file_priorities):
                 'Setting %s file priorities to: %s', self.torrent_id, file_priorities
             )
 
-        if file_priorities and len(file_priorities) == len(self.get_files()):
+        if file_priorities and len(file_priorities) == self.metadata['num_files']:
             self.handle.prioritize_files(file_priorities)
         else:
             log.debug('Unable to set new file priorities.')
@@ -766,8 +851,10 @@ def get_files(self):
         if not self.has_metadata:
             return []
 
-        files = self.torrent_info.files()
-        return convert_lt_files(files)
+        if self._files is None:
+            self._files = convert_lt_files(self.torrent_info.files())
+        self.metadata_used = time.time()
+        return self._files
 
     def get_orig_files(self):
         """Get the original filenames of files in this torrent.
@@ -779,8 +866,10 @@ def get_orig_files(self):
         if not self.has_metadata:
             return []
 
-        files = self.torrent_info.orig_files()
-        return convert_lt_files(files)
+        if self._orig_files is None:
+            self._orig_files = convert_lt_files(self.torrent_info.orig_files())
+        self.metadata_used = time.time()
+        return self._orig_files
 
     def get_peers(self):
         """Get the peers for this torrent.
@@ -872,10 +961,8 @@ def get_file_progress(self):
         if not self.has_metadata:
             return []
         return [
-            progress / _file.size if _file.size else 0.0
-            for progress, _file in zip(
-                self.handle.file_progress(), self.torrent_info.files()
-            )
+            progress / _file['size'] if _file['size'] else 0.0
+            for progress, _file in zip(self.handle.file_progress(), self.get_files())
         ]
 
     def get_tracker_host(self):
@@ -934,10 +1021,8 @@ def get_name(self):
         if self.options['name']:
             return self.options['name']
 
-        if self.has_metadata:
-            # Use the top-level folder as torrent name.
-            filename = decode_bytes(self.torrent_info.file_at(0).path)
-            name = filename.replace('\\', '/', 1).split('/', 1)[0]
+        if self.metadata:
+            name = self.metadata['name']
         else:
             name = decode_bytes(self.handle.name())
 
@@ -1108,25 +1193,15 @@ def _create_status_funcs(self):
             'trackers': lambda: self.trackers,
             'tracker_status': lambda: self.tracker_status,
             'upload_payload_rate': lambda: self.status.upload_payload_rate,
-            'comment': lambda: decode_bytes(self.torrent_info.comment())
-            if self.has_metadata
-            else '',
-            'creator': lambda: decode_bytes(self.torrent_info.creator())
-            if self.has_metadata
-            else '',
-            'num_files': lambda: self.torrent_info.num_files()
-            if self.has_metadata
-            else 0,
-            'num_pieces': lambda: self.torrent_info.num_pieces()
-            if self.has_metadata
-            else 0,
-            'piece_length': lambda: self.torrent_info.piece_length()
-            if self.has_metadata
-            else 0,
-            'private': lambda: self.torrent_info.priv() if self.has_metadata else False,
-            'total_size': lambda: self.torrent_info.total_size()
-            if self.has_metadata
+            'comment': lambda: self.metadata['comment'] if self.metadata else '',
+            'creator': lambda: self.metadata['creator'] if self.metadata else '',
+            'num_files': lambda: self.metadata['num_files'] if self.metadata else 0,
+            'num_pieces': lambda: self.metadata['num_pieces'] if self.metadata else 0,
+            'piece_length': lambda: self.metadata['piece_length']
+            if self.metadata
             else 0,
+            'private': lambda: self.metadata['private'] if self.metadata else False,
+            'total_size': lambda: self.metadata['total_size'] if self.metadata else 0,
             'eta': self.get_eta,
             'file_progress': self.get_file_progress,
             'files': self.get_files,
@@ -1280,53 +1355,44 @@ def save_resume_data(self, flush_disk_cache=False):
             self.handle.save_resume_data(flags)
 
     def write_torrentfile(self, filedump=None):
-        """Writes the torrent file to the state dir and optional 'copy of' dir.
+        """Writes the torrent file to the state and optional 'copy of' dir.
 
         Args:
             filedump (str, optional): bencoded filedump of a torrent file.
 
         """
-
-        def write_file(filepath, filedump):
-            """Write out the torrent file"""
-            log.debug('Writing torrent file to: %s', filepath)
-            try:
-                with open(filepath, 'wb') as save_file:
-                    save_file.write(filedump)
-            except IOError as ex:
-                log.error('Unable to save torrent file to: %s', ex)
-
-        filepath = os.path.join(get_config_dir(), 'state', self.torrent_id + '.torrent')
-
         if filedump is None:
             lt_ct = lt.create_torrent(self.torrent_info)
             filedump = lt.bencode(lt_ct.generate())
 
-        write_file(filepath, filedump)
+        component.get('TorrentManager').write_torrent_metadata(
+            self.torrent_id, filedump
+        )
 
         # If the user has requested a copy of the torrent be saved elsewhere we need to do that.
         if self.config['copy_torrent_file']:
             if not self.filename:
                 self.filename = self.get_name() + '.torrent'
             filepath = os.path.join(self.config['torrentfiles_location'], self.filename)
-            write_file(filepath, filedump)
+            log.debug('Writing torrent file to: %s', filepath)
+            try:
+                with open(filepath, 'wb') as save_file:
+                    save_file.write(filedump)
+            except IOError as ex:
+                log.error('Unable to save torrent file to: %s', ex)
 
     def delete_torrentfile(self, delete_copies=False):
-        """Deletes the .torrent file in the state directory in config"""
-        torrent_files = [
-            os.path.join(get_config_dir(), 'state', self.torrent_id + '.torrent')
-        ]
-        if delete_copies:
-            torrent_files.append(
-                os.path.join(self.config['torrentfiles_location'], self.filename)
-            )
+        """Deletes the .torrent file in the state and optional 'copy of' dir."""
+        component.get('TorrentManager').delete_torrent_metadata(self.torrent_id)
+        if not delete_copies:
+            return
 
-        for torrent_file in torrent_files:
-            log.debug('Deleting torrent file: %s', torrent_file)
-            try:
-                os.remove(torrent_file)
-            except OSError as ex:
-                log.warning('Unable to delete the torrent file: %s', ex)
+        torrent_file = os.path.join(self.config['torrentfiles_location'], self.filename)
+        log.debug('Deleting torrent file: %s', torrent_file)
+        try:
+            os.remove(torrent_file)
+        except OSError as ex:
+            log.warning('Unable to delete the torrent file: %s', ex)
 
     def force_reannounce(self):
         """Force a tracker reannounce"""
@@ -15,20 +15,26 @@
 import operator
 import os
 import time
-from collections import namedtuple
+from collections import deque, namedtuple
 from tempfile import gettempdir
 
 import six.moves.cPickle as pickle  # noqa: N813
 from twisted.internet import defer, error, reactor, threads
 from twisted.internet.defer import Deferred, DeferredList
-from twisted.internet.task import LoopingCall
+from twisted.internet.task import LoopingCall, TaskDone, TaskStopped, cooperate
 
 import deluge.component as component
 from deluge._libtorrent import lt
 from deluge.common import PY2, archive_files, decode_bytes, get_magnet_info, is_magnet
 from deluge.configmanager import ConfigManager, get_config_dir
 from deluge.core.authmanager import AUTH_LEVEL_ADMIN
-from deluge.core.torrent import Torrent, TorrentOptions, sanitize_filepath
+from deluge.core.metadatastore import MetadataStore
+from deluge.core.torrent import (
+    METADATA_KEEP_TIME,
+    Torrent,
+    TorrentOptions,
+    sanitize_filepath,
+)
 from deluge.error import AddTorrentError, InvalidTorrentError
 from deluge.event import (
     ExternalIPEvent,
@@ -88,6 +94,7 @@ def __init__(
         shared=False,
         super_seeding=False,
         name=None,
+        metadata=None,
     ):
         # Build the class atrribute list from args
         for key, value in locals().items():
@@ -151,6 +158,14 @@ def __init__(self):
         if not os.path.exists(self.state_dir):
             os.makedirs(self.state_dir)
         self.temp_file = os.path.join(self.state_dir, '.safe_state_check')
+        # The torrent files of the session torrents.
+        self.metadata_store = MetadataStore(
+            os.path.join(self.state_dir, 'torrents.metadata')
+        )
+        # The task adding the torrents of the state, None once they are added.
+        self.loading_state = None
+        # The torrents of the state not added as the loading was stopped.
+        self.unloaded_state = []
 
         # Create the torrents dict { torrent_id: Torrent }
         self.torrents = {}
@@ -225,6 +240,7 @@ def __init__(self):
         self.save_state_timer = LoopingCall(self.save_state)
         self.save_resume_data_timer = LoopingCall(self.save_resume_data)
         self.prev_status_cleanup_loop = LoopingCall(self.cleanup_torrents_prev_status)
+        self.metadata_release_loop = LoopingCall(self.release_torrents_metadata)
 
     def start(self):
         # Check for old temp file to verify safe shutdown
@@ -242,6 +258,7 @@ def start(self):
         self.save_state_timer.start(200, False)
         self.save_resume_data_timer.start(190, False)
         self.prev_status_cleanup_loop.start(10)
+        self.metadata_release_loop.start(60, now=False)
 
     @defer.inlineCallbacks
     def stop(self):
@@ -255,8 +272,18 @@ def stop(self):
         if self.prev_status_cleanup_loop.running:
             self.prev_status_cleanup_loop.stop()
 
+        if self.metadata_release_loop.running:
+            self.metadata_release_loop.stop()
+
+        if self.loading_state:
+            try:
+                self.loading_state.stop()
+            except TaskDone:
+                pass
+
         # Save state on shutdown
         yield self.save_state()
+        self.metadata_store.close()
 
         self.session.pause()
 
@@ -339,6 +366,79 @@ def get_torrent_info_from_file(self, filepath):
         else:
             return torrent_info
 
+    def get_torrent_info_from_state(self, torrent_id):
+        """Retrieves torrent_info from the torrent file saved for a torrent.
+
+        Args:
+            torrent_id (str): The torrent_id.
+
+        Returns:
+            lt.torrent_info: A libtorrent torrent_info dict or None if no or invalid data.
+
+        """
+        filedump = self.metadata_store.get(torrent_id)
+        if filedump is None:
+            return self.get_torrent_info_from_file(
+                os.path.join(self.state_dir, torrent_id + '.torrent')
+            )
+        try:
+            return lt.torrent_info(lt.bdecode(filedump))
+        except RuntimeError as ex:
+            log.warning('Unable to read torrent file of %s: %s', torrent_id, ex)
+
+    def write_torrent_metadata(self, torrent_id, filedump):
+        """Save the torrent file of a torrent in the state.
+
+        Args:
+            torrent_id (str): The torrent_id.
+            filedump (bytes): The bencoded torrent file.
+
+        """
+        if self.config['packed_torrent_metadata']:
+            self.metadata_store.put(torrent_id, filedump)
+            return
+
+        filepath = os.path.join(self.state_dir, torrent_id + '.torrent')
+        log.debug('Writing torrent file to: %s', filepath)
+        try:
+            with open(filepath, 'wb') as save_file:
+                save_file.write(filedump)
+        except IOError as ex:
+            log.error('Unable to save torrent file to: %s', ex)
+
+    def delete_torrent_metadata(self, torrent_id):
+        """Delete the torrent file of a torrent from the state."""
+        self.metadata_store.remove(torrent_id)
+        filepath = os.path.join(self.state_dir, torrent_id + '.torrent')
+        if os.path.isfile(filepath):
+            log.debug('Deleting torrent file: %s', filepath)
+            try:
+                os.remove(filepath)
+            except OSError as ex:
+                log.warning('Unable to delete the torrent file: %s', ex)
+
+    def migrate_torrent_metadata(self, torrent_ids):
+        """Move the torrent files in the state to the configured layout.
+
+        With `packed_torrent_metadata` the `<torrent_id>.torrent` files are
+        moved into the metadata store, otherwise the store is written back
+        to them.
+
+        Args:
+            torrent_ids (list): The torrent_ids of the session.
+
+        """
+        filepath = self.metadata_store.filepath
+        if self.config['packed_torrent_metadata']:
+            self.metadata_store.open()
+            count = self.metadata_store.import_files(self.state_dir, torrent_ids)
+            if count:
+                log.info('Moved %d torrent files into %s', count, filepath)
+        elif os.path.isfile(filepath):
+            self.metadata_store.open()
+            count = self.metadata_store.export_files(self.state_dir)
+            log.info('Moved %d torrent files out of %s', count, filepath)
+
     def prefetch_metadata(self, magnet, timeout):
         """Download the metadata for a magnet URI.
 
@@ -840,46 +940,18 @@ def load_state(self):
             key=operator.attrgetter('queue'), reverse=self.config['queue_new_to_top']
         )
         resume_data = self.load_resume_data_file()
+        self.migrate_torrent_metadata(
+            [t_state.torrent_id for t_state in state.torrents]
+        )
 
         deferreds = []
-        for t_state in state.torrents:
-            # Populate the options dict from state
-            options = TorrentOptions()
-            for option in options:
-                try:
-                    options[option] = getattr(t_state, option)
-                except AttributeError:
-                    pass
-            # Manually update unmatched attributes
-            options['download_location'] = t_state.save_path
-            options['pre_allocate_storage'] = t_state.storage_mode == 'allocate'
-            options['prioritize_first_last_pieces'] = t_state.prioritize_first_last
-            options['add_paused'] = t_state.paused
-
-            magnet = t_state.magnet
-            torrent_info = self.get_torrent_info_from_file(
-                os.path.join(self.state_dir, t_state.torrent_id + '.torrent')
-            )
 
-            try:
-                d = self.add_async(
-                    torrent_info=torrent_info,
-                    state=t_state,
-                    options=options,
-                    save_state=False,
-                    magnet=magnet,
-                    resume_data=resume_data.get(t_state.torrent_id),
-                )
-            except AddTorrentError as ex:
-                log.warning(
-                    'Error when adding torrent "%s" to session: %s',
-                    t_state.torrent_id,
-                    ex,
-                )
-            else:
-                deferreds.append(d)
+        remaining = deque(state.torrents)
 
-        deferred_list = DeferredList(deferreds, consumeErrors=False)
+        def add_torrents():
+            while remaining:
+                self._add_from_state(remaining.popleft(), resume_data, deferreds)
+                yield
 
         def on_complete(result):
             log.info(
@@ -889,7 +961,59 @@ def on_complete(result):
             )
             component.get('EventManager').emit(SessionStartedEvent())
 
-        deferred_list.addCallback(on_complete)
+        def on_added(result):
+            self.loading_state = None
+            deferred_list = DeferredList(deferreds, consumeErrors=False)
+            deferred_list.addCallback(on_complete)
+
+        def on_stopped(failure):
+            failure.trap(TaskStopped)
+            self.loading_state = None
+            # Keep the torrents not added so saving the state does not drop them.
+            self.unloaded_state = list(remaining)
+            log.info(
+                'Stopped loading torrents from state, %d not added', len(remaining)
+            )
+
+        # Add the torrents in turns with the other reactor calls so the daemon
+        # responds while loading many torrents.
+        self.loading_state = cooperate(add_torrents())
+        d = self.loading_state.whenDone()
+        d.addCallbacks(on_added, on_stopped)
+
+    def _add_from_state(self, t_state, resume_data, deferreds):
+        """Add a torrent of the TorrentManager state to the session."""
+        # Populate the options dict from state
+        options = TorrentOptions()
+        for option in options:
+            try:
+                options[option] = getattr(t_state, option)
+            except AttributeError:
+                pass
+        # Manually update unmatched attributes
+        options['download_location'] = t_state.save_path
+        options['pre_allocate_storage'] = t_state.storage_mode == 'allocate'
+        options['prioritize_first_last_pieces'] = t_state.prioritize_first_last
+        options['add_paused'] = t_state.paused
+
+        magnet = t_state.magnet
+        torrent_info = self.get_torrent_info_from_state(t_state.torrent_id)
+
+        try:
+            d = self.add_async(
+                torrent_info=torrent_info,
+                state=t_state,
+                options=options,
+                save_state=False,
+                magnet=magnet,
+                resume_data=resume_data.get(t_state.torrent_id),
+            )
+        except AddTorrentError as ex:
+            log.warning(
+                'Error when adding torrent "%s" to session: %s', t_state.torrent_id, ex
+            )
+        else:
+            deferreds.append(d)
 
     def create_state(self):
         """Create a state of all the torrents in TorrentManager.
@@ -937,6 +1061,7 @@ def create_state(self):
                 torrent.options['shared'],
                 torrent.options['super_seeding'],
                 torrent.options['name'],
+                dict(torrent.metadata) if torrent.metadata else None,
             )
             state.torrents.append(torrent_state)
         return state
@@ -963,7 +1088,20 @@ def on_state_saved(arg):
 
     def _save_state(self):
         """Save the state of the TorrentManager to the torrents.state file."""
+        # The torrent files are saved first so the state has them all.
+        self.metadata_store.flush()
+
+        # Do not replace the state with the torrents loaded so far.
+        if self.loading_state:
+            log.debug('Not saving state while loading torrents')
+            return
+
         state = self.create_state()
+        state.torrents.extend(
+            t_state
+            for t_state in self.unloaded_state
+            if t_state.torrent_id not in self.torrents
+        )
 
         # If the state hasn't changed, no need to save it
         if self.prev_saved_state == state:
@@ -1215,6 +1353,15 @@ def cleanup_torrents_prev_status(self):
         for torrent in self.torrents.values():
             torrent.cleanup_prev_status()
 
+    def release_torrents_metadata(self):
+        """Release the torrent_info and file lists of the torrents not used recently."""
+        released = 0
+        for torrent in self.torrents.values():
+            if torrent.release_metadata(METADATA_KEEP_TIME):
+                released += 1
+        if released:
+            log.debug('Released the metadata of %d torrents', released)
+
     def on_set_max_connections_per_torrent(self, key, value):
         """Sets the per-torrent connection limit"""
         log.debug('max_connections_per_torrent set to %s...', value)
@@ -1519,6 +1666,7 @@ def on_alert_file_renamed(self, alert):
 
         new_name = decode_bytes(alert.new_name())
         log.debug('index: %s name: %s', alert.index, new_name)
+        torrent.on_file_renamed(alert.index)
 
         # We need to see if this file index is in a waiting_on_folder dict
         for wait_on_folder in torrent.waiting_on_folder_rename:
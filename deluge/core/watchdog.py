@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""Detection of calls blocking the Twisted reactor."""
+
+from __future__ import unicode_literals
+
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+import twisted
+
+import deluge.component as component
+from deluge.common import LatencyHistogram
+from deluge.core.rpcserver import DelugeRPCProtocol
+
+log = logging.getLogger(__name__)
+
+TWISTED_PATH = os.path.dirname(twisted.__file__)
+
+
+class ReactorWatchdog(component.Component):
+    """
+    Measures the lag of the reactor loop and reports the calls that block it.
+
+    A heartbeat is run by the reactor every `interval` seconds. A separate
+    thread checks the heartbeat and, when the reactor has not run it for
+    `threshold` seconds, samples the stack of the reactor thread. The stall
+    is attributed to the component update, alert handler or RPC method found
+    in the stack, then logged and kept for :meth:`get_stats` once the reactor
+    is running again.
+
+    Args:
+        threshold (float): The seconds the reactor is blocked for to report a stall.
+        interval (float): The seconds between heartbeats.
+        max_stalls (int): The number of recent stalls to keep.
+    """
+
+    def __init__(self, threshold=1.0, interval=0.1, max_stalls=50):
+        component.Component.__init__(self, 'ReactorWatchdog', interval=interval)
+        self.threshold = threshold
+        self.stalls = deque(maxlen=max_stalls)
+        self.culprits = {}
+        self.lag = LatencyHistogram()
+        self._last_beat = None
+        self._sample = None
+        self._reactor_thread = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        self._reactor_thread = threading.current_thread().ident
+        self._last_beat = time.time()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._watch, name='ReactorWatchdog')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def update(self):
+        now = time.time()
+        lag = max(0.0, now - self._last_beat - self._component_interval)
+        self.lag.add(lag)
+        self._last_beat = now
+
+        sample = self._sample
+        if sample:
+            self._sample = None
+            self._report_stall(sample, lag + self._component_interval)
+
+    def _watch(self):
+        while not self._stopped.wait(self.threshold / 4):
+            last_beat = self._last_beat
+            if self._sample or time.time() - last_beat < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._reactor_thread)
+            if frame is None:
+                continue
+            # Only keep the sample if the reactor is still blocked in the same stall.
+            sample = (
+                time.time(),
+                self._attribute(frame),
+                traceback.format_stack(frame),
+            )
+            if self._last_beat == last_beat:
+                self._sample = sample
+
+    def _get_alert_handlers(self):
+        try:
+            handlers = component.get('AlertManager').handlers
+            return {
+                getattr(handler, '__code__', None)
+                for handler_list in list(handlers.values())
+                for handler in list(handler_list)
+            }
+        except (KeyError, RuntimeError):
+            # Missing AlertManager or the handlers changed while copying them.
+            return set()
+
+    def _attribute(self, frame):
+        """Find the call responsible for a reactor stall in a stack.
+
+        Args:
+            frame (frame): The innermost frame of the reactor thread.
+
+        Returns:
+            str: A description of the call blocking the reactor.
+        """
+        frames = []
+        while frame is not None:
+            frames.append(frame)
+            frame = frame.f_back
+        frames.reverse()
+
+        alert_handlers = self._get_alert_handlers()
+        in_twisted = False
+        fallback = None
+        for frame in frames:
+            code = frame.f_code
+            if code is component.Component._component_update.__code__:
+                name = getattr(frame.f_locals.get('self'), '_component_name', '')
+                return 'component %s update' % name
+            if code is DelugeRPCProtocol.dispatch.__code__:
+                return 'rpc %s' % frame.f_locals.get('method')
+            if code in alert_handlers:
+                return 'alert handler %s' % self._describe(frame)
+            if code.co_filename.startswith(TWISTED_PATH):
+                in_twisted = True
+            elif in_twisted and fallback is None:
+                # The first call from the reactor back into other code.
+                fallback = self._describe(frame)
+        return fallback or 'unknown'
+
+    @staticmethod
+    def _describe(frame):
+        obj = frame.f_locals.get('self')
+        if obj is not None:
+            return '%s.%s' % (type(obj).__name__, frame.f_code.co_name)
+        return '%s:%s' % (
+            os.path.basename(frame.f_code.co_filename),
+            frame.f_code.co_name,
+        )
+
+    def _report_stall(self, sample, duration):
+        sampled_at, culprit, stack = sample
+        stall = {
+            'time': sampled_at,
+            'duration': duration,
+            'culprit': culprit,
+            'stack': ''.join(stack),
+        }
+        self.stalls.append(stall)
+        stats = self.culprits.setdefault(
+            culprit, {'count': 0, 'total': 0.0, 'max': 0.0}
+        )
+        stats['count'] += 1
+        stats['total'] += duration
+        stats['max'] = max(stats['max'], duration)
+        log.warning(
+            'Reactor blocked for %.2fs by %s at:\n%s',
+            duration,
+            culprit,
+            stall['stack'],
+        )
+
+    def get_stats(self):
+        """Get the reactor lag, recent stalls and component update times.
+
+        Returns:
+            dict: With keys 'lag', 'stalls', 'culprits' and 'component_updates'.
+        """
+        return {
+            'threshold': self.threshold,
+            'lag': self.lag.to_dict(),
+            'stalls': list(self.stalls),
+            'culprits': dict(self.culprits),
+            'component_updates': component.get_update_stats(),
+        }
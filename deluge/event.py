@@ -302,6 +302,20 @@ def __init__(self, plugin_name):
         self._args = [plugin_name]
 
 
+class FilterTreeChangedEvent(DelugeEvent):
+    """
+    Emitted when the counts of the filter tree change.
+    """
+
+    def __init__(self, version):
+        """
+        Args:
+            version (int): The version of the filter tree, see
+                `core.get_filter_tree_changes`.
+        """
+        self._args = [version]
+
+
 class ClientDisconnectedEvent(DelugeEvent):
     """
     Emitted when a client disconnects.
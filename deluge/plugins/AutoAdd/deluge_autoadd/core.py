@@ -18,9 +18,11 @@
 import logging
 import os
 import shutil
+import time
 from base64 import b64encode
+from itertools import chain
 
-from twisted.internet import reactor
+from twisted.internet import defer, reactor, threads
 from twisted.internet.task import LoopingCall, deferLater
 
 import deluge.component as component
@@ -32,6 +34,8 @@
 from deluge.event import DelugeEvent
 from deluge.plugins.pluginbase import CorePluginBase
 
+from .watcher import WatchFolder
+
 log = logging.getLogger(__name__)
 
 
@@ -65,6 +69,16 @@
 }
 
 MAX_NUM_ATTEMPTS = 10
+# The number of files read by each thread
+LOAD_CHUNK_SIZE = 50
+# The number of torrents added to the session at a time
+ADD_BATCH_SIZE = 100
+
+# The results of loading a file
+LOAD_OK = 0
+LOAD_RETRY = 1
+LOAD_INVALID = 2
+LOAD_SPLIT = 3
 
 
 class AutoaddOptionsChangedEvent(DelugeEvent):
@@ -97,6 +111,24 @@ def enable(self):
         self.invalid_torrents = {}
         # Loopingcall timers for each enabled watchdir
         self.update_timers = {}
+        # WatchFolder for each enabled watchdir
+        self.watch_folders = {}
+        # Cache of the torrent options for each watchdir
+        self.watchdir_options = {}
+        # DelayedCalls to check watchdirs after inotify events
+        self.pending_updates = {}
+        # The watchdirs with files being added
+        self.ingesting = set()
+        self.ingest_stats = {
+            'files_read': 0,
+            'read_errors': 0,
+            'read_time': 0.0,
+            'torrents_added': 0,
+            'add_errors': 0,
+            'add_time': 0.0,
+            'batches': 0,
+            'post_add_time': 0.0,
+        }
         deferLater(reactor, 5, self.enable_looping)
 
     def enable_looping(self):
@@ -112,6 +144,8 @@ def disable(self):
         )
         for loopingcall in self.update_timers.values():
             loopingcall.stop()
+        for watch_folder in self.watch_folders.values():
+            watch_folder.stop()
         self.config.save()
 
     def update(self):
@@ -136,6 +170,7 @@ def set_options(self, watchdir_id, options):
         # disable the watch loop if it was active
         if watchdir_id in self.update_timers:
             self.disable_watchdir(watchdir_id)
+        self.watchdir_options.pop(watchdir_id, None)
 
         self.watchdirs[watchdir_id].update(options)
         # re-enable watch loop if appropriate
@@ -158,10 +193,11 @@ def load_torrent(self, filename, magnet):
             raise EOFError('Torrent is 0 bytes!')
 
         # Get the info to see if any exceptions are raised
+        torrent_id = None
         if not magnet:
-            lt.torrent_info(lt.bdecode(filedump))
+            torrent_id = str(lt.torrent_info(lt.bdecode(filedump)).info_hash())
 
-        return filedump
+        return filedump, torrent_id
 
     def split_magnets(self, filename):
         log.debug('Attempting to open %s for splitting magnets.', filename)
@@ -214,65 +250,110 @@ def update_watchdir(self, watchdir_id):
             self.disable_watchdir(watchdir_id)
             return
 
-        # Generate options dict for watchdir
-        options = {}
-        if 'stop_at_ratio_toggle' in watchdir:
-            watchdir['stop_ratio_toggle'] = watchdir['stop_at_ratio_toggle']
-        # We default to True when reading _toggle values, so a config
-        # without them is valid, and applies all its settings.
-        for option, value in watchdir.items():
-            if OPTIONS_AVAILABLE.get(option):
-                if watchdir.get(option + '_toggle', True) or option in [
-                    'owner',
-                    'seed_mode',
-                ]:
-                    options[option] = value
+        if watchdir_id in self.ingesting:
+            # The previous files are still being added.
+            return
 
-        # Check for .magnet files containing multiple magnet links and
-        # create a new .magnet file for each of them.
-        for filename in os.listdir(watchdir['abspath']):
-            try:
-                filepath = os.path.join(watchdir['abspath'], filename)
-            except UnicodeDecodeError as ex:
-                log.error(
-                    'Unable to auto add torrent due to improper filename encoding: %s',
-                    ex,
-                )
-                continue
-            if os.path.isdir(filepath):
-                # Skip directories
+        watch_folder = self.watch_folders[watchdir_id]
+        filenames = []
+        for filename in watch_folder.poll():
+            ext = os.path.splitext(filename)[1].lower()
+            if ext not in ('.magnet', '.torrent'):
+                log.debug('File checked for auto-loading is invalid: %s', filename)
+                watch_folder.skip(filename)
                 continue
-            elif os.path.splitext(filename)[1] == '.magnet' and self.split_magnets(
-                filepath
-            ):
-                os.remove(filepath)
+            filenames.append(filename)
 
-        for filename in os.listdir(watchdir['abspath']):
-            try:
-                filepath = os.path.join(watchdir['abspath'], filename)
-            except UnicodeDecodeError as ex:
-                log.error(
-                    'Unable to auto add torrent due to improper filename encoding: %s',
-                    ex,
-                )
-                continue
+        if not filenames:
+            return
 
-            if os.path.isdir(filepath):
-                # Skip directories
-                continue
+        self.ingesting.add(watchdir_id)
+        d = self.ingest(watchdir_id, filenames)
 
-            ext = os.path.splitext(filename)[1].lower()
-            magnet = ext == '.magnet'
-            if not magnet and not ext == '.torrent':
-                log.debug('File checked for auto-loading is invalid: %s', filename)
-                continue
+        def on_ingested(result):
+            self.ingesting.discard(watchdir_id)
+            return result
+
+        return d.addBoth(on_ingested)
 
+    def load_torrents(self, path, filenames):
+        """Read and validate torrent and magnet files, run in a thread.
+
+        Args:
+            path (str): The watch folder path.
+            filenames (list): The filenames of the files to load.
+
+        Returns:
+            list: A (filename, status, filedump, torrent_id) tuple for each
+                file, the filedump is base64 encoded for torrent files.
+
+        """
+        results = []
+        for filename in filenames:
+            filepath = os.path.join(path, filename)
+            magnet = os.path.splitext(filename)[1].lower() == '.magnet'
             try:
-                filedump = self.load_torrent(filepath, magnet)
+                # Check for .magnet files containing multiple magnet links and
+                # create a new .magnet file for each of them.
+                if magnet and self.split_magnets(filepath):
+                    os.remove(filepath)
+                    results.append((filename, LOAD_SPLIT, None, None))
+                    continue
+                filedump, torrent_id = self.load_torrent(filepath, magnet)
             except (IOError, EOFError) as ex:
                 # If torrent is invalid, keep track of it so can try again on the next pass.
                 # This catches torrent files that may not be fully saved to disk at load time.
                 log.debug('Torrent is invalid: %s', ex)
+                results.append((filename, LOAD_RETRY, None, None))
+            except Exception as ex:
+                log.error('Cannot Autoadd %s: %s', filepath, ex)
+                results.append((filename, LOAD_INVALID, None, None))
+            else:
+                if not magnet:
+                    filedump = b64encode(filedump)
+                results.append((filename, LOAD_OK, filedump, torrent_id))
+        return results
+
+    @defer.inlineCallbacks
+    def ingest(self, watchdir_id, filenames):
+        """Add the torrents of the files from a watch folder.
+
+        The files are read and validated in the thread pool, the torrents
+        added to the session in batches and the actions on the added
+        torrents and their files are done for each batch at once.
+
+        Args:
+            watchdir_id (str): The watchdir id.
+            filenames (list): The filenames of the files to add.
+
+        """
+        watchdir = self.watchdirs[watchdir_id]
+        watch_folder = self.watch_folders[watchdir_id]
+        options = self.get_watchdir_options(watchdir_id)
+        stats = self.ingest_stats
+
+        start = time.time()
+        results = yield defer.gatherResults(
+            [
+                threads.deferToThread(
+                    self.load_torrents,
+                    watchdir['abspath'],
+                    filenames[idx : idx + LOAD_CHUNK_SIZE],
+                )
+                for idx in range(0, len(filenames), LOAD_CHUNK_SIZE)
+            ],
+            consumeErrors=True,
+        )
+        stats['files_read'] += len(filenames)
+        stats['read_time'] += time.time() - start
+
+        torrent_files = []
+        magnets = []
+        for filename, status, filedump, torrent_id in chain(*results):
+            filepath = os.path.join(watchdir['abspath'], filename)
+            if status == LOAD_RETRY:
+                stats['read_errors'] += 1
+                watch_folder.retry(filename)
                 if filename in self.invalid_torrents:
                     self.invalid_torrents[filename] += 1
                     if self.invalid_torrents[filename] >= MAX_NUM_ATTEMPTS:
@@ -283,34 +364,158 @@ def update_watchdir(self, watchdir_id):
                         )
                         os.rename(filepath, filepath + '.invalid')
                         del self.invalid_torrents[filename]
+                        watch_folder.skip(filename)
                 else:
                     self.invalid_torrents[filename] = 1
                 continue
 
-            def on_torrent_added(torrent_id, filename, filepath):
-                if 'Label' in component.get('CorePluginManager').get_enabled_plugins():
-                    if watchdir.get('label_toggle', True) and watchdir.get('label'):
-                        label = component.get('CorePlugin.Label')
-                        if not watchdir['label'] in label.get_labels():
-                            label.add(watchdir['label'])
-                        try:
-                            label.set_torrent(torrent_id, watchdir['label'])
-                        except Exception as ex:
-                            log.error('Unable to set label: %s', ex)
-
-                if (
-                    watchdir.get('queue_to_top_toggle', True)
-                    and 'queue_to_top' in watchdir
-                ):
-                    if watchdir['queue_to_top']:
-                        component.get('TorrentManager').queue_top(torrent_id)
-                    else:
-                        component.get('TorrentManager').queue_bottom(torrent_id)
-
-                # Rename, copy or delete the torrent once added to deluge.
+            # The file is renamed or removed once handled.
+            watch_folder.skip(filename)
+            self.invalid_torrents.pop(filename, None)
+            if status == LOAD_INVALID:
+                stats['read_errors'] += 1
+                self.fail_torrent_add(filepath)
+            elif status == LOAD_OK:
+                if torrent_id:
+                    torrent_files.append((filename, filedump, torrent_id))
+                else:
+                    magnets.append((filename, filedump))
+
+        for idx in range(0, len(torrent_files), ADD_BATCH_SIZE):
+            added = yield self.add_torrent_batch(
+                watchdir, torrent_files[idx : idx + ADD_BATCH_SIZE], options
+            )
+            yield self.on_torrents_added(watchdir, added)
+
+        if magnets:
+            added = []
+            for filename, magnet in magnets:
+                filepath = os.path.join(watchdir['abspath'], filename)
+                try:
+                    torrent_id = component.get('Core').add_torrent_magnet(
+                        magnet.strip(), options
+                    )
+                except AddTorrentError as ex:
+                    stats['add_errors'] += 1
+                    self.fail_torrent_add(filepath, str(ex), magnet=True)
+                else:
+                    added.append((torrent_id, filename, filepath))
+            yield self.on_torrents_added(watchdir, added)
+
+        elapsed = time.time() - start
+        log.info(
+            'AutoAdd handled %d files from %s in %.2fs (%.1f files/s)',
+            len(filenames),
+            watchdir['abspath'],
+            elapsed,
+            len(filenames) / elapsed if elapsed else 0.0,
+        )
+
+    @defer.inlineCallbacks
+    def add_torrent_batch(self, watchdir, torrent_files, options):
+        """Add a batch of torrents to the session.
+
+        Returns:
+            list: The (torrent_id, filename, filepath) of the added torrents.
+
+        """
+        stats = self.ingest_stats
+        torrentmanager = component.get('TorrentManager')
+        # Torrents already in the session fail to be added.
+        existing = {
+            torrent_id
+            for dummy_filename, dummy_filedump, torrent_id in torrent_files
+            if torrent_id in torrentmanager.torrents
+        }
+
+        start = time.time()
+        yield component.get('Core').add_torrent_files(
+            [
+                (filename, filedump, options)
+                for filename, filedump, dummy_torrent_id in torrent_files
+            ]
+        )
+        stats['add_time'] += time.time() - start
+        stats['batches'] += 1
+
+        added = []
+        for filename, dummy_filedump, torrent_id in torrent_files:
+            filepath = os.path.join(watchdir['abspath'], filename)
+            if torrent_id in torrentmanager.torrents and torrent_id not in existing:
+                added.append((torrent_id, filename, filepath))
+            else:
+                stats['add_errors'] += 1
+                self.fail_torrent_add(filepath, 'Unable to add torrent')
+        defer.returnValue(added)
+
+    def fail_torrent_add(self, filepath, err_msg='Invalid torrent', magnet=False):
+        # torrent handle is invalid and so is the magnet link
+        log.error(
+            'Cannot Autoadd %s: %s: %s',
+            'magnet' if magnet else 'torrent file',
+            filepath,
+            err_msg,
+        )
+        try:
+            os.rename(filepath, filepath + '.invalid')
+        except OSError as ex:
+            log.warning('Unable to rename %s: %s', filepath, ex)
+
+    def on_torrents_added(self, watchdir, added):
+        """Apply the watchdir label and queue position to the added torrents
+        and rename, copy or delete their files.
+
+        Args:
+            watchdir (dict): The watchdir options.
+            added (list): The (torrent_id, filename, filepath) of the added torrents.
+
+        Returns:
+            Deferred: Fires once the files have been handled.
+
+        """
+        if not added:
+            return defer.succeed(None)
+
+        self.ingest_stats['torrents_added'] += len(added)
+        torrent_ids = [torrent_id for torrent_id, dummy_name, dummy_path in added]
+        if 'Label' in component.get('CorePluginManager').get_enabled_plugins():
+            if watchdir.get('label_toggle', True) and watchdir.get('label'):
+                label = component.get('CorePlugin.Label')
+                if not watchdir['label'] in label.get_labels():
+                    label.add(watchdir['label'])
+                try:
+                    label.set_torrents(torrent_ids, watchdir['label'])
+                except Exception as ex:
+                    log.error('Unable to set label: %s', ex)
+
+        if watchdir.get('queue_to_top_toggle', True) and 'queue_to_top' in watchdir:
+            torrentmanager = component.get('TorrentManager')
+            queue = (
+                torrentmanager.queue_top
+                if watchdir['queue_to_top']
+                else torrentmanager.queue_bottom
+            )
+            for torrent_id in torrent_ids:
+                queue(torrent_id)
+
+        if watchdir.get('append_extension_toggle'):
+            if not watchdir.get('append_extension'):
+                watchdir['append_extension'] = '.added'
+
+        start = time.time()
+
+        def on_files_handled(result):
+            self.ingest_stats['post_add_time'] += time.time() - start
+            return result
+
+        d = threads.deferToThread(self.handle_added_files, dict(watchdir), added)
+        return d.addCallback(on_files_handled)
+
+    def handle_added_files(self, watchdir, added):
+        """Rename, copy or delete the torrent files once added to deluge."""
+        for dummy_torrent_id, filename, filepath in added:
+            try:
                 if watchdir.get('append_extension_toggle'):
-                    if not watchdir.get('append_extension'):
-                        watchdir['append_extension'] = '.added'
                     os.rename(filepath, filepath + watchdir['append_extension'])
                 elif watchdir.get('copy_torrent_toggle'):
                     copy_torrent_path = watchdir['copy_torrent']
@@ -323,31 +528,58 @@ def on_torrent_added(torrent_id, filename, filepath):
                     shutil.move(filepath, copy_torrent_file)
                 else:
                     os.remove(filepath)
+            except (IOError, OSError) as ex:
+                log.error('Unable to handle added torrent file %s: %s', filepath, ex)
 
-            def fail_torrent_add(err_msg, filepath, magnet):
-                # torrent handle is invalid and so is the magnet link
-                log.error(
-                    'Cannot Autoadd %s: %s: %s',
-                    'magnet' if magnet else 'torrent file',
-                    filepath,
-                    err_msg,
-                )
-                os.rename(filepath, filepath + '.invalid')
+    @export
+    def get_ingest_stats(self):
+        """Returns the counters and throughput of the torrents added from
+        the watch folders."""
+        stats = dict(self.ingest_stats)
+        stats['read_rate'] = (
+            stats['files_read'] / stats['read_time'] if stats['read_time'] else 0.0
+        )
+        stats['add_rate'] = (
+            stats['torrents_added'] / stats['add_time'] if stats['add_time'] else 0.0
+        )
+        return stats
 
-            try:
-                # The torrent looks good, so lets add it to the session.
-                if magnet:
-                    d = component.get('Core').add_torrent_magnet(
-                        filedump.strip(), options
-                    )
-                else:
-                    d = component.get('Core').add_torrent_file_async(
-                        filename, b64encode(filedump), options
-                    )
-                    d.addCallback(on_torrent_added, filename, filepath)
-                    d.addErrback(fail_torrent_add, filepath, magnet)
-            except AddTorrentError as ex:
-                fail_torrent_add(str(ex), filepath, magnet)
+    def get_watchdir_options(self, watchdir_id):
+        """The options for the torrents added from a watchdir."""
+        if watchdir_id in self.watchdir_options:
+            return self.watchdir_options[watchdir_id]
+
+        watchdir = self.watchdirs[watchdir_id]
+        options = {}
+        if 'stop_at_ratio_toggle' in watchdir:
+            watchdir['stop_ratio_toggle'] = watchdir['stop_at_ratio_toggle']
+        # We default to True when reading _toggle values, so a config
+        # without them is valid, and applies all its settings.
+        for option, value in watchdir.items():
+            if OPTIONS_AVAILABLE.get(option):
+                if watchdir.get(option + '_toggle', True) or option in [
+                    'owner',
+                    'seed_mode',
+                ]:
+                    options[option] = value
+        self.watchdir_options[watchdir_id] = options
+        return options
+
+    def on_watch_folder_change(self, watchdir_id):
+        """Check the watch folder once the new files are unchanged."""
+        if watchdir_id in self.pending_updates:
+            return
+
+        def update(watchdir_id):
+            del self.pending_updates[watchdir_id]
+            if watchdir_id in self.update_timers:
+                return defer.maybeDeferred(
+                    self.update_watchdir, watchdir_id
+                ).addErrback(self.on_update_watchdir_error, watchdir_id)
+
+        self.pending_updates[watchdir_id] = reactor.callLater(
+            self.watch_folders[watchdir_id].debounce + 0.1, update, watchdir_id
+        )
 
     def on_update_watchdir_error(self, failure, watchdir_id):
         """Disables any watch folders with un-handled exceptions."""
@@ -363,6 +595,11 @@ def enable_watchdir(self, watchdir_id):
         w_id = str(watchdir_id)
         # Enable the looping call
         if w_id not in self.update_timers or not self.update_timers[w_id].running:
+            self.watch_folders[w_id] = WatchFolder(
+                self.watchdirs[w_id]['abspath'],
+                on_change=lambda: self.on_watch_folder_change(w_id),
+            )
+            self.watch_folders[w_id].start()
             self.update_timers[w_id] = LoopingCall(self.update_watchdir, w_id)
             self.update_timers[w_id].start(5).addErrback(
                 self.on_update_watchdir_error, w_id
@@ -381,6 +618,10 @@ def disable_watchdir(self, watchdir_id):
             if self.update_timers[w_id].running:
                 self.update_timers[w_id].stop()
             del self.update_timers[w_id]
+        if w_id in self.watch_folders:
+            self.watch_folders.pop(w_id).stop()
+        if w_id in self.pending_updates:
+            self.pending_updates.pop(w_id).cancel()
         # Update the config
         if self.watchdirs[w_id]['enabled']:
             self.watchdirs[w_id]['enabled'] = False
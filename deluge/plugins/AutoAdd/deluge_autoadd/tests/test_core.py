@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+from base64 import b64decode
+
+import mock
+from twisted.internet import task
+
+import deluge.component as component
+from deluge.core.eventmanager import EventManager
+from deluge.core.rpcserver import RPCServer
+from deluge.tests import common
+from deluge.tests.basetest import BaseTestCase
+
+from .. import core
+from ..core import LOAD_INVALID, LOAD_OK, LOAD_RETRY, LOAD_SPLIT, Core
+
+MAGNET = 'magnet:?xt=urn:btih:%s&dn=%s'
+
+
+class AutoAddCoreTestCase(BaseTestCase):
+    def set_up(self):
+        self.path = tempfile.mkdtemp()
+        self.rpcserver = RPCServer(listen=False)
+        self.core = Core('AutoAdd')
+
+    def tear_down(self):
+        shutil.rmtree(self.path)
+        self.rpcserver.deregister_object(self.core)
+        del self.core
+        return component.shutdown()
+
+    def write_file(self, filename, data):
+        with open(os.path.join(self.path, filename), 'wb') as _file:
+            _file.write(data)
+
+    def test_load_torrents(self):
+        with open(common.get_test_data_file('test.torrent'), 'rb') as _file:
+            filedump = _file.read()
+        self.write_file('test.torrent', filedump)
+        self.write_file('empty.torrent', b'')
+        self.write_file('invalid.torrent', b'not bencoded')
+        self.write_file(
+            'multiple.magnet',
+            '\n'.join(
+                [MAGNET % ('a' * 40, 'one'), MAGNET % ('b' * 40, 'two')]
+            ).encode(),
+        )
+
+        results = {
+            filename: (status, filedump, torrent_id)
+            for filename, status, filedump, torrent_id in self.core.load_torrents(
+                self.path,
+                ['test.torrent', 'empty.torrent', 'invalid.torrent', 'multiple.magnet'],
+            )
+        }
+        status, encoded, torrent_id = results['test.torrent']
+        self.assertEqual(LOAD_OK, status)
+        self.assertEqual(filedump, b64decode(encoded))
+        self.assertEqual('ab570cdd5a17ea1b61e970bb72047de141bce173', torrent_id)
+        self.assertEqual(LOAD_RETRY, results['empty.torrent'][0])
+        self.assertEqual(LOAD_INVALID, results['invalid.torrent'][0])
+        self.assertEqual(LOAD_SPLIT, results['multiple.magnet'][0])
+        self.assertEqual(
+            {
+                'test.torrent',
+                'empty.torrent',
+                'invalid.torrent',
+                'one.magnet',
+                'two.magnet',
+            },
+            set(os.listdir(self.path)),
+        )
+
+    def test_watch_folder_change_error(self):
+        EventManager()
+        clock = task.Clock()
+        with mock.patch.object(core, 'reactor', clock):
+            self.core.enable()
+            watchdir_id = str(self.core.add({'path': self.path, 'enabled': True}))
+            self.core.on_watch_folder_change(watchdir_id)
+        # An error checking the folder disables it, as the LoopingCall does.
+        with mock.patch.object(
+            self.core, 'update_watchdir', side_effect=ValueError('ingest failed')
+        ):
+            clock.advance(5)
+        self.assertFalse(self.core.watchdirs[watchdir_id]['enabled'])
+        self.assertNotIn(watchdir_id, self.core.update_timers)
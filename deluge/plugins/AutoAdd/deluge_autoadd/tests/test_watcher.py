@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import time
+
+from mock import patch
+from twisted.internet import defer, reactor, task
+
+from deluge.tests.basetest import BaseTestCase
+
+from .. import watcher
+from ..watcher import WatchFolder
+
+
+class WatchFolderTestCase(BaseTestCase):
+    def set_up(self):
+        self.path = tempfile.mkdtemp()
+        self.folder = WatchFolder(self.path, debounce=0)
+
+    def tear_down(self):
+        self.folder.stop()
+        shutil.rmtree(self.path)
+
+    def write_file(self, filename, age=10):
+        filepath = os.path.join(self.path, filename)
+        with open(filepath, 'wb') as _file:
+            _file.write(b'data')
+        # Make the file and folder old enough to not be changing.
+        mtime = time.time() - age
+        os.utime(filepath, (mtime, mtime))
+        os.utime(self.path, (mtime, mtime))
+
+    def test_poll(self):
+        self.write_file('test.torrent')
+        os.mkdir(os.path.join(self.path, 'subdir'))
+        os.utime(self.path, (time.time() - 10, time.time() - 10))
+        # The first poll records the state of the new file.
+        self.assertEqual([], self.folder.poll())
+        self.assertEqual(['test.torrent'], self.folder.poll())
+        self.assertEqual({'subdir'}, self.folder.seen)
+
+        self.folder.skip('test.torrent')
+        self.assertEqual([], self.folder.poll())
+
+    def test_poll_unchanged_folder(self):
+        self.write_file('test.torrent')
+        self.folder.poll()
+        self.folder.skip('test.torrent')
+        with patch.object(watcher.os, 'listdir') as listdir:
+            self.assertEqual([], self.folder.poll())
+            self.assertFalse(listdir.called)
+
+    def test_debounce(self):
+        self.folder.debounce = 5
+        self.write_file('test.torrent', age=0)
+        self.folder.poll()
+        self.assertEqual([], self.folder.poll())
+        self.assertTrue('test.torrent' in self.folder.pending)
+
+    def test_removed_file(self):
+        self.write_file('test.torrent')
+        self.folder.poll()
+        os.remove(os.path.join(self.path, 'test.torrent'))
+        self.assertEqual([], self.folder.poll())
+        self.assertEqual({}, self.folder.pending)
+
+    @defer.inlineCallbacks
+    def test_inotify(self):
+        if watcher.inotify is None:
+            self.skipTest('inotify is not available')
+        changed = []
+        self.folder.on_change = lambda: changed.append(True)
+        self.folder.start()
+        if not self.folder.notifier:
+            self.skipTest('inotify is not available')
+
+        self.write_file('test.torrent')
+        yield task.deferLater(reactor, 0.2, lambda: None)
+        self.assertTrue(changed)
+        self.assertTrue('test.torrent' in self.folder.pending)
+        self.assertEqual(['test.torrent'], self.folder.poll())
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+from __future__ import unicode_literals
+
+import logging
+import os
+import time
+
+from twisted.python.filepath import FilePath
+
+try:
+    from twisted.internet import inotify
+except ImportError:
+    # Not available on this platform, fallback to polling.
+    inotify = None
+
+log = logging.getLogger(__name__)
+
+# The seconds a file must be unchanged for before it is added.
+DEBOUNCE_SECONDS = 2
+# Rescan the folder while its mtime is this recent as changes within the
+# mtime resolution of the filesystem would be missed.
+MTIME_RESOLUTION = 2
+
+
+class WatchFolder(object):
+    """Tracks the files of a watch folder that are ready to be added.
+
+    A folder is only listed again when its mtime changes, so checking a folder
+    without new files costs a single stat. With inotify, files written or
+    moved into the folder are also noticed as soon as they are closed. New
+    files are kept pending until they have not changed for `debounce` seconds
+    so partially written files are not read. Files which have been handled
+    are kept in a seen set and not checked again.
+
+    Args:
+        path (str): The absolute path of the folder.
+        on_change (func, optional): Called when inotify notices a new file.
+        debounce (float): The seconds a file must be unchanged to be ready.
+
+    """
+
+    def __init__(self, path, on_change=None, debounce=DEBOUNCE_SECONDS):
+        self.path = path
+        self.on_change = on_change
+        self.debounce = debounce
+        # Filenames of the files which will not be checked again
+        self.seen = set()
+        # Dict of Filename:(size, mtime) when last checked
+        self.pending = {}
+        self.mtime = None
+        self.notifier = None
+
+    def start(self, use_inotify=True):
+        """Start watching the folder, with inotify if available."""
+        if not use_inotify or inotify is None:
+            return
+        try:
+            self.notifier = inotify.INotify()
+            self.notifier.startReading()
+            self.notifier.watch(
+                FilePath(self.path),
+                mask=inotify.IN_CLOSE_WRITE | inotify.IN_MOVED_TO,
+                callbacks=[self.on_notify],
+            )
+        except Exception as ex:
+            log.warning('Unable to use inotify for %s, polling: %s', self.path, ex)
+            self.stop()
+
+    def stop(self):
+        if self.notifier:
+            self.notifier.loseConnection()
+            self.notifier = None
+
+    def on_notify(self, ignored, filepath, mask):
+        filename = filepath.basename()
+        if isinstance(filename, bytes):
+            filename = filename.decode('utf8', 'replace')
+        self.seen.discard(filename)
+        try:
+            stat = os.stat(filepath.path)
+        except OSError:
+            return
+        # The file was closed so is ready if it is unchanged after debounce.
+        self.pending[filename] = (stat.st_size, stat.st_mtime)
+        if self.on_change:
+            self.on_change()
+
+    def scan(self):
+        """List the folder and add the unseen files to the pending files."""
+        filenames = set(os.listdir(self.path))
+        self.seen &= filenames
+        for filename in filenames:
+            if filename in self.seen or filename in self.pending:
+                continue
+            try:
+                filepath = os.path.join(self.path, filename)
+            except UnicodeDecodeError as ex:
+                log.error(
+                    'Unable to auto add torrent due to improper filename encoding: %s',
+                    ex,
+                )
+                self.seen.add(filename)
+                continue
+            if os.path.isdir(filepath):
+                # Skip directories
+                self.seen.add(filename)
+            else:
+                self.pending[filename] = None
+
+    def poll(self):
+        """Find the files which are ready to be added.
+
+        Returns:
+            list: The filenames of the files which have not changed for
+                `debounce` seconds.
+
+        """
+        now = time.time()
+        mtime = os.stat(self.path).st_mtime
+        if mtime != self.mtime or now - mtime < MTIME_RESOLUTION:
+            self.mtime = mtime
+            self.scan()
+
+        ready = []
+        for filename, state in list(self.pending.items()):
+            try:
+                stat = os.stat(os.path.join(self.path, filename))
+            except OSError:
+                # Removed before it was added
+                del self.pending[filename]
+                continue
+            new_state = (stat.st_size, stat.st_mtime)
+            if state == new_state and now - stat.st_mtime >= self.debounce:
+                ready.append(filename)
+            else:
+                self.pending[filename] = new_state
+        return ready
+
+    def retry(self, filename):
+        """Check a file again on a later poll."""
+        if filename in self.pending:
+            self.pending[filename] = None
+
+    def skip(self, filename):
+        """Stop checking a file which has been handled."""
+        self.pending.pop(filename, None)
+        self.seen.add(filename)
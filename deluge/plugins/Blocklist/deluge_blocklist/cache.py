@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""Compiled binary cache of the ip ranges parsed from a blocklist."""
+
+from __future__ import unicode_literals
+
+import binascii
+import hashlib
+import logging
+import shutil
+import socket
+import struct
+import sys
+from array import array
+
+from six.moves import range, zip
+
+from deluge.common import PY2
+
+log = logging.getLogger(__name__)
+
+MAGIC = b'DLBC'
+VERSION = 2
+# Magic, version, sha1 digest of the source blocklist and the number of IPv4
+# and IPv6 ranges.
+HEADER = struct.Struct('<4sB20sII')
+
+# Use an unsigned 32 bit array for the IPv4 addresses on all platforms.
+UINT32 = 'I' if array('I').itemsize == 4 else 'L'
+
+
+def checksum(filename):
+    """Calculate the sha1 digest of a blocklist file.
+
+    Args:
+        filename (str): Path of the blocklist.
+
+    Returns:
+        bytes: The sha1 digest.
+
+    """
+    sha1 = hashlib.sha1()
+    with open(filename, 'rb') as _file:
+        for chunk in iter(lambda: _file.read(1024 * 1024), b''):
+            sha1.update(chunk)
+    return sha1.digest()
+
+
+def array_frombytes(arr, data):
+    try:
+        arr.frombytes(data)
+    except AttributeError:
+        # PY2 fallback
+        arr.fromstring(data)
+
+
+def long_to_address(long_ip):
+    """Convert an ip address integer to dotted notation."""
+    return socket.inet_ntoa(struct.pack('!I', long_ip))
+
+
+def long_to_ipv6(long_ip):
+    """Convert an IPv6 address integer to text notation."""
+    return socket.inet_ntop(socket.AF_INET6, long_to_bytes(long_ip))
+
+
+def long_to_bytes(long_ip):
+    return binascii.unhexlify('%032x' % long_ip)
+
+
+class IPRanges(object):
+    """A list of ip ranges stored as the first and last address of each range.
+
+    IPv4 addresses are kept in arrays of 32 bit integers, IPv6 addresses are
+    too large for an array so are kept in lists.
+
+    Args:
+        starts (array or list): The first address of each range.
+        ends (array or list): The last address of each range.
+        ipv6 (bool): If the ranges are of IPv6 addresses.
+
+    """
+
+    def __init__(self, starts=None, ends=None, ipv6=False):
+        self.ipv6 = ipv6
+        if starts is None:
+            starts, ends = ([], []) if ipv6 else (array(UINT32), array(UINT32))
+        self.starts = starts
+        self.ends = ends
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+
+    def add(self, start, end):
+        """Add a range, the addresses are integers."""
+        if start > end:
+            start, end = end, start
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def extend(self, ranges):
+        """Add a list of (start, end) ranges."""
+        for start, end in ranges:
+            self.add(start, end)
+
+    def merged(self):
+        """Sort the ranges and coalesce the overlapping or adjacent ones.
+
+        Returns:
+            IPRanges: The sorted, merged ranges.
+
+        """
+        merged = IPRanges(ipv6=self.ipv6)
+        if not self.starts:
+            return merged
+
+        # Sort without a (start, end) tuple per range, which for a full list
+        # would take several times the memory of the ranges themselves.
+        if self.ipv6:
+            order = sorted(range(len(self.starts)), key=self.starts.__getitem__)
+            ranges = ((self.starts[i], self.ends[i]) for i in order)
+        else:
+            # The start and end packed in one integer, ordered by the start.
+            keys = sorted(
+                start << 32 | end for start, end in zip(self.starts, self.ends)
+            )
+            ranges = ((key >> 32, key & 0xFFFFFFFF) for key in keys)
+
+        cur_start, cur_end = next(ranges)
+        for start, end in ranges:
+            if start <= cur_end + 1:
+                if end > cur_end:
+                    cur_end = end
+            else:
+                merged.starts.append(cur_start)
+                merged.ends.append(cur_end)
+                cur_start, cur_end = start, end
+        merged.starts.append(cur_start)
+        merged.ends.append(cur_end)
+        return merged
+
+    def add_to_filter(self, ip_filter, access):
+        """Add the ranges as rules to a libtorrent ip_filter."""
+        to_address = long_to_ipv6 if self.ipv6 else long_to_address
+        for start, end in self:
+            ip_filter.add_rule(to_address(start), to_address(end), access)
+
+    def tobytes(self):
+        """The addresses as little-endian integers, all the starts then the ends."""
+        if self.ipv6:
+            return b''.join(
+                long_to_bytes(address)[::-1] for address in self.starts + self.ends
+            )
+        addresses = self.starts + self.ends
+        if sys.byteorder != 'little':
+            addresses.byteswap()
+        return addresses.tostring() if PY2 else addresses.tobytes()
+
+    @classmethod
+    def frombytes(cls, data, ipv6=False):
+        """Create the ranges from the data of :meth:`tobytes`."""
+        if ipv6:
+            addresses = [
+                int(binascii.hexlify(data[i : i + 16][::-1]), 16)
+                for i in range(0, len(data), 16)
+            ]
+        else:
+            addresses = array(UINT32)
+            array_frombytes(addresses, data)
+            if sys.byteorder != 'little':
+                addresses.byteswap()
+        middle = len(addresses) // 2
+        return cls(addresses[:middle], addresses[middle:], ipv6=ipv6)
+
+
+def save_ranges(filename, digest, ranges, ranges6):
+    """Write the compiled ranges of a blocklist to a cache file.
+
+    Args:
+        filename (str): Path of the cache.
+        digest (bytes): The checksum of the source blocklist.
+        ranges (IPRanges): The IPv4 ranges.
+        ranges6 (IPRanges): The IPv6 ranges.
+
+    """
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'wb') as _file:
+        _file.write(HEADER.pack(MAGIC, VERSION, digest, len(ranges), len(ranges6)))
+        _file.write(ranges.tobytes())
+        _file.write(ranges6.tobytes())
+    shutil.move(tmp_filename, filename)
+
+
+def load_ranges(filename, digest):
+    """Read the compiled ranges of a blocklist from a cache file.
+
+    Args:
+        filename (str): Path of the cache.
+        digest (bytes): The checksum of the source blocklist.
+
+    Returns:
+        tuple: The IPv4 and IPv6 :class:`IPRanges` or None if the cache is
+            missing, invalid or for another blocklist.
+
+    """
+    try:
+        with open(filename, 'rb') as _file:
+            data = _file.read()
+    except (IOError, OSError):
+        return None
+
+    try:
+        magic, version, cache_digest, count, count6 = HEADER.unpack_from(data)
+    except struct.error:
+        return None
+    if magic != MAGIC or version != VERSION or cache_digest != digest:
+        return None
+    middle = HEADER.size + count * 8
+    if len(data) != middle + count6 * 32:
+        log.warning('Blocklist cache is truncated: %s', filename)
+        return None
+
+    return (
+        IPRanges.frombytes(data[HEADER.size : middle]),
+        IPRanges.frombytes(data[middle:], ipv6=True),
+    )
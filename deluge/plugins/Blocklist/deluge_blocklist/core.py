@@ -28,6 +28,7 @@
 from deluge.httpdownloader import download_file
 from deluge.plugins.pluginbase import CorePluginBase
 
+from .cache import IPRanges, checksum, load_ranges, save_ranges
 from .common import IP, BadIP
 from .detect import UnknownFormatError, create_reader, detect_compression, detect_format
 from .readers import ReaderParseError
@@ -73,6 +74,7 @@ def enable(self):
         self.need_to_resume_session = False
         self.num_whited = 0
         self.num_blocked = 0
+        self.import_rate = 0.0
         self.file_progress = 0.0
 
         self.core = component.get('Core')
@@ -269,6 +271,7 @@ def get_status(self):
         status['up_to_date'] = self.up_to_date
         status['num_whited'] = self.num_whited
         status['num_blocked'] = self.num_blocked
+        status['import_rate'] = self.import_rate
         status['file_progress'] = self.file_progress
         status['file_url'] = self.config['url']
         status['file_size'] = self.config['list_size']
@@ -407,11 +410,45 @@ def import_list(self, blocklist):
         """
         log.trace('on import_list')
 
-        def on_read_ip_range(start, end):
-            """Add ip range to blocklist"""
-            # log.trace('Adding ip range %s - %s to ipfilter as blocked', start, end)
-            self.blocklist.add_rule(start.address, end.address, BLOCK_RANGE)
-            self.num_blocked += 1
+        def read_list(blocklist):
+            """Read the ip ranges from the compiled cache, or parse and compile
+            the blocklist if the cache is not for this blocklist."""
+            start_time = time.time()
+            compiled = deluge.configmanager.get_config_dir('blocklist.compiled')
+            digest = checksum(blocklist)
+            cached = load_ranges(compiled, digest)
+            if cached is None:
+                parsed = IPRanges()
+                parsed6 = IPRanges(ipv6=True)
+                for chunk_ranges, chunk_ranges6 in self.reader(blocklist).readchunks():
+                    parsed.extend(chunk_ranges)
+                    parsed6.extend(chunk_ranges6)
+                ranges, ranges6 = parsed.merged(), parsed6.merged()
+                log.debug(
+                    'Merged %d ranges into %d',
+                    len(parsed) + len(parsed6),
+                    len(ranges) + len(ranges6),
+                )
+                try:
+                    save_ranges(compiled, digest, ranges, ranges6)
+                except (IOError, OSError) as ex:
+                    log.warning('Unable to save compiled blocklist: %s', ex)
+            else:
+                ranges, ranges6 = cached
+                log.debug('Loaded compiled blocklist: %s', compiled)
+
+            ranges.add_to_filter(self.blocklist, BLOCK_RANGE)
+            ranges6.add_to_filter(self.blocklist, BLOCK_RANGE)
+            self.num_blocked = len(ranges) + len(ranges6)
+            elapsed = time.time() - start_time
+            self.import_rate = self.num_blocked / elapsed if elapsed else 0.0
+            log.info(
+                'Imported %d ranges in %.2fs (%d ranges/s)',
+                self.num_blocked,
+                elapsed,
+                self.import_rate,
+            )
+            return blocklist
 
         def on_finish_read(result):
             """Add any whitelisted IP's and add the blocklist to session"""
@@ -456,7 +493,7 @@ def on_reader_failure(failure):
         )
         log.debug('Clearing current ip filtering')
         # self.blocklist.add_rule('0.0.0.0', '255.255.255.255', ALLOW_RANGE)
-        d = threads.deferToThread(self.reader(blocklist).read, on_read_ip_range)
+        d = threads.deferToThread(read_list, blocklist)
         d.addCallback(on_finish_read).addErrback(on_reader_failure)
 
         return d
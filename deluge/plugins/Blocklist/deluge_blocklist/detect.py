@@ -10,6 +10,7 @@
 from __future__ import unicode_literals
 
 from .decompressers import BZipped2, GZipped, Zipped
+from .peerguardian import PGReader
 from .readers import EmuleReader, PeerGuardianReader, SafePeerReader
 
 COMPRESSION_TYPES = {b'PK': 'Zip', b'\x1f\x8b': 'GZip', b'BZ': 'BZip2'}
@@ -20,6 +21,7 @@
     'Emule': EmuleReader,
     'SafePeer': SafePeerReader,
     'PeerGuardian': PeerGuardianReader,
+    'P2B': PGReader,
 }
 
 
@@ -9,64 +9,88 @@
 
 from __future__ import unicode_literals
 
-import gzip
 import logging
-import socket
-from struct import unpack
+import re
+import sys
+from array import array
+
+from .cache import UINT32, array_frombytes, long_to_address
+from .readers import CHUNK_SIZE, BaseReader, ReaderParseError
 
 log = logging.getLogger(__name__)
 
+P2B_HEADER = b'\xff\xff\xff\xffP2B'
+# A nul terminated name followed by the big-endian first and last address.
+P2B_RANGE_RE = re.compile(br'[^\x00]*\x00(.{8})', re.DOTALL)
+
 
-class PGException(Exception):
+class PGException(ReaderParseError):
     pass
 
 
-# Incrementally reads PeerGuardian blocklists v1 and v2.
-# See http://wiki.phoenixlabs.org/wiki/P2B_Format
-class PGReader(object):
-    def __init__(self, filename):
-        log.debug('PGReader loading: %s', filename)
+class PGReader(BaseReader):
+    """Blocklist reader for PeerGuardian binary (P2B) version 1 and 2 blocklists"""
 
-        try:
-            with gzip.open(filename, 'rb') as _file:
-                self.fd = _file
-        except IOError:
-            log.debug('Blocklist: PGReader: Incorrect file type or list is corrupt')
-
-        # 4 bytes, should be 0xffffffff
-        buf = self.fd.read(4)
-        hdr = unpack('l', buf)[0]
-        if hdr != -1:
-            raise PGException(_('Invalid leader') + ' %d' % hdr)
-
-        magic = self.fd.read(3)
-        if magic != 'P2B':
+    def read_header(self, blocklist):
+        header = blocklist.read(len(P2B_HEADER) + 1)
+        if header[:-1] != P2B_HEADER:
             raise PGException(_('Invalid magic code'))
+        version = bytearray(header[-1:])[0]
+        if version not in (1, 2):
+            raise PGException(_('Invalid version') + ' %d' % version)
+        return version
 
-        buf = self.fd.read(1)
-        ver = ord(buf)
-        if ver != 1 and ver != 2:
-            raise PGException(_('Invalid version') + ' %d' % ver)
-
-    def __next__(self):
-        # Skip over the string
-        buf = -1
-        while buf != 0:
-            buf = self.fd.read(1)
-            if buf == '':  # EOF
-                return False
-            buf = ord(buf)
-
-        buf = self.fd.read(4)
-        start = socket.inet_ntoa(buf)
-
-        buf = self.fd.read(4)
-        end = socket.inet_ntoa(buf)
-
-        return (start, end)
-
-    # Python 2 compatibility
-    next = __next__
-
-    def close(self):
-        self.fd.close()
+    def is_valid(self):
+        blocklist = self.open()
+        try:
+            self.read_header(blocklist)
+        except PGException:
+            return False
+        finally:
+            blocklist.close()
+        return True
+
+    def parse_chunk(self, chunk):
+        """Extracts the IPv4 ranges from a buffer of P2B entries
+
+        Returns:
+            tuple: The lists of (start, end) integer IPv4 ranges and IPv6
+                ranges, and the offset of the first incomplete entry.
+
+        """
+        packed = []
+        end = 0
+        for match in P2B_RANGE_RE.finditer(chunk):
+            if match.start() != end:
+                raise PGException(_('Invalid P2B entry at %d') % end)
+            packed.append(match.group(1))
+            end = match.end()
+        # Join the addresses of all the entries to convert them at once.
+        addresses = array(UINT32)
+        array_frombytes(addresses, b''.join(packed))
+        if sys.byteorder == 'little':
+            addresses.byteswap()
+        return list(zip(addresses[::2], addresses[1::2])), [], end
+
+    def readchunks(self, chunk_size=CHUNK_SIZE):
+        blocklist = self.open()
+        try:
+            self.read_header(blocklist)
+            remainder = b''
+            while True:
+                data = blocklist.read(chunk_size)
+                if not data:
+                    break
+                data = remainder + data
+                ranges, ranges6, end = self.parse_chunk(data)
+                remainder = data[end:]
+                yield ranges, ranges6
+        finally:
+            blocklist.close()
+        if remainder:
+            raise PGException(_('Truncated P2B entry'))
+
+    def readranges(self):
+        for ranges, dummy_ranges6 in self.readchunks():
+            for start, end in ranges:
+                yield long_to_address(start), long_to_address(end)
@@ -9,8 +9,10 @@
 
 from __future__ import unicode_literals
 
+import binascii
 import logging
 import re
+import socket
 
 from deluge.common import decode_bytes
 
@@ -18,13 +20,93 @@
 
 log = logging.getLogger(__name__)
 
+CHUNK_SIZE = 1024 * 1024
+
+# An IPv4 address with decimal octets, validated when converted to an integer.
+IPV4_PATTERN = br'(\d{1,3})\.(\d{1,3})\.(\d{1,3})\.(\d{1,3})'
+# An IPv6 address, validated when converted to an integer.
+IPV6_PATTERN = br'([0-9A-Fa-f.]*:[0-9A-Fa-f:.]*)'
+# A line with content that is not a comment.
+CONTENT_RE = re.compile(br'^[ \t]*[^#\s]', re.MULTILINE)
+
+# Lookup tables of the value of an octet, optionally zero padded, at each
+# position of an IPv4 address. Faster than converting each octet with int().
+OCTETS = [
+    {
+        octet.encode(): i << shift
+        for i in range(256)
+        for octet in {str(i), str(i).zfill(2), str(i).zfill(3)}
+    }
+    for shift in (24, 16, 8, 0)
+]
+
+
+def ipv4_ranges(matches):
+    """Convert the octets matched by an IPv4 range pattern to integers."""
+    o1, o2, o3, o4 = OCTETS
+    try:
+        return [
+            (o1[a] | o2[b] | o3[c] | o4[d], o1[e] | o2[f] | o3[g] | o4[h])
+            for a, b, c, d, e, f, g, h in matches
+        ]
+    except KeyError:
+        # An octet is out of range, skip the invalid ranges one at a time.
+        pass
+
+    ranges = []
+    for a, b, c, d, e, f, g, h in matches:
+        try:
+            ranges.append(
+                (o1[a] | o2[b] | o3[c] | o4[d], o1[e] | o2[f] | o3[g] | o4[h])
+            )
+        except KeyError:
+            log.error(
+                'Failed to parse IP range: %s - %s',
+                decode_bytes(b'.'.join((a, b, c, d))),
+                decode_bytes(b'.'.join((e, f, g, h))),
+            )
+    return ranges
+
+
+def ipv6_to_long(address):
+    """Convert an IPv6 address to an integer.
+
+    Raises:
+        BadIP: If the address is invalid.
+
+    """
+    try:
+        packed = socket.inet_pton(socket.AF_INET6, decode_bytes(address))
+    except (socket.error, ValueError):
+        raise BadIP(_('The IP address "%s" is badly formed') % decode_bytes(address))
+    return int(binascii.hexlify(packed), 16)
+
+
+def ipv6_ranges(matches):
+    """Convert the addresses matched by an IPv6 range pattern to integers."""
+    ranges = []
+    for start, end in matches:
+        try:
+            ranges.append((ipv6_to_long(start), ipv6_to_long(end)))
+        except BadIP as ex:
+            log.error('Failed to parse IP: %s', ex)
+    return ranges
+
 
 class ReaderParseError(Exception):
     pass
 
 
 class BaseReader(object):
-    """Base reader for blocklist files"""
+    """Base reader for blocklist files
+
+    Subclasses define `range_re` and `range6_re`, the compiled patterns of a
+    line with an IPv4 range and with an IPv6 range, used to parse the file a
+    chunk of lines at a time by :meth:`readchunks`.
+    """
+
+    range_re = None
+    range6_re = None
 
     def __init__(self, _file):
         """Creates a new BaseReader given a file"""
@@ -32,7 +114,7 @@ def __init__(self, _file):
 
     def open(self):
         """Opens the associated file for reading"""
-        return open(self.file)
+        return open(self.file, 'rb')
 
     def parse(self, line):
         """Extracts ip range from given line"""
@@ -53,23 +135,77 @@ def is_ignored(self, line):
         return line.startswith('#') or not line
 
     def is_valid(self):
-        """Determines whether file is valid for this reader"""
+        """Determines whether file is valid for this reader
+
+        The first line with content must be an IPv4 or IPv6 range, checked
+        with the same patterns and conversions as :meth:`readchunks`.
+        """
         blocklist = self.open()
-        valid = True
-        for line in blocklist:
-            line = decode_bytes(line)
-            if not self.is_ignored(line):
-                try:
-                    (start, end) = self.parse(line)
-                    if not re.match(r'^(\d{1,3}\.){4}$', start + '.') or not re.match(
-                        r'^(\d{1,3}\.){4}$', end + '.'
-                    ):
-                        valid = False
-                except Exception:
-                    valid = False
-                break
-        blocklist.close()
-        return valid
+        try:
+            for line in blocklist:
+                if not self.is_ignored(decode_bytes(line)):
+                    break
+            else:
+                return True
+        finally:
+            blocklist.close()
+
+        # The patterns match whole lines.
+        ranges, ranges6, __ = self.parse_chunk(line.rstrip(b'\r\n') + b'\n')
+        return bool(ranges or ranges6)
+
+    def parse_chunk(self, chunk):
+        """Extracts the ip ranges from a chunk of complete lines
+
+        Returns:
+            tuple: The lists of (start, end) integer IPv4 ranges and IPv6
+                ranges, and the number of lines that could not be parsed.
+
+        """
+        ranges = ipv4_ranges(self.range_re.findall(chunk))
+        ranges6 = ipv6_ranges(self.range6_re.findall(chunk))
+        unparsed = len(CONTENT_RE.findall(chunk)) - len(ranges) - len(ranges6)
+        return ranges, ranges6, unparsed
+
+    def readchunks(self, chunk_size=CHUNK_SIZE):
+        """Yields the ip ranges from the file in bulk
+
+        Yields:
+            tuple: The lists of (start, end) integer IPv4 ranges and IPv6
+                ranges found in each chunk of the file.
+
+        Raises:
+            ReaderParseError: If no line of the file could be parsed.
+
+        """
+        parsed = unparsed = 0
+        blocklist = self.open()
+        try:
+            remainder = b''
+            while True:
+                data = blocklist.read(chunk_size)
+                if not data:
+                    chunk = remainder
+                else:
+                    end = data.rfind(b'\n') + 1
+                    chunk = remainder + data[:end]
+                    remainder = data[end:] if end else remainder + data
+                    if not end:
+                        continue
+                if chunk:
+                    ranges, ranges6, bad_lines = self.parse_chunk(chunk)
+                    parsed += len(ranges) + len(ranges6)
+                    unparsed += bad_lines
+                    yield ranges, ranges6
+                if not data:
+                    break
+        finally:
+            blocklist.close()
+
+        if unparsed:
+            log.warning('Skipped %d lines that could not be parsed', unparsed)
+            if not parsed:
+                raise ReaderParseError('No ip ranges found in %s' % self.file)
 
     @raises_errors_as(ReaderParseError)
     def readranges(self):
@@ -85,6 +221,15 @@ def readranges(self):
 class EmuleReader(BaseReader):
     """Blocklist reader for emule style blocklists"""
 
+    range_re = re.compile(
+        br'^[ \t]*%s[ \t]*-[ \t]*%s[ \t]*,' % (IPV4_PATTERN, IPV4_PATTERN),
+        re.MULTILINE,
+    )
+    range6_re = re.compile(
+        br'^[ \t]*%s[ \t]*-[ \t]*%s[ \t]*,' % (IPV6_PATTERN, IPV6_PATTERN),
+        re.MULTILINE,
+    )
+
     def parse(self, line):
         return line.strip().split(' , ')[0].split(' - ')
 
@@ -92,6 +237,17 @@ def parse(self, line):
 class SafePeerReader(BaseReader):
     """Blocklist reader for SafePeer style blocklists"""
 
+    # The name is matched greedily for IPv4 as it may contain colons, but
+    # lazily for IPv6 as the addresses contain colons.
+    range_re = re.compile(
+        br'^[^\n]*:%s[ \t]*-[ \t]*%s[ \t\r]*$' % (IPV4_PATTERN, IPV4_PATTERN),
+        re.MULTILINE,
+    )
+    range6_re = re.compile(
+        br'^[^\n]*?:%s[ \t]*-[ \t]*%s[ \t\r]*$' % (IPV6_PATTERN, IPV6_PATTERN),
+        re.MULTILINE,
+    )
+
     def parse(self, line):
         return line.strip().split(':')[-1].split('-')
 
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+
+from deluge.tests.basetest import BaseTestCase
+
+from ..cache import (
+    IPRanges,
+    checksum,
+    load_ranges,
+    long_to_address,
+    long_to_ipv6,
+    save_ranges,
+)
+from ..readers import ipv6_to_long
+from ..common import IP
+
+
+def ip(address):
+    return IP.parse(address).long
+
+
+class IPRangesTestCase(BaseTestCase):
+    def set_up(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp_dir, 'blocklist.compiled')
+
+    def tear_down(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_merge_ranges(self):
+        ranges = IPRanges()
+        ranges.add(ip('10.0.0.5'), ip('10.0.0.20'))
+        ranges.add(ip('1.1.1.1'), ip('1.1.1.1'))
+        # Overlapping
+        ranges.add(ip('10.0.0.0'), ip('10.0.0.10'))
+        # Adjacent
+        ranges.add(ip('10.0.0.21'), ip('10.0.0.30'))
+        # Contained
+        ranges.add(ip('10.0.0.25'), ip('10.0.0.26'))
+        ranges.add(ip('192.168.0.255'), ip('192.168.0.0'))
+
+        merged = [
+            (long_to_address(start), long_to_address(end))
+            for start, end in ranges.merged()
+        ]
+        self.assertEqual(
+            [
+                ('1.1.1.1', '1.1.1.1'),
+                ('10.0.0.0', '10.0.0.30'),
+                ('192.168.0.0', '192.168.0.255'),
+            ],
+            merged,
+        )
+
+    def test_merge_ipv6_ranges(self):
+        ranges = IPRanges(ipv6=True)
+        ranges.add(ipv6_to_long('2001:db8::10'), ipv6_to_long('2001:db8::ff'))
+        ranges.add(ipv6_to_long('2001:db8::'), ipv6_to_long('2001:db8::f'))
+        ranges.add(ipv6_to_long('::1'), ipv6_to_long('::1'))
+
+        merged = [
+            (long_to_ipv6(start), long_to_ipv6(end)) for start, end in ranges.merged()
+        ]
+        self.assertEqual(
+            [('::1', '::1'), ('2001:db8::', '2001:db8::ff')], merged,
+        )
+
+    def test_save_load(self):
+        ranges = IPRanges()
+        ranges.add(ip('1.2.3.4'), ip('1.2.3.255'))
+        ranges.add(ip('255.255.255.0'), ip('255.255.255.255'))
+        ranges6 = IPRanges(ipv6=True)
+        ranges6.add(ipv6_to_long('::1'), ipv6_to_long('ffff::ffff'))
+        digest = b'\x01' * 20
+        save_ranges(self.filename, digest, ranges, ranges6)
+
+        loaded, loaded6 = load_ranges(self.filename, digest)
+        self.assertEqual(list(ranges), list(loaded))
+        self.assertEqual(list(ranges6), list(loaded6))
+        self.assertTrue(loaded6.ipv6)
+        self.assertIsNone(load_ranges(self.filename, b'\x02' * 20))
+        self.assertIsNone(load_ranges(self.filename + '.missing', digest))
+
+    def test_load_truncated(self):
+        ranges = IPRanges()
+        ranges.add(ip('1.2.3.4'), ip('1.2.3.255'))
+        save_ranges(self.filename, b'\x01' * 20, ranges, IPRanges(ipv6=True))
+        with open(self.filename, 'rb+') as _file:
+            _file.truncate(os.path.getsize(self.filename) - 2)
+        self.assertIsNone(load_ranges(self.filename, b'\x01' * 20))
+
+    def test_checksum(self):
+        with open(self.filename, 'wb') as _file:
+            _file.write(b'1.2.3.4 - 1.2.3.5 , 000 , test\n')
+        self.assertEqual(20, len(checksum(self.filename)))
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+from __future__ import print_function, unicode_literals
+
+import os
+import shutil
+import socket
+import struct
+import tempfile
+import time
+
+import pytest
+from deluge.tests.basetest import BaseTestCase
+
+from ..detect import detect_format
+from ..peerguardian import PGReader
+from ..readers import EmuleReader, ReaderParseError, SafePeerReader, ipv6_to_long
+
+BENCHMARK_RANGES = 200000
+
+
+def address(long_ip):
+    return socket.inet_ntoa(struct.pack('!I', long_ip))
+
+
+def emule_line(start, end):
+    return '%s - %s , 000 , Range %d\n' % (address(start), address(end), start)
+
+
+def safepeer_line(start, end):
+    return 'Range %d:%s-%s\n' % (start, address(start), address(end))
+
+
+def p2b_entry(start, end):
+    return b'Range %d\x00' % start + struct.pack('!II', start, end)
+
+
+class ReadersTestBase(BaseTestCase):
+    def set_up(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tear_down(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_list(self, data, name='blocklist'):
+        filename = os.path.join(self.tmp_dir, name)
+        with open(filename, 'wb') as _file:
+            _file.write(data)
+        return filename
+
+    def read_all(self, reader, chunk_size=64):
+        ranges = []
+        ranges6 = []
+        for chunk_ranges, chunk_ranges6 in reader.readchunks(chunk_size):
+            ranges.extend(chunk_ranges)
+            ranges6.extend(chunk_ranges6)
+        return ranges, ranges6
+
+
+class ReadersTestCase(ReadersTestBase):
+    def test_emule(self):
+        filename = self.write_list(
+            b'# Comment\n'
+            b'001.002.003.004 - 001.002.003.255 , 000 , Some organization\n'
+            b'\n'
+            b'10.0.0.0 - 10.255.255.255 , 000 , Private\r\n'
+            b'2001:db8::1 - 2001:db8::ffff , 000 , Documentation\n'
+            b'300.0.0.0 - 300.0.0.1 , 000 , Invalid'
+        )
+        ranges, ranges6 = self.read_all(EmuleReader(filename))
+        self.assertEqual([(16909060, 16909311), (167772160, 184549375)], ranges)
+        self.assertEqual(
+            [(ipv6_to_long('2001:db8::1'), ipv6_to_long('2001:db8::ffff'))], ranges6
+        )
+
+    def test_safepeer(self):
+        filename = self.write_list(
+            b'Name with: colon:1.2.3.4-1.2.3.255\n'
+            b'IPv6 range:2001:db8::-2001:db8::ff\n'
+            b'No newline at end:5.6.7.8-5.6.7.9'
+        )
+        ranges, ranges6 = self.read_all(SafePeerReader(filename))
+        self.assertEqual([(16909060, 16909311), (84281096, 84281097)], ranges)
+        self.assertEqual(
+            [(ipv6_to_long('2001:db8::'), ipv6_to_long('2001:db8::ff'))], ranges6
+        )
+
+    def test_detect_ipv6_first(self):
+        filename = self.write_list(
+            b'# Comment\n'
+            b'2001:db8::1 - 2001:db8::ffff , 000 , Documentation\n'
+            b'1.2.3.4 - 1.2.3.255 , 000 , Some organization\n'
+        )
+        self.assertTrue(EmuleReader(filename).is_valid())
+        self.assertFalse(SafePeerReader(filename).is_valid())
+        self.assertEqual('Emule', detect_format(filename))
+
+        filename = self.write_list(b'IPv6 range:2001:db8::-2001:db8::ff\r\n')
+        self.assertTrue(SafePeerReader(filename).is_valid())
+        self.assertFalse(EmuleReader(filename).is_valid())
+        self.assertEqual('SafePeer', detect_format(filename))
+
+        filename = self.write_list(b'Invalid:2001:db8::g-2001:db8::ff\n')
+        self.assertEqual('', detect_format(filename))
+
+    def test_invalid_list(self):
+        filename = self.write_list(b'not a blocklist\n')
+        self.assertRaises(ReaderParseError, self.read_all, EmuleReader(filename), 1024)
+
+    def test_p2b(self):
+        for version in (1, 2):
+            data = b'\xff\xff\xff\xffP2B' + struct.pack('B', version)
+            data += p2b_entry(16909060, 16909311) + p2b_entry(167772160, 184549375)
+            filename = self.write_list(data, 'blocklist.p2b')
+            self.assertEqual('P2B', detect_format(filename))
+            ranges, ranges6 = self.read_all(PGReader(filename), chunk_size=5)
+            self.assertEqual([(16909060, 16909311), (167772160, 184549375)], ranges)
+            self.assertEqual([], ranges6)
+
+    def test_p2b_truncated(self):
+        data = b'\xff\xff\xff\xffP2B\x02' + p2b_entry(1, 2)[:-1]
+        filename = self.write_list(data, 'blocklist.p2b')
+        self.assertRaises(ReaderParseError, self.read_all, PGReader(filename))
+
+
+@pytest.mark.slow
+class ReadersBenchmarkTestCase(ReadersTestBase):
+    def benchmark(self, name, reader_cls, entry, header=b''):
+        ranges = [(i << 8, (i << 8) + 255) for i in range(BENCHMARK_RANGES)]
+        data = header
+        if isinstance(entry(0, 0), bytes):
+            data += b''.join(entry(start, end) for start, end in ranges)
+        else:
+            data += ''.join(entry(start, end) for start, end in ranges).encode()
+        filename = self.write_list(data, name)
+
+        start_time = time.time()
+        parsed, dummy_parsed6 = self.read_all(reader_cls(filename), 1024 * 1024)
+        elapsed = time.time() - start_time
+        self.assertEqual(ranges, parsed)
+        print(
+            '\n%s: %d ranges in %.2fs (%d ranges/s)'
+            % (name, len(parsed), elapsed, len(parsed) / elapsed)
+        )
+
+    def test_benchmark_emule(self):
+        self.benchmark('emule', EmuleReader, emule_line)
+
+    def test_benchmark_safepeer(self):
+        self.benchmark('safepeer', SafePeerReader, safepeer_line)
+
+    def test_benchmark_p2b(self):
+        self.benchmark('p2b', PGReader, p2b_entry, b'\xff\xff\xff\xffP2B\x02')
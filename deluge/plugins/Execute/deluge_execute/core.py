@@ -11,11 +11,8 @@
 
 import hashlib
 import logging
-import os
 import time
 
-from twisted.internet.utils import getProcessOutputAndValue
-
 import deluge.component as component
 from deluge.common import windows_check
 from deluge.configmanager import ConfigManager
@@ -23,9 +20,19 @@
 from deluge.event import DelugeEvent
 from deluge.plugins.pluginbase import CorePluginBase
 
+from .runner import CommandRunner
+
 log = logging.getLogger(__name__)
 
-DEFAULT_CONFIG = {'commands': []}
+DEFAULT_CONFIG = {
+    'commands': [],
+    # The ids of the commands run once per batch of torrents.
+    'batch_commands': [],
+    # The number of commands running at the same time.
+    'max_running': 4,
+    # The seconds torrents are collected for a batch command.
+    'batch_delay': 1.0,
+}
 
 EXECUTE_ID = 0
 EXECUTE_EVENT = 1
@@ -62,6 +69,9 @@ def enable(self):
         event_manager = component.get('EventManager')
         self.registered_events = {}
         self.preremoved_cache = {}
+        self.runner = CommandRunner(
+            self.config['max_running'], self.config['batch_delay']
+        )
 
         # Go through the commands list and register event handlers
         for command in self.config['commands']:
@@ -107,27 +117,29 @@ def execute_commands(self, torrent_id, event, *arg):
             torrent = component.get('TorrentManager').torrents[torrent_id]
             info = torrent.get_status(['name', 'download_location'])
             # Grab the torrent name and download location
-            # getProcessOutputAndValue requires args to be str
             torrent_name = info['name']
             download_location = info['download_location']
 
         log.debug('Running commands for %s', event)
 
-        def log_error(result, command):
-            (stdout, stderr, exit_code) = result
-            if exit_code:
-                log.warning('Command "%s" failed with exit code %d', command, exit_code)
-                if stdout:
-                    log.warning('stdout: %s', stdout)
-                if stderr:
-                    log.warning('stderr: %s', stderr)
-
+        torrent = None
+        cmd_args = None
         # Go through and execute all the commands
         for command in self.config['commands']:
-            if command[EXECUTE_EVENT] == event:
-                command = os.path.expandvars(command[EXECUTE_COMMAND])
-                command = os.path.expanduser(command)
+            if command[EXECUTE_EVENT] != event:
+                continue
+            if command[EXECUTE_ID] in self.config['batch_commands']:
+                if torrent is None:
+                    torrent = {
+                        'id': torrent_id,
+                        'name': torrent_name,
+                        'download_location': download_location,
+                    }
+                self.runner.run_batch(command[EXECUTE_COMMAND], event, torrent)
+                continue
 
+            if cmd_args is None:
+                # spawnProcess requires args to be str
                 cmd_args = [
                     torrent_id.encode('utf8'),
                     torrent_name.encode('utf8'),
@@ -136,15 +148,10 @@ def log_error(result, command):
                 if windows_check():
                     # Escape ampersand on windows (see #2784)
                     cmd_args = [cmd_arg.replace('&', '^^^&') for cmd_arg in cmd_args]
-
-                if os.path.isfile(command) and os.access(command, os.X_OK):
-                    log.debug('Running %s with args: %s', command, cmd_args)
-                    d = getProcessOutputAndValue(command, cmd_args, env=os.environ)
-                    d.addCallback(log_error, command)
-                else:
-                    log.error('Execute script not found or not executable')
+            self.runner.run(command[EXECUTE_COMMAND], cmd_args)
 
     def disable(self):
+        self.runner.flush_all()
         self.config.save()
         event_manager = component.get('EventManager')
         for event, handler in self.registered_events.items():
@@ -153,9 +160,11 @@ def disable(self):
 
     # Exported RPC methods #
     @export
-    def add_command(self, event, command):
+    def add_command(self, event, command, batch=False):
         command_id = hashlib.sha1(str(time.time()).encode()).hexdigest()
         self.config['commands'].append((command_id, event, command))
+        if batch:
+            self.config['batch_commands'].append(command_id)
         self.config.save()
         component.get('EventManager').emit(
             ExecuteCommandAddedEvent(command_id, event, command)
@@ -165,21 +174,41 @@ def add_command(self, event, command):
     def get_commands(self):
         return self.config['commands']
 
+    @export
+    def get_batch_commands(self):
+        """Returns the ids of the commands run once per batch of torrents."""
+        return self.config['batch_commands']
+
     @export
     def remove_command(self, command_id):
         for command in self.config['commands']:
             if command[EXECUTE_ID] == command_id:
                 self.config['commands'].remove(command)
+                if command_id in self.config['batch_commands']:
+                    self.config['batch_commands'].remove(command_id)
                 component.get('EventManager').emit(
                     ExecuteCommandRemovedEvent(command_id)
                 )
                 break
         self.config.save()
+        self.runner.clear_cache()
 
     @export
-    def save_command(self, command_id, event, cmd):
+    def save_command(self, command_id, event, cmd, batch=None):
         for i, command in enumerate(self.config['commands']):
             if command[EXECUTE_ID] == command_id:
                 self.config['commands'][i] = (command_id, event, cmd)
                 break
+        if batch is not None:
+            batch_commands = self.config['batch_commands']
+            if batch and command_id not in batch_commands:
+                batch_commands.append(command_id)
+            elif not batch and command_id in batch_commands:
+                batch_commands.remove(command_id)
         self.config.save()
+        self.runner.clear_cache()
+
+    @export
+    def get_stats(self):
+        """Returns the command queue length and the run times and failures."""
+        return self.runner.get_stats()
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""Runs the execute commands with a limit on the number of processes."""
+
+from __future__ import unicode_literals
+
+import json
+import logging
+import os
+import time
+from collections import defaultdict, deque
+
+from twisted.internet import defer, protocol, reactor
+
+from deluge.common import LatencyHistogram
+
+log = logging.getLogger(__name__)
+
+# The seconds a resolved command path is cached for.
+RESOLVE_TTL = 60
+
+
+class CommandProtocol(protocol.ProcessProtocol):
+    """Writes the optional input to a process and collects its output.
+
+    The deferred fires with (stdout, stderr, exit_code), the exit code is -1
+    if the process was killed by a signal.
+    """
+
+    def __init__(self, deferred, stdin=None):
+        self.deferred = deferred
+        self.stdin = stdin
+        self.stdout = []
+        self.stderr = []
+
+    def connectionMade(self):  # NOQA: N802
+        if self.stdin:
+            self.transport.write(self.stdin)
+        self.transport.closeStdin()
+
+    def outReceived(self, data):  # NOQA: N802
+        self.stdout.append(data)
+
+    def errReceived(self, data):  # NOQA: N802
+        self.stderr.append(data)
+
+    def processEnded(self, reason):  # NOQA: N802
+        exit_code = reason.value.exitCode
+        self.deferred.callback(
+            (
+                b''.join(self.stdout),
+                b''.join(self.stderr),
+                -1 if exit_code is None else exit_code,
+            )
+        )
+
+
+class CommandRunner(object):
+    """Queues the command runs and starts at most `max_running` at once.
+
+    A run of a command with the same arguments as one already queued is
+    dropped. Batch commands are not run per torrent, the torrents are
+    collected for `batch_delay` seconds, or until there are `batch_size`,
+    and passed to a single run as a JSON list on stdin.
+
+    Args:
+        max_running (int): The number of commands running at the same time.
+        batch_delay (float): The seconds torrents are collected for a batch.
+        batch_size (int): The maximum number of torrents in a batch.
+    """
+
+    def __init__(self, max_running=4, batch_delay=1.0, batch_size=1000):
+        self.max_running = max_running
+        self.batch_delay = batch_delay
+        self.batch_size = batch_size
+        # Queue of (command, args, stdin) to run.
+        self.queue = deque()
+        self.queued = set()
+        self.running = 0
+        # Dicts of (command, event): the torrents and flush call of a batch.
+        self.batches = {}
+        self.batch_calls = {}
+        # Dict of command: (path or None, time resolved)
+        self.paths = {}
+        self.stats = defaultdict(LatencyHistogram)
+        self.coalesced = 0
+
+    def resolve(self, command):
+        """Expand the command path and check it is executable.
+
+        Returns:
+            str: The command path or None if it cannot be run.
+        """
+        now = time.time()
+        path, resolved = self.paths.get(command, (None, 0))
+        if now - resolved < RESOLVE_TTL:
+            return path
+
+        path = os.path.expanduser(os.path.expandvars(command))
+        if not (os.path.isfile(path) and os.access(path, os.X_OK)):
+            log.error('Execute script not found or not executable: %s', path)
+            path = None
+        self.paths[command] = (path, now)
+        return path
+
+    def clear_cache(self):
+        self.paths.clear()
+
+    def run(self, command, args):
+        """Queue a run of a command.
+
+        Args:
+            command (str): The command, with variables to expand.
+            args (list): The command arguments.
+        """
+        key = (command, tuple(args))
+        if key in self.queued:
+            self.coalesced += 1
+            return
+        self.queued.add(key)
+        self.queue.append((command, args, None))
+        self.process()
+
+    def run_batch(self, command, event, torrent):
+        """Add a torrent to the next batch run of a command.
+
+        Args:
+            command (str): The command, with variables to expand.
+            event (str): The event, passed as the command argument.
+            torrent (dict): The torrent details written to the command input.
+        """
+        key = (command, event)
+        batch = self.batches.setdefault(key, [])
+        batch.append(torrent)
+        if len(batch) >= self.batch_size:
+            self.flush(key)
+        elif key not in self.batch_calls:
+            self.batch_calls[key] = reactor.callLater(self.batch_delay, self.flush, key)
+
+    def flush(self, key):
+        """Queue the run of a batch."""
+        call = self.batch_calls.pop(key, None)
+        if call and call.active():
+            call.cancel()
+        batch = self.batches.pop(key, None)
+        if not batch:
+            return
+        command, event = key
+        stdin = json.dumps(batch).encode('utf8')
+        self.queue.append((command, [event.encode('utf8')], stdin))
+        self.process()
+
+    def flush_all(self):
+        for key in list(self.batches):
+            self.flush(key)
+
+    def process(self):
+        """Start the queued runs while below the process limit."""
+        while self.queue and self.running < self.max_running:
+            command, args, stdin = self.queue.popleft()
+            if stdin is None:
+                self.queued.discard((command, tuple(args)))
+
+            path = self.resolve(command)
+            if path is None:
+                self.stats[command].add(0.0, failed=True)
+                continue
+
+            log.debug('Running %s with args: %s', path, args)
+            d = defer.Deferred()
+            try:
+                reactor.spawnProcess(
+                    CommandProtocol(d, stdin), path, [path] + args, env=os.environ
+                )
+            except OSError as ex:
+                log.error('Unable to run command "%s": %s', command, ex)
+                self.stats[command].add(0.0, failed=True)
+                continue
+            self.running += 1
+            d.addCallback(self.on_exit, command, time.time())
+
+    def on_exit(self, result, command, start):
+        self.running -= 1
+        stdout, stderr, exit_code = result
+        self.stats[command].add(time.time() - start, failed=bool(exit_code))
+        if exit_code:
+            log.warning('Command "%s" failed with exit code %d', command, exit_code)
+            if stdout:
+                log.warning('stdout: %s', stdout)
+            if stderr:
+                log.warning('stderr: %s', stderr)
+        self.process()
+        return result
+
+    def get_stats(self):
+        """The queue length and the run times and failures of each command.
+
+        Returns:
+            dict: With keys 'queued', 'running', 'batched', 'coalesced' and
+                'commands', a dict of command: run time summary.
+        """
+        return {
+            'queued': len(self.queue),
+            'running': self.running,
+            'batched': sum(len(batch) for batch in self.batches.values()),
+            'coalesced': self.coalesced,
+            'commands': {
+                command: stats.to_dict() for command, stats in self.stats.items()
+            },
+        }
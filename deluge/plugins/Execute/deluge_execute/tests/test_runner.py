@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import stat
+import tempfile
+
+from twisted.internet import defer, reactor, task
+
+from deluge.common import windows_check
+from deluge.tests.basetest import BaseTestCase
+
+from ..runner import CommandRunner
+
+
+class CommandRunnerTestCase(BaseTestCase):
+    if windows_check():
+        skip = 'Uses shell scripts'
+
+    def set_up(self):
+        self.path = tempfile.mkdtemp()
+        self.output = os.path.join(self.path, 'output')
+
+    def tear_down(self):
+        shutil.rmtree(self.path)
+
+    def write_script(self, body):
+        script = os.path.join(self.path, 'script.sh')
+        with open(script, 'w') as _file:
+            _file.write('#!/bin/sh\n' + body + '\n')
+        os.chmod(script, stat.S_IRWXU)
+        return script
+
+    @defer.inlineCallbacks
+    def wait_idle(self, runner):
+        while runner.running or runner.queue or runner.batches:
+            yield task.deferLater(reactor, 0.01, lambda: None)
+
+    def read_output(self):
+        with open(self.output) as _file:
+            return _file.read()
+
+    @defer.inlineCallbacks
+    def test_max_running(self):
+        script = self.write_script('echo "$1" >> %s' % self.output)
+        runner = CommandRunner(max_running=1)
+        for arg in ('a', 'b', 'c', 'b'):
+            runner.run(script, [arg.encode()])
+        stats = runner.get_stats()
+        self.assertEqual(
+            (1, 2, 1), (stats['running'], stats['queued'], stats['coalesced'])
+        )
+
+        yield self.wait_idle(runner)
+        self.assertEqual('a\nb\nc\n', self.read_output())
+        self.assertEqual(3, runner.get_stats()['commands'][script]['count'])
+
+    @defer.inlineCallbacks
+    def test_failures(self):
+        script = self.write_script('exit 1')
+        runner = CommandRunner()
+        runner.run(script, [])
+        runner.run(os.path.join(self.path, 'missing.sh'), [])
+        yield self.wait_idle(runner)
+        commands = runner.get_stats()['commands']
+        self.assertEqual(1, commands[script]['errors'])
+        self.assertEqual(1, commands[os.path.join(self.path, 'missing.sh')]['errors'])
+
+    @defer.inlineCallbacks
+    def test_batch(self):
+        script = self.write_script('echo "$1" > %s; cat >> %s' % ((self.output,) * 2))
+        runner = CommandRunner(batch_delay=0.01)
+        torrents = [{'id': str(i), 'name': 'name%d' % i} for i in range(3)]
+        for torrent in torrents:
+            runner.run_batch(script, 'complete', torrent)
+        self.assertEqual(3, runner.get_stats()['batched'])
+
+        yield self.wait_idle(runner)
+        event, data = self.read_output().split('\n', 1)
+        self.assertEqual('complete', event)
+        self.assertEqual(torrents, json.loads(data))
+        self.assertEqual(1, runner.get_stats()['commands'][script]['count'])
+
+    def test_resolve_cached(self):
+        script = self.write_script('true')
+        runner = CommandRunner()
+        self.assertEqual(script, runner.resolve(script))
+        os.remove(script)
+        self.assertEqual(script, runner.resolve(script))
+        runner.clear_cache()
+        self.assertIsNone(runner.resolve(script))
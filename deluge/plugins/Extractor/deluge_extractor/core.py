@@ -17,6 +17,7 @@
 import logging
 import os
 
+from twisted.internet import threads
 from twisted.internet.utils import getProcessOutputAndValue
 from twisted.python.procutils import which
 
@@ -26,9 +27,19 @@
 from deluge.core.rpcserver import export
 from deluge.plugins.pluginbase import CorePluginBase
 
+from .jobqueue import IN_PROCESS_EXTS, ExtractQueue, extract_archive
+
 log = logging.getLogger(__name__)
 
-DEFAULT_PREFS = {'extract_path': '', 'use_name_folder': True}
+DEFAULT_PREFS = {
+    'extract_path': '',
+    'use_name_folder': True,
+    # The number of archives extracted at the same time.
+    'max_jobs': 2,
+    # The nice level and idle IO class of the extracting programs.
+    'niceness': 10,
+    'idle_io': True,
+}
 
 if windows_check():
     win_7z_exes = [
@@ -94,8 +105,30 @@
                     log.warning('%s not found, disabling support for %s', command, k)
                     del EXTRACT_COMMANDS[k]
 
-if not EXTRACT_COMMANDS:
-    raise Exception('No archive extracting programs found, plugin will be disabled')
+# Zip and tar archives are always supported by extracting in-process.
+SUPPORTED_EXTS = set(EXTRACT_COMMANDS) | set(IN_PROCESS_EXTS)
+
+
+def low_priority_command(cmd, niceness, idle_io):
+    """Prefix a command to run it with a lower CPU and IO priority.
+
+    Args:
+        cmd (list): The command and its arguments.
+        niceness (int): The nice level, 0 to not change it.
+        idle_io (bool): Run with the idle IO scheduling class.
+
+    Returns:
+        list: The command with the priority programs prefixed.
+
+    """
+    if windows_check():
+        return cmd
+    prefix = []
+    if idle_io and which('ionice'):
+        prefix += ['ionice', '-c', '3']
+    if niceness and which('nice'):
+        prefix += ['nice', '-n', str(niceness)]
+    return prefix + cmd
 
 
 class Core(CorePluginBase):
@@ -107,11 +140,19 @@ def enable(self):
             self.config['extract_path'] = deluge.configmanager.ConfigManager(
                 'core.conf'
             )['download_location']
+        self.jobs_config = deluge.configmanager.ConfigManager(
+            'extractor_jobs.conf', {'jobs': []}
+        )
+        self.queue = ExtractQueue(
+            self.extract, self.jobs_config, self.config['max_jobs']
+        )
+        self.queue.start()
         component.get('EventManager').register_event_handler(
             'TorrentFinishedEvent', self._on_torrent_finished
         )
 
     def disable(self):
+        self.queue.stop()
         component.get('EventManager').deregister_event_handler(
             'TorrentFinishedEvent', self._on_torrent_finished
         )
@@ -121,7 +162,7 @@ def update(self):
 
     def _on_torrent_finished(self, torrent_id):
         """
-        This is called when a torrent finishes and checks if any files to extract.
+        This is called when a torrent finishes and queues any files to extract.
         """
         tid = component.get('TorrentManager').torrents[torrent_id]
         tid_status = tid.get_status(['download_location', 'name'])
@@ -130,9 +171,9 @@ def _on_torrent_finished(self, torrent_id):
         for f in files:
             file_root, file_ext = os.path.splitext(f['path'])
             file_ext_sec = os.path.splitext(file_root)[1]
-            if file_ext_sec and file_ext_sec + file_ext in EXTRACT_COMMANDS:
+            if file_ext_sec and file_ext_sec + file_ext in SUPPORTED_EXTS:
                 file_ext = file_ext_sec + file_ext
-            elif file_ext not in EXTRACT_COMMANDS or file_ext_sec == '.tar':
+            elif file_ext not in SUPPORTED_EXTS or file_ext_sec == '.tar':
                 log.debug('Cannot extract file with unknown file type: %s', f['path'])
                 continue
             elif file_ext == '.rar' and 'part' in file_ext_sec:
@@ -141,7 +182,6 @@ def _on_torrent_finished(self, torrent_id):
                     log.debug('Skipping remaining multi-part rar files: %s', f['path'])
                     continue
 
-            cmd = EXTRACT_COMMANDS[file_ext]
             fpath = os.path.join(
                 tid_status['download_location'], os.path.normpath(f['path'])
             )
@@ -156,28 +196,59 @@ def _on_torrent_finished(self, torrent_id):
                     log.error('Error creating destination folder: %s', ex)
                     break
 
-            def on_extract(result, torrent_id, fpath):
-                # Check command exit code.
-                if not result[2]:
-                    log.info('Extract successful: %s (%s)', fpath, torrent_id)
-                else:
-                    log.error(
-                        'Extract failed: %s (%s) %s', fpath, torrent_id, result[1]
-                    )
-
-            # Run the command and add callback.
-            log.debug(
-                'Extracting %s from %s with %s %s to %s',
-                fpath,
-                torrent_id,
-                cmd[0],
-                cmd[1],
-                dest,
-            )
-            d = getProcessOutputAndValue(
-                cmd[0], cmd[1].split() + [str(fpath)], os.environ, str(dest)
-            )
-            d.addCallback(on_extract, torrent_id, fpath)
+            log.debug('Queueing extraction of %s from %s', fpath, torrent_id)
+            self.queue.add(torrent_id, fpath, dest, file_ext)
+
+    def extract(self, job):
+        """Extract the archive of a queued job.
+
+        Zip and tar archives are extracted in a thread, other archives with
+        a low priority external program.
+
+        Returns:
+            Deferred: Fires with True if the extraction succeeded.
+        """
+        torrent_id, fpath, dest, file_ext = (
+            job['torrent_id'],
+            job['path'],
+            job['dest'],
+            job['ext'],
+        )
+
+        def on_extract(result):
+            # Check command exit code.
+            if not result[2]:
+                log.info('Extract successful: %s (%s)', fpath, torrent_id)
+                return True
+            log.error('Extract failed: %s (%s) %s', fpath, torrent_id, result[1])
+            return False
+
+        def on_extract_archive(result):
+            log.info('Extract successful: %s (%s)', fpath, torrent_id)
+            return True
+
+        if file_ext in IN_PROCESS_EXTS:
+            log.debug('Extracting %s from %s to %s', fpath, torrent_id, dest)
+            d = threads.deferToThread(extract_archive, fpath, dest, file_ext)
+            return d.addCallback(on_extract_archive)
+
+        cmd = EXTRACT_COMMANDS[file_ext]
+        # Run the command and add callback.
+        log.debug(
+            'Extracting %s from %s with %s %s to %s',
+            fpath,
+            torrent_id,
+            cmd[0],
+            cmd[1],
+            dest,
+        )
+        cmd = low_priority_command(
+            [cmd[0]] + cmd[1].split() + [str(fpath)],
+            self.config['niceness'],
+            self.config['idle_io'],
+        )
+        d = getProcessOutputAndValue(cmd[0], cmd[1:], os.environ, str(dest))
+        return d.addCallback(on_extract)
 
     @export
     def set_config(self, config):
@@ -185,8 +256,15 @@ def set_config(self, config):
         for key in config:
             self.config[key] = config[key]
         self.config.save()
+        self.queue.max_jobs = self.config['max_jobs']
+        self.queue.process()
 
     @export
     def get_config(self):
         """Returns the config dictionary."""
         return self.config.config
+
+    @export
+    def get_queue_status(self):
+        """Returns the extraction queue depth and throughput."""
+        return self.queue.get_status()
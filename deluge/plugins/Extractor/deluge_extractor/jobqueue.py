@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""A persistent queue of extraction jobs run a limited number at a time."""
+
+from __future__ import division, unicode_literals
+
+import logging
+import os
+import tarfile
+import time
+import uuid
+import zipfile
+
+from twisted.internet import defer
+
+log = logging.getLogger(__name__)
+
+# Archive types extracted by Python instead of an external program, with the
+# tarfile open mode.
+IN_PROCESS_EXTS = {
+    '.zip': None,
+    '.tar': 'r:',
+    '.tar.gz': 'r:gz',
+    '.tgz': 'r:gz',
+    '.tar.bz2': 'r:bz2',
+    '.tbz': 'r:bz2',
+    '.tar.xz': 'r:xz',
+    '.txz': 'r:xz',
+}
+
+
+def get_device(path):
+    """The id of the device a path is on, for a missing path its nearest parent."""
+    while True:
+        try:
+            return os.stat(path).st_dev
+        except OSError:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+
+
+def _within(dest, name):
+    dest = os.path.realpath(dest)
+    path = os.path.realpath(os.path.join(dest, name))
+    return path == dest or path.startswith(dest + os.sep)
+
+
+def _safe_member(dest, member):
+    if not _within(dest, member.name):
+        return False
+    if member.issym():
+        target = os.path.join(os.path.dirname(member.name), member.linkname)
+        return _within(dest, target)
+    if member.islnk():
+        return _within(dest, member.linkname)
+    return True
+
+
+def extract_archive(path, dest, ext):
+    """Extract a zip or tar archive, skipping members outside of `dest`.
+
+    Args:
+        path (str): The archive path.
+        dest (str): The folder to extract to.
+        ext (str): The archive type, a key of :data:`IN_PROCESS_EXTS`.
+
+    Raises:
+        zipfile.BadZipfile, tarfile.TarError: If the archive is invalid.
+
+    """
+    if ext == '.zip':
+        with zipfile.ZipFile(path) as archive:
+            members = archive.namelist()
+            safe = [name for name in members if _within(dest, name)]
+            archive.extractall(dest, safe)
+    else:
+        with tarfile.open(path, IN_PROCESS_EXTS[ext]) as archive:
+            members = archive.getmembers()
+            safe = [member for member in members if _safe_member(dest, member)]
+            archive.extractall(dest, safe)
+    if len(safe) != len(members):
+        log.warning(
+            'Skipped %d files extracting outside of %s from %s',
+            len(members) - len(safe),
+            dest,
+            path,
+        )
+
+
+class ExtractQueue(object):
+    """Runs extraction jobs, at most `max_jobs` at the same time.
+
+    Jobs are dicts with the 'torrent_id', 'path', 'dest' and 'ext' of an
+    archive. They are saved in `config` until they have run so are resumed
+    after a restart. Jobs run in the order they were added, except a job
+    waits while another job is extracting to the same device so a disk is
+    not shared by concurrent extractions.
+
+    Args:
+        run_job (func): Called with a job to extract it, returns a Deferred
+            firing with True if the extraction succeeded.
+        config (Config): The config the unfinished jobs are saved to, in the
+            'jobs' key.
+        max_jobs (int): The number of jobs to run at the same time.
+
+    """
+
+    def __init__(self, run_job, config, max_jobs=2):
+        self.run_job = run_job
+        self.config = config
+        self.max_jobs = max_jobs
+        # The unfinished jobs in the order they were added.
+        self.jobs = [dict(job) for job in config['jobs']]
+        # Dict of job id: device of the running jobs.
+        self.running = {}
+        self.stopped = True
+        self.stats = {'completed': 0, 'failed': 0, 'bytes': 0, 'time': 0.0}
+
+    def start(self):
+        self.stopped = False
+        if self.jobs:
+            log.info('Resuming %d extraction jobs', len(self.jobs))
+        self.process()
+
+    def stop(self):
+        """Stop starting jobs, the running jobs are run again after a restart."""
+        self.stopped = True
+
+    def add(self, torrent_id, path, dest, ext):
+        """Queue the extraction of an archive."""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        job = {
+            'id': uuid.uuid4().hex,
+            'torrent_id': torrent_id,
+            'path': path,
+            'dest': dest,
+            'ext': ext,
+            'size': size,
+            'added': time.time(),
+        }
+        self.jobs.append(job)
+        self.save()
+        self.process()
+        return job['id']
+
+    def save(self):
+        self.config['jobs'] = list(self.jobs)
+        self.config.save()
+
+    def process(self):
+        """Start the queued jobs that can run."""
+        if self.stopped:
+            return
+        busy = set(self.running.values())
+        ready = []
+        for job in self.jobs:
+            if len(self.running) + len(ready) >= self.max_jobs:
+                break
+            if job['id'] in self.running:
+                continue
+            device = get_device(job['dest'])
+            if device in busy:
+                continue
+            busy.add(device)
+            ready.append((job, device))
+
+        for job, device in ready:
+            self.running[job['id']] = device
+        for job, device in ready:
+            self._run(job)
+
+    def _run(self, job):
+        start = time.time()
+        d = defer.maybeDeferred(self.run_job, job)
+        d.addErrback(self._on_error, job)
+        d.addCallback(self._on_done, job, start)
+
+    def _on_error(self, failure, job):
+        log.error('Extract failed: %s (%s) %s', job['path'], job['torrent_id'], failure)
+        return False
+
+    def _on_done(self, success, job, start):
+        del self.running[job['id']]
+        self.jobs.remove(job)
+        if success:
+            self.stats['completed'] += 1
+            self.stats['bytes'] += job['size']
+        else:
+            self.stats['failed'] += 1
+        self.stats['time'] += time.time() - start
+        self.save()
+        self.process()
+
+    def get_status(self):
+        """The queue depth and throughput of the extractions.
+
+        Returns:
+            dict: The number of queued and running jobs, the completed and
+                failed jobs, and the archive bytes extracted per second.
+
+        """
+        status = dict(self.stats)
+        status['queued'] = len(self.jobs) - len(self.running)
+        status['running'] = len(self.running)
+        status['max_jobs'] = self.max_jobs
+        status['rate'] = status['bytes'] / status['time'] if status['time'] else 0.0
+        return status
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from io import BytesIO
+
+from mock import patch
+from twisted.internet import defer
+
+from deluge.config import Config
+from deluge.tests.basetest import BaseTestCase
+
+from .. import jobqueue
+from ..jobqueue import ExtractQueue, extract_archive
+
+
+class ExtractQueueTestCase(BaseTestCase):
+    def set_up(self):
+        self.path = tempfile.mkdtemp()
+        self.config = Config('extractor_jobs.conf', {'jobs': []}, self.path)
+        self.runs = {}
+
+    def tear_down(self):
+        shutil.rmtree(self.path)
+
+    def run_job(self, job):
+        self.runs[job['path']] = defer.Deferred()
+        return self.runs[job['path']]
+
+    def add_jobs(self, queue, *dests):
+        for dest in dests:
+            queue.add('tid', dest + '.zip', dest, '.zip')
+
+    def test_max_jobs(self):
+        queue = ExtractQueue(self.run_job, self.config, max_jobs=2)
+        queue.start()
+        with patch.object(jobqueue, 'get_device', lambda path: path):
+            self.add_jobs(queue, 'a', 'b', 'c')
+            self.assertEqual(['a.zip', 'b.zip'], sorted(self.runs))
+            self.assertEqual(1, queue.get_status()['queued'])
+
+            self.runs['a.zip'].callback(True)
+            self.assertIn('c.zip', self.runs)
+            self.runs['b.zip'].callback(False)
+            self.runs['c.zip'].errback(Exception('Extract error'))
+
+        status = queue.get_status()
+        self.assertEqual((0, 0), (status['queued'], status['running']))
+        self.assertEqual((1, 2), (status['completed'], status['failed']))
+
+    def test_device_serialized(self):
+        queue = ExtractQueue(self.run_job, self.config, max_jobs=3)
+        queue.start()
+        with patch.object(jobqueue, 'get_device', lambda path: path[0]):
+            self.add_jobs(queue, 'a1', 'a2', 'b1')
+            self.assertEqual(['a1.zip', 'b1.zip'], sorted(self.runs))
+            self.runs['a1.zip'].callback(True)
+            self.assertIn('a2.zip', self.runs)
+
+    def test_resume(self):
+        queue = ExtractQueue(self.run_job, self.config, max_jobs=1)
+        queue.start()
+        with patch.object(jobqueue, 'get_device', lambda path: path):
+            self.add_jobs(queue, 'a', 'b')
+            queue.stop()
+            self.runs['a.zip'].callback(True)
+            self.assertNotIn('b.zip', self.runs)
+
+            # The unfinished jobs are loaded from the saved config.
+            config = Config('extractor_jobs.conf', {'jobs': []}, self.path)
+            self.assertEqual(['b.zip'], [job['path'] for job in config['jobs']])
+            self.runs.clear()
+            ExtractQueue(self.run_job, config).start()
+        self.assertEqual(['b.zip'], list(self.runs))
+
+    def test_extract_zip(self):
+        archive = os.path.join(self.path, 'test.zip')
+        with zipfile.ZipFile(archive, 'w') as _zip:
+            _zip.writestr('dir/file', b'data')
+            _zip.writestr('../outside', b'data')
+        dest = os.path.join(self.path, 'dest')
+        extract_archive(archive, dest, '.zip')
+        with open(os.path.join(dest, 'dir', 'file'), 'rb') as _file:
+            self.assertEqual(b'data', _file.read())
+        self.assertFalse(os.path.exists(os.path.join(self.path, 'outside')))
+
+    def test_extract_tar(self):
+        archive = os.path.join(self.path, 'test.tar.gz')
+        with tarfile.open(archive, 'w:gz') as tar:
+            for name in ('file', '../outside'):
+                info = tarfile.TarInfo(name)
+                info.size = 4
+                tar.addfile(info, BytesIO(b'data'))
+            link = tarfile.TarInfo('link')
+            link.type = tarfile.SYMTYPE
+            link.linkname = '/etc/passwd'
+            tar.addfile(link)
+        dest = os.path.join(self.path, 'dest')
+        extract_archive(archive, dest, '.tar.gz')
+        self.assertEqual(['file'], os.listdir(dest))
+        self.assertFalse(os.path.exists(os.path.join(self.path, 'outside')))
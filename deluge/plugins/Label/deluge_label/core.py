@@ -314,19 +314,32 @@ def set_torrent(self, torrent_id, label_id):
         assign a label to a torrent
         removes a label if the label_id parameter is empty.
         """
+        self.set_torrents([torrent_id], label_id)
+
+    @export
+    def set_torrents(self, torrent_ids, label_id):
+        """
+        assign a label to multiple torrents, saving the config once
+        removes the label if the label_id parameter is empty.
+        """
         if label_id == NO_LABEL:
             label_id = None
 
         check_input((not label_id) or (label_id in self.labels), _('Unknown Label'))
-        check_input(torrent_id in self.torrents, _('Unknown Torrent'))
+        for torrent_id in torrent_ids:
+            check_input(torrent_id in self.torrents, _('Unknown Torrent'))
 
-        if torrent_id in self.torrent_labels:
-            self._unset_torrent_options(torrent_id, self.torrent_labels[torrent_id])
-            del self.torrent_labels[torrent_id]
+        unset = False
+        for torrent_id in torrent_ids:
+            if torrent_id in self.torrent_labels:
+                self._unset_torrent_options(torrent_id, self.torrent_labels[torrent_id])
+                del self.torrent_labels[torrent_id]
+                unset = True
+            if label_id:
+                self.torrent_labels[torrent_id] = label_id
+                self._set_torrent_options(torrent_id, label_id)
+        if unset:
             self.clean_config()
-        if label_id:
-            self.torrent_labels[torrent_id] = label_id
-            self._set_torrent_options(torrent_id, label_id)
 
         self.config.save()
 
@@ -15,10 +15,8 @@
 from __future__ import unicode_literals
 
 import logging
-import smtplib
-from email.utils import formatdate
 
-from twisted.internet import defer, threads
+from twisted.internet import defer
 
 import deluge.configmanager
 from deluge import component
@@ -27,6 +25,7 @@
 from deluge.plugins.pluginbase import CorePluginBase
 
 from .common import CustomNotifications
+from .mailer import EmailDispatcher
 
 log = logging.getLogger(__name__)
 
@@ -39,6 +38,9 @@
     'smtp_from': '',
     'smtp_tls': False,  # SSL or TLS
     'smtp_recipients': [],
+    # Seconds to collect notifications for to send them in one email.
+    'smtp_digest_window': 0,
+    'smtp_max_retries': 5,
     # Subscriptions
     'subscriptions': {'email': []},
 }
@@ -75,12 +77,8 @@ def handle_custom_email_notification(self, result, eventtype):
         if not self.config['smtp_enabled']:
             return defer.succeed('SMTP notification not enabled.')
         subject, message = result
-        log.debug(
-            'Spawning new thread to send email with subject: %s: %s', subject, message
-        )
-        # Spawn thread because we don't want Deluge to lock up while we send the
-        # email.
-        return threads.deferToThread(self._notify_email, subject, message)
+        log.debug('Queueing email with subject: %s: %s', subject, message)
+        return self.dispatcher.send(subject, message)
 
     def get_handled_events(self):
         handled_events = []
@@ -94,85 +92,6 @@ def get_handled_events(self):
         log.debug('Handled Notification Events: %s', handled_events)
         return handled_events
 
-    def _notify_email(self, subject='', message=''):
-        log.debug('Email prepared')
-        to_addrs = self.config['smtp_recipients']
-        to_addrs_str = ', '.join(self.config['smtp_recipients'])
-        headers_dict = {
-            'smtp_from': self.config['smtp_from'],
-            'subject': subject,
-            'smtp_recipients': to_addrs_str,
-            'date': formatdate(),
-        }
-        headers = (
-            """\
-From: %(smtp_from)s
-To: %(smtp_recipients)s
-Subject: %(subject)s
-Date: %(date)s
-
-
-"""
-            % headers_dict
-        )
-
-        message = '\r\n'.join((headers + message).splitlines())
-
-        try:
-            # Python 2.6
-            server = smtplib.SMTP(
-                self.config['smtp_host'], self.config['smtp_port'], timeout=60
-            )
-        except Exception as ex:
-            err_msg = _('There was an error sending the notification email: %s') % ex
-            log.error(err_msg)
-            return ex
-
-        security_enabled = self.config['smtp_tls']
-
-        if security_enabled:
-            server.ehlo()
-            if 'starttls' not in server.esmtp_features:
-                log.warning('TLS/SSL enabled but server does not support it')
-            else:
-                server.starttls()
-                server.ehlo()
-
-        if self.config['smtp_user'] and self.config['smtp_pass']:
-            try:
-                server.login(self.config['smtp_user'], self.config['smtp_pass'])
-            except smtplib.SMTPHeloError as ex:
-                err_msg = _('Server did not reply properly to HELO greeting: %s') % ex
-                log.error(err_msg)
-                return ex
-            except smtplib.SMTPAuthenticationError as ex:
-                err_msg = _('Server refused username/password combination: %s') % ex
-                log.error(err_msg)
-                return ex
-
-        try:
-            try:
-                server.sendmail(self.config['smtp_from'], to_addrs, message)
-            except smtplib.SMTPException as ex:
-                err_msg = (
-                    _('There was an error sending the notification email: %s') % ex
-                )
-                log.error(err_msg)
-                return ex
-        finally:
-            if security_enabled:
-                # avoid false failure detection when the server closes
-                # the SMTP connection with TLS enabled
-                import socket
-
-                try:
-                    server.quit()
-                except socket.sslerror:
-                    pass
-            else:
-                server.quit()
-        return _('Notification email sent.')
-
     def _on_torrent_finished_event(self, torrent_id):
         log.debug('Handler for TorrentFinishedEvent called for CORE')
         torrent = component.get('TorrentManager')[torrent_id]
@@ -209,11 +128,13 @@ def enable(self):
         self.config = deluge.configmanager.ConfigManager(
             'notifications-core.conf', DEFAULT_PREFS
         )
+        self.dispatcher = EmailDispatcher(self.config)
         log.debug('ENABLING CORE NOTIFICATIONS')
 
     def disable(self):
         log.debug('DISABLING CORE NOTIFICATIONS')
         CoreNotifications.disable(self)
+        return self.dispatcher.stop()
 
     @export
     def set_config(self, config):
@@ -221,6 +142,7 @@ def set_config(self, config):
         for key in config:
             self.config[key] = config[key]
         self.config.save()
+        self.dispatcher.reset()
 
     @export
     def get_config(self):
@@ -230,3 +152,8 @@ def get_config(self):
     @export
     def get_handled_events(self):
         return CoreNotifications.get_handled_events(self)
+
+    @export
+    def get_email_stats(self):
+        """Returns the counts of sent and failed notification emails."""
+        return self.dispatcher.get_stats()
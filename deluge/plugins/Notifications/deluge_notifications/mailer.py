@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""Sends the notification emails over a reused SMTP session."""
+
+from __future__ import unicode_literals
+
+import logging
+import smtplib
+from email.utils import formatdate
+
+from twisted.internet import defer, reactor, threads
+from twisted.python.threadpool import ThreadPool
+
+log = logging.getLogger(__name__)
+
+# The seconds before the first retry of a failed email, doubled for each
+# following retry up to MAX_RETRY_DELAY.
+RETRY_DELAY = 30
+MAX_RETRY_DELAY = 3600
+# The seconds an unused SMTP session is kept open.
+IDLE_TIMEOUT = 60
+
+# Errors which will not be fixed by sending again.
+PERMANENT_ERRORS = (smtplib.SMTPAuthenticationError, smtplib.SMTPRecipientsRefused)
+
+
+def format_email(config, subject, message):
+    headers_dict = {
+        'smtp_from': config['smtp_from'],
+        'subject': subject,
+        'smtp_recipients': ', '.join(config['smtp_recipients']),
+        'date': formatdate(),
+    }
+    headers = (
+        """\
+From: %(smtp_from)s
+To: %(smtp_recipients)s
+Subject: %(subject)s
+Date: %(date)s
+
+
+"""
+        % headers_dict
+    )
+
+    return '\r\n'.join((headers + message).splitlines())
+
+
+class EmailDispatcher(object):
+    """Sends notification emails from a dedicated thread.
+
+    The SMTP session is kept open between emails and closed once it has not
+    been used for IDLE_TIMEOUT seconds. Notifications sent within the
+    'smtp_digest_window' seconds of the first are merged into a single
+    email and failed emails are sent again, waiting longer after each
+    failure, up to 'smtp_max_retries' times.
+
+    Args:
+        config (Config): The notifications config with the smtp settings.
+
+    """
+
+    def __init__(self, config):
+        self.config = config
+        # List of (subject, message, deferred) waiting for the digest window.
+        self.pending = []
+        self.flush_call = None
+        self.close_call = None
+        self.retry_calls = []
+        self.server = None
+        self.stopped = False
+        self.stats = {
+            'notifications': 0,
+            'emails': 0,
+            'failed': 0,
+            'retries': 0,
+            'connections': 0,
+        }
+        # A thread of our own so slow SMTP servers do not use up the reactor
+        # threadpool.
+        self.pool = ThreadPool(1, 1, name='NotificationsEmail')
+        self.pool.start()
+        self.shutdown_trigger = reactor.addSystemEventTrigger(
+            'during', 'shutdown', self.pool.stop
+        )
+
+    def send(self, subject, message):
+        """Send a notification email, merged with others in the digest window.
+
+        Returns:
+            Deferred: Fires when the email is sent or fails with the error
+                once no more retries are left.
+
+        """
+        d = defer.Deferred()
+        self.pending.append((subject, message, d))
+        window = self.config['smtp_digest_window']
+        if window <= 0:
+            self.flush()
+        elif self.flush_call is None:
+            self.flush_call = reactor.callLater(window, self.flush)
+        return d
+
+    def flush(self):
+        """Send the pending notifications now."""
+        if self.flush_call and self.flush_call.active():
+            self.flush_call.cancel()
+        self.flush_call = None
+        batch, self.pending = self.pending, []
+        if batch:
+            self._deliver(batch, 0)
+
+    @staticmethod
+    def format_digest(batch):
+        """Merge notifications into the subject and message of one email."""
+        if len(batch) == 1:
+            return batch[0][:2]
+        subject = _('%(subject)s (and %(count)d more)') % {
+            'subject': batch[0][0],
+            'count': len(batch) - 1,
+        }
+        message = '\n\n'.join(
+            '%s\n%s\n%s' % (item_subject, '-' * len(item_subject), item_message)
+            for item_subject, item_message, d in batch
+        )
+        return subject, message
+
+    def _deliver(self, batch, attempt):
+        subject, message = self.format_digest(batch)
+        d = threads.deferToThreadPool(
+            reactor, self.pool, self._sendmail, subject, message
+        )
+        d.addCallbacks(
+            self._on_sent,
+            self._on_send_failed,
+            callbackArgs=(batch,),
+            errbackArgs=(batch, attempt),
+        )
+
+    def _on_sent(self, result, batch):
+        self.stats['emails'] += 1
+        self.stats['notifications'] += len(batch)
+        if not self.stopped:
+            if self.close_call and self.close_call.active():
+                self.close_call.reset(IDLE_TIMEOUT)
+            else:
+                self.close_call = reactor.callLater(IDLE_TIMEOUT, self._close_idle)
+        for subject, message, d in batch:
+            d.callback(_('Notification email sent.'))
+
+    def _on_send_failed(self, failure, batch, attempt):
+        err_msg = _('There was an error sending the notification email: %s') % (
+            failure.getErrorMessage()
+        )
+        log.error(err_msg)
+        self.retry_calls = [call for call in self.retry_calls if call.active()]
+        if (
+            not self.stopped
+            and not failure.check(*PERMANENT_ERRORS)
+            and attempt < self.config['smtp_max_retries']
+        ):
+            delay = min(RETRY_DELAY * 2 ** attempt, MAX_RETRY_DELAY)
+            log.info('Sending the notification email again in %s seconds', delay)
+            self.stats['retries'] += 1
+            self.retry_calls.append(
+                reactor.callLater(delay, self._deliver, batch, attempt + 1)
+            )
+            return
+
+        self.stats['failed'] += 1
+        for subject, message, d in batch:
+            d.errback(failure)
+
+    def _sendmail(self, subject, message):
+        """Send an email, connecting if there is no open session.
+
+        Runs in the dispatcher thread.
+        """
+        to_addrs = self.config['smtp_recipients']
+        email = format_email(self.config, subject, message)
+        reused = self.server is not None
+        try:
+            try:
+                self._connect().sendmail(self.config['smtp_from'], to_addrs, email)
+            except smtplib.SMTPServerDisconnected:
+                if not reused:
+                    raise
+                # The server closed the session while it was unused.
+                self.server = None
+                self._connect().sendmail(self.config['smtp_from'], to_addrs, email)
+        except Exception:
+            self._close()
+            raise
+
+    def _connect(self):
+        if self.server is not None:
+            return self.server
+
+        server = smtplib.SMTP(
+            self.config['smtp_host'], self.config['smtp_port'], timeout=60
+        )
+        self.stats['connections'] += 1
+        if self.config['smtp_tls']:
+            server.ehlo()
+            if not server.has_extn('starttls'):
+                log.warning('TLS/SSL enabled but server does not support it')
+            else:
+                server.starttls()
+                server.ehlo()
+
+        if self.config['smtp_user'] and self.config['smtp_pass']:
+            try:
+                server.login(self.config['smtp_user'], self.config['smtp_pass'])
+            except smtplib.SMTPHeloError as ex:
+                log.error(_('Server did not reply properly to HELO greeting: %s') % ex)
+                server.close()
+                raise
+            except smtplib.SMTPAuthenticationError as ex:
+                log.error(_('Server refused username/password combination: %s') % ex)
+                server.close()
+                raise
+        self.server = server
+        return server
+
+    def _close(self):
+        """Close the SMTP session, runs in the dispatcher thread."""
+        server, self.server = self.server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            # Ignore the server closing the connection first, e.g. with TLS.
+            server.close()
+
+    def _close_idle(self):
+        self.close_call = None
+        threads.deferToThreadPool(reactor, self.pool, self._close)
+
+    def reset(self):
+        """Close the session so the next email uses the changed settings."""
+        if not self.stopped:
+            threads.deferToThreadPool(reactor, self.pool, self._close)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['pending'] = len(self.pending)
+        stats['retrying'] = len([call for call in self.retry_calls if call.active()])
+        return stats
+
+    def stop(self):
+        """Send the pending notifications, close the session and stop the thread.
+
+        Returns:
+            Deferred: Fires when the thread has stopped.
+
+        """
+        self.flush()
+        self.stopped = True
+        for call in self.retry_calls + [self.close_call]:
+            if call and call.active():
+                call.cancel()
+        self.retry_calls = []
+        reactor.removeSystemEventTrigger(self.shutdown_trigger)
+        d = threads.deferToThreadPool(reactor, self.pool, self._close)
+        d.addBoth(lambda _: self.pool.stop())
+        return d
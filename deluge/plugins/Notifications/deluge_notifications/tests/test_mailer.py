@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+from __future__ import unicode_literals
+
+from mock import patch
+from twisted.internet import defer, reactor
+from twisted.mail import smtp
+from zope.interface import implementer
+
+from deluge.tests.basetest import BaseTestCase
+
+from .. import mailer
+from ..mailer import EmailDispatcher
+
+
+@implementer(smtp.IMessage)
+class Message(object):
+    def __init__(self, messages):
+        self.messages = messages
+        self.lines = []
+
+    def lineReceived(self, line):  # NOQA: N802
+        self.lines.append(line)
+
+    def eomReceived(self):  # NOQA: N802
+        self.messages.append(b'\n'.join(self.lines).decode('utf8'))
+        return defer.succeed(None)
+
+    def connectionLost(self):  # NOQA: N802
+        pass
+
+
+@implementer(smtp.IMessageDelivery)
+class Delivery(object):
+    def __init__(self):
+        self.messages = []
+
+    def receivedHeader(self, helo, origin, recipients):  # NOQA: N802
+        return None
+
+    def validateFrom(self, helo, origin):  # NOQA: N802
+        return origin
+
+    def validateTo(self, user):  # NOQA: N802
+        return lambda: Message(self.messages)
+
+
+class SMTPFactory(smtp.SMTPFactory):
+    """A local SMTP server keeping the received messages."""
+
+    protocol = smtp.ESMTP
+
+    def __init__(self):
+        smtp.SMTPFactory.__init__(self)
+        self.delivery = Delivery()
+        self.connections = []
+
+    def buildProtocol(self, addr):  # NOQA: N802
+        protocol = smtp.SMTPFactory.buildProtocol(self, addr)
+        protocol.delivery = self.delivery
+        self.connections.append(protocol)
+        return protocol
+
+
+class EmailDispatcherTestCase(BaseTestCase):
+    def set_up(self):
+        self.factory = SMTPFactory()
+        self.port = reactor.listenTCP(0, self.factory, interface='127.0.0.1')
+        self.config = {
+            'smtp_host': '127.0.0.1',
+            'smtp_port': self.port.getHost().port,
+            'smtp_user': '',
+            'smtp_pass': '',
+            'smtp_from': 'deluge@example.com',
+            'smtp_tls': False,
+            'smtp_recipients': ['user@example.com'],
+            'smtp_digest_window': 0,
+            'smtp_max_retries': 2,
+        }
+        self.dispatcher = EmailDispatcher(self.config)
+
+    @defer.inlineCallbacks
+    def tear_down(self):
+        yield self.dispatcher.stop()
+        for protocol in self.factory.connections:
+            protocol.transport.loseConnection()
+        yield self.port.stopListening()
+
+    @defer.inlineCallbacks
+    def test_reuse_session(self):
+        yield self.dispatcher.send('Subject 1', 'Message 1')
+        yield self.dispatcher.send('Subject 2', 'Message 2')
+        self.assertEqual(2, len(self.factory.delivery.messages))
+        self.assertIn('Subject: Subject 2', self.factory.delivery.messages[1])
+        self.assertEqual(1, len(self.factory.connections))
+
+        # A session closed by the server is opened again.
+        self.factory.connections[0].transport.loseConnection()
+        yield self.dispatcher.send('Subject 3', 'Message 3')
+        self.assertEqual(3, len(self.factory.delivery.messages))
+        self.assertEqual(2, self.dispatcher.get_stats()['connections'])
+
+    @defer.inlineCallbacks
+    def test_digest(self):
+        self.config['smtp_digest_window'] = 0.05
+        sent = [
+            self.dispatcher.send('Subject %d' % i, 'Message %d' % i) for i in range(3)
+        ]
+        self.assertEqual(3, self.dispatcher.get_stats()['pending'])
+        yield defer.gatherResults(sent)
+        self.assertEqual(1, len(self.factory.delivery.messages))
+        message = self.factory.delivery.messages[0]
+        self.assertIn('Subject: Subject 0 (and 2 more)', message)
+        self.assertIn('Message 2', message)
+        stats = self.dispatcher.get_stats()
+        self.assertEqual((1, 3), (stats['emails'], stats['notifications']))
+
+    @defer.inlineCallbacks
+    def test_retry(self):
+        yield self.port.stopListening()
+        with patch.object(mailer, 'RETRY_DELAY', 0.01):
+            d = self.dispatcher.send('Subject', 'Message')
+            yield self.assertFailure(d, EnvironmentError)
+        stats = self.dispatcher.get_stats()
+        self.assertEqual((2, 1), (stats['retries'], stats['failed']))
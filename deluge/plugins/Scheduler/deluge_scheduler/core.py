@@ -11,7 +11,7 @@
 # See LICENSE for more details.
 #
 
-from __future__ import unicode_literals
+from __future__ import division, unicode_literals
 
 import logging
 import time
@@ -24,6 +24,8 @@
 from deluge.event import DelugeEvent
 from deluge.plugins.pluginbase import CorePluginBase
 
+from .transition import Transition
+
 log = logging.getLogger(__name__)
 
 DEFAULT_PREFS = {
@@ -32,7 +34,21 @@
     'low_active': -1,
     'low_active_down': -1,
     'low_active_up': -1,
+    'low_connections': -1,
     'button_state': [[0] * 7 for dummy in range(24)],
+    # The minutes of each slot of a day, a divisor of 1440.
+    'slot_minutes': 60,
+    # The state of each slot, a list for each day. When empty the hourly
+    # 'button_state' is used.
+    'slot_state': [],
+    # Dict of 'day:slot': dict of core config limits used in the slot, e.g.
+    # {'0:36': {'max_download_speed': 100}} for Monday 9:00 with 15 minutes
+    # slots.
+    'slot_limits': {},
+    # Limit changes are applied in steps so the torrents are not all paused
+    # or resumed at once.
+    'transition_steps': 10,
+    'transition_interval': 6.0,
 }
 
 STATES = {0: 'Green', 1: 'Yellow', 2: 'Red'}
@@ -40,11 +56,77 @@
 CONTROLLED_SETTINGS = [
     'max_download_speed',
     'max_upload_speed',
+    'max_connections_global',
     'max_active_limit',
     'max_active_downloading',
     'max_active_seeding',
 ]
 
+# The session setting of each controlled core config key.
+SESSION_SETTINGS = {
+    'max_download_speed': 'download_rate_limit',
+    'max_upload_speed': 'upload_rate_limit',
+    'max_connections_global': 'connections_limit',
+    'max_active_limit': 'active_limit',
+    'max_active_downloading': 'active_downloads',
+    'max_active_seeding': 'active_seeds',
+}
+ACTIVE_SETTINGS = ['active_limit', 'active_downloads', 'active_seeds']
+
+# The core config keys of the Yellow (Slow) settings.
+LOW_SETTINGS = {
+    'max_download_speed': 'low_down',
+    'max_upload_speed': 'low_up',
+    'max_connections_global': 'low_connections',
+    'max_active_limit': 'low_active',
+    'max_active_downloading': 'low_active_down',
+    'max_active_seeding': 'low_active_up',
+}
+
+
+def to_session_settings(limits):
+    """Convert core config limits to session settings, speeds are in KiB/s."""
+    settings = {}
+    for key, value in limits.items():
+        if key in ('max_download_speed', 'max_upload_speed'):
+            value = -1 if value < 0 else int(value * 1024)
+        settings[SESSION_SETTINGS[key]] = int(value)
+    return settings
+
+
+def resample_slot_state(slot_state, slot_minutes, new_slot_minutes):
+    """Convert the states of the slots of each day to another slot length.
+
+    Each new slot takes the state of the slot containing its start.
+
+    Returns:
+        list: The state of each slot, a list for each day.
+
+    """
+    return [
+        [day[minute // slot_minutes] for minute in range(0, 1440, new_slot_minutes)]
+        for day in slot_state
+    ]
+
+
+def check_slot_state(slot_state, slot_minutes):
+    """Check the states of the slots of each day for a slot length.
+
+    Raises:
+        ValueError: The slot length does not divide a day or the states are
+            not a list of 7 days of valid states for each slot.
+
+    """
+    if slot_minutes <= 0 or 1440 % slot_minutes:
+        raise ValueError('slot_minutes must divide the 1440 minutes of a day')
+    if not slot_state:
+        return
+    slots = 1440 // slot_minutes
+    if len(slot_state) != 7 or any(len(day) != slots for day in slot_state):
+        raise ValueError('slot_state must have 7 days of %d slots' % slots)
+    if any(level not in STATES for day in slot_state for level in day):
+        raise ValueError('slot_state has an invalid state')
+
 
 class SchedulerEvent(DelugeEvent):
     """
@@ -67,6 +149,7 @@ def enable(self):
         DEFAULT_PREFS['low_active'] = core_config['max_active_limit']
         DEFAULT_PREFS['low_active_down'] = core_config['max_active_downloading']
         DEFAULT_PREFS['low_active_up'] = core_config['max_active_seeding']
+        DEFAULT_PREFS['low_connections'] = core_config['max_connections_global']
 
         self.config = deluge.configmanager.ConfigManager(
             'scheduler.conf', DEFAULT_PREFS
@@ -74,13 +157,20 @@ def enable(self):
 
         self.state = self.get_state()
 
-        # Apply the scheduling rules
-        self.do_schedule(False)
+        self.transition = Transition(
+            component.get('Core').apply_session_settings,
+            self.config['transition_steps'],
+            self.config['transition_interval'],
+        )
+        # The session starts with the core config settings.
+        self.transition.current = to_session_settings(
+            {key: core_config[key] for key in CONTROLLED_SETTINGS}
+        )
 
-        # Schedule the next do_schedule() call for on the next hour
-        now = time.localtime(time.time())
-        secs_to_next_hour = ((60 - now[4]) * 60) + (60 - now[5])
-        self.timer = reactor.callLater(secs_to_next_hour, self.do_schedule)
+        # Apply the scheduling rules and schedule the next do_schedule() call
+        # for the start of the next slot.
+        self.timer = None
+        self.do_schedule()
 
         # Register for config changes so state isn't overridden
         component.get('EventManager').register_event_handler(
@@ -88,8 +178,9 @@ def enable(self):
         )
 
     def disable(self):
-        if self.timer.active():
+        if self.timer and self.timer.active():
             self.timer.cancel()
+        self.transition.cancel()
         component.get('EventManager').deregister_event_handler(
             'ConfigValueChangedEvent', self.on_config_value_changed
         )
@@ -100,6 +191,8 @@ def update(self):
 
     def on_config_value_changed(self, key, value):
         if key in CONTROLLED_SETTINGS:
+            # The core has applied the new value to the session.
+            self.transition.current.update(to_session_settings({key: value}))
             self.do_schedule(False)
 
     def __apply_set_functions(self):
@@ -114,32 +207,72 @@ def __apply_set_functions(self):
         # Resume the session if necessary
         component.get('Core').resume_session()
 
+    def get_slot(self, now=None):
+        """The day and slot of a time, the current time by default."""
+        now = time.localtime(time.time() if now is None else now)
+        minutes = now.tm_hour * 60 + now.tm_min
+        return now.tm_wday, minutes // self.config['slot_minutes']
+
+    def seconds_to_next_slot(self):
+        now = time.time()
+        slot_seconds = self.config['slot_minutes'] * 60
+        local = time.localtime(now)
+        seconds = local.tm_hour * 3600 + local.tm_min * 60 + local.tm_sec
+        return slot_seconds - seconds % slot_seconds + (int(now) - now)
+
+    def get_slot_limits(self, state, day, slot):
+        """The core config limits of a state, with the slot overrides."""
+        if state == 'Yellow':
+            limits = {key: self.config[low] for key, low in LOW_SETTINGS.items()}
+        else:
+            core_config = component.get('Core').config
+            limits = {key: core_config[key] for key in CONTROLLED_SETTINGS}
+        overrides = self.config['slot_limits'].get('%d:%d' % (day, slot), {})
+        limits.update((key, value) for key, value in overrides.items() if key in limits)
+        return limits
+
+    def get_ceilings(self):
+        """The current values used in place of the unlimited settings."""
+        core = component.get('Core')
+        status = core.get_session_status(
+            ['payload_download_rate', 'payload_upload_rate', 'peer.num_peers_connected']
+        )
+        num_torrents = len(component.get('TorrentManager').torrents)
+        ceilings = {key: num_torrents for key in ACTIVE_SETTINGS}
+        ceilings['download_rate_limit'] = int(status['payload_download_rate'])
+        ceilings['upload_rate_limit'] = int(status['payload_upload_rate'])
+        ceilings['connections_limit'] = status['peer.num_peers_connected']
+        return ceilings
+
     def do_schedule(self, timer=True):
         """
         This is where we apply schedule rules.
         """
-
+        day, slot = self.get_slot()
         state = self.get_state()
+        core = component.get('Core')
+
+        if state == 'Red':
+            # This is Red (Stop), so lower the active limits to pause the
+            # torrents gradually, then pause the libtorrent session.
+            target = {key: 0 for key in ACTIVE_SETTINGS}
+        else:
+            # This is Green (Normal) or Yellow (Slow) so move to the global
+            # defaults or the settings provided from the user.
+            target = to_session_settings(self.get_slot_limits(state, day, slot))
+
+        d = self.transition.start(target, self.get_ceilings())
+        if state == 'Red':
 
-        if state == 'Green':
-            # This is Green (Normal) so we just make sure we've applied the
-            # global defaults
-            self.__apply_set_functions()
-        elif state == 'Yellow':
-            # This is Yellow (Slow), so use the settings provided from the user
-            settings = {
-                'active_limit': self.config['low_active'],
-                'active_downloads': self.config['low_active_down'],
-                'active_seeds': self.config['low_active_up'],
-                'download_rate_limit': int(self.config['low_down'] * 1024),
-                'upload_rate_limit': int(self.config['low_up'] * 1024),
-            }
-            component.get('Core').apply_session_settings(settings)
-            # Resume the session if necessary
-            component.get('Core').resume_session()
-        elif state == 'Red':
-            # This is Red (Stop), so pause the libtorrent session
-            component.get('Core').pause_session()
+            def on_transition(completed):
+                if completed:
+                    core.pause_session()
+
+            d.addCallback(on_transition)
+        else:
+            # Resume the session if necessary, the active limits were lowered
+            # before pausing so the torrents are resumed gradually.
+            core.resume_session()
 
         if state != self.state:
             # The state has changed since last update so we need to emit an event
@@ -147,16 +280,36 @@ def do_schedule(self, timer=True):
             component.get('EventManager').emit(SchedulerEvent(self.state))
 
         if timer:
-            # Call this again in 1 hour
-            self.timer = reactor.callLater(3600, self.do_schedule)
+            # Call this again at the start of the next slot
+            if self.timer and self.timer.active():
+                self.timer.cancel()
+            self.timer = reactor.callLater(
+                self.seconds_to_next_slot(), self.do_schedule
+            )
 
     @export()
     def set_config(self, config):
         """Sets the config dictionary."""
+        slot_minutes = config.get('slot_minutes', self.config['slot_minutes'])
+        if 'slot_state' in config:
+            check_slot_state(config['slot_state'], slot_minutes)
+        else:
+            check_slot_state([], slot_minutes)
+            if slot_minutes != self.config['slot_minutes']:
+                # Keep the slot states of the previous slot length.
+                config = dict(config)
+                config['slot_state'] = resample_slot_state(
+                    self.config['slot_state'],
+                    self.config['slot_minutes'],
+                    slot_minutes,
+                )
         for key in config:
             self.config[key] = config[key]
         self.config.save()
-        self.do_schedule(False)
+        self.transition.steps = self.config['transition_steps']
+        self.transition.interval = self.config['transition_interval']
+        # The slot length may have changed.
+        self.do_schedule()
 
     @export()
     def get_config(self):
@@ -165,6 +318,18 @@ def get_config(self):
 
     @export()
     def get_state(self):
-        now = time.localtime(time.time())
-        level = self.config['button_state'][now[3]][now[6]]
+        day, slot = self.get_slot()
+        if self.config['slot_state']:
+            level = self.config['slot_state'][day][slot]
+        else:
+            hour = slot * self.config['slot_minutes'] // 60
+            level = self.config['button_state'][hour][day]
         return STATES[level]
+
+    @export()
+    def get_transition(self):
+        """The session settings applied and the remaining transition steps."""
+        return {
+            'settings': dict(self.transition.current),
+            'steps': len(self.transition.plan),
+        }
@@ -557,6 +557,13 @@ Deluge.ux.preferences.SchedulerPage = Ext.extend(Ext.Panel, {
             value: -1,
             decimalPrecision: 0,
         });
+        this.connections = this.slowSettings.add({
+            fieldLabel: _('Maximum Connections'),
+            name: 'connections',
+            width: 80,
+            value: -1,
+            decimalPrecision: 0,
+        });
 
         this.on('show', this.updateConfig, this);
     },
@@ -582,6 +589,7 @@ Deluge.ux.preferences.SchedulerPage = Ext.extend(Ext.Panel, {
         config['low_active'] = this.activeTorrents.getValue();
         config['low_active_down'] = this.activeDownloading.getValue();
         config['low_active_up'] = this.activeSeeding.getValue();
+        config['low_connections'] = this.connections.getValue();
 
         deluge.client.scheduler.set_config(config);
     },
@@ -599,6 +607,7 @@ Deluge.ux.preferences.SchedulerPage = Ext.extend(Ext.Panel, {
                 this.activeTorrents.setValue(config['low_active']);
                 this.activeDownloading.setValue(config['low_active_down']);
                 this.activeSeeding.setValue(config['low_active_up']);
+                this.connections.setValue(config['low_connections']);
             },
             scope: this,
         });
@@ -220,6 +220,7 @@ def on_apply_prefs(self):
         config['low_active'] = self.spin_active.get_value_as_int()
         config['low_active_down'] = self.spin_active_down.get_value_as_int()
         config['low_active_up'] = self.spin_active_up.get_value_as_int()
+        config['low_connections'] = self.spin_connections.get_value_as_int()
         config['button_state'] = self.scheduler_select.button_state
         client.scheduler.set_config(config)
 
@@ -232,6 +233,7 @@ def on_get_config(config):
             self.spin_active.set_value(config['low_active'])
             self.spin_active_down.set_value(config['low_active_down'])
             self.spin_active_up.set_value(config['low_active_up'])
+            self.spin_connections.set_value(config['low_connections'])
 
         client.scheduler.get_config().addCallback(on_get_config)
 
@@ -295,7 +297,7 @@ def create_prefs_page(self):
         vbox.pack_start(frame, False, False, 0)
         vbox.pack_start(hover, False, False, 0)
 
-        table = Gtk.Table(5, 2)
+        table = Gtk.Table(6, 2)
         table.set_margin_left(15)
 
         label = Gtk.Label(_('Download Limit:'))
@@ -343,6 +345,15 @@ def create_prefs_page(self):
         self.spin_active_up.set_increments(1, 10)
         table.attach_defaults(self.spin_active_up, 1, 2, 4, 5)
 
+        label = Gtk.Label(_('Connections:'))
+        label.set_alignment(0.0, 0.6)
+        table.attach_defaults(label, 0, 1, 5, 6)
+        self.spin_connections = Gtk.SpinButton()
+        self.spin_connections.set_numeric(True)
+        self.spin_connections.set_range(-1, 9999)
+        self.spin_connections.set_increments(1, 10)
+        table.attach_defaults(self.spin_connections, 1, 2, 5, 6)
+
         eventbox = Gtk.EventBox()
         eventbox.add(table)
         frame = Gtk.Frame()
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+from __future__ import unicode_literals
+
+from twisted.trial import unittest
+
+from ..core import check_slot_state, resample_slot_state
+
+
+class SlotStateTestCase(unittest.TestCase):
+    def test_check_slot_state(self):
+        check_slot_state([], 60)
+        check_slot_state([[0] * 96] * 7, 15)
+        self.assertRaises(ValueError, check_slot_state, [], 7)
+        self.assertRaises(ValueError, check_slot_state, [], 0)
+        # The slot states of another slot length.
+        self.assertRaises(ValueError, check_slot_state, [[0] * 24] * 7, 15)
+        self.assertRaises(ValueError, check_slot_state, [[0] * 24] * 6, 60)
+        self.assertRaises(ValueError, check_slot_state, [[3] * 24] * 7, 60)
+
+    def test_resample_slot_state(self):
+        day = [0] * 12 + [2] * 12
+        self.assertEqual(
+            [[0] * 48 + [2] * 48] * 7, resample_slot_state([day] * 7, 60, 15)
+        )
+        self.assertEqual([[0, 2]] * 7, resample_slot_state([day] * 7, 60, 720))
+        self.assertEqual([], resample_slot_state([], 60, 15))
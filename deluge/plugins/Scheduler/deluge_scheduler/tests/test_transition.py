@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+from __future__ import unicode_literals
+
+from twisted.internet import task
+from twisted.trial import unittest
+
+from ..transition import Transition, step_values
+
+
+class StepValuesTestCase(unittest.TestCase):
+    def test_linear(self):
+        self.assertEqual([75, 50, 25, 0], step_values(100, 0, 4))
+        self.assertEqual([5, 5, 5], step_values(5, 5, 3))
+
+    def test_unlimited(self):
+        # Adding a limit starts from the ceiling.
+        self.assertEqual([750, 500, 250, 0], step_values(-1, 0, 4, ceiling=1000))
+        # Removing a limit is applied at the last step.
+        self.assertEqual([325, 550, 775, -1], step_values(100, -1, 4, ceiling=1000))
+        self.assertEqual([-1, -1], step_values(-1, -1, 2, ceiling=1000))
+
+
+class TransitionTestCase(unittest.TestCase):
+    def setUp(self):  # NOQA: N803
+        self.applied = []
+        self.transition = Transition(self.applied.append, steps=4, interval=10)
+        self.clock = self.transition.clock = task.Clock()
+
+    def test_steps(self):
+        self.transition.current = {'active_limit': 400, 'download_rate_limit': 0}
+        results = []
+        d = self.transition.start(
+            {'active_limit': 0, 'download_rate_limit': 0, 'upload_rate_limit': 1}
+        )
+        d.addCallback(results.append)
+        # New settings are applied at once, unchanged ones not at all.
+        self.assertEqual([{'active_limit': 300, 'upload_rate_limit': 1}], self.applied)
+        self.clock.advance(10)
+        self.clock.advance(10)
+        self.assertEqual([], results)
+        self.clock.advance(10)
+        self.assertEqual(
+            [300, 200, 100, 0], [step['active_limit'] for step in self.applied]
+        )
+        self.assertEqual([True], results)
+        self.assertEqual(0, self.transition.current['active_limit'])
+        self.assertFalse(self.clock.getDelayedCalls())
+
+    def test_replaced(self):
+        self.transition.current = {'active_limit': 400}
+        results = []
+        self.transition.start({'active_limit': 0}).addCallback(results.append)
+        self.clock.advance(10)
+        # Continues from the applied value.
+        self.transition.start({'active_limit': 400}).addCallback(results.append)
+        self.assertEqual([False], results)
+        self.clock.pump([10, 10, 10])
+        self.assertEqual(
+            [300, 200, 250, 300, 350, 400],
+            [step['active_limit'] for step in self.applied],
+        )
+        self.assertEqual([False, True], results)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""Moves the session limits to new values in steps."""
+
+from __future__ import division, unicode_literals
+
+import logging
+
+from twisted.internet import defer, reactor
+
+log = logging.getLogger(__name__)
+
+
+def step_values(start, target, steps, ceiling=0):
+    """The values of a setting at each step from `start` to `target`.
+
+    Negative values are unlimited. An unlimited end is interpolated as
+    `ceiling`, or the other end if larger, so removing a limit is applied at
+    the last step.
+
+    Returns:
+        list: The `steps` values, the last is `target`.
+
+    """
+    if start == target or (start < 0 and target < 0):
+        return [target] * steps
+    finite = max(start, target, ceiling)
+    first = finite if start < 0 else start
+    last = finite if target < 0 else target
+    values = [
+        int(round(first + (last - first) * step / steps)) for step in range(1, steps)
+    ]
+    return values + [target]
+
+
+class Transition(object):
+    """Applies changes of session settings gradually.
+
+    Each change is split into `steps` applied `interval` seconds apart, so
+    lowering the active limits pauses the torrents a few at a time rather
+    than all at once. Starting a new transition replaces the running one,
+    continuing from the values applied so far.
+
+    Args:
+        apply_settings (func): Called with a dict of the session settings to
+            apply at each step.
+        steps (int): The number of steps of a transition.
+        interval (float): The seconds between steps.
+
+    """
+
+    def __init__(self, apply_settings, steps=10, interval=6.0):
+        self.apply_settings = apply_settings
+        self.steps = steps
+        self.interval = interval
+        # The session settings applied.
+        self.current = {}
+        # The settings to apply at each of the remaining steps.
+        self.plan = []
+        self.call = None
+        self.deferred = None
+        self.clock = reactor
+
+    def start(self, target, ceilings=None):
+        """Start moving the settings to `target`.
+
+        Args:
+            target (dict): The session settings to reach.
+            ceilings (dict, optional): The values standing in for an unlimited
+                setting, e.g. the number of torrents for the active limits.
+
+        Returns:
+            Deferred: Fires with True once `target` is applied or with False
+                if the transition was replaced.
+
+        """
+        self.cancel()
+        ceilings = ceilings or {}
+        steps = max(1, self.steps)
+        self.plan = [{} for dummy in range(steps)]
+        for key, value in target.items():
+            if key not in self.current:
+                # Nothing to move from, apply at once.
+                self.plan[0][key] = value
+                continue
+            values = step_values(self.current[key], value, steps, ceilings.get(key, 0))
+            previous = self.current[key]
+            for step, step_value in zip(self.plan, values):
+                if step_value != previous:
+                    step[key] = step_value
+                    previous = step_value
+        self.plan = [step for step in self.plan if step]
+
+        self.deferred = d = defer.Deferred()
+        self._step()
+        return d
+
+    def _step(self):
+        self.call = None
+        if self.plan:
+            settings = self.plan.pop(0)
+            log.debug('Applying scheduled settings: %s', settings)
+            self.apply_settings(settings)
+            self.current.update(settings)
+        if self.plan:
+            self.call = self.clock.callLater(self.interval, self._step)
+        else:
+            d, self.deferred = self.deferred, None
+            d.callback(True)
+
+    def cancel(self):
+        """Stop the running transition at the values applied so far."""
+        if self.call and self.call.active():
+            self.call.cancel()
+        self.call = None
+        self.plan = []
+        if self.deferred:
+            d, self.deferred = self.deferred, None
+            d.callback(False)
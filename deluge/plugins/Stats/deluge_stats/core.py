@@ -21,12 +21,30 @@
 from deluge.core.rpcserver import export
 from deluge.plugins.pluginbase import CorePluginBase
 
+from .timeseries import SeriesFile, TimeSeries
+from .torrenthistory import TorrentHistory
+
 DEFAULT_PREFS = {
     'test': 'NiNiNi',
     'update_interval': 1,  # 2 seconds.
     'length': 150,  # 2 seconds * 150 --> 5 minutes.
+    # Other session status keys to record.
+    'extra_stats': [],
+    # Record the payload transferred by each torrent.
+    'torrent_history': False,
+    'torrent_history_interval': 60,  # 60 seconds.
+    'torrent_history_length': 168,  # 60 seconds * 168 --> 168 hours hourly.
 }
 
+# Stats which are not session status keys.
+DERIVED_STATS = [
+    'num_connections',
+    'dht_cache_nodes',
+    'max_download',
+    'max_upload',
+    'max_num_connections',
+]
+
 DEFAULT_TOTALS = {
     'total_upload': 0,
     'total_download': 0,
@@ -45,30 +63,14 @@ def get_key(config, key):
         return None
 
 
-def mean(items):
-    try:
-        return sum(items) // len(items)
-    except Exception:
-        return 0
-
-
 class Core(CorePluginBase):
     totals = {}  # class var to catch only updating this once per session in enable.
 
     def enable(self):
         log.debug('Stats plugin enabled')
         self.core = component.get('Core')
-        self.stats = {}
-        self.count = {}
         self.intervals = [1, 5, 30, 300]
 
-        self.last_update = {}
-        t = time.time()
-        for i in self.intervals:
-            self.stats[i] = {}
-            self.last_update[i] = t
-            self.count[i] = 0
-
         self.config = configmanager.ConfigManager('stats.conf', DEFAULT_PREFS)
         self.saved_stats = configmanager.ConfigManager('stats.totals', DEFAULT_TOTALS)
         if self.totals == {}:
@@ -76,8 +78,15 @@ def enable(self):
 
         self.length = self.config['length']
 
-        # self.stats = get_key(self.saved_stats, 'stats') or {}
-        self.stats_keys = ['peer.num_peers_half_open', 'dht.dht_node_cache']
+        self.series = TimeSeries(self.length, self.intervals)
+        self.series_file = SeriesFile(
+            configmanager.get_config_dir('stats.series'), self.series
+        )
+        self.series_file.load()
+        self.series.fill_gap(time.time(), self.config['update_interval'])
+
+        self.stats_keys = []
+        self.session_keys = []
         self.add_stats(
             'upload_rate',
             'download_rate',
@@ -86,6 +95,9 @@ def enable(self):
             'dht_torrents',
             'num_peers',
             'num_connections',
+            'peer.num_peers_half_open',
+            'dht.dht_node_cache',
+            *self.config['extra_stats']
         )
 
         self.update_stats()
@@ -96,77 +108,90 @@ def enable(self):
         self.save_timer = LoopingCall(self.save_stats)
         self.save_timer.start(60)
 
+        self.torrent_history = None
+        if self.config['torrent_history']:
+            self.start_torrent_history()
+
     def disable(self):
         self.update_timer.stop() if self.update_timer.running else None
         self.save_timer.stop() if self.save_timer.running else None
         self.save_stats()
+        self.stop_torrent_history()
+
+    def start_torrent_history(self):
+        if self.torrent_history:
+            return
+        self.torrent_history = TorrentHistory(self.config['torrent_history_length'])
+        component.get('AlertManager').register_handler(
+            'state_update_alert', self.on_alert_state_update
+        )
+        component.get('EventManager').register_event_handler(
+            'TorrentRemovedEvent', self.on_torrent_removed
+        )
+        self.history_timer = LoopingCall(self.sample_torrent_history)
+        self.history_timer.start(self.config['torrent_history_interval'], now=False)
+
+    def stop_torrent_history(self):
+        if not self.torrent_history:
+            return
+        self.history_timer.stop() if self.history_timer.running else None
+        component.get('AlertManager').deregister_handler(self.on_alert_state_update)
+        component.get('EventManager').deregister_event_handler(
+            'TorrentRemovedEvent', self.on_torrent_removed
+        )
+        self.torrent_history = None
+
+    def on_alert_state_update(self, alert):
+        for t_status in alert.status:
+            try:
+                torrent_id = str(t_status.info_hash)
+            except RuntimeError:
+                continue
+            self.torrent_history.update(
+                torrent_id,
+                t_status.total_payload_upload,
+                t_status.total_payload_download,
+            )
+
+    def on_torrent_removed(self, torrent_id):
+        self.torrent_history.remove(torrent_id)
+
+    def sample_torrent_history(self):
+        # Request the status of the changed torrents if no client did recently,
+        # the counters are updated by the resulting state_update_alert.
+        component.get('TorrentManager').torrents_status_update([], [])
+        self.torrent_history.sample(time.time(), self.get_tracker_host)
+
+    def get_tracker_host(self, torrent_id):
+        try:
+            return component.get('TorrentManager')[torrent_id].get_tracker_host()
+        except KeyError:
+            return ''
 
     def add_stats(self, *stats):
         for stat in stats:
             if stat not in self.stats_keys:
                 self.stats_keys.append(stat)
-            for i in self.intervals:
-                if stat not in self.stats[i]:
-                    self.stats[i][stat] = []
+                if stat not in DERIVED_STATS:
+                    self.session_keys.append(stat)
+            self.series.add_stat(stat)
 
     def update_stats(self):
-        # Get all possible stats!
-        stats = {}
-        for key in self.stats_keys:
-            # try all keys we have, very inefficient but saves having to
-            # work out where a key comes from...
-            try:
-                stats.update(self.core.get_session_status([key]))
-            except AttributeError:
-                pass
-        stats['num_connections'] = (
-            stats['num_peers'] + stats['peer.num_peers_half_open']
+        stats = self.core.get_session_status(self.session_keys)
+        stats['num_connections'] = stats.get('num_peers', 0) + stats.get(
+            'peer.num_peers_half_open', 0
         )
-        stats['dht_cache_nodes'] = stats['dht.dht_node_cache']
+        stats['dht_cache_nodes'] = stats.get('dht.dht_node_cache', 0)
         stats.update(
             self.core.get_config_values(
                 ['max_download', 'max_upload', 'max_num_connections']
             )
         )
-        # status = self.core.session.status()
-        # for stat in dir(status):
-        #     if not stat.startswith('_') and stat not in stats:
-        #         stats[stat] = getattr(status, stat, None)
-
-        update_time = time.time()
-        self.last_update[1] = update_time
-
-        # extract the ones we are interested in
-        # adding them to the 1s array
-        for stat, stat_list in self.stats[1].items():
-            if stat in stats:
-                stat_list.insert(0, int(stats[stat]))
-            else:
-                stat_list.insert(0, 0)
-            if len(stat_list) > self.length:
-                stat_list.pop()
-
-        def update_interval(interval, base, multiplier):
-            self.count[interval] = self.count[interval] + 1
-            if self.count[interval] >= interval:
-                self.last_update[interval] = update_time
-                self.count[interval] = 0
-                current_stats = self.stats[interval]
-                for stat, stat_list in self.stats[base].items():
-                    try:
-                        avg = mean(stat_list[0:multiplier])
-                    except ValueError:
-                        avg = 0
-                    current_stats[stat].insert(0, avg)
-                    if len(current_stats[stat]) > self.length:
-                        current_stats[stat].pop()
-
-        update_interval(5, 1, 5)
-        update_interval(30, 5, 6)
-        update_interval(300, 30, 10)
+        self.series.record(stats, time.time())
 
     def save_stats(self):
-        self.saved_stats['stats'] = self.stats
+        self.series_file.flush()
+        self.saved_stats['stats'] = {}
         self.saved_stats.config.update(self.get_totals())
         self.saved_stats.save()
 
@@ -176,16 +201,80 @@ def get_stats(self, keys, interval):
         if interval not in self.intervals:
             return None
 
-        stats_dict = {}
-        for key in keys:
-            if key in self.stats[interval]:
-                stats_dict[key] = self.stats[interval][key]
-
-        stats_dict['_last_update'] = self.last_update[interval]
+        stats_dict = self.series.get(keys, interval)
+        stats_dict['_last_update'] = self.series.last_update[interval]
         stats_dict['_length'] = self.config['length']
         stats_dict['_update_interval'] = interval
         return stats_dict
 
+    @export
+    def get_stats_range(self, keys, start, end=None, resolution=None):
+        """Returns the values of stats recorded in a time range.
+
+        Args:
+            keys (list): The stats.
+            start (float): The start time of the range.
+            end (float, optional): The end time, defaults to now.
+            resolution (float, optional): The seconds between the returned
+                values, defaults to the resolution stored for the range.
+
+        Returns:
+            dict: The lists of values for each stat, oldest first, the
+                '_times' of the values and the '_interval' they are from.
+        """
+        if end is None:
+            end = time.time()
+        return self.series.get_range(keys, start, end, resolution)
+
+    @export
+    def get_torrent_history(self, torrent_ids, start, end=None):
+        """Returns the payload transferred by torrents in a time range.
+
+        Args:
+            torrent_ids (list): The torrent ids.
+            start (float): The start time of the range.
+            end (float, optional): The end time, defaults to now.
+
+        Returns:
+            dict: For each torrent with history the bytes transferred in each
+                interval as 'upload' and 'download' lists, oldest first, with
+                the '_times' and '_interval' of the values. None if the
+                torrent history is not enabled.
+        """
+        if not self.torrent_history:
+            return None
+        if end is None:
+            end = time.time()
+        return self.torrent_history.get_range(torrent_ids, start, end)
+
+    @export
+    def get_top_torrents(self, count, start, end=None, key='upload', by_tracker=False):
+        """Returns the torrents, or trackers, which transferred the most.
+
+        Args:
+            count (int): The number of results.
+            start (float): The start time of the range.
+            end (float, optional): The end time, defaults to now.
+            key (str): Rank by 'upload', 'download' or 'total' bytes.
+            by_tracker (bool): Rank trackers by the payload of their torrents.
+
+        Returns:
+            list: The (torrent_id or tracker, upload, download) tuples. None if
+                the torrent history is not enabled.
+        """
+        if not self.torrent_history:
+            return None
+        if end is None:
+            end = time.time()
+        return self.torrent_history.get_top(count, start, end, key, by_tracker)
+
+    @export
+    def get_torrent_history_usage(self):
+        """Returns the memory used by the torrent history."""
+        if not self.torrent_history:
+            return None
+        return self.torrent_history.memory_usage()
+
     @export
     def get_totals(self):
         result = {}
@@ -211,6 +300,11 @@ def set_config(self, config):
         for key in config:
             self.config[key] = config[key]
         self.config.save()
+        self.add_stats(*self.config['extra_stats'])
+        if self.config['torrent_history']:
+            self.start_torrent_history()
+        else:
+            self.stop_torrent_history()
 
     @export
     def get_config(self):
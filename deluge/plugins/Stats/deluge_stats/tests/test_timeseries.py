@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+
+from twisted.trial import unittest
+
+from ..timeseries import RingBuffer, SeriesFile, TimeSeries
+
+
+class RingBufferTestCase(unittest.TestCase):
+    def test_wrap(self):
+        ring = RingBuffer(3)
+        self.assertEqual([], ring.last().tolist())
+        for value in range(5):
+            ring.append(value)
+        self.assertEqual(3, len(ring))
+        self.assertEqual([2, 3, 4], ring.last().tolist())
+        self.assertEqual([3, 4], ring.last(2).tolist())
+
+
+class TimeSeriesTestCase(unittest.TestCase):
+    def setUp(self):  # NOQA: N803
+        self.series = TimeSeries(10, [1, 5, 30])
+        self.series.add_stat('rate')
+        for second in range(60):
+            self.series.record({'rate': second}, 1000 + second)
+
+    def test_get(self):
+        stats = self.series.get(['rate', 'missing'], 1)
+        self.assertEqual(list(range(59, 49, -1)), stats['rate'])
+        self.assertNotIn('missing', stats)
+        # Means of the last 5 values and of the last 6 means.
+        self.assertEqual([57, 52, 47], self.series.get(['rate'], 5)['rate'][:3])
+        self.assertEqual([44, 14], self.series.get(['rate'], 30)['rate'])
+        self.assertEqual(1059, self.series.last_update[30])
+
+    def test_add_stat_aligned(self):
+        self.series.add_stat('new')
+        self.series.record({'new': 7}, 1060)
+        self.assertEqual([7] + [0] * 9, self.series.get(['new'], 1)['new'])
+
+    def test_get_range(self):
+        stats = self.series.get_range(['rate'], 1052, 1055)
+        self.assertEqual(1, stats['_interval'])
+        self.assertEqual([1052, 1053, 1054, 1055], stats['_times'])
+        self.assertEqual([52, 53, 54, 55], stats['rate'])
+
+        # Older than the 1 second values, from the 5 second interval.
+        stats = self.series.get_range(['rate'], 1015, 1100, resolution=10)
+        self.assertEqual(5, stats['_interval'])
+        self.assertEqual([1019, 1029, 1039, 1049, 1059], stats['_times'])
+        self.assertEqual([17, 24.5, 34.5, 44.5, 54.5], stats['rate'])
+
+    def test_fill_gap(self):
+        self.series.fill_gap(1062, 1)
+        self.assertEqual([0, 0, 59], self.series.get(['rate'], 1)['rate'][:3])
+
+
+class SeriesFileTestCase(unittest.TestCase):
+    def setUp(self):  # NOQA: N803
+        self.path = tempfile.mkdtemp()
+        self.filename = os.path.join(self.path, 'stats.series')
+
+    def tearDown(self):  # NOQA: N803
+        shutil.rmtree(self.path)
+
+    def load(self):
+        series = TimeSeries(10, [1, 5])
+        series_file = SeriesFile(self.filename, series, compact_factor=2)
+        series_file.load()
+        return series, series_file
+
+    def test_save_load(self):
+        series, series_file = self.load()
+        series.add_stat('a')
+        for second in range(4):
+            series.record({'a': second}, second)
+        series_file.flush()
+        series.add_stat('b')
+        for second in range(4, 12):
+            series.record({'a': second, 'b': -second}, second)
+        series_file.flush()
+
+        loaded = self.load()[0]
+        for interval in (1, 5):
+            self.assertEqual(
+                series.get(['a', 'b'], interval), loaded.get(['a', 'b'], interval)
+            )
+        self.assertEqual(11, loaded.last_update[1])
+
+    def test_compact(self):
+        series, series_file = self.load()
+        series.add_stat('a')
+        for second in range(100):
+            series.record({'a': second}, second)
+            series_file.flush()
+        # The file never holds more than twice the 20 kept values.
+        self.assertLessEqual(series_file.records, 40)
+        self.assertEqual(series.get(['a'], 1), self.load()[0].get(['a'], 1))
+
+    def test_truncated(self):
+        series, series_file = self.load()
+        series.add_stat('a')
+        for second in range(3):
+            series.record({'a': second}, second)
+        series_file.flush()
+        with open(self.filename, 'ab') as _file:
+            _file.write(b'\x01\x00')
+        self.assertEqual([2, 1, 0], self.load()[0].get(['a'], 1)['a'])
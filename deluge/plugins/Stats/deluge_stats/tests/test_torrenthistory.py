@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+from __future__ import print_function, unicode_literals
+
+import pytest
+from twisted.trial import unittest
+
+from ..torrenthistory import TorrentHistory
+
+BENCHMARK_TORRENTS = 10000
+
+
+class TorrentHistoryTestCase(unittest.TestCase):
+    def setUp(self):  # NOQA: N803
+        self.history = TorrentHistory(length=4, intervals=[1, 2])
+
+    def sample(self, sample_time, **counters):
+        for torrent_id, (upload, download) in counters.items():
+            self.history.update(torrent_id, upload, download)
+        self.history.sample(sample_time, lambda torrent_id: 'tracker.' + torrent_id)
+
+    def test_deltas(self):
+        self.sample(1, a=(100, 1000), b=(0, 0))
+        self.sample(2, a=(150, 1000), b=(0, 0))
+        self.sample(3, a=(160, 1200))
+        # Restarted torrents reset their counters.
+        self.sample(4, a=(10, 0))
+        history = self.history.get_range(['a', 'b'], 0, 10)
+        self.assertEqual([1, 2, 3, 4], history['_times'])
+        self.assertEqual([0, 50, 10, 10], history['a']['upload'])
+        self.assertEqual([0, 0, 200, 0], history['a']['download'])
+        # Idle torrents have no history.
+        self.assertNotIn('b', history)
+
+        # Sums of two samples from the second interval once the first no
+        # longer holds the start of the range.
+        self.sample(5)
+        self.sample(6)
+        history = self.history.get_range(['a'], 2, 6)
+        self.assertEqual([2, 4, 6], history['_times'])
+        self.assertEqual(2, history['_interval'])
+        self.assertEqual([50, 20, 0], history['a']['upload'])
+
+    def test_top(self):
+        self.sample(1, a=(0, 0), b=(0, 0), c=(0, 0))
+        self.sample(2, a=(100, 10), b=(50, 500), c=(70, 0))
+        self.sample(3, a=(100, 10), b=(50, 500), c=(75, 0))
+        self.assertEqual([('a', 100, 10), ('c', 75, 0)], self.history.get_top(2, 0, 10))
+        self.assertEqual(
+            [('b', 50, 500)], self.history.get_top(1, 0, 10, key='download')
+        )
+        self.assertEqual(
+            [('tracker.b', 50, 500)],
+            self.history.get_top(1, 0, 10, key='total', by_tracker=True),
+        )
+
+    def test_idle_dropped(self):
+        self.sample(1, a=(0, 0))
+        self.sample(2, a=(10, 0))
+        self.history.remove('a')
+        self.assertIn('a', self.history.columns)
+        # Dropped once all of the coarsest interval history is idle.
+        for sample_time in range(3, 10):
+            self.sample(sample_time)
+        self.assertIn('a', self.history.columns)
+        self.sample(10)
+        self.assertNotIn('a', self.history.columns)
+        self.assertEqual(0, self.history.memory_usage()['total'])
+
+
+@pytest.mark.slow
+class TorrentHistoryBenchmarkTestCase(unittest.TestCase):
+    def test_benchmark_memory(self):
+        try:
+            import tracemalloc
+        except ImportError:
+            raise unittest.SkipTest('tracemalloc not available')
+
+        history = TorrentHistory()
+        torrent_ids = ['%040x' % i for i in range(BENCHMARK_TORRENTS)]
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        # The columns are allocated in full when a torrent first transfers
+        # data, later samples only overwrite the values.
+        for sample in range(3):
+            for torrent_id in torrent_ids:
+                history.update(torrent_id, sample * 1024, sample * 4096)
+            history.sample(sample)
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        per_torrent = used / BENCHMARK_TORRENTS
+        usage = history.memory_usage()
+        print(
+            '\n%d torrents: %d bytes per torrent, %d bytes of columns'
+            % (usage['torrents'], per_torrent, usage['per_torrent'])
+        )
+        self.assertEqual(BENCHMARK_TORRENTS, usage['torrents'])
+        # The columns plus the per torrent dicts and buffer objects.
+        self.assertLess(per_torrent, usage['per_torrent'] + 2048)
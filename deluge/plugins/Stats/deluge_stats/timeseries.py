@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""Fixed size time series of the stats at several resolutions."""
+
+from __future__ import division, unicode_literals
+
+import logging
+import shutil
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+
+log = logging.getLogger(__name__)
+
+MAGIC = b'DLST'
+VERSION = 1
+HEADER = struct.Struct('<4sB')
+# Record type, key index and name length followed by the utf8 name.
+KEY_RECORD = struct.Struct('<BHH')
+# Record type, interval index, time and the number of values followed by the
+# values as doubles in the order of the key indexes.
+SAMPLE_RECORD = struct.Struct('<BBdH')
+KEY, SAMPLE = 0, 1
+
+
+class RingBuffer(object):
+    """The last `size` values of a series in a fixed size array.
+
+    Args:
+        size (int): The number of values kept.
+        typecode (str): The array type code of the values.
+
+    """
+
+    def __init__(self, size, typecode='d'):
+        self.size = size
+        self.values = array(str(typecode), [0]) * size
+        # The index the next value is written to.
+        self.pos = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value):
+        self.values[self.pos] = value
+        self.pos = (self.pos + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def align(self, other):
+        """Make an empty buffer end at the same position as `other`.
+
+        The values before it are zeros.
+        """
+        self.pos = other.pos
+        self.count = other.count
+
+    def last(self, num=None):
+        """The last `num` values, oldest first.
+
+        Returns:
+            array: A copy of the values.
+
+        """
+        num = self.count if num is None else min(num, self.count)
+        start = self.pos - num
+        if start >= 0:
+            return self.values[start : self.pos]
+        return self.values[start:] + self.values[: self.pos]
+
+
+def downsample(times, columns, resolution):
+    """Average values into buckets of `resolution` seconds.
+
+    Args:
+        times (list): The sorted times of the values.
+        columns (list): Lists of values, one for each time.
+        resolution (float): The seconds of each bucket.
+
+    Returns:
+        tuple: The time of the last value in each bucket and the columns of
+            the bucket averages.
+
+    """
+    bucket_times = []
+    bucket_columns = [[] for column in columns]
+    first = 0
+    while first < len(times):
+        bucket_end = times[first] - times[first] % resolution + resolution
+        end = bisect_left(times, bucket_end, first + 1)
+        bucket_times.append(times[end - 1])
+        for column, bucket_column in zip(columns, bucket_columns):
+            bucket_column.append(sum(column[first:end]) / (end - first))
+        first = end
+    return bucket_times, bucket_columns
+
+
+class TimeSeries(object):
+    """Samples of stats kept at several resolutions.
+
+    Each sample is added to the first interval and every `interval` samples
+    the average of the previous interval is added to the next one. The
+    values of each interval are kept in a :class:`RingBuffer` of `length`.
+
+    Args:
+        length (int): The number of values kept for each interval.
+        intervals (list): The number of samples averaged for each interval,
+            starting with 1.
+
+    """
+
+    def __init__(self, length, intervals=(1, 5, 30, 300)):
+        self.length = length
+        self.intervals = list(intervals)
+        self.times = {interval: RingBuffer(length) for interval in self.intervals}
+        # Dict of stat: {interval: RingBuffer}
+        self.series = {}
+        # The stat names in the order they were added, used for storage.
+        self.keys = []
+        self.count = {interval: 0 for interval in self.intervals}
+        self.last_update = {interval: 0.0 for interval in self.intervals}
+        # Callback for each appended value, called with the interval index,
+        # time and values in the order of `keys`.
+        self.on_append = None
+
+    def add_stat(self, stat):
+        if stat in self.series:
+            return
+        self.keys.append(stat)
+        self.series[stat] = {
+            interval: RingBuffer(self.length) for interval in self.intervals
+        }
+        # Keep the new series aligned with the times of the others.
+        for interval, times in self.times.items():
+            for dummy in range(len(times)):
+                self.series[stat][interval].append(0)
+
+    def _append(self, index, update_time, values):
+        interval = self.intervals[index]
+        self.times[interval].append(update_time)
+        self.last_update[interval] = update_time
+        for stat, value in zip(self.keys, values):
+            self.series[stat][interval].append(value)
+        if self.on_append:
+            self.on_append(index, update_time, values)
+
+    def record(self, sample, update_time):
+        """Add a sample of the stats.
+
+        Args:
+            sample (dict): The stat values, missing stats are recorded as 0.
+            update_time (float): The time of the sample.
+
+        """
+        self._append(0, update_time, [sample.get(stat, 0) for stat in self.keys])
+
+        for index in range(1, len(self.intervals)):
+            interval = self.intervals[index]
+            self.count[interval] += 1
+            if self.count[interval] < interval:
+                continue
+            self.count[interval] = 0
+            base = self.intervals[index - 1]
+            multiplier = interval // base
+            values = []
+            for stat in self.keys:
+                base_values = self.series[stat][base].last(multiplier)
+                values.append(
+                    sum(base_values) // len(base_values) if base_values else 0
+                )
+            self._append(index, update_time, values)
+
+    def get(self, stats, interval):
+        """The recorded values of stats at an interval, newest first.
+
+        Returns:
+            dict: The lists of values of the recorded stats.
+
+        """
+        result = {}
+        for stat in stats:
+            if stat in self.series:
+                values = [int(value) for value in self.series[stat][interval].last()]
+                values.reverse()
+                result[stat] = values
+        return result
+
+    def get_range(self, stats, start, end, resolution=None):
+        """The values of stats recorded between two times.
+
+        The values are from the finest interval still holding the start of
+        the range, averaged into buckets of `resolution` seconds.
+
+        Args:
+            stats (list): The stat names.
+            start (float): The time of the first value.
+            end (float): The time of the last value.
+            resolution (float, optional): The seconds between values.
+
+        Returns:
+            dict: The '_times' of the values, the '_interval' they are from
+                and the lists of values of the recorded stats, oldest first.
+
+        """
+        recorded = [interval for interval in self.intervals if self.times[interval]]
+        if not recorded:
+            return {'_times': [], '_interval': self.intervals[0]}
+
+        interval = recorded[-1]
+        for candidate in recorded:
+            if self.times[candidate].last()[0] <= start:
+                interval = candidate
+                break
+
+        times = self.times[interval].last().tolist()
+        first = bisect_left(times, start)
+        last = bisect_right(times, end)
+        times = times[first:last]
+        stats = [stat for stat in stats if stat in self.series]
+        columns = [
+            self.series[stat][interval].last().tolist()[first:last] for stat in stats
+        ]
+        if resolution and times:
+            times, columns = downsample(times, columns, resolution)
+
+        result = dict(zip(stats, columns))
+        result['_times'] = times
+        result['_interval'] = interval
+        return result
+
+    def fill_gap(self, update_time, update_interval):
+        """Add zero values for the updates missed before `update_time`.
+
+        Keeps the values spaced by the update interval after a restart.
+        """
+        zeros = [0] * len(self.keys)
+        for index, interval in enumerate(self.intervals):
+            times = self.times[interval]
+            if not times:
+                continue
+            last_time = times.last(1)[0]
+            spacing = interval * update_interval
+            missed = min(int((update_time - last_time) / spacing) - 1, self.length)
+            for num in range(missed, 0, -1):
+                self._append(index, update_time - num * spacing, zeros)
+
+    def iter_records(self):
+        """The records to write the whole series to a file."""
+        for index, stat in enumerate(self.keys):
+            yield self.pack_key(index, stat)
+        for index, interval in enumerate(self.intervals):
+            times = self.times[interval].last()
+            columns = [self.series[stat][interval].last() for stat in self.keys]
+            for pos, update_time in enumerate(times):
+                values = [column[pos] for column in columns]
+                yield self.pack_sample(index, update_time, values)
+
+    @staticmethod
+    def pack_key(index, stat):
+        name = stat.encode('utf8')
+        return KEY_RECORD.pack(KEY, index, len(name)) + name
+
+    @staticmethod
+    def pack_sample(index, update_time, values):
+        return SAMPLE_RECORD.pack(
+            SAMPLE, index, update_time, len(values)
+        ) + struct.pack(str('<%dd' % len(values)), *values)
+
+    def load_records(self, data):
+        """Add the stats and values from the records of a file.
+
+        Reading stops at the first incomplete or invalid record.
+        """
+        offset = 0
+        while offset < len(data):
+            try:
+                record_type = struct.unpack_from(str('B'), data, offset)[0]
+                if record_type == KEY:
+                    dummy, index, length = KEY_RECORD.unpack_from(data, offset)
+                    start = offset + KEY_RECORD.size
+                    if start + length > len(data):
+                        break
+                    self.add_stat(data[start : start + length].decode('utf8'))
+                    offset = start + length
+                elif record_type == SAMPLE:
+                    dummy, index, update_time, num = SAMPLE_RECORD.unpack_from(
+                        data, offset
+                    )
+                    start = offset + SAMPLE_RECORD.size
+                    if index >= len(self.intervals) or num > len(self.keys):
+                        break
+                    values = list(struct.unpack_from(str('<%dd' % num), data, start))
+                    # Stats added after the sample was written were 0.
+                    values += [0] * (len(self.keys) - num)
+                    self._append(index, update_time, values)
+                    offset = start + num * 8
+                else:
+                    break
+            except (struct.error, UnicodeDecodeError):
+                break
+
+
+class SeriesFile(object):
+    """Append only storage of a :class:`TimeSeries`.
+
+    Appended values are buffered and written by :meth:`flush`. The file is
+    rewritten with only the values still kept once it holds more than
+    `compact_factor` times as many.
+
+    Args:
+        filename (str): The path of the file.
+        series (TimeSeries): The series stored.
+        compact_factor (int): The file size, relative to the values kept,
+            it is rewritten at.
+
+    """
+
+    def __init__(self, filename, series, compact_factor=4):
+        self.filename = filename
+        self.series = series
+        self.compact_factor = compact_factor
+        self.buffer = []
+        self.num_keys = 0
+        self.records = 0
+        series.on_append = self.on_append
+
+    def load(self):
+        """Read the values from the file into the series."""
+        try:
+            with open(self.filename, 'rb') as _file:
+                data = _file.read()
+        except (IOError, OSError):
+            data = b''
+        if data:
+            try:
+                magic, version = HEADER.unpack_from(data)
+            except struct.error:
+                magic, version = None, None
+            if magic == MAGIC and version == VERSION:
+                self.series.load_records(data[HEADER.size :])
+            else:
+                log.warning('Ignoring invalid stats file: %s', self.filename)
+        # Rewrite the file to drop old values and any incomplete record.
+        self.compact()
+
+    def on_append(self, index, update_time, values):
+        self.buffer.append(self.series.pack_sample(index, update_time, values))
+
+    def _new_keys(self):
+        records = []
+        for index in range(self.num_keys, len(self.series.keys)):
+            records.append(self.series.pack_key(index, self.series.keys[index]))
+        self.num_keys = len(self.series.keys)
+        return records
+
+    def flush(self):
+        """Append the buffered values to the file."""
+        if not self.buffer:
+            return
+        kept = self.series.length * len(self.series.intervals)
+        if self.records + len(self.buffer) > kept * self.compact_factor:
+            self.compact()
+            return
+        # Key records go first so the following samples can be read.
+        records = self._new_keys() + self.buffer
+        with open(self.filename, 'ab') as _file:
+            _file.write(b''.join(records))
+        self.records += len(self.buffer)
+        self.buffer = []
+
+    def compact(self):
+        """Rewrite the file with only the values kept by the series."""
+        tmp_filename = self.filename + '.tmp'
+        records = 0
+        with open(tmp_filename, 'wb') as _file:
+            _file.write(HEADER.pack(MAGIC, VERSION))
+            for record in self.series.iter_records():
+                _file.write(record)
+                records += 1
+        shutil.move(tmp_filename, self.filename)
+        self.num_keys = len(self.series.keys)
+        self.records = records - self.num_keys
+        self.buffer = []
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""The payload transferred by each torrent over time."""
+
+from __future__ import division, unicode_literals
+
+import logging
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+from .timeseries import RingBuffer
+
+log = logging.getLogger(__name__)
+
+UPLOAD, DOWNLOAD = 0, 1
+# The values are stored as 32 bit floats, precise to within 1 in 10 million.
+TYPECODE = 'f'
+
+
+class TorrentHistory(object):
+    """Per torrent upload and download series sharing the sample times.
+
+    The payload counters of the torrents are updated from the torrent
+    status and on every :meth:`sample` the bytes transferred since the
+    previous sample are appended to the torrent columns. Every
+    `intervals[i]` samples the sum of the previous interval is appended to
+    the next interval.
+
+    Only torrents which transferred data during the kept history have
+    columns, they are dropped again once the history is all zeros, so the
+    memory of a torrent is at most two columns of `length` values for each
+    interval.
+
+    Args:
+        length (int): The number of values kept for each interval.
+        intervals (list): The number of samples summed for each interval,
+            starting with 1.
+
+    """
+
+    def __init__(self, length=168, intervals=(1, 60)):
+        self.length = length
+        self.intervals = list(intervals)
+        self.times = {interval: RingBuffer(length) for interval in self.intervals}
+        # Dict of torrent_id: {interval: (upload, download) RingBuffers}
+        self.columns = {}
+        # Dict of torrent_id: (upload, download) payload counters.
+        self.counters = {}
+        # The counters at the previous sample.
+        self.sampled = {}
+        # Dict of torrent_id: number of the last sample with a transfer.
+        self.last_active = {}
+        self.trackers = {}
+        self.samples = 0
+        self.count = {interval: 0 for interval in self.intervals}
+
+    def update(self, torrent_id, upload, download):
+        """Set the payload counters of a torrent."""
+        self.counters[torrent_id] = (upload, download)
+
+    def remove(self, torrent_id):
+        """Stop sampling a torrent, its history is kept until it ages out."""
+        self.counters.pop(torrent_id, None)
+        self.sampled.pop(torrent_id, None)
+
+    def _add_columns(self, torrent_id):
+        columns = {}
+        for interval, times in self.times.items():
+            pair = (
+                RingBuffer(self.length, TYPECODE),
+                RingBuffer(self.length, TYPECODE),
+            )
+            for column in pair:
+                column.align(times)
+            columns[interval] = pair
+        self.columns[torrent_id] = columns
+        return columns
+
+    def sample(self, sample_time, get_tracker=None):
+        """Append the bytes transferred since the previous sample.
+
+        Args:
+            sample_time (float): The time of the sample.
+            get_tracker (func, optional): Called with a torrent id to get the
+                tracker of a torrent when it first transfers data.
+
+        """
+        self.samples += 1
+        first = self.intervals[0]
+        for torrent_id, counters in self.counters.items():
+            sampled = self.sampled.get(torrent_id, counters)
+            self.sampled[torrent_id] = counters
+            # Counters lower than before were reset by restarting the torrent.
+            deltas = [
+                value - previous if value >= previous else value
+                for value, previous in zip(counters, sampled)
+            ]
+            if any(deltas):
+                self.last_active[torrent_id] = self.samples
+                if torrent_id not in self.columns:
+                    self._add_columns(torrent_id)
+                    if get_tracker:
+                        self.trackers[torrent_id] = get_tracker(torrent_id)
+            if torrent_id in self.columns:
+                upload, download = self.columns[torrent_id][first]
+                upload.append(deltas[UPLOAD])
+                download.append(deltas[DOWNLOAD])
+
+        # Torrents which are no longer sampled, e.g. removed.
+        for torrent_id, columns in self.columns.items():
+            if torrent_id not in self.counters:
+                for column in columns[first]:
+                    column.append(0)
+        # New columns are aligned with the times before this sample.
+        self.times[first].append(sample_time)
+
+        for index in range(1, len(self.intervals)):
+            interval = self.intervals[index]
+            self.count[interval] += 1
+            if self.count[interval] < interval:
+                continue
+            self.count[interval] = 0
+            base = self.intervals[index - 1]
+            multiplier = interval // base
+            self.times[interval].append(sample_time)
+            for columns in self.columns.values():
+                for base_column, column in zip(columns[base], columns[interval]):
+                    column.append(sum(base_column.last(multiplier)))
+
+        self._drop_idle()
+
+    def _drop_idle(self):
+        # Samples covered by the history of the coarsest interval.
+        kept = self.length * self.intervals[-1]
+        for torrent_id in list(self.columns):
+            if self.samples - self.last_active[torrent_id] >= kept:
+                del self.columns[torrent_id]
+                del self.last_active[torrent_id]
+                self.trackers.pop(torrent_id, None)
+
+    def _select(self, start, end):
+        """The interval with the values of a range and the range positions."""
+        recorded = [interval for interval in self.intervals if self.times[interval]]
+        if not recorded:
+            return self.intervals[0], [], 0, 0
+        # A range starting before the history starts at the oldest value.
+        start = max(start, min(self.times[i].last()[0] for i in recorded))
+        interval = recorded[-1]
+        for candidate in recorded:
+            if self.times[candidate].last()[0] <= start:
+                interval = candidate
+                break
+        times = self.times[interval].last().tolist()
+        return interval, times, bisect_left(times, start), bisect_right(times, end)
+
+    def get_range(self, torrent_ids, start, end):
+        """The bytes transferred by torrents between two times.
+
+        Returns:
+            dict: The '_times' of the values, the '_interval' they are from
+                and for each torrent with history a dict of 'upload' and
+                'download' lists, oldest first.
+
+        """
+        interval, times, first, last = self._select(start, end)
+        result = {'_times': times[first:last], '_interval': interval}
+        for torrent_id in torrent_ids:
+            if torrent_id in self.columns:
+                upload, download = self.columns[torrent_id][interval]
+                result[torrent_id] = {
+                    'upload': upload.last().tolist()[first:last],
+                    'download': download.last().tolist()[first:last],
+                }
+        return result
+
+    def get_top(self, count, start, end, key='upload', by_tracker=False):
+        """The torrents or trackers which transferred the most between two times.
+
+        Args:
+            count (int): The number of results.
+            start (float): The start time of the range.
+            end (float): The end time of the range.
+            key (str): Rank by 'upload', 'download' or 'total' bytes.
+            by_tracker (bool): Rank the trackers by the sum of their torrents.
+
+        Returns:
+            list: The (torrent_id or tracker, upload, download) tuples.
+
+        """
+        interval, times, first, last = self._select(start, end)
+        totals = defaultdict(lambda: [0, 0])
+        for torrent_id, columns in self.columns.items():
+            upload, download = columns[interval]
+            name = self.trackers.get(torrent_id, '') if by_tracker else torrent_id
+            totals[name][UPLOAD] += sum(upload.last()[first:last])
+            totals[name][DOWNLOAD] += sum(download.last()[first:last])
+
+        if key == 'total':
+            sort_key = sum
+        else:
+            index = DOWNLOAD if key == 'download' else UPLOAD
+            sort_key = lambda totals: totals[index]  # NOQA: E731
+        ranked = sorted(
+            totals.items(), key=lambda item: sort_key(item[1]), reverse=True
+        )
+        return [(name, upload, download) for name, (upload, download) in ranked[:count]]
+
+    def memory_usage(self):
+        """The bytes used by the columns, per torrent with history and in total."""
+        per_torrent = (
+            2 * len(self.intervals) * self.length * array(str(TYPECODE)).itemsize
+        )
+        return {
+            'torrents': len(self.columns),
+            'per_torrent': per_torrent,
+            'total': per_torrent * len(self.columns),
+        }
@@ -6,6 +6,9 @@
 #
 from __future__ import unicode_literals
 
+import time
+
+import pytest
 from twisted.trial import unittest
 
 from deluge import bencode
@@ -32,3 +35,142 @@ def test_bdecode(self):
             bencode.bdecode(b'dEf')
         with self.assertRaises(bencode.BTFailure):
             bencode.bdecode({'dEf': 123})
+
+    def test_bdecode_info(self):
+        data = b'd8:announce3:url4:infod4:name1:ae1:zi1ee'
+        metainfo, span = bencode.bdecode_info(data)
+        self.assertEqual(bencode.bdecode(data), metainfo)
+        self.assertEqual(b'd4:name1:ae', data[span[0] : span[1]])
+        self.assertEqual(({b'a': 1}, None), bencode.bdecode_info(b'd1:ai1ee'))
+        with self.assertRaises(bencode.BTFailure):
+            bencode.bdecode_info(b'li1ee')
+        with self.assertRaises(bencode.BTFailure):
+            bencode.bdecode_info(b'd4:info')
+
+    def test_bdecode_values(self):
+        self.assertEqual(
+            {b'a': [1, -2, b''], b'b': {b'c': b'0:'}},
+            bencode.bdecode(b'd1:ali1ei-2e0:e1:bd1:c2:0:ee'),
+        )
+        # Data after the value is ignored.
+        self.assertEqual(1, bencode.bdecode(b'i1ei2e'))
+        self.assertEqual(b'ab', bencode.bdecode(bytearray(b'2:ab')))
+        self.assertEqual([b'ab'], bencode.bdecode(memoryview(b'l2:abe')))
+
+    def test_bdecode_invalid(self):
+        for data in (
+            b'',
+            b'i01e',
+            b'i-0e',
+            b'ie',
+            b'i1',
+            b'01:a',
+            b'3:ab',
+            b'-1:',
+            b'l1:a',
+            b'di1ei2ee',
+            b'd1:ae',
+            b'd1:ai1e',
+            b'e',
+            b'x',
+        ):
+            with self.assertRaises(bencode.BTFailure):
+                bencode.bdecode(data)
+
+    def test_bdecode_nested(self):
+        depth = 100000
+        value = bencode.bdecode(b'l' * depth + b'e' * depth)
+        for __ in range(depth - 1):
+            value = value[0]
+        self.assertEqual([], value)
+
+    def test_bdecoder(self):
+        data = bencode.bencode(
+            {'name': 'a' * 100, 'list': [1, 2, {'key': b'value'}], 'int': 12345}
+        )
+        for chunk_size in (1, 3, 7, 64, len(data)):
+            decoder = bencode.BDecoder()
+            values = []
+            for start in range(0, len(data) * 2, chunk_size):
+                values.extend(decoder.feed((data * 2)[start : start + chunk_size]))
+            decoder.close()
+            self.assertEqual([bencode.bdecode(data)] * 2, values)
+
+    def test_bdecoder_incomplete(self):
+        decoder = bencode.BDecoder()
+        self.assertEqual([], decoder.feed(b'l1:a10:abc'))
+        with self.assertRaises(bencode.BTFailure):
+            decoder.close()
+        with self.assertRaises(bencode.BTFailure):
+            bencode.BDecoder().feed(b'i1xe')
+
+
+def legacy_bdecode(x):
+    """The recursive decoder replaced by `bencode.decode_next`."""
+
+    def decode_int(x, f):
+        f += 1
+        newf = x.index(b'e', f)
+        return int(x[f:newf]), newf + 1
+
+    def decode_string(x, f):
+        colon = x.index(b':', f)
+        n = int(x[f:colon])
+        colon += 1
+        return x[colon : colon + n], colon + n
+
+    def decode_list(x, f):
+        r, f = [], f + 1
+        while x[f : f + 1] != b'e':
+            v, f = decode_func[x[f : f + 1]](x, f)
+            r.append(v)
+        return r, f + 1
+
+    def decode_dict(x, f):
+        r, f = {}, f + 1
+        while x[f : f + 1] != b'e':
+            k, f = decode_string(x, f)
+            r[k], f = decode_func[x[f : f + 1]](x, f)
+        return r, f + 1
+
+    decode_func = {b'l': decode_list, b'd': decode_dict, b'i': decode_int}
+    for digit in range(10):
+        decode_func[str(digit).encode()] = decode_string
+    return decode_func[x[0:1]](x, 0)[0]
+
+
+@pytest.mark.slow
+class BencodeBenchmarkTestCase(unittest.TestCase):
+    def test_benchmark_torrent(self):
+        files = [
+            {b'length': num, b'path': [b'dir%d' % (num % 100), b'file%d' % num]}
+            for num in range(100000)
+        ]
+        metainfo = {
+            b'announce': b'http://tracker',
+            b'info': {b'name': b'a', b'pieces': b'0' * 20 * 50000, b'files': files},
+        }
+        data = bencode.bencode(metainfo)
+
+        def best(func):
+            times = []
+            for __ in range(3):
+                start = time.time()
+                func()
+                times.append(time.time() - start)
+            return min(times) * 1000
+
+        decoder = bencode.BDecoder()
+        results = [
+            ('legacy decode', best(lambda: legacy_bdecode(data))),
+            ('decode', best(lambda: bencode.bdecode(data))),
+            ('python decode', best(lambda: bencode.decode_next(data, 0, []))),
+            ('stream decode', best(lambda: decoder.feed(data))),
+            ('encode', best(lambda: bencode.bencode(metainfo))),
+        ]
+        print(
+            '\n%d bytes: %s'
+            % (len(data), ', '.join('%s %.1f ms' % result for result in results))
+        )
+        self.assertEqual(metainfo, bencode.bdecode(data))
+        self.assertEqual(metainfo, legacy_bdecode(data))
@@ -202,3 +202,73 @@ def on_failure(failure):
 
         d.addCallbacks(self.fail, on_failure)
         return d
+
+
+class ClientPipeliningTestCase(BaseTestCase, DaemonBase):
+
+    if windows_check():
+        skip = 'windows cant start_core not enough arguments for format string'
+
+    def set_up(self):
+        custom_script = """
+    from twisted.internet import defer
+    from deluge.core.rpcserver import export
+    class TestClass(object):
+        @export()
+        def never(self):
+            return defer.Deferred()
+    test = TestClass()
+    daemon.rpcserver.register_object(test)
+"""
+        d = self.common_set_up()
+        d.addCallback(self.start_core, custom_script=custom_script)
+        d.addErrback(self.terminate_core)
+        return d
+
+    def tear_down(self):
+        d = component.shutdown()
+        d.addCallback(self.terminate_core)
+        return d
+
+    @defer.inlineCallbacks
+    def test_call_timeout(self):
+        test_client = Client()
+        yield test_client.connect('localhost', self.listen_port)
+        test_client.set_call_timeout(0.1, method='testclass.never')
+        d = test_client.testclass.never()
+        yield self.assertFailure(d, defer.TimeoutError)
+        stats = test_client.get_call_stats()
+        self.assertEqual(stats['testclass.never']['errors'], 1)
+        # The connection is still usable after the timeout.
+        version = yield test_client.daemon.get_version()
+        self.assertTrue(version)
+        yield test_client.disconnect()
+
+    @defer.inlineCallbacks
+    def test_max_in_flight(self):
+        test_client = Client()
+        yield test_client.connect('localhost', self.listen_port)
+        test_client.set_max_in_flight(1)
+        calls = [test_client.daemon.get_version() for __ in range(5)]
+        self.assertEqual((1, 4), test_client._daemon_proxy.get_pending_count())
+        results = yield defer.gatherResults(calls)
+        self.assertEqual(5, len(results))
+        self.assertEqual((0, 0), test_client._daemon_proxy.get_pending_count())
+        self.assertEqual(5, test_client.get_call_stats()['daemon.get_version']['count'])
+        yield test_client.disconnect()
+
+    @defer.inlineCallbacks
+    def test_cancel_queued_call(self):
+        test_client = Client()
+        yield test_client.connect('localhost', self.listen_port)
+        test_client.set_max_in_flight(1)
+        first = test_client.testclass.never()
+        second = test_client.daemon.get_version()
+        second.cancel()
+        yield self.assertFailure(second, defer.CancelledError)
+        first.cancel()
+        yield self.assertFailure(first, defer.CancelledError)
+        # Queued behind the daemon.cancel_request sent for the first call.
+        yield test_client.daemon.get_version()
+        self.assertEqual((0, 0), test_client._daemon_proxy.get_pending_count())
+        yield test_client.disconnect()
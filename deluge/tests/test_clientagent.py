@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+
+from mock import patch
+from twisted.internet import defer
+
+import deluge.component as component
+from deluge import error
+from deluge.common import get_localhost_auth, windows_check
+from deluge.core.authmanager import AUTH_LEVEL_ADMIN
+from deluge.ui.client import Client
+from deluge.ui.clientagent import ClientAgent
+
+from .basetest import BaseTestCase
+from .daemon_base import DaemonBase
+
+
+class ClientAgentTestCase(BaseTestCase, DaemonBase):
+
+    if windows_check():
+        skip = 'UNIX sockets are not available on Windows'
+
+    def set_up(self):
+        # Keep the socket path short, UNIX socket paths are length limited.
+        self.socket_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.socket_dir, 'agent.sock')
+        self.agent = ClientAgent(self.socket_path)
+        self.agent.start()
+        self.environ = patch.dict(os.environ, {'DELUGE_CLIENT_AGENT': self.socket_path})
+        self.environ.start()
+
+        d = self.common_set_up()
+        d.addCallback(self.start_core)
+        d.addErrback(self.terminate_core)
+        return d
+
+    def tear_down(self):
+        self.environ.stop()
+        d = self.agent.stop()
+        d.addCallback(lambda _: shutil.rmtree(self.socket_dir))
+        d.addCallback(lambda _: component.shutdown())
+        d.addCallback(self.terminate_core)
+        return d
+
+    @defer.inlineCallbacks
+    def test_connect_through_agent(self):
+        client = Client()
+        username, password = get_localhost_auth()
+        yield client.connect(
+            'localhost', self.listen_port, username=username, password=password
+        )
+        self.assertEqual(self.socket_path, client._daemon_proxy.agent_socket)
+        self.assertEqual(AUTH_LEVEL_ADMIN, client.get_auth_level())
+        self.assertEqual(
+            ('localhost', self.listen_port, username), client.connection_info()
+        )
+        methods = yield client.daemon.get_method_list()
+        self.assertTrue('core.get_session_status' in methods)
+        yield client.disconnect()
+
+    @defer.inlineCallbacks
+    def test_connection_reused(self):
+        username, password = get_localhost_auth()
+        pool = self.agent.factory.pool
+        for __ in range(2):
+            client = Client()
+            yield client.connect(
+                'localhost', self.listen_port, username=username, password=password
+            )
+            version = yield client.daemon.get_version()
+            self.assertTrue(version)
+            yield client.disconnect()
+            self.assertEqual(1, len(pool.connections))
+
+        key = ('localhost', self.listen_port, username)
+        self.assertTrue(pool.connections[key].proxy.connected)
+
+    @defer.inlineCallbacks
+    def test_bad_password_on_pooled_connection(self):
+        username, password = get_localhost_auth()
+        client = Client()
+        yield client.connect(
+            'localhost', self.listen_port, username=username, password=password
+        )
+        yield client.disconnect()
+
+        client = Client()
+        d = client.connect(
+            'localhost', self.listen_port, username=username, password=password + '1'
+        )
+        yield self.assertFailure(d, error.BadLoginError)
+        yield client.disconnect()
+
+    @defer.inlineCallbacks
+    def test_errors_forwarded(self):
+        client = Client()
+        yield client.connect('localhost', self.listen_port, username='', password='')
+        d = client.core.invalid_method()
+        yield self.assertFailure(d, error.WrappedException)
+        yield client.disconnect()
@@ -13,6 +13,7 @@
 from twisted.trial import unittest
 
 from deluge.common import (
+    LatencyHistogram,
     VersionSplit,
     archive_files,
     fdate,
@@ -200,3 +201,19 @@ def test_archive_files_message(self):
                 if tar_info.name == 'archive_message.txt':
                     result = tar.extractfile(tar_info).read().decode()
                     self.assertEqual(result, 'test')
+
+    def test_latency_histogram(self):
+        histogram = LatencyHistogram()
+        self.assertEqual(histogram.percentile(50), 0.0)
+        for __ in range(90):
+            histogram.add(0.0004)
+        for __ in range(10):
+            histogram.add(0.1, failed=True)
+        stats = histogram.to_dict()
+        self.assertEqual(stats['count'], 100)
+        self.assertEqual(stats['errors'], 10)
+        self.assertEqual(stats['p50'], 0.0005)
+        self.assertEqual(stats['p99'], 0.1)
+        self.assertAlmostEqual(stats['mean'], 0.01036)
+        histogram.add(1000)
+        self.assertEqual(histogram.percentile(100), 1000)
@@ -187,6 +187,18 @@ def on_start(result, c1, counter):
         d.addCallback(on_start, c1, cnt)
         return d
 
+    def test_update_stats(self):
+        def on_start(result, c1):
+            stats = component.get_update_stats()['test_update_stats_c1']
+            self.assertTrue(stats['count'] >= 1)
+            self.assertEqual(stats['count'], c1.counter)
+            return component.stop()
+
+        c1 = ComponentTesterUpdate('test_update_stats_c1')
+        d = component.start(['test_update_stats_c1'])
+        d.addCallback(on_start, c1)
+        return d
+
     def test_pause(self):
         def on_pause(result, c1, counter):
             self.assertEqual(c1._component_state, 'Paused')
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+from __future__ import unicode_literals
+
+import deluge.component as component
+from deluge.core.filtermanager import FilterManager, filter_tree_changes
+
+from .basetest import BaseTestCase
+
+
+class TorrentMock(object):
+    def __init__(self, state, tracker_host='', owner='localclient'):
+        self.status = {
+            'state': state,
+            'tracker_host': tracker_host,
+            'tracker_status': '',
+            'owner': owner,
+            'download_payload_rate': 0,
+            'upload_payload_rate': 0,
+        }
+
+    def get_status(self, keys):
+        return {key: self.status[key] for key in keys}
+
+
+class TorrentManagerMock(component.Component):
+    def __init__(self):
+        component.Component.__init__(self, 'TorrentManager')
+        self.torrents = {}
+
+    def __getitem__(self, torrent_id):
+        return self.torrents[torrent_id]
+
+    def get_torrent_list(self):
+        return list(self.torrents)
+
+    def separate_keys(self, keys, torrent_ids):
+        return list(keys), []
+
+
+class CoreMock(object):
+    def __init__(self):
+        self.torrentmanager = TorrentManagerMock()
+
+    def create_torrent_status(self, torrent_id, torrent_keys, plugin_keys):
+        return self.torrentmanager[torrent_id].get_status(torrent_keys)
+
+
+class FilterTreeChangesTestCase(BaseTestCase):
+    def set_up(self):
+        self.core = CoreMock()
+        self.torrents = self.core.torrentmanager.torrents
+        self.torrents['a'] = TorrentMock('Seeding', 'tracker.org')
+        self.torrents['b'] = TorrentMock('Paused')
+        self.filtermanager = FilterManager(self.core)
+
+    def test_filter_tree_changes(self):
+        old_tree = {'state': {'All': 2, 'Paused': 1}, 'owner': {'': 0}}
+        new_tree = {'state': {'All': 2, 'Seeding': 1}, 'owner': {'': 0}}
+        self.assertEqual(
+            ({'state': {'Seeding': 1}}, {'state': ['Paused']}),
+            filter_tree_changes(old_tree, new_tree),
+        )
+        self.assertEqual(({}, {}), filter_tree_changes(new_tree, new_tree))
+        self.assertIsNone(filter_tree_changes(old_tree, {'state': {}}))
+
+    def test_get_filter_tree_changes(self):
+        result = self.filtermanager.get_filter_tree_changes()
+        self.assertTrue(result['full'])
+        self.assertEqual(1, result['version'])
+        self.assertEqual(
+            self.filtermanager.get_filter_tree(), result['changes'],
+        )
+
+        # The tree counted for the first call is reused.
+        self.torrents['b'].status['state'] = 'Seeding'
+        result = self.filtermanager.get_filter_tree_changes(1)
+        self.assertEqual(
+            {'version': 1, 'full': False, 'changes': {}, 'removed': {}}, result
+        )
+
+        self.filtermanager.tree_time = 0
+        result = self.filtermanager.get_filter_tree_changes(1)
+        self.assertEqual(2, result['version'])
+        self.assertFalse(result['full'])
+        self.assertEqual({'state': [('Seeding', 2), ('Paused', 0)]}, result['changes'])
+
+    def test_get_filter_tree_changes_hide_zero(self):
+        self.filtermanager.get_filter_tree_changes()
+        self.torrents['b'].status['state'] = 'Seeding'
+        self.filtermanager.tree_time = 0
+        result = self.filtermanager.get_filter_tree_changes(
+            1, show_zero_hits=False, hide_cat=['tracker_host', 'owner']
+        )
+        self.assertEqual({'state': [('Seeding', 2)]}, result['changes'])
+        self.assertEqual({'state': ['Paused']}, result['removed'])
+
+    def test_get_filter_tree_changes_unknown_version(self):
+        self.filtermanager.get_filter_tree_changes()
+        result = self.filtermanager.get_filter_tree_changes(42)
+        self.assertTrue(result['full'])
+        self.assertIn(('Seeding', 1), result['changes']['state'])
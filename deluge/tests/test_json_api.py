@@ -187,7 +187,7 @@ def get_session_id(s_id):
         self.assertTrue('testclass.test' in methods)
 
         request = MagicMock()
-        session_id = list(auth.config['sessions'])[0]
+        session_id = list(auth.sessions)[0]
         request.getCookie = MagicMock(return_value=session_id.encode())
         json_data = {'method': 'testclass.test', 'id': 0, 'params': []}
         request.json = json_lib.dumps(json_data).encode()
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+from __future__ import unicode_literals
+
+import os
+
+import mock
+from twisted.trial import unittest
+
+from deluge.core import metadatastore
+from deluge.core.metadatastore import MetadataStore
+
+ID_A = 'a' * 40
+ID_B = 'b' * 40
+
+
+class MetadataStoreTestCase(unittest.TestCase):
+    def setUp(self):  # NOQA: N803
+        self.state_dir = self.mktemp()
+        os.makedirs(self.state_dir)
+        self.filepath = os.path.join(self.state_dir, 'torrents.metadata')
+        self.store = MetadataStore(self.filepath)
+        self.store.open()
+
+    def tearDown(self):  # NOQA: N803
+        self.store.close()
+
+    def reopen(self):
+        self.store.close()
+        self.store = MetadataStore(self.filepath)
+        self.store.open()
+
+    def test_put_get(self):
+        self.assertIsNone(self.store.get(ID_A))
+        self.store.put(ID_A, b'd4:infod1:xi1eee')
+        self.assertIn(ID_A, self.store)
+        self.assertEqual(b'd4:infod1:xi1eee', self.store.get(ID_A))
+        self.assertFalse(os.path.isfile(self.filepath))
+
+        self.store.flush()
+        self.assertTrue(os.path.isfile(self.filepath))
+        self.store.put(ID_B, b'le')
+        self.reopen()
+        self.assertEqual({ID_A, ID_B}, self.store.torrent_ids())
+        self.assertEqual(b'd4:infod1:xi1eee', self.store.get(ID_A))
+        self.assertEqual(b'le', self.store.get(ID_B))
+
+    def test_put_invalid_id(self):
+        self.assertRaises(ValueError, self.store.put, 'abc', b'le')
+
+    def test_remove(self):
+        self.store.put(ID_A, b'le')
+        self.store.put(ID_B, b'de')
+        self.store.flush()
+        self.store.remove(ID_A)
+        self.assertNotIn(ID_A, self.store)
+        self.reopen()
+        self.assertEqual({ID_B}, self.store.torrent_ids())
+
+    def test_replace(self):
+        self.store.put(ID_A, b'le')
+        self.store.flush()
+        self.store.put(ID_A, b'li1ee')
+        self.reopen()
+        self.assertEqual(b'li1ee', self.store.get(ID_A))
+        self.assertEqual(1, len(self.store))
+
+    def test_compact(self):
+        with mock.patch.object(metadatastore, 'COMPACT_MIN', 0):
+            self.store.put(ID_A, b'x' * 1000)
+            self.store.put(ID_B, b'le')
+            self.store.flush()
+            size = os.path.getsize(self.filepath)
+            self.store.remove(ID_A)
+            self.store.put(ID_B, b'de')
+            self.store.flush()
+        self.assertLess(os.path.getsize(self.filepath), size - 1000)
+        self.assertFalse(os.path.isfile(self.filepath + '.tmp'))
+        self.reopen()
+        self.assertEqual({ID_B}, self.store.torrent_ids())
+        self.assertEqual(b'de', self.store.get(ID_B))
+
+    def test_invalid_file(self):
+        self.store.close()
+        with open(self.filepath, 'wb') as _file:
+            _file.write(b'not a store file at all')
+        self.store.open()
+        self.assertEqual(0, len(self.store))
+        self.assertTrue(os.path.isfile(self.filepath + '.bad'))
+        self.assertFalse(os.path.isfile(self.filepath))
+
+    def test_interrupted_flush(self):
+        self.store.put(ID_A, b'le')
+        self.store.flush()
+        self.store.put(ID_B, b'de')
+        with mock.patch('os.fsync', side_effect=OSError('disk full')):
+            self.store.flush()
+        # The failed changes are kept and the old index is still valid.
+        self.assertEqual(b'de', self.store.get(ID_B))
+        self.assertEqual(b'le', self.store.get(ID_A))
+        store = MetadataStore(self.filepath)
+        store.open()
+        self.assertEqual({ID_A}, store.torrent_ids())
+        store.close()
+
+        self.reopen()
+        self.assertEqual({ID_A, ID_B}, self.store.torrent_ids())
+
+    def test_import_export_files(self):
+        for torrent_id in (ID_A, ID_B):
+            with open(os.path.join(self.state_dir, torrent_id + '.torrent'), 'wb') as f:
+                f.write(torrent_id.encode())
+        self.assertEqual(2, self.store.import_files(self.state_dir, [ID_A, ID_B]))
+        self.assertFalse(
+            os.path.isfile(os.path.join(self.state_dir, ID_A + '.torrent'))
+        )
+        self.assertEqual(ID_B.encode(), self.store.get(ID_B))
+        self.assertEqual(0, self.store.import_files(self.state_dir, [ID_A]))
+
+        self.assertEqual(2, self.store.export_files(self.state_dir))
+        self.assertFalse(os.path.isfile(self.filepath))
+        self.assertEqual(0, len(self.store))
+        with open(os.path.join(self.state_dir, ID_A + '.torrent'), 'rb') as _file:
+            self.assertEqual(ID_A.encode(), _file.read())
+
+    def test_export_keeps_newer_files(self):
+        self.store.put(ID_A, b'le')
+        self.store.put(ID_B, b'de')
+        self.store.flush()
+        filepath = os.path.join(self.state_dir, ID_A + '.torrent')
+        with open(filepath, 'wb') as _file:
+            _file.write(b'li1ee')
+        mtime = os.path.getmtime(self.filepath) + 10
+        os.utime(filepath, (mtime, mtime))
+
+        self.assertEqual(1, self.store.export_files(self.state_dir))
+        self.assertFalse(os.path.isfile(self.filepath))
+        with open(filepath, 'rb') as _file:
+            self.assertEqual(b'li1ee', _file.read())
+        with open(os.path.join(self.state_dir, ID_B + '.torrent'), 'rb') as _file:
+            self.assertEqual(b'de', _file.read())
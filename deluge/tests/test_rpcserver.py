@@ -9,6 +9,8 @@
 
 from __future__ import unicode_literals
 
+from twisted.internet import defer
+
 import deluge.component as component
 import deluge.error
 from deluge.common import get_localhost_auth
@@ -111,3 +113,99 @@ def test_daemon_info(self):
         self.assertEqual(msg[0], rpcserver.RPC_RESPONSE, str(msg))
         self.assertEqual(msg[1], self.request_id, str(msg))
         self.assertEqual(msg[2], deluge.common.get_version(), str(msg))
+
+    def test_cancel_request_before_dispatch(self):
+        self.protocol.messages[:] = []
+        self.protocol.message_received(
+            (
+                (self.request_id, 'daemon.info', [], {}),
+                (self.request_id + 1, 'daemon.cancel_request', [self.request_id], {}),
+            )
+        )
+        self.assertEqual(self.protocol._pending_calls, {})
+        self.assertEqual(
+            self.protocol.messages,
+            [(rpcserver.RPC_RESPONSE, self.request_id + 1, True)],
+        )
+
+    def test_cancel_running_request(self):
+        d = defer.Deferred()
+
+        class SlowObject(object):
+            @rpcserver.export
+            def slow(self):
+                return d
+
+        self.rpcserver.register_object(SlowObject(), 'slow')
+        self.factory.authorized_sessions[self.session_id] = self.protocol.AuthLevel(
+            rpcserver.AUTH_LEVEL_ADMIN, ''
+        )
+        self.protocol.messages[:] = []
+        self.protocol.dispatch(self.request_id, 'slow.slow', [], {})
+        self.protocol.cancel_request(self.request_id + 1, self.request_id)
+        d.callback('result')
+        self.assertEqual(
+            self.protocol.messages,
+            [(rpcserver.RPC_RESPONSE, self.request_id + 1, True)],
+        )
+        self.assertFalse(self.protocol._running_requests)
+        self.assertFalse(self.protocol._cancelled_requests)
+
+    def test_rpc_stats(self):
+        class StatsObject(object):
+            @rpcserver.export
+            def echo(self, value):
+                return value
+
+            @rpcserver.export
+            def fail(self):
+                raise deluge.error.DelugeError('failed')
+
+        self.rpcserver.register_object(StatsObject(), 'stats')
+        self.factory.authorized_sessions[self.session_id] = self.protocol.AuthLevel(
+            rpcserver.AUTH_LEVEL_ADMIN, ''
+        )
+        self.factory.stats.start_profiling(sample_rate=1)
+        for request_id in range(3):
+            self.protocol.dispatch(request_id, 'stats.echo', ['value'], {})
+        self.protocol.dispatch(3, 'stats.fail', [], {})
+
+        stats = self.rpcserver.get_rpc_stats()['methods']
+        self.assertEqual(3, stats['stats.echo']['count'])
+        self.assertEqual(0, stats['stats.echo']['errors'])
+        self.assertEqual(1, stats['stats.fail']['errors'])
+        self.assertTrue(
+            'deluge_rpc_calls_total{method="stats.echo"} 3'
+            in self.factory.stats.to_prometheus()
+        )
+        self.assertTrue('echo' in self.factory.stats.get_profile())
+
+        self.factory.stats.stop_profiling()
+        self.factory.stats.reset()
+        self.assertEqual({}, self.rpcserver.get_rpc_stats()['methods'])
+        self.assertEqual('', self.factory.stats.get_profile())
+
+    def test_rpc_stats_prometheus_families(self):
+        for method in ('b.call', 'a.call'):
+            self.factory.stats.record(method, 0.01, 10, 20)
+        families = []
+        for line in self.factory.stats.to_prometheus().splitlines():
+            if line.startswith('# TYPE '):
+                families.append(line.split()[2])
+                continue
+            name = line.split('{', 1)[0]
+            for suffix in ('_bucket', '_sum', '_count'):
+                if families[-1].endswith('_seconds') and name.endswith(suffix):
+                    name = name[: -len(suffix)]
+            # Every sample follows the TYPE line of its family.
+            self.assertEqual(families[-1], name)
+        self.assertEqual(len(families), len(set(families)))
+
+    @defer.inlineCallbacks
+    def test_metrics_listener_stopped(self):
+        self.rpcserver.listen_metrics(0)
+        listener = self.rpcserver.metrics_listener
+        self.assertTrue(listener.connected)
+        yield component.shutdown()
+        self.assertIsNone(self.rpcserver.metrics_listener)
+        self.assertFalse(listener.connected)
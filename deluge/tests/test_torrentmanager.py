@@ -8,6 +8,7 @@
 from __future__ import unicode_literals
 
 import os
+import pickle
 import shutil
 import warnings
 from base64 import b64encode
@@ -17,8 +18,10 @@
 from twisted.internet import defer, task
 
 from deluge import component
+from deluge.core import torrentmanager
 from deluge.core.core import Core
 from deluge.core.rpcserver import RPCServer
+from deluge.core.torrentmanager import TorrentManagerState, TorrentState
 from deluge.error import InvalidTorrentError
 
 from . import common
@@ -56,6 +59,78 @@ def test_remove_torrent(self):
         )
         self.assertTrue(self.tm.remove(torrent_id, False))
 
+    @defer.inlineCallbacks
+    def test_torrent_metadata_store(self):
+        self.core.config.config['packed_torrent_metadata'] = True
+        filename = common.get_test_data_file('test.torrent')
+        with open(filename, 'rb') as _file:
+            filedump = _file.read()
+        torrent_id = yield self.core.add_torrent_file_async(
+            filename, b64encode(filedump), {}
+        )
+        self.assertEqual(filedump, self.tm.metadata_store.get(torrent_id))
+        self.assertFalse(
+            os.path.isfile(os.path.join(self.tm.state_dir, torrent_id + '.torrent'))
+        )
+        self.assertEqual(
+            'azcvsupdater_2.6.2.jar',
+            self.tm.get_torrent_info_from_state(torrent_id).name(),
+        )
+
+        self.tm.metadata_store.flush()
+        self.assertTrue(os.path.isfile(self.tm.metadata_store.filepath))
+        self.assertTrue(self.tm.remove(torrent_id, False))
+        self.assertNotIn(torrent_id, self.tm.metadata_store)
+
+    def test_migrate_torrent_metadata(self):
+        torrent_id = 'a' * 40
+        filepath = os.path.join(self.tm.state_dir, torrent_id + '.torrent')
+        with open(filepath, 'wb') as _file:
+            _file.write(b'le')
+
+        # The torrent files are only moved into the store when enabled.
+        self.tm.migrate_torrent_metadata([torrent_id])
+        self.assertTrue(os.path.isfile(filepath))
+        self.assertNotIn(torrent_id, self.tm.metadata_store)
+
+        self.core.config.config['packed_torrent_metadata'] = True
+        self.tm.migrate_torrent_metadata([torrent_id])
+        self.assertFalse(os.path.isfile(filepath))
+        self.assertEqual(b'le', self.tm.metadata_store.get(torrent_id))
+
+    @defer.inlineCallbacks
+    def test_torrent_metadata_summary(self):
+        filename = common.get_test_data_file('test.torrent')
+        with open(filename, 'rb') as _file:
+            filedump = _file.read()
+        torrent_id = yield self.core.add_torrent_file_async(
+            filename, b64encode(filedump), {}
+        )
+        torrent = self.tm[torrent_id]
+        self.assertEqual('azcvsupdater_2.6.2.jar', torrent.metadata['name'])
+        # The torrent_info is only kept while used.
+        self.assertFalse(torrent.release_metadata())
+        status = torrent.get_status(['name', 'num_files', 'total_size', 'private'])
+        self.assertEqual(
+            {
+                'name': 'azcvsupdater_2.6.2.jar',
+                'num_files': 1,
+                'total_size': 307949,
+                'private': False,
+            },
+            status,
+        )
+        self.assertFalse(torrent.release_metadata())
+
+        files = torrent.get_files()
+        self.assertIs(files, torrent.get_files())
+        self.assertFalse(torrent.release_metadata(keep_time=60))
+        self.assertTrue(torrent.release_metadata())
+        self.assertEqual(files, torrent.get_files())
+
+        state = self.tm.create_state()
+        self.assertEqual(torrent.metadata, state.torrents[0].metadata)
+
     def test_prefetch_metadata(self):
         from deluge._libtorrent import lt
 
@@ -129,3 +204,41 @@ def test_open_state_from_python2(self):
         )
         state = self.tm.open_state()
         self.assertEqual(len(state.torrents), 1)
+
+    @defer.inlineCallbacks
+    def test_stop_loading_state(self):
+        """Stopping while loading the state keeps the torrents not loaded."""
+        if self.tm.loading_state:
+            yield self.tm.loading_state.whenDone()
+        state = TorrentManagerState()
+        state.torrents = [
+            TorrentState(torrent_id=c * 40, queue=num) for num, c in enumerate('abcd')
+        ]
+        self.tm.prev_saved_state = None
+        with open(os.path.join(self.tm.state_dir, 'torrents.state'), 'wb') as _file:
+            pickle.dump(state, _file, protocol=2)
+
+        # Run the adding task one torrent at a time.
+        calls = []
+        cooperator = task.Cooperator(
+            terminationPredicateFactory=lambda: lambda: True, scheduler=calls.append
+        )
+        with mock.patch.object(torrentmanager, 'cooperate', cooperator.cooperate):
+            self.tm.load_state()
+        calls.pop()()
+        self.tm.loading_state.stop()
+        self.assertEqual(3, len(self.tm.unloaded_state))
+
+        # The first torrent failed to add, having no torrent file. A torrent
+        # added after the loading stopped is saved with the others.
+        filename = common.get_test_data_file('test.torrent')
+        with open(filename, 'rb') as _file:
+            filedump = _file.read()
+        torrent_id = yield self.core.add_torrent_file_async(
+            filename, b64encode(filedump), {}
+        )
+        self.tm._save_state()
+        self.assertEqual(
+            {c * 40 for c in 'bcd'} | {torrent_id},
+            {t_state.torrent_id for t_state in self.tm.open_state().torrents},
+        )
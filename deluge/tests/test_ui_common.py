@@ -8,11 +8,17 @@
 #
 from __future__ import unicode_literals
 
+import os
+import time
+from hashlib import sha1
+
+import pytest
 from six import assertCountEqual
 from twisted.trial import unittest
 
+from deluge import bencode
 from deluge.common import windows_check
-from deluge.ui.common import TorrentInfo
+from deluge.ui.common import FileTree, FileTree2, TorrentInfo, parse_torrent_files
 
 from . import common
 
@@ -75,3 +81,120 @@ def test_utf8_encoded_paths2(self):
         ]
 
         assertCountEqual(self, ti.files, result_files)
+
+    def test_info_hash_from_file(self):
+        filename = common.get_test_data_file('test.torrent')
+        ti = TorrentInfo(filename)
+        info = bencode.bencode(ti.metainfo[b'info'])
+        self.assertEqual(sha1(info).hexdigest(), ti.info_hash)
+
+    def test_info_hash_unsorted_keys(self):
+        # The hash is of the info dict as written, not encoded again.
+        info = b'd6:lengthi1e4:name1:a12:piece lengthi16384e6:pieces20:%se' % (
+            b'0' * 20
+        )
+        filename = os.path.join(self.mktemp() + '.torrent')
+        with open(filename, 'wb') as _file:
+            _file.write(b'd4:info' + info + b'e')
+        ti = TorrentInfo(filename)
+        self.assertEqual(sha1(info).hexdigest(), ti.info_hash)
+        self.assertEqual('a', ti.name)
+
+    def test_files_tree_lazy(self):
+        filename = common.get_test_data_file('dir_with_6_files.torrent')
+        ti = TorrentInfo(filename, 2)
+        self.assertIsNone(ti._files_tree)
+        paths = [f['path'] for f in ti.files]
+
+        expected = FileTree2(paths)
+        tree = ti.files_tree
+        self.assertEqual(
+            sorted(expected.get_tree()['contents']), sorted(tree['contents'])
+        )
+        directory = tree['contents']['dir_with_6_files']
+        self.assertEqual('dir', directory['type'])
+        self.assertEqual(sum(f['size'] for f in ti.files), directory['length'])
+
+        ti = TorrentInfo(filename)
+        self.assertEqual(sorted(FileTree(paths).get_tree()), sorted(ti.files_tree))
+
+    def test_parse_torrent_files(self):
+        filenames = [
+            common.get_test_data_file(name)
+            for name in ('test.torrent', 'unicode_file.torrent', 'missing.torrent')
+        ] * 4
+        for processes in (1, 2):
+            results = list(parse_torrent_files(filenames, processes=processes))
+            self.assertEqual(filenames, [filename for filename, info in results])
+            for filename, info in results:
+                if filename.endswith('missing.torrent'):
+                    self.assertIsInstance(info, Exception)
+                else:
+                    self.assertEqual(
+                        TorrentInfo(filename).as_dict('info_hash', 'name', 'files'),
+                        info,
+                    )
+
+    def test_parse_torrent_files_keys(self):
+        filename = common.get_test_data_file('test.torrent')
+        results = list(parse_torrent_files([filename], 2, keys=('files_tree',)))
+        self.assertEqual(
+            [(filename, TorrentInfo(filename, 2).as_dict('files_tree'))], results
+        )
+
+
+def write_torrent(filename, num_files, name='torrent'):
+    files = [
+        {b'length': num, b'path': [b'dir%d' % (num % 100), b'file%d' % num]}
+        for num in range(num_files)
+    ]
+    info = {
+        b'name': name.encode(),
+        b'piece length': 16384,
+        b'pieces': b'0' * 20 * (num_files // 100 + 1),
+        b'files': files,
+    }
+    with open(filename, 'wb') as _file:
+        _file.write(bencode.bencode({b'announce': b'http://tracker', b'info': info}))
+
+
+@pytest.mark.slow
+class TorrentInfoBenchmarkTestCase(unittest.TestCase):
+    def test_benchmark_many_files(self):
+        num_files = 200000
+        filename = self.mktemp() + '.torrent'
+        write_torrent(filename, num_files)
+
+        start = time.time()
+        ti = TorrentInfo(filename, 2)
+        parse = time.time() - start
+        files_tree = ti.files_tree
+        tree = time.time() - start - parse
+        print(
+            '\n%d files: parse %.1f ms, files tree %.1f ms'
+            % (num_files, parse * 1000, tree * 1000)
+        )
+        self.assertEqual(100, len(files_tree['contents']['torrent']['contents']))
+
+    def test_benchmark_many_torrents(self):
+        num_torrents = 500
+        path = self.mktemp()
+        os.mkdir(path)
+        filenames = []
+        for num in range(num_torrents):
+            filenames.append(os.path.join(path, '%d.torrent' % num))
+            write_torrent(filenames[-1], 1000, name='torrent%d' % num)
+
+        for processes in (1, None):
+            start = time.time()
+            infos = [
+                info
+                for filename, info in parse_torrent_files(
+                    filenames, processes=processes
+                )
+            ]
+            print(
+                '\n%d torrents, processes %s: %.1f ms'
+                % (num_torrents, processes, (time.time() - start) * 1000)
+            )
+            self.assertEqual(num_torrents, len({info['info_hash'] for info in infos}))
@@ -9,9 +9,17 @@
 
 import argparse
 
+import mock
+from twisted.internet import defer
+
+import deluge.component as component
 from deluge.common import windows_check
+from deluge.ui.client import client
 from deluge.ui.console.cmdline.commands.add import Command
 from deluge.ui.console.cmdline.commands.config import json_eval
+from deluge.ui.console.main import EventLog
+from deluge.ui.console.modes.torrentlist.torrentview import TorrentView
+from deluge.ui.console.utils.torrentindex import TorrentIndex
 from deluge.ui.console.widgets.fields import TextInput
 
 from .basetest import BaseTestCase
@@ -24,6 +32,14 @@ def __init__(self):
         self.encoding = 'utf8'
 
 
+class MockTorrentList(object):
+    rows = 10
+    minor_mode = None
+
+    def refresh(self, lines=None):
+        pass
+
+
 class UIConsoleFieldTestCase(BaseTestCase):
     def setUp(self):  # NOQA: N803
         self.parent = MockParent()
@@ -91,3 +107,151 @@ def test_config_json_eval(self):
         # Empty values to clear config key.
         self.assertEqual(json_eval('[]'), [])
         self.assertEqual(json_eval(''), '')
+
+
+class UIConsoleTorrentViewTestCase(BaseTestCase):
+    def setUp(self):
+        self.config = {
+            'torrentview': {
+                'sort_primary': 'eta',
+                'sort_secondary': 'queue',
+                'separate_complete': True,
+            }
+        }
+        self.torrentview = TorrentView(MockTorrentList(), self.config)
+
+    def tearDown(self):
+        pass
+
+    def status(self, queue, eta, progress=50.0):
+        return {
+            'state': 'Downloading',
+            'name': 'torrent%d' % queue,
+            'queue': queue,
+            'progress': progress,
+            'eta': eta,
+        }
+
+    def test_sort_torrents(self):
+        state = {
+            'a': self.status(0, 0),
+            'b': self.status(1, 30),
+            'c': self.status(2, 10),
+            'd': self.status(3, 10, progress=100.0),
+            'e': self.status(4, 10),
+        }
+        # Completed last, then by eta with no eta last, then by queue.
+        self.assertEqual(
+            ['c', 'e', 'b', 'a', 'd'], self.torrentview._sort_torrents(state)
+        )
+        self.config['torrentview']['separate_complete'] = False
+        self.assertEqual(
+            ['c', 'd', 'e', 'b', 'a'], self.torrentview._sort_torrents(state)
+        )
+
+    def test_update_state(self):
+        self.torrentview.update_state({'a': self.status(0, 0), 'b': self.status(1, 5)})
+        self.assertEqual(['b', 'a'], self.torrentview.sorted_ids)
+        self.assertEqual(['torrent1', 'torrent0'], self.torrentview.torrent_names)
+        self.torrentview.cached_rows = {'a': ('row a', ''), 'b': ('row b', '')}
+
+        # Only the changed rows and removed torrents are dropped from the cache.
+        self.torrentview.update_state({'a': self.status(0, 20)})
+        self.assertEqual(['a'], self.torrentview.sorted_ids)
+        self.assertEqual({}, self.torrentview.cached_rows)
+        self.torrentview.cached_rows = {'a': ('row a', '')}
+        self.torrentview.update_state({'a': self.status(0, 20)})
+        self.assertEqual({'a': ('row a', '')}, self.torrentview.cached_rows)
+
+    def test_fetch_window_removed(self):
+        self.torrentview.update_state({'a': self.status(0, 0), 'b': self.status(1, 5)})
+        self.torrentview.cursel = 1
+        session_proxy = mock.Mock()
+        session_proxy.get_torrents_status.return_value = defer.succeed(
+            {'b': {'ratio': 1.0}}
+        )
+        # The daemon no longer has torrent a, so it is dropped from the list.
+        with mock.patch.object(component, 'get', return_value=session_proxy):
+            self.torrentview.fetch_window()
+        self.assertEqual(['b'], self.torrentview.sorted_ids)
+        self.assertEqual({'b'}, self.torrentview.fetched)
+        self.assertEqual(1, self.torrentview.numtorrents)
+        self.assertEqual(0, self.torrentview.cursel)
+
+
+class UIConsoleTorrentIndexTestCase(BaseTestCase):
+    def setUp(self):
+        self.index = TorrentIndex(['a1', 'a2', 'b1'])
+
+    def tearDown(self):
+        pass
+
+    def assert_matches(self, pattern, expected):
+        self.assertEqual(sorted(expected), sorted(self.index.match(pattern)))
+
+    def test_match_ids(self):
+        self.assertFalse(self.index.names_loaded)
+        self.assert_matches('', ['a1', 'a2', 'b1'])
+        self.assert_matches('*', ['a1', 'a2', 'b1'])
+        self.assert_matches('a1', ['a1'])
+        self.assert_matches('a*', ['a1', 'a2'])
+        self.assert_matches('*1', ['a1', 'b1'])
+        self.assert_matches('a', [])
+
+    def test_match_names(self):
+        self.index.set_names({'a1': 'Ubuntu 20.04', 'a2': 'Debian 10', 'b1': 'ubuntu'})
+        self.assertTrue(self.index.names_loaded)
+        self.assert_matches('ubuntu', ['b1'])
+        self.assert_matches('Ubuntu*', ['a1'])
+        self.assert_matches('*10', ['a2'])
+        self.assert_matches('*bunt*', ['a1', 'b1'])
+        self.assert_matches('*a*', ['a1', 'a2'])
+        self.assert_matches('*u*', ['a1', 'b1'])
+        self.assert_matches('*04 Deb*', [])
+
+    def test_add_remove(self):
+        self.index.set_names({'a1': 'one', 'a2': 'two', 'b1': 'three'})
+        self.index.add('c1')
+        self.assertFalse(self.index.names_loaded)
+        self.index.set_names({'c1': 'four'})
+        self.index.remove('a2')
+        self.assertTrue(self.index.names_loaded)
+        self.assert_matches('*o*', ['a1', 'c1'])
+        self.assertEqual(None, self.index.get_name('a2'))
+        self.assertEqual('four', self.index.get_name('c1'))
+
+
+class ConsoleUIMock(component.Component):
+    def __init__(self, torrents):
+        component.Component.__init__(self, 'ConsoleUI')
+        self.torrents = torrents
+        self.events = []
+
+    def get_torrent_name(self, torrent_id):
+        return self.torrents.get_name(torrent_id)
+
+    def write_event(self, line):
+        self.events.append(line)
+
+
+class UIConsoleEventLogTestCase(BaseTestCase):
+    def set_up(self):
+        self.patch(client, 'register_event_handler', lambda event, handler: None)
+        self.console = ConsoleUIMock(TorrentIndex(['a1', 'b1']))
+        self.eventlog = EventLog()
+
+    def test_names_not_loaded(self):
+        self.eventlog.on_torrent_removed_event('a1')
+        self.eventlog.on_torrent_state_changed_event('b1', 'Seeding')
+        self.assertIn('Torrent Removed: {!info!}a1 ', self.console.events[-2])
+        self.assertIn('Seeding: {!info!}b1 ', self.console.events[-1])
+
+        self.console.torrents.set_names({'a1': 'one', 'b1': 'two'})
+        self.eventlog.on_torrent_removed_event('a1')
+        self.assertIn('Torrent Removed: {!info!}one ', self.console.events[-1])
+        # The state of a torrent with no name yet once the names are loaded.
+        self.console.torrents.add('c1')
+        self.console.torrents.set_names({'c1': None})
+        events = list(self.console.events)
+        self.eventlog.on_torrent_state_changed_event('c1', 'Paused')
+        self.assertEqual(events, self.console.events)
@@ -10,6 +10,7 @@
 from __future__ import print_function, unicode_literals
 
 import argparse
+import json
 import sys
 from io import StringIO
 
@@ -432,6 +433,37 @@ def test_console_command_add_move_completed(self):
             or std_output.endswith('move_completed_path: /tmp\nmove_completed: True\n')
         )
 
+    @defer.inlineCallbacks
+    def test_console_command_info_streaming(self):
+        filename = common.get_test_data_file('test.torrent')
+        self.patch_arg_command(
+            [
+                'add ' + filename + ' ; info --format json --fields name,total_size'
+                ' ; info --format csv --fields name --page-size 1'
+            ]
+        )
+        fd = StringFileDescriptor(sys.stdout)
+        self.patch(sys, 'stdout', fd)
+
+        yield self.exec_command()
+
+        lines = fd.out.getvalue().splitlines()
+        self.assertEqual(
+            {
+                'id': 'ab570cdd5a17ea1b61e970bb72047de141bce173',
+                'name': 'azcvsupdater_2.6.2.jar',
+                'total_size': 307949,
+            },
+            json.loads(lines[-3]),
+        )
+        self.assertEqual(
+            [
+                'id,name',
+                'ab570cdd5a17ea1b61e970bb72047de141bce173,azcvsupdater_2.6.2.jar',
+            ],
+            lines[-2:],
+        )
+
     @defer.inlineCallbacks
     def test_console_command_status(self):
         fd = StringFileDescriptor(sys.stdout)
@@ -8,11 +8,15 @@
 from __future__ import unicode_literals
 
 import sys
+import time
 
 import mock
 import pytest
 from twisted.trial import unittest
 
+from deluge.ui.gtk3.files_table import ROOT, FilesTable
+from deluge.ui.gtk3.torrentview_rows import TorrentRows, status_changes
+
 
 @pytest.mark.gtkui
 class GTK3CommonTestCase(unittest.TestCase):
@@ -32,3 +36,196 @@ def test_cmp(self):
         self.assertEqual(cmp(None, 'bar'), -1)
         self.assertEqual(cmp('foo', None), 1)
         self.assertEqual(cmp('', None), 1)
+
+
+class TorrentRowsTestCase(unittest.TestCase):
+    def setUp(self):  # NOQA: N803
+        self.rows = TorrentRows()
+        for torrent_id in ('a', 'b', 'c'):
+            self.rows.add(torrent_id, 'iter_' + torrent_id)
+        self.fields = [(1, 'name'), (2, 'progress')]
+        self.status = {
+            'a': {'name': 'A', 'progress': 0.0},
+            'b': {'name': 'B', 'progress': 0.0},
+            'c': {'name': 'C', 'progress': 0.0},
+        }
+
+    def test_status_changes(self):
+        prev_status = {'a': {'name': 'A', 'progress': 0.0}}
+        status = {'a': {'name': 'A', 'progress': 5.0}, 'b': {'name': 'B'}}
+        self.assertEqual(
+            {'a': [2, 5.0], 'b': [1, 'B']},
+            status_changes(status, prev_status, self.fields),
+        )
+        self.assertEqual({}, status_changes(prev_status, prev_status, self.fields))
+
+    def test_update(self):
+        changes, show, hide = self.rows.update(self.status, self.fields)
+        self.assertEqual(['a', 'b', 'c'], sorted(changes))
+        self.assertEqual((set(), set()), (show, hide))
+
+        status = dict(self.status, a={'name': 'A', 'progress': 1.0})
+        del status['c']
+        changes, show, hide = self.rows.update(status, self.fields)
+        self.assertEqual({'a': [2, 1.0]}, changes)
+        self.assertEqual((set(), {'c'}), (show, hide))
+
+        changes, show, hide = self.rows.update(self.status, self.fields)
+        self.assertEqual({'a': [2, 0.0]}, changes)
+        self.assertEqual(({'c'}, set()), (show, hide))
+
+    def test_update_new_fields(self):
+        self.rows.update(self.status, self.fields)
+        changes, show, hide = self.rows.update(self.status, self.fields[:1])
+        self.assertEqual(['a', 'b', 'c'], sorted(changes))
+        self.assertEqual([1, 'A'], changes['a'])
+
+    def test_update_unknown_torrent(self):
+        status = dict(self.status, d={'name': 'D', 'progress': 0.0})
+        changes, show, hide = self.rows.update(status, self.fields)
+        self.assertNotIn('d', changes)
+        # The row added later gets every value.
+        self.rows.add('d', 'iter_d')
+        changes, show, hide = self.rows.update(status, self.fields)
+        self.assertEqual({'d': [1, 'D', 2, 0.0]}, changes)
+
+    def test_remove_and_invalidate(self):
+        self.rows.update(self.status, self.fields)
+        self.assertEqual('iter_b', self.rows.remove('b'))
+        self.assertIsNone(self.rows.remove('b'))
+        self.rows.invalidate('a')
+        changes, show, hide = self.rows.update(self.status, self.fields)
+        self.assertEqual({'a': [1, 'A', 2, 0.0]}, changes)
+
+    def test_toggle_visible(self):
+        self.rows.update(self.status, self.fields)
+        # The search box hid a row, the update shows it again.
+        self.rows.toggle_visible(['b'])
+        changes, show, hide = self.rows.update(self.status, self.fields)
+        self.assertEqual(({'b'}, set()), (show, hide))
+
+
+class FilesTableTestCase(unittest.TestCase):
+    def setUp(self):  # NOQA: N803
+        self.table = FilesTable(
+            [
+                {'path': 'root/a/1.txt', 'size': 100},
+                {'path': 'root/a/b/2.txt', 'size': 300},
+                {'path': 'root/3.txt', 'size': 600},
+            ]
+        )
+
+    def test_folders(self):
+        table = self.table
+        self.assertEqual(['root/', 'root/a/', 'root/a/b/'], table.folder_paths)
+        self.assertEqual([1000, 400, 300], table.folder_sizes)
+        self.assertEqual('b/', table.folder_name(2))
+        self.assertEqual([0], table.subfolders(ROOT))
+        self.assertEqual([], table.files(ROOT))
+        self.assertEqual([1], table.subfolders(0))
+        self.assertEqual([2], table.files(0))
+        self.assertEqual([0], table.files(1))
+        self.assertEqual(['1.txt', '2.txt', '3.txt'], table.names)
+        self.assertEqual([0, 1, 2], sorted(table.all_files(0)))
+        self.assertEqual([0, 1], sorted(table.all_files(1)))
+
+    def test_update_progress(self):
+        table = self.table
+        changed, folders = table.update_progress([1.0, 0.0, 0.5])
+        self.assertEqual([0, 2], changed)
+        self.assertEqual({0, 1}, folders)
+        self.assertEqual(40, table.folder_progress(0))
+        self.assertEqual(25, table.folder_progress(1))
+        self.assertEqual(0, table.folder_progress(2))
+
+        self.assertEqual(([], set()), table.update_progress([1.0, 0.0, 0.5]))
+        changed, folders = table.update_progress([1.0, 1.0, 0.5])
+        self.assertEqual([1], changed)
+        self.assertEqual({0, 1, 2}, folders)
+        self.assertEqual(100, table.folder_progress(1))
+        self.assertEqual(70, table.folder_progress(0))
+
+    def test_update_priorities(self):
+        table = self.table
+        self.assertEqual([0, 1, 2], table.update_priorities([4, 4, 4]))
+        self.assertEqual([1], table.update_priorities([4, 0, 4]))
+        self.assertEqual([], table.update_priorities([4, 0, 4]))
+
+    def test_rename_file(self):
+        table = self.table
+        self.assertTrue(table.rename_file(0, 'root/a/4.txt'))
+        self.assertTrue(table.rename_file(2, 'root/5.txt'))
+        self.assertEqual(['4.txt', '2.txt', '5.txt'], table.names)
+        # Moving the file to another folder needs a new table.
+        self.assertFalse(table.rename_file(0, 'root/4.txt'))
+        self.assertFalse(table.rename_file(2, 'root/c/5.txt'))
+        self.assertFalse(table.rename_file(1, 'other/a/b/2.txt'))
+        self.assertEqual(['4.txt', '2.txt', '5.txt'], table.names)
+
+
+@pytest.mark.slow
+class FilesTableBenchmarkTestCase(unittest.TestCase):
+    def test_benchmark_files_table(self):
+        num_files = 100000
+        files = [
+            {'path': 'root/dir%d/sub%d/file%d' % (num % 100, num % 7, num), 'size': 1}
+            for num in range(num_files)
+        ]
+        start = time.time()
+        table = FilesTable(files)
+        build = time.time() - start
+
+        progress = [0.0] * num_files
+        for num in range(0, num_files, 100):
+            progress[num] = 1.0
+        start = time.time()
+        changed, folders = table.update_progress(progress)
+        update = time.time() - start
+        print(
+            '\n%d files: build %.1f ms, update %d files %.1f ms'
+            % (num_files, build * 1000, len(changed), update * 1000)
+        )
+        self.assertEqual(1 + 100 + 700, len(table.folder_paths))
+        self.assertEqual(num_files // 100, len(changed))
+        self.assertEqual(1, table.folder_progress(0))
+
+
+@pytest.mark.slow
+class TorrentRowsBenchmarkTestCase(unittest.TestCase):
+    def test_benchmark_update(self):
+        num_torrents = 20000
+        keys = [
+            'name',
+            'state',
+            'progress',
+            'total_wanted',
+            'download_payload_rate',
+            'upload_payload_rate',
+            'num_seeds',
+            'num_peers',
+            'eta',
+            'ratio',
+        ]
+        fields = [(index + 1, key) for index, key in enumerate(keys)]
+        status = {
+            '%040x' % num: {key: num for key in keys} for num in range(num_torrents)
+        }
+        rows = TorrentRows()
+        for torrent_id in status:
+            rows.add(torrent_id, torrent_id)
+        rows.update(status, fields)
+
+        # One percent of the torrents transfer data.
+        changed = dict(status)
+        for torrent_id in list(status)[::100]:
+            changed[torrent_id] = dict(status[torrent_id], progress=-1, eta=-1)
+        start = time.time()
+        changes, show, hide = rows.update(changed, fields)
+        elapsed = time.time() - start
+        print(
+            '\n%d torrents, %d changed: %.1f ms'
+            % (num_torrents, len(changes), elapsed * 1000)
+        )
+        self.assertEqual(num_torrents // 100, len(changes))
+        self.assertEqual(4, len(next(iter(changes.values()))))
+        self.assertFalse(show or hide)
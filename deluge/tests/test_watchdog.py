@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+from __future__ import unicode_literals
+
+import time
+
+from twisted.internet import defer, reactor, task
+
+import deluge.component as component
+from deluge.core.watchdog import ReactorWatchdog
+
+from .basetest import BaseTestCase
+
+
+class BlockingComponent(component.Component):
+    def __init__(self):
+        component.Component.__init__(self, 'BlockingComponent', interval=60)
+        self.block = False
+
+    def update(self):
+        if self.block:
+            time.sleep(0.5)
+
+
+def block_reactor():
+    time.sleep(0.5)
+
+
+class ReactorWatchdogTestCase(BaseTestCase):
+    def set_up(self):
+        self.watchdog = ReactorWatchdog(threshold=0.2, interval=0.05)
+        return component.start(['ReactorWatchdog'])
+
+    def tear_down(self):
+        return component.shutdown()
+
+    def wait(self, seconds):
+        return task.deferLater(reactor, seconds, lambda: None)
+
+    @defer.inlineCallbacks
+    def test_no_stall(self):
+        yield self.wait(0.3)
+        stats = self.watchdog.get_stats()
+        self.assertTrue(stats['lag']['count'] > 0)
+        self.assertEqual([], stats['stalls'])
+
+    @defer.inlineCallbacks
+    def test_stall_attributed_to_call(self):
+        reactor.callLater(0, block_reactor)
+        yield self.wait(0.3)
+        stalls = self.watchdog.get_stats()['stalls']
+        self.assertEqual(1, len(stalls))
+        self.assertEqual('test_watchdog.py:block_reactor', stalls[0]['culprit'])
+        self.assertTrue(stalls[0]['duration'] >= 0.4)
+        self.assertTrue('time.sleep(0.5)' in stalls[0]['stack'])
+
+    @defer.inlineCallbacks
+    def test_stall_attributed_to_component_update(self):
+        blocking = BlockingComponent()
+        yield component.start(['BlockingComponent'])
+        blocking.block = True
+        blocking._component_update()
+        yield self.wait(0.3)
+        stats = self.watchdog.get_stats()
+        self.assertEqual(
+            'component BlockingComponent update', stats['stalls'][0]['culprit']
+        )
+        self.assertEqual(
+            1, stats['culprits']['component BlockingComponent update']['count']
+        )
+        self.assertTrue(stats['component_updates']['BlockingComponent']['max'] >= 0.5)
@@ -34,3 +34,56 @@ def test_change_password(self, mock_json):
         )
         webauth = auth.Auth(config)
         self.assertTrue(webauth.change_password('deluge', 'deluge_new'))
+
+
+class SessionStoreTestCase(unittest.TestCase):
+    def setUp(self):  # NOQA
+        self.store = auth.SessionStore()
+
+    def add(self, session_id, expires, login='admin', max_per_login=0):
+        self.store.add(
+            session_id,
+            {'login': login, 'level': 10, 'expires': expires},
+            max_per_login=max_per_login,
+        )
+
+    def test_clean_expired(self):
+        self.add('a', 100)
+        self.add('b', 200)
+        self.add('c', 300)
+        self.assertEqual(1, self.store.clean(now=150))
+        self.assertEqual(['b', 'c'], sorted(self.store))
+
+    def test_touch_extends_expiry(self):
+        self.add('a', 100)
+        self.store.touch('a', 500)
+        self.assertEqual(0, self.store.clean(now=150))
+        self.assertTrue('a' in self.store)
+        self.assertEqual(1, self.store.clean(now=600))
+        self.assertFalse('a' in self.store)
+
+    def test_remove(self):
+        self.add('a', 100)
+        self.store.remove('a')
+        self.store.remove('a')
+        self.assertEqual(0, len(self.store))
+        self.assertEqual(0, self.store.clean(now=150))
+
+    def test_max_per_login(self):
+        for session_id in ('a', 'b', 'c'):
+            self.add(session_id, 100, max_per_login=2)
+        self.add('d', 100, login='other', max_per_login=2)
+        self.assertEqual(['b', 'c', 'd'], sorted(self.store))
+
+    def test_save_load(self):
+        filename = self.mktemp()
+        store = auth.SessionStore(filename)
+        store.add('a', {'login': 'admin', 'level': 10, 'expires': 100.0})
+
+        def on_saved(result):
+            self.assertFalse(store.is_dirty)
+            loaded = auth.SessionStore(filename)
+            loaded.load()
+            self.assertEqual(store.sessions, loaded.sessions)
+
+        return store.save().addCallback(on_saved)
@@ -12,6 +12,7 @@
 
 import logging
 import struct
+import time
 import zlib
 
 import rencode
@@ -46,14 +47,24 @@ def __init__(self):
         self._message_length = 0
         self._bytes_received = 0
         self._bytes_sent = 0
+        # Seconds spent in rencode and zlib, and the last received message.
+        self._encode_time = 0.0
+        self._decode_time = 0.0
+        self._last_decode_time = 0.0
+        self._last_message_size = 0
 
     def transfer_message(self, data):
         """
         Transfer the data.
 
         :param data: data to be transfered in a data structure serializable by rencode.
+
+        :returns: the number of bytes sent
+        :rtype: int
         """
+        start = time.time()
         body = zlib.compress(rencode.dumps(data))
+        self._encode_time += time.time() - start
         body_len = len(body)
         message = struct.pack(
             '{}{}s'.format(MESSAGE_HEADER_FORMAT, body_len),
@@ -63,6 +74,7 @@ def transfer_message(self, data):
         )
         self._bytes_sent += len(message)
         self.transport.write(message)
+        return len(message)
 
     def dataReceived(self, data):  # NOQA: N802
         """
@@ -126,9 +138,12 @@ def _handle_complete_message(self, data):
 
         """
         try:
-            self.message_received(
-                rencode.loads(zlib.decompress(data), decode_utf8=True)
-            )
+            start = time.time()
+            message = rencode.loads(zlib.decompress(data), decode_utf8=True)
+            self._last_decode_time = time.time() - start
+            self._decode_time += self._last_decode_time
+            self._last_message_size = MESSAGE_HEADER_SIZE + len(data)
+            self.message_received(message)
         except Exception as ex:
             log.warning(
                 'Failed to decompress (%d bytes) and load serialized data with rencode: %s',
@@ -156,6 +171,16 @@ def get_bytes_sent(self):
         """
         return self._bytes_sent
 
+    def get_codec_time(self):
+        """
+        Returns the time spent encoding and decoding messages.
+
+        :returns: the (encode, decode) times in seconds
+        :rtype: tuple
+
+        """
+        return self._encode_time, self._decode_time
+
     def message_received(self, message):
         """Override this method to receive the complete message"""
         pass
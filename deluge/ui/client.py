@@ -11,14 +11,24 @@
 from __future__ import unicode_literals
 
 import logging
+import os
 import subprocess
 import sys
+import time
+from collections import deque
 
 from twisted.internet import defer, reactor, ssl
+from twisted.internet.error import ConnectError
 from twisted.internet.protocol import ClientFactory
 
 from deluge import error
-from deluge.common import get_localhost_auth, get_version
+from deluge.common import (
+    LatencyHistogram,
+    get_localhost_auth,
+    get_version,
+    windows_check,
+)
+from deluge.configmanager import get_config_dir
 from deluge.decorators import deprecated
 from deluge.transfer import DelugeTransferProtocol
 
@@ -26,6 +36,8 @@
 RPC_ERROR = 2
 RPC_EVENT = 3
 
+AGENT_SOCKET = 'client-agent.sock'
+
 log = logging.getLogger(__name__)
 
 
@@ -33,6 +45,28 @@ def format_kwargs(kwargs):
     return ', '.join([key + '=' + str(value) for key, value in kwargs.items()])
 
 
+def get_agent_socket():
+    """
+    Get the path of a running client agent socket.
+
+    The path is taken from the DELUGE_CLIENT_AGENT environment variable,
+    falling back to the socket in the config dir. Setting the variable to
+    an empty string disables the agent.
+
+    :returns: the socket path or None if no agent is available
+    :rtype: str
+    """
+    if windows_check():
+        return None
+
+    path = os.environ.get('DELUGE_CLIENT_AGENT')
+    if path is None:
+        path = get_config_dir(AGENT_SOCKET)
+    if path and os.path.exists(path):
+        return path
+    return None
+
+
 class DelugeRPCRequest(object):
     """
     This object is created whenever there is a RPCRequest to be sent to the
@@ -85,13 +119,16 @@ def connectionMade(self):  # NOQA: N802
         self.__rpc_requests = {}
         # Set the protocol in the daemon so it can send data
         self.factory.daemon.protocol = self
-        # Get the address of the daemon that we've connected to
+        # Get the address of the daemon that we've connected to, when connected
+        # through a client agent this is the address given to connect.
         peer = self.transport.getPeer()
-        self.factory.daemon.host = peer.host
-        self.factory.daemon.port = peer.port
+        if not self.factory.daemon.agent_socket:
+            self.factory.daemon.host = peer.host
+            self.factory.daemon.port = peer.port
+        host, port = self.factory.daemon.host, self.factory.daemon.port
         self.factory.daemon.connected = True
-        log.debug('Connected to daemon at %s:%s..', peer.host, peer.port)
-        self.factory.daemon.connect_deferred.callback((peer.host, peer.port))
+        log.debug('Connected to daemon at %s:%s..', host, port)
+        self.factory.daemon.connect_deferred.callback((host, port))
 
     def message_received(self, request):
         """
@@ -126,7 +163,13 @@ def message_received(self, request):
 
         # We get the Deferred object for this request_id to either run the
         # callbacks or the errbacks dependent on the response from the daemon.
-        d = self.factory.daemon.pop_deferred(request_id)
+        d = self.factory.daemon.pop_deferred(
+            request_id, failed=message_type == RPC_ERROR
+        )
+        if d is None:
+            # The request was cancelled or timed out, drop the late response.
+            self.__rpc_requests.pop(request_id, None)
+            return
 
         if message_type == RPC_RESPONSE:
             # Run the callbacks registered with this Deferred object
@@ -200,6 +243,15 @@ def send_request(self, request):
         except Exception as ex:
             log.warning('Error occurred when sending message: %s', ex)
 
+    def forget_request(self, request_id):
+        """
+        Forget a sent request that will not be waited for anymore.
+
+        :param request_id: the request_id of the request
+
+        """
+        self.__rpc_requests.pop(request_id, None)
+
 
 class DelugeRPCClientFactory(ClientFactory):
     protocol = DelugeRPCProtocol
@@ -209,13 +261,15 @@ def __init__(self, daemon, event_handlers):
         self.event_handlers = event_handlers
 
     def startedConnecting(self, connector):  # NOQA: N802
-        log.debug('Connecting to daemon at "%s:%s"...', connector.host, connector.port)
+        log.debug(
+            'Connecting to daemon at "%s:%s"...', self.daemon.host, self.daemon.port
+        )
 
     def clientConnectionFailed(self, connector, reason):  # NOQA: N802
         log.debug(
             'Connection to daemon at "%s:%s" failed: %s',
-            connector.host,
-            connector.port,
+            self.daemon.host,
+            self.daemon.port,
             reason.value,
         )
         self.daemon.connect_deferred.errback(reason)
@@ -223,8 +277,8 @@ def clientConnectionFailed(self, connector, reason):  # NOQA: N802
     def clientConnectionLost(self, connector, reason):  # NOQA: N802
         log.debug(
             'Connection lost to daemon at "%s:%s" reason: %s',
-            connector.host,
-            connector.port,
+            self.daemon.host,
+            self.daemon.port,
             reason.value,
         )
         self.daemon.host = None
@@ -248,13 +302,40 @@ class DaemonProxy(object):
 
 
 class DaemonSSLProxy(DaemonProxy):
-    def __init__(self, event_handlers=None):
+    """
+    Connection to a daemon over SSL, or through a client agent.
+
+    :param event_handlers: the event handlers to register with the daemon
+    :type event_handlers: dict
+    :param agent_socket: the path to a client agent UNIX socket to connect
+        through instead of connecting to the daemon directly
+    :type agent_socket: str
+
+    Requests are pipelined, with at most `max_in_flight` awaiting a response
+    from the daemon; further requests are queued until responses arrive.
+    Requests time out after `call_timeout` seconds, or the per method value
+    in `method_timeouts`, failing with a twisted TimeoutError. Cancelling or
+    timing out a request tells the daemon to drop it.
+    """
+
+    def __init__(self, event_handlers=None, agent_socket=None):
         if event_handlers is None:
             event_handlers = {}
+        self.agent_socket = agent_socket
         self.__factory = DelugeRPCClientFactory(self, event_handlers)
         self.__factory.noisy = False
         self.__request_counter = 0
         self.__deferred = {}
+        self.__in_flight = {}
+        self.__queue = deque()
+
+        # Pipelining and timeout settings, None for no limit
+        self.max_in_flight = None
+        self.call_timeout = None
+        self.method_timeouts = {}
+
+        # The LatencyHistogram of each called method
+        self.call_stats = {}
 
         # This is set when a connection is made to the daemon
         self.protocol = None
@@ -286,9 +367,12 @@ def connect(self, host, port):
         log.debug('sslproxy.connect()')
         self.host = host
         self.port = port
-        self.__connector = reactor.connectSSL(
-            self.host, self.port, self.__factory, ssl.ClientContextFactory()
-        )
+        if self.agent_socket:
+            self.__connector = reactor.connectUNIX(self.agent_socket, self.__factory)
+        else:
+            self.__connector = reactor.connectSSL(
+                self.host, self.port, self.__factory, ssl.ClientContextFactory()
+            )
         self.connect_deferred = defer.Deferred()
         self.daemon_info_deferred = defer.Deferred()
 
@@ -323,11 +407,11 @@ def call(self, method, *args, **kwargs):
         request.method = method
         request.args = args
         request.kwargs = kwargs
-        # Send the request to the server
-        self.protocol.send_request(request)
-        # Create a Deferred object to return and add a default errback to print
-        # the error.
-        d = defer.Deferred()
+
+        # Create a Deferred object to return, cancelling it drops the request.
+        d = defer.Deferred(
+            canceller=lambda d, request_id=request.request_id: self.__cancel(request_id)
+        )
 
         # Store the Deferred until we receive a response from the daemon
         self.__deferred[self.__request_counter] = d
@@ -336,18 +420,91 @@ def call(self, method, *args, **kwargs):
         # before a response is received.
         self.__request_counter += 1
 
+        # Send the request to the server, or queue it if the window is full
+        if self.max_in_flight and len(self.__in_flight) >= self.max_in_flight:
+            self.__queue.append(request)
+        else:
+            self.__send(request)
+
+        timeout = self.method_timeouts.get(method, self.call_timeout)
+        if timeout:
+            d.addTimeout(timeout, reactor)
+
         return d
 
-    def pop_deferred(self, request_id):
+    def __send(self, request):
+        self.__in_flight[request.request_id] = (request.method, time.time())
+        self.protocol.send_request(request)
+
+    def __send_queued(self):
+        while self.__queue and (
+            not self.max_in_flight or len(self.__in_flight) < self.max_in_flight
+        ):
+            self.__send(self.__queue.popleft())
+
+    def __cancel(self, request_id):
+        self.__deferred.pop(request_id, None)
+        for request in self.__queue:
+            if request.request_id == request_id:
+                self.__queue.remove(request)
+                return
+
+        method, start = self.__in_flight.pop(request_id, (None, None))
+        if method is None:
+            return
+        self.__record(method, start, failed=True)
+        if self.protocol:
+            self.protocol.forget_request(request_id)
+        if self.connected and method != 'daemon.cancel_request':
+            # Errors are ignored as older daemons do not support cancelling.
+            self.call('daemon.cancel_request', request_id).addErrback(lambda f: None)
+        self.__send_queued()
+
+    def __record(self, method, start, failed=False):
+        if method not in self.call_stats:
+            self.call_stats[method] = LatencyHistogram()
+        self.call_stats[method].add(time.time() - start, failed=failed)
+
+    def pop_deferred(self, request_id, failed=False):
         """
         Pops a Deferred object.  This is generally called once we receive the
         reply we were waiting on from the server.
 
         :param request_id: the request_id of the Deferred to pop
         :type request_id: int
+        :param failed: if the daemon replied with an error
+        :type failed: bool
+
+        :returns: the Deferred, or None if the request was cancelled
+
+        """
+        method, start = self.__in_flight.pop(request_id, (None, None))
+        if method is not None:
+            self.__record(method, start, failed=failed)
+            self.__send_queued()
+        return self.__deferred.pop(request_id, None)
+
+    def get_call_stats(self):
+        """
+        Get the latency statistics of the calls made to the daemon.
+
+        :returns: dict of method name to LatencyHistogram.to_dict() values
+        :rtype: dict
+
+        """
+        return {
+            method: histogram.to_dict() for method, histogram in self.call_stats.items()
+        }
 
+    def get_pending_count(self):
         """
-        return self.__deferred.pop(request_id)
+        Get the number of requests waiting for a response, including queued.
+
+        :returns: tuple of (in flight, queued) request counts
+        :rtype: tuple
+
+        """
+        return len(self.__in_flight), len(self.__queue)
 
     def register_event_handler(self, event, handler):
         """
@@ -401,6 +558,9 @@ def on_info_fail(reason):
             log.exception(reason)
             self.daemon_info_deferred.errback(reason)
 
+        if self.agent_socket:
+            # Tell the agent which daemon the following requests are for.
+            self.call('agent.attach', self.host, self.port)
         self.call('daemon.info').addCallback(on_info).addErrback(on_info_fail)
         return self.daemon_info_deferred
 
@@ -562,6 +722,19 @@ def __init__(self):
         self._daemon_proxy = None
         self.disconnect_callback = None
         self.__started_standalone = False
+        self.max_in_flight = None
+        self.call_timeout = None
+        self.method_timeouts = {}
+
+    def __new_proxy(self, agent_socket=None):
+        self._daemon_proxy = DaemonSSLProxy(
+            dict(self.__event_handlers), agent_socket=agent_socket
+        )
+        self._daemon_proxy.set_disconnect_callback(self.__on_disconnect)
+        self._daemon_proxy.max_in_flight = self.max_in_flight
+        self._daemon_proxy.call_timeout = self.call_timeout
+        self._daemon_proxy.method_timeouts = self.method_timeouts
+        return self._daemon_proxy
 
     def connect(
         self,
@@ -581,12 +754,25 @@ def connect(
 
         :returns: a Deferred object that will be called once the connection
             has been established or fails
-        """
 
-        self._daemon_proxy = DaemonSSLProxy(dict(self.__event_handlers))
-        self._daemon_proxy.set_disconnect_callback(self.__on_disconnect)
+        If a client agent is running (see :func:`get_agent_socket`) the
+        connection is made through the agent, falling back to connecting
+        directly if the agent cannot be reached.
+        """
+        agent_socket = get_agent_socket()
+        d = self.__new_proxy(agent_socket).connect(host, port)
+
+        def on_agent_connect_fail(reason):
+            reason.trap(ConnectError)
+            log.warning(
+                'Unable to connect to client agent at %s, connecting directly: %s',
+                agent_socket,
+                reason.value,
+            )
+            return self.__new_proxy().connect(host, port)
 
-        d = self._daemon_proxy.connect(host, port)
+        if agent_socket:
+            d.addErrback(on_agent_connect_fail)
 
         def on_connected(daemon_version):
             log.debug('on_connected. Daemon version: %s', daemon_version)
@@ -771,6 +957,52 @@ def deregister_event_handler(self, event, handler):
         if self._daemon_proxy:
             self._daemon_proxy.deregister_event_handler(event, handler)
 
+    def set_call_timeout(self, timeout, method=None):
+        """
+        Set the time to wait for a response before a call fails.
+
+        :param timeout: the timeout in seconds, None for no timeout
+        :type timeout: float
+        :param method: the method to set the timeout for, None to set the
+            default for all methods
+        :type method: str
+
+        """
+        if method is None:
+            self.call_timeout = timeout
+        elif timeout is None:
+            self.method_timeouts.pop(method, None)
+        else:
+            self.method_timeouts[method] = timeout
+        if isinstance(self._daemon_proxy, DaemonSSLProxy):
+            self._daemon_proxy.call_timeout = self.call_timeout
+
+    def set_max_in_flight(self, max_in_flight):
+        """
+        Set the maximum number of calls waiting for a response from the daemon,
+        further calls are queued until responses arrive.
+
+        :param max_in_flight: the number of calls, None for no limit
+        :type max_in_flight: int
+
+        """
+        self.max_in_flight = max_in_flight
+        if isinstance(self._daemon_proxy, DaemonSSLProxy):
+            self._daemon_proxy.max_in_flight = max_in_flight
+
+    def get_call_stats(self):
+        """
+        Get the latency statistics of the calls made on the current connection.
+
+        :returns: dict of method name to a dict of count, errors, mean, max,
+            percentiles and histogram buckets, with durations in seconds
+        :rtype: dict
+
+        """
+        if isinstance(self._daemon_proxy, DaemonSSLProxy):
+            return self._daemon_proxy.get_call_stats()
+        return {}
+
     def force_call(self, block=False):
         # no-op for now.. we'll see if we need this in the future
         pass
@@ -0,0 +1,453 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""
+Client agent that keeps authenticated daemon connections open for short-lived
+clients such as ``deluge-console`` commands.
+
+The agent listens on a UNIX socket and speaks the normal Deluge RPC wire
+protocol. A client first sends an ``agent.attach`` request with the daemon
+host and port, after which ``daemon.info`` and ``daemon.login`` are answered
+from a pooled connection to that daemon. All other requests are forwarded
+over the pooled connection with their request ids remapped, and events the
+client registered interest in are fanned out from the pooled connection.
+"""
+
+from __future__ import unicode_literals
+
+import hashlib
+import logging
+import os
+import sys
+import traceback
+
+from twisted.internet import defer, reactor
+from twisted.internet.protocol import Factory, connectionDone
+
+from deluge import error
+from deluge.argparserbase import ArgParserBase
+from deluge.common import AUTH_LEVEL_NONE, get_version
+from deluge.i18n import setup_translation
+from deluge.transfer import DelugeTransferProtocol
+from deluge.ui.client import (
+    AGENT_SOCKET,
+    RPC_ERROR,
+    RPC_EVENT,
+    RPC_RESPONSE,
+    DaemonSSLProxy,
+)
+
+log = logging.getLogger(__name__)
+
+# Seconds a pooled connection without clients is kept open.
+IDLE_TIMEOUT = 300
+
+
+def _password_digest(salt, password):
+    return hashlib.sha256(salt + password.encode('utf8')).digest()
+
+
+class PooledConnection(object):
+    """
+    An authenticated connection to a daemon shared by the agent clients.
+
+    :param pool: the pool the connection belongs to
+    :type pool: ConnectionPool
+    :param key: the (host, port, username) key of the connection
+    :type key: tuple
+    :param proxy: the connected daemon proxy
+    :type proxy: deluge.ui.client.DaemonSSLProxy
+    :param daemon_info: the daemon version returned on connect
+    :type daemon_info: str
+    """
+
+    def __init__(self, pool, key, proxy, daemon_info):
+        self.pool = pool
+        self.key = key
+        self.proxy = proxy
+        self.daemon_info = daemon_info
+        self.auth_level = AUTH_LEVEL_NONE
+        self.salt = os.urandom(16)
+        self.digest = None
+        self.clients = set()
+        self.interests = {}
+        self.idle_timer = None
+        self.login_waiters = None
+
+    def login(self, username, password, client_version):
+        """
+        Authenticate the connection. Once authenticated, later logins with
+        the same password are answered without contacting the daemon, while
+        a different password is checked by the daemon again.
+
+        :returns: A Deferred fired with the auth level
+        :rtype: twisted.internet.defer.Deferred
+        """
+        if self.login_waiters is not None:
+            # Wait for the running login so its result can be reused.
+            d = defer.Deferred()
+            self.login_waiters.append((d, (username, password, client_version)))
+            return d
+
+        digest = _password_digest(self.salt, password)
+        if self.digest is not None and self.digest == digest:
+            return defer.succeed(self.auth_level)
+
+        def on_login(auth_level):
+            self.auth_level = auth_level
+            self.digest = digest
+            return auth_level
+
+        def on_done(result):
+            waiters, self.login_waiters = self.login_waiters, None
+            for waiter, args in waiters:
+                self.login(*args).chainDeferred(waiter)
+            return result
+
+        self.login_waiters = []
+        d = self.proxy.call(
+            'daemon.login', username, password, client_version=client_version
+        )
+        d.addCallback(on_login)
+        d.addBoth(on_done)
+        return d
+
+    def attach(self, client):
+        self.clients.add(client)
+        if self.idle_timer and self.idle_timer.active():
+            self.idle_timer.cancel()
+        self.idle_timer = None
+
+    def detach(self, client):
+        self.clients.discard(client)
+        for clients in self.interests.values():
+            clients.discard(client)
+        if not self.clients and self.pool.connections.get(self.key) is self:
+            self.idle_timer = reactor.callLater(
+                self.pool.idle_timeout, self.pool.close, self
+            )
+
+    def set_event_interest(self, client, events):
+        """Register a client for events, registering new ones with the daemon."""
+        for event in events:
+            if event not in self.interests:
+                self.interests[event] = set()
+                self.proxy.register_event_handler(event, self._make_handler(event))
+            self.interests[event].add(client)
+
+    def _make_handler(self, event):
+        def on_event(*args):
+            for client in list(self.interests.get(event, ())):
+                client.send_event(event, args)
+
+        return on_event
+
+    def on_disconnect(self):
+        log.info('Lost pooled connection to %s:%s as %s', *self.key)
+        self.pool.remove(self)
+        for client in list(self.clients):
+            client.transport.loseConnection()
+
+
+class ConnectionPool(object):
+    """
+    The daemon connections of the agent, keyed by (host, port, username).
+
+    Connections are made on the first ``daemon.info`` request for a host and
+    bound to a username on login.
+    """
+
+    def __init__(self, idle_timeout=IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self.connections = {}
+        self.unbound = {}
+
+    def get_unbound(self, host, port):
+        """
+        Get a connected but not yet authenticated connection to a daemon.
+
+        :returns: A Deferred fired with a PooledConnection
+        :rtype: twisted.internet.defer.Deferred
+        """
+        entry = self.unbound.get((host, port))
+        if isinstance(entry, PooledConnection):
+            return defer.succeed(entry)
+
+        d = defer.Deferred()
+        if entry is not None:
+            # A connection is being made, wait for it.
+            entry.append(d)
+            return d
+
+        waiters = self.unbound[(host, port)] = [d]
+        proxy = DaemonSSLProxy()
+
+        def on_connect(daemon_info):
+            conn = PooledConnection(self, (host, port, None), proxy, daemon_info)
+            proxy.set_disconnect_callback(conn.on_disconnect)
+            self.unbound[(host, port)] = conn
+            for waiter in waiters:
+                waiter.callback(conn)
+
+        def on_connect_fail(failure):
+            del self.unbound[(host, port)]
+            for waiter in waiters:
+                waiter.errback(failure)
+
+        proxy.connect(host, port).addCallbacks(on_connect, on_connect_fail)
+        return d
+
+    def login(self, host, port, username, password, client_version):
+        """
+        Get an authenticated connection for a user, making one if needed.
+
+        :returns: A Deferred fired with the PooledConnection
+        :rtype: twisted.internet.defer.Deferred
+        """
+        key = (host, port, username)
+        if key in self.connections:
+            conn = self.connections[key]
+            d = conn.login(username, password, client_version)
+            return d.addCallback(lambda auth_level: conn)
+
+        def on_unbound(conn):
+            if key in self.connections or conn.key[2] is not None:
+                # Another client logged in with the connection in the meantime.
+                return self.login(host, port, username, password, client_version)
+
+            # The unbound connection now belongs to this user.
+            del self.unbound[(host, port)]
+            conn.key = key
+            self.connections[key] = conn
+            log.info('Pooled connection to %s:%s as %s', *key)
+
+            def on_login_fail(failure):
+                self.close(conn)
+                return failure
+
+            d = conn.login(username, password, client_version)
+            d.addCallbacks(lambda auth_level: conn, on_login_fail)
+            return d
+
+        return self.get_unbound(host, port).addCallback(on_unbound)
+
+    def remove(self, conn):
+        if self.connections.get(conn.key) is conn:
+            del self.connections[conn.key]
+        if self.unbound.get(conn.key[:2]) is conn:
+            del self.unbound[conn.key[:2]]
+
+    def close(self, conn):
+        self.remove(conn)
+        if conn.idle_timer and conn.idle_timer.active():
+            conn.idle_timer.cancel()
+        if conn.proxy.connected:
+            conn.proxy.set_disconnect_callback(None)
+            conn.proxy.disconnect()
+
+    def close_all(self):
+        conns = list(self.connections.values()) + [
+            conn for conn in self.unbound.values() if isinstance(conn, PooledConnection)
+        ]
+        for conn in conns:
+            self.close(conn)
+
+
+class AgentProtocol(DelugeTransferProtocol):
+    """A connection from a client to the agent."""
+
+    def __init__(self):
+        super(AgentProtocol, self).__init__()
+        self.daemon = None
+        self.conn = None
+        # The forwarded request Deferreds by client request_id.
+        self.requests = {}
+
+    def connectionLost(self, reason=connectionDone):  # NOQA: N802
+        for d in list(self.requests.values()):
+            d.cancel()
+        if self.conn:
+            self.conn.detach(self)
+            self.conn = None
+
+    def message_received(self, request):
+        if not isinstance(request, tuple):
+            log.debug('Received invalid message: type is not tuple')
+            return
+
+        for call in request:
+            if len(call) != 4:
+                log.debug('Received invalid rpc request: %s items', len(call))
+                continue
+            self.dispatch(*call)
+
+    def send_response(self, request_id, result):
+        self.transfer_message((RPC_RESPONSE, request_id, result))
+
+    def send_error(self, request_id, failure):
+        exception = failure.value
+        if not isinstance(exception, error.DelugeError):
+            exception = error.WrappedException(
+                str(exception),
+                exception.__class__.__name__,
+                failure.getTraceback(),
+            )
+        self.transfer_message(
+            (
+                RPC_ERROR,
+                request_id,
+                exception.__class__.__name__,
+                exception._args,
+                exception._kwargs,
+                failure.getTraceback(),
+            )
+        )
+
+    def send_event(self, event, args):
+        if self.transport.connected:
+            self.transfer_message((RPC_EVENT, event, list(args)))
+
+    def dispatch(self, request_id, method, args, kwargs):
+        def on_result(result):
+            self.requests.pop(request_id, None)
+            if self.transport.connected:
+                self.send_response(request_id, result)
+
+        def on_error(failure):
+            self.requests.pop(request_id, None)
+            if failure.check(defer.CancelledError):
+                return
+            if self.transport.connected:
+                self.send_error(request_id, failure)
+
+        if method == 'daemon.cancel_request':
+            # Cancel the forwarded request, which cancels it in the daemon.
+            d = self.requests.get(args[0])
+            if d is not None:
+                d.cancel()
+            self.send_response(request_id, True)
+            return
+
+        d = defer.maybeDeferred(self._call, method, args, kwargs)
+        if not d.called:
+            self.requests[request_id] = d
+        d.addCallbacks(on_result, on_error)
+
+    def _call(self, method, args, kwargs):
+        pool = self.factory.pool
+
+        if method == 'agent.attach':
+            self.daemon = tuple(args[:2])
+            return True
+
+        if self.daemon is None:
+            raise error.DelugeError('agent.attach must be called first')
+
+        if method == 'daemon.info':
+            if self.conn:
+                return self.conn.daemon_info
+            return pool.get_unbound(*self.daemon).addCallback(
+                lambda conn: conn.daemon_info
+            )
+
+        if method == 'daemon.login':
+            client_version = kwargs.get('client_version')
+            if client_version is None:
+                raise error.IncompatibleClient(get_version())
+
+            def on_login(conn):
+                if self.conn is not conn:
+                    if self.conn:
+                        self.conn.detach(self)
+                    self.conn = conn
+                    conn.attach(self)
+                return conn.auth_level
+
+            d = pool.login(
+                self.daemon[0], self.daemon[1], args[0], args[1], client_version
+            )
+            return d.addCallback(on_login)
+
+        if self.conn is None:
+            raise error.NotAuthorizedError(AUTH_LEVEL_NONE, 1)
+
+        if method == 'daemon.set_event_interest':
+            self.conn.set_event_interest(self, args[0])
+            return True
+
+        return self.conn.proxy.call(method, *args, **kwargs)
+
+
+class ClientAgent(object):
+    """
+    Listens on a UNIX socket and serves clients from pooled daemon connections.
+
+    :param socket_path: the path of the UNIX socket to listen on
+    :type socket_path: str
+    :param idle_timeout: seconds to keep a daemon connection open without clients
+    :type idle_timeout: int
+    """
+
+    def __init__(self, socket_path, idle_timeout=IDLE_TIMEOUT):
+        self.socket_path = socket_path
+        self.factory = Factory()
+        self.factory.protocol = AgentProtocol
+        self.factory.noisy = False
+        self.factory.pool = ConnectionPool(idle_timeout)
+        self.port = None
+
+    def start(self):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        log.info('Starting client agent on %s', self.socket_path)
+        self.port = reactor.listenUNIX(self.socket_path, self.factory, mode=0o600)
+
+    def stop(self):
+        self.factory.pool.close_all()
+        if self.port:
+            d = self.port.stopListening()
+            self.port = None
+            return d
+        return defer.succeed(None)
+
+
+def start():
+    """Entry point for the deluge-client-agent script."""
+    setup_translation()
+    parser = ArgParserBase()
+    parser.add_argument(
+        '-s',
+        '--socket',
+        metavar='<path>',
+        action='store',
+        help=_('UNIX socket path to listen on (default: <config>/%s)') % AGENT_SOCKET,
+    )
+    parser.add_argument(
+        '--idle-timeout',
+        metavar='<secs>',
+        action='store',
+        type=int,
+        default=IDLE_TIMEOUT,
+        help=_('Seconds to keep unused daemon connections open'),
+    )
+    parser.add_process_arg_group()
+    options = parser.parse_args()
+
+    from deluge.configmanager import get_config_dir
+
+    agent = ClientAgent(
+        options.socket or get_config_dir(AGENT_SOCKET), options.idle_timeout
+    )
+    try:
+        agent.start()
+    except Exception as ex:
+        log.error('Unable to start client agent: %s', ex)
+        log.debug(traceback.format_exc())
+        sys.exit(1)
+
+    reactor.addSystemEventTrigger('before', 'shutdown', agent.stop)
+    reactor.run()
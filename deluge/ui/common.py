@@ -14,15 +14,19 @@
 from __future__ import unicode_literals
 
 import logging
+import multiprocessing
 import os
 from binascii import hexlify
 from hashlib import sha1 as sha
 
 from deluge import bencode
-from deluge.common import decode_bytes
+from deluge.common import decode_bytes, windows_check
 
 log = logging.getLogger(__name__)
 
+# The number of torrent files from which they are parsed in worker processes.
+PARSE_PROCESSES_MIN = 8
+
 
 # Dummy translation dicts so the text is available for Translators.
 #
@@ -172,6 +176,8 @@ def _(message):
 class TorrentInfo(object):
     """Collects information about a torrent file.
 
+    The file list and files tree are built on first use.
+
     Args:
         filename (str, optional): The path to the .torrent file.
         filetree (int, optional): The version of filetree to create (defaults to 1).
@@ -181,6 +187,10 @@ class TorrentInfo(object):
 
     def __init__(self, filename='', filetree=1, torrent_file=None):
         self._filedata = None
+        self._filetree = filetree
+        self._files = None
+        self._files_tree = None
+        info_span = None
         if torrent_file:
             self._metainfo = torrent_file
         elif filename:
@@ -193,7 +203,7 @@ def __init__(self, filename='', filetree=1, torrent_file=None):
                 return
 
             try:
-                self._metainfo = bencode.bdecode(self._filedata)
+                self._metainfo, info_span = bencode.bdecode_info(self._filedata)
             except bencode.BTFailure as ex:
                 log.warning('Failed to decode %s: %s', filename, ex)
                 return
@@ -201,101 +211,105 @@ def __init__(self, filename='', filetree=1, torrent_file=None):
             log.warning('Requires valid arguments.')
             return
 
-        # info_dict with keys decoded to unicode.
-        info_dict = {k.decode(): v for k, v in self._metainfo[b'info'].items()}
-        self._info_hash = sha(bencode.bencode(info_dict)).hexdigest()
+        info_dict = self._metainfo[b'info']
+        if info_span:
+            self._info_hash = sha(self._filedata[slice(*info_span)]).hexdigest()
+        else:
+            self._info_hash = sha(bencode.bencode(info_dict)).hexdigest()
 
         # Get encoding from torrent file if available
-        encoding = info_dict.get('encoding', None)
-        codepage = info_dict.get('codepage', None)
+        encoding = info_dict.get(b'encoding', None)
+        codepage = info_dict.get(b'codepage', None)
         if not encoding:
             encoding = codepage if codepage else b'UTF-8'
-        if encoding:
-            encoding = encoding.decode()
+        self._encoding = encoding.decode()
 
         # Decode 'name' with encoding unless 'name.utf-8' found.
-        if 'name.utf-8' in info_dict:
-            self._name = decode_bytes(info_dict['name.utf-8'])
+        if b'name.utf-8' in info_dict:
+            self._name = decode_bytes(info_dict[b'name.utf-8'])
         else:
-            self._name = decode_bytes(info_dict['name'], encoding)
-
-        # Get list of files from torrent info
-        self._files = []
-        if 'files' in info_dict:
-            paths = {}
-            dirs = {}
-            prefix = self._name if len(info_dict['files']) > 1 else ''
-
-            for index, f in enumerate(info_dict['files']):
-                f = {k.decode(): v for k, v in f.items()}
-
-                if 'path.utf-8' in f:
-                    path = decode_bytes(os.path.join(*f['path.utf-8']))
-                    del f['path.utf-8']
-                else:
-                    path = decode_bytes(os.path.join(*f['path']), encoding)
-
-                if prefix:
-                    path = os.path.join(prefix, path)
-
-                self._files.append(
-                    {'path': path, 'size': f['length'], 'download': True}
-                )
-
-                f['path'] = path
-                f['index'] = index
-                if 'sha1' in f and len(f['sha1']) == 20:
-                    f['sha1'] = hexlify(f['sha1']).decode()
-                if 'ed2k' in f and len(f['ed2k']) == 16:
-                    f['ed2k'] = hexlify(f['ed2k']).decode()
-                if 'filehash' in f and len(f['filehash']) == 20:
-                    f['filehash'] = hexlify(f['filehash']).decode()
-
-                paths[path] = f
-                dirname = os.path.dirname(path)
-                while dirname:
-                    dirinfo = dirs.setdefault(dirname, {})
-                    dirinfo['length'] = dirinfo.get('length', 0) + f['length']
-                    dirname = os.path.dirname(dirname)
-
-            if filetree == 2:
-
-                def walk(path, item):
-                    if item['type'] == 'dir':
-                        item.update(dirs[path])
-                    else:
-                        item.update(paths[path])
-                    item['download'] = True
-
-                file_tree = FileTree2(list(paths))
-                file_tree.walk(walk)
+            self._name = decode_bytes(info_dict[b'name'], self._encoding)
+
+    def _file_paths(self):
+        """The decoded paths of the files of a multi-file torrent."""
+        torrent_files = self._metainfo[b'info'][b'files']
+        prefix = self._name if len(torrent_files) > 1 else ''
+        encoding = self._encoding
+        paths = []
+        for torrent_file in torrent_files:
+            if b'path.utf-8' in torrent_file:
+                path = decode_bytes(os.path.join(*torrent_file[b'path.utf-8']))
             else:
+                path = decode_bytes(os.path.join(*torrent_file[b'path']), encoding)
+            if prefix:
+                path = os.path.join(prefix, path)
+            paths.append(path)
+        return paths
 
-                def walk(path, item):
-                    if isinstance(item, dict):
-                        return item
-                    return [paths[path]['index'], paths[path]['length'], True]
+    def _build_files_tree(self):
+        """Build the files tree in a single pass over the files.
 
-                file_tree = FileTree(paths)
-                file_tree.walk(walk)
-            self._files_tree = file_tree.get_tree()
-        else:
-            self._files.append(
-                {'path': self._name, 'size': info_dict['length'], 'download': True}
-            )
-            if filetree == 2:
-                self._files_tree = {
+        The folders are created and their sizes summed while descending the
+        path of each file.
+        """
+        info_dict = self._metainfo[b'info']
+        if b'files' not in info_dict:
+            length = info_dict[b'length']
+            if self._filetree == 2:
+                return {
                     'contents': {
                         self._name: {
                             'type': 'file',
                             'index': 0,
-                            'length': info_dict['length'],
+                            'length': length,
                             'download': True,
                         }
                     }
                 }
-            else:
-                self._files_tree = {self._name: (0, info_dict['length'], True)}
+            return {self._name: (0, length, True)}
+
+        files = zip(self.files, info_dict[b'files'])
+        if self._filetree != 2:
+            tree = {}
+            for index, (torrent_file, file_dict) in enumerate(files):
+                parts = torrent_file['path'].split('/')
+                parent = tree
+                for part in parts[:-1]:
+                    parent = parent.setdefault(part, {})
+                parent[parts[-1]] = (index, torrent_file['size'], True)
+            return tree
+
+        tree = {'contents': {}, 'type': 'dir'}
+        for index, (torrent_file, file_dict) in enumerate(files):
+            path = torrent_file['path']
+            length = torrent_file['size']
+            parts = path.split('/')
+            parent = tree
+            for part in parts[:-1]:
+                contents = parent['contents']
+                parent = contents.get(part)
+                if parent is None:
+                    parent = contents[part] = {
+                        'type': 'dir',
+                        'contents': {},
+                        'length': 0,
+                        'download': True,
+                    }
+                parent['length'] += length
+
+            item = {k.decode(): v for k, v in file_dict.items()}
+            item.pop('path.utf-8', None)
+            item.update(
+                {'type': 'file', 'path': path, 'index': index, 'download': True}
+            )
+            if 'sha1' in item and len(item['sha1']) == 20:
+                item['sha1'] = hexlify(item['sha1']).decode()
+            if 'ed2k' in item and len(item['ed2k']) == 16:
+                item['ed2k'] = hexlify(item['ed2k']).decode()
+            if 'filehash' in item and len(item['filehash']) == 20:
+                item['filehash'] = hexlify(item['filehash']).decode()
+            parent['contents'][parts[-1]] = item
+        return tree
 
     @classmethod
     def from_metadata(cls, metadata, trackers=None):
@@ -354,6 +368,19 @@ def files(self):
             list: The list of torrent files.
 
         """
+        if self._files is None:
+            info_dict = self._metainfo[b'info']
+            if b'files' in info_dict:
+                self._files = [
+                    {'path': path, 'size': torrent_file[b'length'], 'download': True}
+                    for path, torrent_file in zip(
+                        self._file_paths(), info_dict[b'files']
+                    )
+                ]
+            else:
+                self._files = [
+                    {'path': self._name, 'size': info_dict[b'length'], 'download': True}
+                ]
         return self._files
 
     @property
@@ -372,6 +399,8 @@ def files_tree(self):
             dict: The tree of files.
 
         """
+        if self._files_tree is None:
+            self._files_tree = self._build_files_tree()
         return self._files_tree
 
     @property
@@ -399,6 +428,82 @@ def filedata(self):
         return self._filedata
 
 
+def _parse_torrent_file(args):
+    """Parse a torrent file in a worker, returning the exception on failure."""
+    filename, filetree, keys = args
+    try:
+        info = TorrentInfo(filename, filetree)
+        if not hasattr(info, '_info_hash'):
+            return ValueError('Unable to read torrent file: %s' % filename)
+        # Only the wanted fields are sent back from the worker processes.
+        return info.as_dict(*keys)
+    except Exception as ex:
+        return ex
+
+
+def _parse_pool(processes):
+    """A pool of worker processes started without forking the caller.
+
+    The UIs run GTK and Twisted threads which a forked child could deadlock
+    on, so the workers are spawned, or not used where spawn is not
+    available.
+
+    Returns:
+        multiprocessing.Pool: The pool, or None if unable to start it.
+
+    """
+    try:
+        context = multiprocessing.get_context('spawn')
+    except AttributeError:
+        log.debug('Torrent parsing processes require Python 3')
+        return None
+
+    try:
+        return context.Pool(processes)
+    except (OSError, ImportError) as ex:
+        log.debug('Unable to start torrent parsing processes: %s', ex)
+        return None
+
+
+def parse_torrent_files(
+    filenames, filetree=1, keys=('info_hash', 'name', 'files'), processes=None
+):
+    """Parse torrent files, in worker processes when there are several.
+
+    Args:
+        filenames (list): The paths to the .torrent files.
+        filetree (int, optional): The version of filetree to create.
+        keys (tuple, optional): The TorrentInfo properties to return.
+        processes (int, optional): The number of worker processes, defaults
+            to the number of CPUs.
+
+    Yields:
+        tuple: The filename and a dict of the `keys` properties, or the
+            exception raised parsing it, in the order of `filenames`.
+
+    """
+    args = [(filename, filetree, keys) for filename in filenames]
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    pool = None
+    if len(args) >= PARSE_PROCESSES_MIN and processes > 1 and not windows_check():
+        pool = _parse_pool(min(processes, len(args)))
+
+    if pool is None:
+        for arg in args:
+            yield arg[0], _parse_torrent_file(arg)
+        return
+
+    try:
+        results = pool.imap(_parse_torrent_file, args, chunksize=4)
+        for index, result in enumerate(results):
+            yield args[index][0], result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
 class FileTree2(object):
     """
     Converts a list of paths in to a file tree.
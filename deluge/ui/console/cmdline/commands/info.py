@@ -8,8 +8,10 @@
 # See LICENSE for more details.
 #
 
-from __future__ import division, unicode_literals
+from __future__ import division, print_function, unicode_literals
 
+import json
+import sys
 from os.path import sep as dirsep
 
 import deluge.component as component
@@ -72,10 +74,37 @@
     'time_added',
 ]
 
+# The fields of the machine readable formats unless given with --fields.
+DEFAULT_FIELDS = [
+    key
+    for key in STATUS_KEYS
+    if key not in ('files', 'file_priorities', 'file_progress', 'peers')
+]
+
+FORMATS = ['text', 'json', 'csv']
+
+# The number of torrents requested at a time.
+PAGE_SIZE = 500
+
 # Add filter specific state to torrent states
 STATES = ['Active'] + TORRENT_STATE
 
 
+def format_csv(values):
+    """Format values as a line of comma separated values."""
+    fields = []
+    for value in values:
+        if isinstance(value, (list, dict)):
+            value = json.dumps(value)
+        elif value is None:
+            value = ''
+        value = '%s' % (value,)
+        if any(char in value for char in ',"\r\n'):
+            value = '"%s"' % value.replace('"', '""')
+        fields.append(value)
+    return ','.join(fields)
+
+
 class Command(BaseCommand):
     """Show information about the torrents"""
 
@@ -131,6 +160,33 @@ def add_arguments(self, parser):
             dest='sort_rev',
             help=_('Same as --sort but items are in reverse order.'),
         )
+        parser.add_argument(
+            '--format',
+            action='store',
+            choices=FORMATS,
+            default='text',
+            dest='format',
+            help=_(
+                'Output format, json and csv print a line per torrent as the '
+                'torrents are received.'
+            ),
+        )
+        parser.add_argument(
+            '--fields',
+            action='store',
+            type=str,
+            default='',
+            dest='fields',
+            help=_('Comma separated status keys output by the json and csv formats.'),
+        )
+        parser.add_argument(
+            '--page-size',
+            action='store',
+            type=int,
+            default=PAGE_SIZE,
+            dest='page_size',
+            help=_('The number of torrents requested from the daemon at a time.'),
+        )
         parser.add_argument(
             'torrent_ids',
             metavar='<torrent-id>',
@@ -150,58 +206,132 @@ def add_subparser(self, subparsers):
 
     def handle(self, options):
         self.console = component.get('ConsoleUI')
-        # Compile a list of torrent_ids to request the status of
-        torrent_ids = []
-
-        if options.torrent_ids:
-            for t_id in options.torrent_ids:
-                torrent_ids.extend(self.console.match_torrent(t_id))
-        else:
-            torrent_ids.extend(self.console.match_torrent(''))
 
-        def on_torrents_status(status):
-            # Print out the information for each torrent
-            sort_key = options.sort
+        # Print out the information for each torrent
+        sort_key = options.sort
+        sort_reverse = False
+        if not sort_key:
+            sort_key = options.sort_rev
+            sort_reverse = True
+        if not sort_key and options.format == 'text':
+            sort_key = 'name'
+            sort_reverse = False
+        if sort_key and sort_key not in STATUS_KEYS:
+            self.console.write('')
+            self.console.write(
+                '{!error!}Unknown sort key: ' + sort_key + ', will sort on name'
+            )
+            sort_key = 'name'
             sort_reverse = False
-            if not sort_key:
-                sort_key = options.sort_rev
-                sort_reverse = True
-            if not sort_key:
-                sort_key = 'name'
-                sort_reverse = False
-            if sort_key not in STATUS_KEYS:
-                self.console.write('')
+
+        if options.format == 'text':
+            keys = STATUS_KEYS
+        elif options.fields:
+            keys = [key.strip() for key in options.fields.split(',')]
+            unknown = [key for key in keys if key not in STATUS_KEYS]
+            if unknown:
                 self.console.write(
-                    '{!error!}Unknown sort key: ' + sort_key + ', will sort on name'
+                    '{!error!}Unknown fields: %s. Possible values are: %s.'
+                    % (', '.join(unknown), ', '.join(STATUS_KEYS))
                 )
-                sort_key = 'name'
-                sort_reverse = False
-            for key, value in sorted(
-                list(status.items()),
-                key=lambda x: x[1].get(sort_key),
-                reverse=sort_reverse,
-            ):
-                self.show_info(key, status[key], options.verbose, options.detailed)
-
-        def on_torrents_status_fail(reason):
-            self.console.write('{!error!}Error getting torrent info: %s' % reason)
+                return
+        else:
+            keys = DEFAULT_FIELDS
 
-        status_dict = {'id': torrent_ids}
+        status_dict = {}
 
         if options.state:
             options.state = options.state.capitalize()
             if options.state in STATES:
-                status_dict.state = options.state
+                status_dict['state'] = options.state
             else:
                 self.console.write('Invalid state: %s' % options.state)
                 self.console.write('Possible values are: %s.' % (', '.join(STATES)))
                 return
 
-        d = client.core.get_torrents_status(status_dict, STATUS_KEYS)
-        d.addCallback(on_torrents_status)
+        def on_torrents_status_fail(reason):
+            self.console.write('{!error!}Error getting torrent info: %s' % reason)
+
+        if options.torrent_ids:
+            d = self.console.lookup_torrents(options.torrent_ids)
+        else:
+            d = client.core.get_session_state()
+        if sort_key:
+            d.addCallback(self.sort_torrents, status_dict, sort_key, sort_reverse)
+        d.addCallback(self.stream_torrents, status_dict, keys, options)
         d.addErrback(on_torrents_status_fail)
         return d
 
+    def sort_torrents(self, torrent_ids, status_dict, sort_key, reverse=False):
+        """Sort torrents fetching only the value of the sort key.
+
+        Returns:
+            Deferred: Fires with the sorted torrent ids.
+
+        """
+
+        def on_torrents_status(status):
+            return sorted(
+                status, key=lambda t_id: status[t_id].get(sort_key), reverse=reverse
+            )
+
+        filter_dict = dict(status_dict, id=torrent_ids)
+        d = client.core.get_torrents_status(filter_dict, [sort_key])
+        return d.addCallback(on_torrents_status)
+
+    def stream_torrents(self, torrent_ids, status_dict, keys, options):
+        """Request the torrents a page at a time and print each page as it
+        arrives, so only a page of status is held at once.
+
+        Returns:
+            Deferred: Fires when all pages are printed.
+
+        """
+        page_size = max(1, options.page_size)
+        if options.format == 'csv':
+            self.write_line(format_csv(['id'] + keys))
+
+        def on_page(status, page):
+            for torrent_id in page:
+                # The torrent was removed or filtered out.
+                if torrent_id not in status:
+                    continue
+                if options.format == 'text':
+                    self.show_info(
+                        torrent_id,
+                        status[torrent_id],
+                        options.verbose,
+                        options.detailed,
+                    )
+                    continue
+                values = [status[torrent_id].get(key) for key in keys]
+                if options.format == 'json':
+                    fields = dict(zip(keys, values))
+                    fields['id'] = torrent_id
+                    self.write_line(json.dumps(fields, sort_keys=True))
+                else:
+                    self.write_line(format_csv([torrent_id] + values))
+
+        def request_page(result, start):
+            page = torrent_ids[start : start + page_size]
+            if not page:
+                return
+            filter_dict = dict(status_dict, id=page)
+            d = client.core.get_torrents_status(filter_dict, keys)
+            d.addCallback(on_page, page)
+            d.addCallback(request_page, start + page_size)
+            return d
+
+        return request_page(None, 0)
+
+    def write_line(self, line):
+        """Write a line of the json or csv output without color formatting."""
+        if self.console.interactive:
+            self.console.write(line)
+        else:
+            print(line)
+            sys.stdout.flush()
+
     def show_file_info(self, torrent_id, status):
         spaces_per_level = 2
 
@@ -74,8 +74,6 @@ def on_torrents_status(status):
         def on_torrents_status_fail(reason):
             self.console.write('{!error!}Failed to get torrent data.')
 
-        torrent_ids = self.console.match_torrent(options.torrent)
-
         request_options = []
         for opt in options.values:
             if opt not in TORRENT_OPTIONS:
@@ -86,15 +84,17 @@ def on_torrents_status_fail(reason):
             request_options = list(TORRENT_OPTIONS)
         request_options.append('name')
 
-        d = client.core.get_torrents_status({'id': torrent_ids}, request_options)
-        d.addCallbacks(on_torrents_status, on_torrents_status_fail)
-        return d
+        def on_match(torrent_ids):
+            d = client.core.get_torrents_status({'id': torrent_ids}, request_options)
+            d.addCallbacks(on_torrents_status, on_torrents_status_fail)
+            return d
+
+        return self.console.lookup_torrents([options.torrent]).addCallback(on_match)
 
     def _set_option(self, options):
         deferred = defer.Deferred()
         key = options.set
         val = ' '.join(options.values)
-        torrent_ids = self.console.match_torrent(options.torrent)
 
         if key not in TORRENT_OPTIONS:
             self.console.write('{!error!}Invalid key: %s' % key)
@@ -106,12 +106,15 @@ def on_set_config(result):
             self.console.write('{!success!}Torrent option successfully updated.')
             deferred.callback(True)
 
-        self.console.write(
-            'Setting %s to %s for torrents %s..' % (key, val, torrent_ids)
-        )
-        client.core.set_torrent_options(torrent_ids, {key: val}).addCallback(
-            on_set_config
-        )
+        def on_match(torrent_ids):
+            self.console.write(
+                'Setting %s to %s for torrents %s..' % (key, val, torrent_ids)
+            )
+            client.core.set_torrent_options(torrent_ids, {key: val}).addCallback(
+                on_set_config
+            )
+
+        self.console.lookup_torrents([options.torrent]).addCallback(on_match)
         return deferred
 
     def complete(self, line):
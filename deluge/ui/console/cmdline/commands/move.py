@@ -44,21 +44,20 @@ def handle(self, options):
             )
             return
 
-        ids = []
-        names = []
-        for t_id in options.torrent_ids:
-            tid = self.console.match_torrent(t_id)
-            ids.extend(tid)
-            names.append(self.console.get_torrent_name(tid))
-
-        def on_move(res):
+        def on_move(res, names):
             msg = 'Moved "%s" to %s' % (', '.join(names), options.path)
             self.console.write(msg)
             log.info(msg)
 
-        d = client.core.move_storage(ids, options.path)
-        d.addCallback(on_move)
-        return d
+        def on_names(names, ids):
+            d = client.core.move_storage(ids, options.path)
+            d.addCallback(on_move, [names[tid] for tid in ids])
+            return d
+
+        def on_match(ids):
+            return self.console.get_torrent_names(ids).addCallback(on_names, ids)
+
+        return self.console.lookup_torrents(options.torrent_ids).addCallback(on_match)
 
     def complete(self, line):
         line = os.path.abspath(os.path.expanduser(line))
@@ -35,12 +35,11 @@ def handle(self, options):
             client.core.force_recheck(self.console.match_torrent(''))
             return
 
-        torrent_ids = []
-        for arg in options.torrent_ids:
-            torrent_ids.extend(self.console.match_torrent(arg))
+        def on_match(torrent_ids):
+            if torrent_ids:
+                return client.core.force_recheck(torrent_ids)
 
-        if torrent_ids:
-            return client.core.force_recheck(torrent_ids)
+        return self.console.lookup_torrents(options.torrent_ids).addCallback(on_match)
 
     def complete(self, line):
         # We use the ConsoleUI torrent tab complete method
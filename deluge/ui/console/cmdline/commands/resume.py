@@ -36,12 +36,11 @@ def handle(self, options):
             client.core.resume_session()
             return
 
-        torrent_ids = []
-        for t_id in options.torrent_ids:
-            torrent_ids.extend(self.console.match_torrent(t_id))
+        def on_match(torrent_ids):
+            if torrent_ids:
+                return client.core.resume_torrent(torrent_ids)
 
-        if torrent_ids:
-            return client.core.resume_torrent(torrent_ids)
+        return self.console.lookup_torrents(options.torrent_ids).addCallback(on_match)
 
     def complete(self, line):
         # We use the ConsoleUI torrent tab complete method
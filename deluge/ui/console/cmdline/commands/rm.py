@@ -48,26 +48,33 @@ def add_arguments(self, parser):
 
     def handle(self, options):
         self.console = component.get('ConsoleUI')
-        torrent_ids = self.console.match_torrents(options.torrent_ids)
-
+        d = self.console.lookup_torrents(options.torrent_ids)
         if not options.confirm:
-            self.console.write(
-                '{!info!}%d %s %s{!info!}'
-                % (
-                    len(torrent_ids),
-                    _n('torrent', 'torrents', len(torrent_ids)),
-                    _n('match', 'matches', len(torrent_ids)),
-                )
-            )
-            for t_id in torrent_ids:
-                name = self.console.get_torrent_name(t_id)
-                self.console.write('* %-50s (%s)' % (name, t_id))
-            self.console.write(
-                _('Confirm with -c to remove the listed torrents (Count: %d)')
-                % len(torrent_ids)
+            d.addCallback(self.console.get_torrent_names)
+            d.addCallback(self._list_torrents)
+        else:
+            d.addCallback(self._remove_torrents, options.remove_data)
+        return d
+
+    def _list_torrents(self, names):
+        torrent_ids = list(names)
+        self.console.write(
+            '{!info!}%d %s %s{!info!}'
+            % (
+                len(torrent_ids),
+                _n('torrent', 'torrents', len(torrent_ids)),
+                _n('match', 'matches', len(torrent_ids)),
             )
-            return
+        )
+        for t_id in torrent_ids:
+            name = names[t_id]
+            self.console.write('* %-50s (%s)' % (name, t_id))
+        self.console.write(
+            _('Confirm with -c to remove the listed torrents (Count: %d)')
+            % len(torrent_ids)
+        )
 
+    def _remove_torrents(self, torrent_ids, remove_data):
         def on_removed_finished(errors):
             if errors:
                 self.console.write('Error(s) occured when trying to delete torrent(s).')
@@ -75,8 +82,9 @@ def on_removed_finished(errors):
                     self.console.write('Error removing torrent %s : %s' % (t_id, e_msg))
 
         log.info('Removing %d torrents', len(torrent_ids))
-        d = client.core.remove_torrents(torrent_ids, options.remove_data)
+        d = client.core.remove_torrents(torrent_ids, remove_data)
         d.addCallback(on_removed_finished)
+        return d
 
     def complete(self, line):
         # We use the ConsoleUI torrent tab complete method
@@ -36,11 +36,10 @@ def handle(self, options):
         if options.torrent_ids[0] == '*':
             args = ['']
 
-        torrent_ids = []
-        for arg in args:
-            torrent_ids.extend(self.console.match_torrent(arg))
+        def on_match(torrent_ids):
+            return client.core.force_reannounce(torrent_ids)
 
-        client.core.force_reannounce(torrent_ids)
+        return self.console.lookup_torrents(args).addCallback(on_match)
 
     def complete(self, line):
         # We use the ConsoleUI torrent tab complete method
@@ -32,6 +32,11 @@
 from deluge.ui.console.modes.torrentdetail import TorrentDetail
 from deluge.ui.console.modes.torrentlist.torrentlist import TorrentList
 from deluge.ui.console.utils import colors
+from deluge.ui.console.utils.torrentindex import (
+    TorrentIndex,
+    match_string,
+    parse_pattern,
+)
 from deluge.ui.console.widgets import StatusBars
 from deluge.ui.coreconfig import CoreConfig
 from deluge.ui.sessionproxy import SessionProxy
@@ -76,7 +81,7 @@ def __init__(self, options, cmds, log_stream):
 
         # keep track of events for the log view
         self.events = []
-        self.torrents = []
+        self.torrents = TorrentIndex()
         self.statusbars = None
         self.modes = {}
         self.active_mode = None
@@ -370,7 +375,8 @@ def on_started(result):
         return d
 
     def start_console(self):
-        # Maintain a list of (torrent_id, name) for use in tab completion
+        # Maintain an index of the torrent ids and names for matching and tab
+        # completion
         self.started_deferred = defer.Deferred()
 
         if not self.initialized:
@@ -386,17 +392,14 @@ def on_stopped(result):
 
     def start(self):
         def on_session_state(result):
-            self.torrents = []
+            # The names are fetched when needed, commands can run without
+            # waiting for the names of every torrent.
+            self.torrents = TorrentIndex(result)
             self.events = []
-
-            def on_torrents_status(torrents):
-                for torrent_id, status in torrents.items():
-                    self.torrents.append((torrent_id, status['name']))
-                self.started_deferred.callback(True)
-
-            client.core.get_torrents_status({'id': result}, ['name']).addCallback(
-                on_torrents_status
-            )
+            self.started_deferred.callback(True)
+            if self.interactive:
+                # For the tab completion.
+                self.load_torrent_names()
 
         d = client.core.get_session_state().addCallback(on_session_state)
 
@@ -407,16 +410,33 @@ def on_torrents_status(torrents):
         )
         return d
 
+    def load_torrent_names(self):
+        """Fetch the names of all the torrents.
+
+        Returns:
+            Deferred: Fires when the names are added to the index.
+
+        """
+
+        def on_torrents_status(torrents):
+            self.torrents.set_names(
+                {torrent_id: status['name'] for torrent_id, status in torrents.items()}
+            )
+
+        return client.core.get_torrents_status({}, ['name']).addCallback(
+            on_torrents_status
+        )
+
     def on_torrent_added_event(self, event, from_state=False):
+        self.torrents.add(event)
+
         def on_torrent_status(status):
-            self.torrents.append((event, status['name']))
+            self.torrents.set_names({event: status['name']})
 
         client.core.get_torrent_status(event, ['name']).addCallback(on_torrent_status)
 
     def on_torrent_removed_event(self, event):
-        for index, (tid, name) in enumerate(self.torrents):
-            if event == tid:
-                del self.torrents[index]
+        self.torrents.remove(event)
 
     def match_torrents(self, strings):
         torrent_ids = []
@@ -429,39 +449,92 @@ def match_torrent(self, string):
         Returns a list of torrent_id matches for the string.  It will search both
         torrent_ids and torrent names, but will only return torrent_ids.
 
+        Only the names fetched so far are matched, see
+        :meth:`lookup_torrents` to match all of them.
+
         :param string: str, the string to match on
 
         :returns: list of matching torrent_ids. Will return an empty list if
             no matches are found.
 
         """
-        deluge.common.decode_bytes(string, self.encoding)
-
-        if string == '*' or string == '':
-            return [tid for tid, name in self.torrents]
-
-        match_func = '__eq__'
-        if string.startswith('*'):
-            string = string[1:]
-            match_func = 'endswith'
-        if string.endswith('*'):
-            match_func = '__contains__' if match_func == 'endswith' else 'startswith'
-            string = string[:-1]
-
-        matches = []
-        for tid, name in self.torrents:
-            deluge.common.decode_bytes(name, self.encoding)
-            if getattr(tid, match_func, None)(string) or getattr(
-                name, match_func, None
-            )(string):
-                matches.append(tid)
-        return matches
+        string = deluge.common.decode_bytes(string, self.encoding)
+        return self.torrents.match(string)
+
+    def lookup_torrents(self, strings):
+        """Match torrent ids and names, asking the daemon for unknown names.
+
+        While the names are not all fetched, the torrents with a name
+        containing each string are found by the daemon name filter and
+        their names added to the index.
+
+        Args:
+            strings (list): The ids or names to match, see :meth:`match_torrent`.
+
+        Returns:
+            Deferred: Fires with the list of matching torrent ids.
+
+        """
+        strings = [deluge.common.decode_bytes(s, self.encoding) for s in strings]
+        patterns = [parse_pattern(s) for s in strings]
+        if self.torrents.names_loaded or all(
+            string is None for match, string in patterns
+        ):
+            return defer.succeed(self.match_torrents(strings))
+
+        def on_name_filter(results):
+            torrent_ids = set(self.match_torrents(strings))
+            for (success, torrents), (match, string) in zip(results, patterns):
+                if not success or string is None:
+                    continue
+                names = {
+                    torrent_id: status['name']
+                    for torrent_id, status in torrents.items()
+                }
+                self.torrents.set_names(names)
+                torrent_ids.update(
+                    torrent_id
+                    for torrent_id, name in names.items()
+                    if match_string(match, string, name)
+                )
+            return list(torrent_ids)
+
+        deferreds = []
+        for match, string in patterns:
+            if string is None:
+                deferreds.append(defer.succeed({}))
+            else:
+                # A case sensitive match of the names containing string.
+                deferreds.append(
+                    client.core.get_torrents_status(
+                        {'name': string + '::match'}, ['name']
+                    )
+                )
+        return defer.DeferredList(deferreds).addCallback(on_name_filter)
 
     def get_torrent_name(self, torrent_id):
-        for tid, name in self.torrents:
-            if torrent_id == tid:
-                return name
-        return None
+        return self.torrents.get_name(torrent_id)
+
+    def get_torrent_names(self, torrent_ids):
+        """The names of torrents, fetching those not known yet.
+
+        Returns:
+            Deferred: Fires with a dict of torrent_id: name.
+
+        """
+        names = {tid: self.torrents.get_name(tid) for tid in torrent_ids}
+        unknown = [tid for tid, name in names.items() if name is None]
+        if not unknown:
+            return defer.succeed(names)
+
+        def on_torrents_status(torrents):
+            fetched = {tid: status['name'] for tid, status in torrents.items()}
+            self.torrents.set_names(fetched)
+            names.update(fetched)
+            return names
+
+        d = client.core.get_torrents_status({'id': unknown}, ['name'])
+        return d.addCallback(on_torrents_status)
 
     def set_batch_write(self, batch):
         if self.interactive and isinstance(
@@ -670,6 +743,10 @@ def __init__(self):
 
         self.previous_time = time.localtime(0)
 
+    def get_torrent_name(self, torrent_id):
+        """The name of a torrent, the torrent_id until the name is fetched."""
+        return self.console.get_torrent_name(torrent_id) or torrent_id
+
     def on_torrent_added_event(self, torrent_id, from_state):
         if from_state:
             return
@@ -689,7 +766,7 @@ def on_torrent_status(status):
     def on_torrent_removed_event(self, torrent_id):
         self.write(
             '{!red!}Torrent Removed: {!info!}%s ({!cyan!}%s{!info!})'
-            % (self.console.get_torrent_name(torrent_id), torrent_id)
+            % (self.get_torrent_name(torrent_id), torrent_id)
         )
 
     def on_torrent_state_changed_event(self, torrent_id, state):
@@ -702,9 +779,11 @@ def on_torrent_state_changed_event(self, torrent_id, state):
 
         t_name = self.console.get_torrent_name(torrent_id)
 
-        # Again, it's most likely a new torrent
         if not t_name:
-            return
+            # Again, it's most likely a new torrent
+            if self.console.torrents.names_loaded:
+                return
+            t_name = torrent_id
 
         self.write('%s: {!info!}%s ({!cyan!}%s{!info!})' % (state, t_name, torrent_id))
 
@@ -715,7 +794,7 @@ def on_torrent_finished_event(self, torrent_id):
             curses.beep()
         self.write(
             '{!info!}Torrent Finished: %s ({!cyan!}%s{!info!})'
-            % (self.console.get_torrent_name(torrent_id), torrent_id)
+            % (self.get_torrent_name(torrent_id), torrent_id)
         )
 
     def on_new_version_available_event(self, version):
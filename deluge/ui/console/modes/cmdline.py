@@ -795,7 +795,7 @@ def tab_complete_torrent(self, line):
 
         match_count = 0
         match_count2 = 0
-        for torrent_id, torrent_name in self.console.torrents:
+        for torrent_id, torrent_name in self.console.torrents.items():
             if torrent_id.startswith(line):
                 match_count += 1
             if torrent_name.startswith(line):
@@ -804,7 +804,7 @@ def tab_complete_torrent(self, line):
                 match_count2 += 1
 
         # Find all possible matches
-        for torrent_id, torrent_name in self.console.torrents:
+        for torrent_id, torrent_name in self.console.torrents.items():
             # Escape spaces to avoid, for example, expanding "Doc" into "Doctor Who" and removing
             # everything containing one of these words
             escaped_name = torrent_name.replace(' ', '\\ ')
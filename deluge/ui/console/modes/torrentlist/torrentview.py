@@ -9,6 +9,8 @@
 
 import logging
 
+from twisted.internet import defer
+
 import deluge.component as component
 from deluge.decorators import overrides
 from deluge.ui.console.modes.basemode import InputKeyHandler
@@ -60,6 +62,11 @@
 ]
 
 
+# The torrents fetched above and below the visible rows so scrolling does not
+# wait for the daemon.
+PREFETCH_ROWS = 20
+
+
 default_column_values = {
     'queue': {'width': 4, 'visible': True},
     'name': {'width': -1, 'visible': True},
@@ -95,9 +102,18 @@ def __init__(self, torrentlist, config):
         self.config = config
         self.filter_dict = {}
         self.curr_filter = None
+        # Dict of torrent_id: (row string, state) of the rendered rows.
         self.cached_rows = {}
+        # Dict of torrent_id: status, the sort fields of every torrent matching
+        # the filter and the column fields of the fetched ones.
+        self.curstate = {}
+        # The torrents with the column fields fetched.
+        self.fetched = set()
+        self.fetching = None
         self.sorted_ids = None
         self.torrent_names = None
+        self.sort_fields = []
+        self.status_fields = []
         self.numtorrents = -1
         self.column_string = ''
         self.curoff = 0
@@ -117,18 +133,102 @@ def torrentlist_offset(self):
         return 2
 
     def update_state(self, state, refresh=False):
-        self.curstate = state  # cache in case we change sort order
-        self.cached_rows.clear()
-        self.numtorrents = len(state)
-        self.sorted_ids = self._sort_torrents(state)
-        self.torrent_names = []
-        for torrent_id in self.sorted_ids:
-            ts = self.curstate[torrent_id]
-            self.torrent_names.append(ts['name'])
+        """Update the sort fields of the torrents matching the filter."""
+        self._remove_torrents(
+            [torrent_id for torrent_id in self.curstate if torrent_id not in state]
+        )
+        self._merge_status(state)
+        self._sort_rows()
 
         if refresh:
             self.torrentlist.refresh()
 
+    def _remove_torrents(self, torrent_ids):
+        """Remove torrents from the cached state, without sorting the rows."""
+        for torrent_id in torrent_ids:
+            del self.curstate[torrent_id]
+            self.cached_rows.pop(torrent_id, None)
+            self.fetched.discard(torrent_id)
+
+    def _sort_rows(self):
+        self.numtorrents = len(self.curstate)
+        self.sorted_ids = self._sort_torrents(self.curstate)
+        self.torrent_names = [
+            self.curstate[torrent_id]['name'] for torrent_id in self.sorted_ids
+        ]
+
+    def _merge_status(self, state):
+        """Add status to the cached state, dropping the changed rows."""
+        for torrent_id, status in state.items():
+            current = self.curstate.get(torrent_id)
+            if current is None:
+                self.curstate[torrent_id] = dict(status)
+            elif any(current.get(key) != value for key, value in status.items()):
+                current.update(status)
+                self.cached_rows.pop(torrent_id, None)
+
+    def window_ids(self):
+        """The visible torrents and those within PREFETCH_ROWS of them."""
+        if not self.sorted_ids:
+            return []
+        start = max(0, self.curoff - PREFETCH_ROWS)
+        return self.sorted_ids[start : self.curoff + self.torrent_rows + PREFETCH_ROWS]
+
+    def fetch_window(self, result=None):
+        """Fetch the column fields of the torrents around the visible rows.
+
+        Returns:
+            Deferred: Fires when the fields are fetched.
+
+        """
+        torrent_ids = self.window_ids()
+        if not torrent_ids:
+            return defer.succeed(None)
+
+        def on_status(state):
+            # Torrents removed by a newer filter update are not added again.
+            self._merge_status(
+                {
+                    torrent_id: status
+                    for torrent_id, status in state.items()
+                    if torrent_id in self.curstate
+                }
+            )
+            self.fetched.update(state)
+            # Torrents removed since the filter update are not returned, drop
+            # them rather than fetching them again on each refresh.
+            removed = [
+                torrent_id
+                for torrent_id in torrent_ids
+                if torrent_id not in state and torrent_id in self.curstate
+            ]
+            if removed:
+                self._remove_torrents(removed)
+                self._sort_rows()
+                self.cursel = max(0, min(self.cursel, self.numtorrents - 1))
+
+        d = component.get('SessionProxy').get_torrents_status(
+            {'id': torrent_ids}, self.status_fields
+        )
+
+        def on_fetched(result):
+            self.fetching = None
+            return result
+
+        self.fetching = d.addCallback(on_status)
+        d.addBoth(on_fetched)
+        return d
+
+    def _fetch_missing(self):
+        """Fetch the window once a visible torrent has no column fields."""
+        if self.fetching:
+            return
+
+        def on_fetched(result):
+            self.torrentlist.refresh()
+
+        self.fetch_window().addCallback(on_fetched)
+
     def set_torrent_filter(self, state):
         self.curr_filter = state
         filter_dict = {'state': [state]}
@@ -208,57 +308,57 @@ def update_marked(self, index, last_mark=True, clear=False):
         return False
 
     def _sort_torrents(self, state):
-        """Sorts by primary and secondary sort fields."""
+        """Sorts by primary and secondary sort fields.
+
+        A single sort with a key of, in order, the completed state if
+        separating the completed torrents, the primary and secondary sort
+        fields and the queue position.
+        """
 
         if not state:
-            return {}
+            return []
 
         s_primary = self.config['torrentview']['sort_primary']
         s_secondary = self.config['torrentview']['sort_secondary']
 
-        result = state
-
-        # Sort first by secondary sort field and then primary sort field
-        # so it all works out
-
-        def sort_by_field(state, to_sort, field):
-            field = torrent_data_fields[field]['status'][0]
-            reverse = field in reverse_sort_fields
-
-            # Get first element so we can check if it has given field
-            # and if it's a string
-            first_element = state[list(state)[0]]
-            if field in first_element:
-
-                def sort_key(s):
-                    try:
-                        # Sort case-insensitively but preserve A>a order.
-                        return state.get(s)[field].lower()
-                    except AttributeError:
-                        # Not a string.
-                        return state.get(s)[field]
-
-                to_sort = sorted(to_sort, key=sort_key, reverse=reverse)
-
-            if field == 'eta':
-                to_sort = sorted(to_sort, key=lambda s: state.get(s)['eta'] == 0)
-
-            return to_sort
-
         # Just in case primary and secondary fields are empty and/or
-        # both are too ambiguous, also sort by queue position first
-        if 'queue' not in [s_secondary, s_primary]:
-            result = sort_by_field(state, result, 'queue')
+        # both are too ambiguous, also sort by queue position last
+        columns = [s_primary]
         if s_secondary != s_primary:
-            result = sort_by_field(state, result, s_secondary)
-        result = sort_by_field(state, result, s_primary)
-
-        if self.config['torrentview']['separate_complete']:
-            result = sorted(
-                result, key=lambda s: state.get(s).get('progress', 0) == 100.0
-            )
-
-        return result
+            columns.append(s_secondary)
+        if 'queue' not in columns:
+            columns.append('queue')
+
+        # Check the first element has the fields
+        first_element = state[next(iter(state))]
+        fields = []
+        for column in columns:
+            field = torrent_data_fields[column]['status'][0]
+            if field in first_element:
+                fields.append((field, field in reverse_sort_fields))
+        separate_complete = self.config['torrentview']['separate_complete']
+
+        def sort_key(torrent_id):
+            status = state[torrent_id]
+            key = []
+            if separate_complete:
+                key.append(status.get('progress', 0) == 100.0)
+            for field, reverse in fields:
+                if field == 'eta':
+                    # Torrents without an eta go last.
+                    key.append(status['eta'] == 0)
+                value = status[field]
+                try:
+                    # Sort case-insensitively but preserve A>a order.
+                    value = value.lower()
+                except AttributeError:
+                    # Not a string.
+                    if reverse:
+                        value = -value
+                key.append(value)
+            return key
+
+        return sorted(state, key=sort_key)
 
     def _get_colors(self, row, tidx):
         # default style
@@ -291,17 +391,32 @@ def update_torrents(self, lines):
             self.torrentlist.add_string(1, 'Waiting for torrents from core...')
             return
 
+        missing = []
+
         def draw_row(index):
-            if index not in self.cached_rows:
-                ts = self.curstate[self.sorted_ids[index]]
-                self.cached_rows[index] = (
-                    format_utils.format_row(
-                        [get_column_value(name, ts) for name in self.cols_to_show],
-                        self.column_widths,
-                    ),
-                    ts['state'],
-                )
-            return self.cached_rows[index]
+            torrent_id = self.sorted_ids[index]
+            if torrent_id in self.cached_rows:
+                return self.cached_rows[torrent_id]
+            ts = self.curstate[torrent_id]
+            if torrent_id not in self.fetched:
+                # Draw the fields known until the columns are fetched.
+                missing.append(torrent_id)
+                values = [
+                    get_column_value(name, ts)
+                    if all(key in ts for key in torrent_data_fields[name]['status'])
+                    else ''
+                    for name in self.cols_to_show
+                ]
+                return format_utils.format_row(values, self.column_widths), ts['state']
+            row = (
+                format_utils.format_row(
+                    [get_column_value(name, ts) for name in self.cols_to_show],
+                    self.column_widths,
+                ),
+                ts['state'],
+            )
+            self.cached_rows[torrent_id] = row
+            return row
 
         tidx = self.curoff
         currow = 0
@@ -336,11 +451,21 @@ def draw_row(index):
                 scr=self.torrentlist.torrentview_panel,
             )
 
+        if missing:
+            self._fetch_missing()
+
     def update(self, refresh=False):
+        """Fetch the sort fields of all the matching torrents and the column
+        fields of those around the visible rows.
+        """
         d = component.get('SessionProxy').get_torrents_status(
-            self.filter_dict, self.status_fields
+            self.filter_dict, self.sort_fields
         )
-        d.addCallback(self.update_state, refresh=refresh)
+        d.addCallback(self.update_state)
+        d.addCallback(self.fetch_window)
+        if refresh:
+            d.addCallback(lambda result: self.torrentlist.refresh())
+        return d
 
     def on_config_changed(self):
         s_primary = self.config['torrentview']['sort_primary']
@@ -364,16 +489,19 @@ def on_config_changed(self):
         ]
         self.status_fields = get_required_fields(self.cols_to_show)
 
-        # we always need these, even if we're not displaying them
-        for rf in ['state', 'name', 'queue', 'progress']:
+        # we always need these for every torrent, even if we're not displaying
+        # them, same with sort keys
+        self.sort_fields = ['state', 'name', 'queue', 'progress']
+        for column in (s_primary, s_secondary):
+            if column:
+                self.sort_fields.extend(get_required_fields([column])[:1])
+        for rf in self.sort_fields:
             if rf not in self.status_fields:
                 self.status_fields.append(rf)
 
-        # same with sort keys
-        if s_primary and s_primary not in self.status_fields:
-            self.status_fields.append(s_primary)
-        if s_secondary and s_secondary not in self.status_fields:
-            self.status_fields.append(s_secondary)
+        # The fetched columns may have changed.
+        self.fetched.clear()
+        self.cached_rows.clear()
 
         self.update_columns()
 
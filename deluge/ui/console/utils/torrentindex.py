@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""An index of the torrent ids and names for matching torrent patterns."""
+
+from __future__ import unicode_literals
+
+from bisect import bisect_left, bisect_right
+
+EXACT, PREFIX, SUFFIX, SUBSTRING = 'exact', 'prefix', 'suffix', 'substring'
+# Separates the names in the joined text searched for substrings.
+SEPARATOR = '\0'
+
+
+def parse_pattern(pattern):
+    """The type of match and the string of a pattern.
+
+    A leading `*` matches the end of a string, a trailing `*` the start and
+    both anywhere in it.
+
+    Returns:
+        tuple: The match type and the string, None for `*` or an empty
+            pattern matching every torrent.
+
+    """
+    if pattern in ('', '*'):
+        return SUBSTRING, None
+    match = EXACT
+    if pattern.startswith('*'):
+        pattern = pattern[1:]
+        match = SUFFIX
+    if pattern.endswith('*'):
+        match = SUBSTRING if match == SUFFIX else PREFIX
+        pattern = pattern[:-1]
+    return match, pattern
+
+
+def match_string(match, string, value):
+    """Check a value against the match type and string of a pattern."""
+    if match == EXACT:
+        return value == string
+    elif match == PREFIX:
+        return value.startswith(string)
+    elif match == SUFFIX:
+        return value.endswith(string)
+    return string in value
+
+
+def _prefixed(values, prefix):
+    """The items of a sorted list of (string, ...) tuples starting with `prefix`."""
+    index = bisect_left(values, (prefix,))
+    while index < len(values) and values[index][0].startswith(prefix):
+        yield values[index]
+        index += 1
+
+
+class TorrentIndex(object):
+    """The torrent ids of a session and the names fetched so far.
+
+    Names are added as they become known so the index can be used before
+    they are all fetched, :attr:`names_loaded` tells if a name match
+    is complete. The sorted and joined lists searched for matches are
+    rebuilt on the first match after a change.
+
+    Args:
+        torrent_ids (list): The torrent ids, without names.
+
+    """
+
+    def __init__(self, torrent_ids=()):
+        # Dict of torrent_id: name, None when not fetched.
+        self.names = dict.fromkeys(torrent_ids)
+        self.unnamed = len(self.names)
+        self._dirty = True
+        self._ids = []
+        # Sorted lists of (name, torrent_id) and (reversed name, torrent_id).
+        self._by_name = []
+        self._by_reversed = []
+        # The names joined by SEPARATOR with the offset and id of each name.
+        self._text = ''
+        self._offsets = []
+        self._text_ids = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, torrent_id):
+        return torrent_id in self.names
+
+    @property
+    def names_loaded(self):
+        return not self.unnamed
+
+    def items(self):
+        """The (torrent_id, name) of the torrents with a known name."""
+        return [(tid, name) for tid, name in self.names.items() if name is not None]
+
+    def get_name(self, torrent_id):
+        return self.names.get(torrent_id)
+
+    def add(self, torrent_id, name=None):
+        self.remove(torrent_id)
+        self.names[torrent_id] = name
+        if name is None:
+            self.unnamed += 1
+        self._dirty = True
+
+    def remove(self, torrent_id):
+        if torrent_id not in self.names:
+            return
+        if self.names.pop(torrent_id) is None:
+            self.unnamed -= 1
+        self._dirty = True
+
+    def set_names(self, names):
+        """Set the names of torrents in the index.
+
+        Args:
+            names (dict): The torrent_id: name of the torrents.
+
+        """
+        for torrent_id, name in names.items():
+            if torrent_id not in self.names:
+                continue
+            if self.names[torrent_id] is None:
+                self.unnamed -= 1
+            self.names[torrent_id] = name
+        self._dirty = True
+
+    def _rebuild(self):
+        self._ids = sorted(self.names)
+        named = [(name, tid) for tid, name in self.names.items() if name is not None]
+        self._by_name = sorted(named)
+        self._by_reversed = sorted((name[::-1], tid) for name, tid in named)
+        self._offsets = []
+        self._text_ids = []
+        offset = 0
+        for name, tid in named:
+            self._offsets.append(offset)
+            self._text_ids.append(tid)
+            offset += len(name) + 1
+        self._text = SEPARATOR.join(name for name, tid in named)
+        self._dirty = False
+
+    def _match_ids(self, match, string):
+        if match in (EXACT, PREFIX):
+            matches = []
+            index = bisect_left(self._ids, string)
+            while index < len(self._ids) and self._ids[index].startswith(string):
+                if match == PREFIX or self._ids[index] == string:
+                    matches.append(self._ids[index])
+                index += 1
+            return matches
+        return [tid for tid in self._ids if match_string(match, string, tid)]
+
+    def _match_names(self, match, string):
+        if match in (EXACT, PREFIX):
+            return [
+                tid
+                for name, tid in _prefixed(self._by_name, string)
+                if match == PREFIX or name == string
+            ]
+        elif match == SUFFIX:
+            return [tid for name, tid in _prefixed(self._by_reversed, string[::-1])]
+
+        matches = []
+        if SEPARATOR in string:
+            return matches
+        pos = self._text.find(string)
+        while pos != -1:
+            index = bisect_right(self._offsets, pos) - 1
+            matches.append(self._text_ids[index])
+            # Continue after this name.
+            next_name = index + 1
+            if next_name == len(self._offsets):
+                break
+            pos = self._text.find(string, self._offsets[next_name])
+        return matches
+
+    def match(self, pattern):
+        """The torrents with an id or known name matching a pattern.
+
+        Args:
+            pattern (str): An id or name, `*` at the start or end matches any
+                characters.
+
+        Returns:
+            list: The matching torrent ids.
+
+        """
+        if self._dirty:
+            self._rebuild()
+        match, string = parse_pattern(pattern)
+        if string is None:
+            return list(self._ids)
+        matches = self._match_ids(match, string)
+        names = self._match_names(match, string)
+        if matches:
+            matched = set(matches)
+            matches.extend(tid for tid in names if tid not in matched)
+            return matches
+        return names
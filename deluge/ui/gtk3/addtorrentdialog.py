@@ -32,7 +32,7 @@
 from deluge.configmanager import ConfigManager
 from deluge.httpdownloader import download_file
 from deluge.ui.client import client
-from deluge.ui.common import TorrentInfo
+from deluge.ui.common import TorrentInfo, parse_torrent_files
 
 from .common import (
     get_clipboard_text,
@@ -246,17 +246,21 @@ def show_already_added_dialog(self, count):
     def add_from_files(self, filenames):
         already_added = 0
 
-        for filename in filenames:
-            # Get the torrent data from the torrent file
-            try:
-                info = TorrentInfo(filename)
-            except Exception as ex:
-                log.debug('Unable to open torrent file: %s', ex)
-                ErrorDialog(_('Invalid File'), ex, self.dialog).run()
+        # Get the torrent data from the torrent files
+        for filename, info in parse_torrent_files(
+            filenames, keys=('info_hash', 'name', 'files', 'filedata')
+        ):
+            if isinstance(info, Exception):
+                log.debug('Unable to open torrent file: %s', info)
+                ErrorDialog(_('Invalid File'), info, self.dialog).run()
                 continue
 
             if not self._add_torrent_liststore(
-                info.info_hash, info.name, filename, info.files, info.filedata
+                info['info_hash'],
+                info['name'],
+                filename,
+                info['files'],
+                info['filedata'],
             ):
                 already_added += 1
 
@@ -21,6 +21,7 @@
 from gi.repository import Gio, Gtk
 from gi.repository.Gdk import DragAction, ModifierType, keyval_name
 from gi.repository.GObject import TYPE_UINT64
+from twisted.internet import reactor
 
 # isort:imports-firstparty
 import deluge.component as component
@@ -32,9 +33,9 @@
 from .common import (
     listview_replace_treestore,
     load_pickled_state_file,
-    reparent_iter,
     save_pickled_state_file,
 )
+from .files_table import ROOT, FilesTable
 from .torrentdetails import Tab
 from .torrentview_data_funcs import cell_data_size
 
@@ -49,6 +50,19 @@
 
 G_ICON_DIRECTORY = Gio.content_type_get_icon('inode/directory')
 
+# The folder column of the row standing in for the children of a folder
+# until it is expanded.
+PLACEHOLDER = -2
+PLACEHOLDER_ROW = ['', 0, '', 0, 0, -1, None, PLACEHOLDER]
+
+
+def file_icon(name):
+    """The symbolic icon of the type of a file."""
+    mime_type, uncertain = Gio.content_type_guess(name, None)
+    if not uncertain and mime_type:
+        return Gio.content_type_get_symbolic_icon(mime_type)
+    return Gio.content_type_get_symbolic_icon('text/plain')
+
 
 def cell_priority(column, cell, model, row, data):
     if model.get_value(row, 5) == -1:
@@ -87,8 +101,11 @@ def __init__(self):
         super(FilesTab, self).__init__('Files', 'files_tab', 'files_tab_label')
 
         self.listview = self.main_builder.get_object('files_listview')
-        # filename, size, progress string, progress value, priority, file index, icon id
-        self.treestore = Gtk.TreeStore(str, TYPE_UINT64, str, float, int, int, Gio.Icon)
+        # filename, size, progress string, progress value, priority, file index, icon id,
+        # folder id
+        self.treestore = Gtk.TreeStore(
+            str, TYPE_UINT64, str, float, int, int, Gio.Icon, int
+        )
         self.treestore.set_sort_column_id(0, Gtk.SortType.ASCENDING)
 
         # We need to store the row that's being edited to prevent updating it until
@@ -181,6 +198,7 @@ def __init__(self):
         ]
 
         self.listview.connect('row-activated', self._on_row_activated)
+        self.listview.connect('test-expand-row', self._on_test_expand_row)
         self.listview.connect('key-press-event', self._on_key_press_event)
         self.listview.connect('button-press-event', self._on_button_press_event)
 
@@ -214,6 +232,16 @@ def __init__(self):
         self.files_list = {}
 
         self.torrent_id = None
+        # The files and folders of the shown torrent.
+        self.files_table = None
+        # The rows added so far, by file index and folder id.
+        self.file_iters = {}
+        self.folder_iters = {}
+        # Rows not updated while being edited.
+        self._pending_files = set()
+        self._pending_folders = set()
+        # The rebuild of the rows after files moved to other folders.
+        self._update_files_call = None
 
     def start(self):
         attr = 'hide' if not client.is_localhost() else 'show'
@@ -284,7 +312,7 @@ def update(self):
         status_keys = ['file_progress', 'file_priorities']
         if torrent_id != self.torrent_id:
             # We only want to do this if the torrent_id has changed
-            self.treestore.clear()
+            self._clear_rows()
             self.torrent_id = torrent_id
             status_keys += ['storage_mode', 'is_seed']
 
@@ -305,7 +333,7 @@ def update(self):
         ).addCallback(self._on_get_torrent_status, self.torrent_id)
 
     def clear(self):
-        self.treestore.clear()
+        self._clear_rows()
         self.torrent_id = None
 
     def _on_row_activated(self, tree, path, view_column):
@@ -344,119 +372,144 @@ def _on_show_file(self, status):
             timestamp = component.get('MainWindow').get_timestamp()
             show_file(filepath, timestamp=timestamp)
 
-    # The following 3 methods create the folder/file view in the treeview
-    def prepare_file_store(self, torrent_files):
-        split_files = {}
-        for index, torrent_file in enumerate(torrent_files):
-            self.prepare_file(torrent_file, torrent_file['path'], index, split_files)
-        self.add_files(None, split_files)
-
-    def prepare_file(self, torrent_file, file_name, file_num, files_storage):
-        first_slash_index = file_name.find('/')
-        if first_slash_index == -1:
-            files_storage[file_name] = (file_num, torrent_file)
-        else:
-            file_name_chunk = file_name[: first_slash_index + 1]
-            if file_name_chunk not in files_storage:
-                files_storage[file_name_chunk] = {}
-            self.prepare_file(
-                torrent_file,
-                file_name[first_slash_index + 1 :],
-                file_num,
-                files_storage[file_name_chunk],
+    # The following methods create the folder/file view in the treeview
+    def update_files(self, keep_expanded=False):
+        """Show the files of the torrent, only the top level rows are added.
+
+        Args:
+            keep_expanded (bool): Expand the folders which were expanded
+                before, e.g. after a rename.
+
+        """
+        expanded = []
+        prev_table = self.files_table if keep_expanded else None
+        if prev_table:
+            self.listview.map_expanded_rows(
+                lambda view, path, data: expanded.append(
+                    prev_table.folder_paths[self.treestore[path][7]]
+                ),
+                None,
             )
 
-    def add_files(self, parent_iter, split_files):
-        chunk_size_total = 0
-        for key, value in split_files.items():
-            if key.endswith('/'):
-                chunk_iter = self.treestore.append(
-                    parent_iter, [key, 0, '', 0, 0, -1, G_ICON_DIRECTORY]
-                )
-                chunk_size = self.add_files(chunk_iter, value)
-                self.treestore.set(chunk_iter, 1, chunk_size)
-                chunk_size_total += chunk_size
-            else:
-                mime_type, uncertain = Gio.content_type_guess(key, None)
-                if not uncertain and mime_type:
-                    mime_icon = Gio.content_type_get_symbolic_icon(mime_type)
-                else:
-                    mime_icon = Gio.content_type_get_symbolic_icon('text/plain')
-                self.treestore.append(
-                    parent_iter, [key, value[1]['size'], '', 0, 0, value[0], mime_icon]
-                )
-                chunk_size_total += value[1]['size']
-        return chunk_size_total
+        self.files_table = table = FilesTable(self.files_list[self.torrent_id])
+        if prev_table and len(prev_table) == len(table):
+            # The files were renamed, keep their status.
+            table.update_progress(prev_table.progress)
+            table.update_priorities(prev_table.priorities)
 
-    def update_files(self):
         with listview_replace_treestore(self.listview):
-            self.prepare_file_store(self.files_list[self.torrent_id])
-        root = Gtk.TreePath.new_first()
-        self.listview.expand_row(root, False)
+            self.file_iters = {}
+            self.folder_iters = {}
+            self.add_rows(None, ROOT)
+
+        if expanded:
+            # Parents are expanded before their subfolders.
+            for path in sorted(expanded, key=len):
+                folder = table.folder_ids.get(path)
+                if folder in self.folder_iters:
+                    self.listview.expand_row(
+                        self.treestore.get_path(self.folder_iters[folder]), False
+                    )
+        else:
+            root = Gtk.TreePath.new_first()
+            self.listview.expand_row(root, False)
+
+    def add_rows(self, parent_iter, folder):
+        """Add the rows of the subfolders and files of a folder.
+
+        The subfolders get a placeholder row which is replaced by their
+        children when expanded.
+        """
+        table = self.files_table
+        for subfolder in table.subfolders(folder):
+            progress = table.folder_progress(subfolder)
+            chunk_iter = self.treestore.append(
+                parent_iter,
+                [
+                    table.folder_name(subfolder),
+                    table.folder_sizes[subfolder],
+                    '%i%%' % progress,
+                    progress,
+                    0,
+                    -1,
+                    G_ICON_DIRECTORY,
+                    subfolder,
+                ],
+            )
+            self.folder_iters[subfolder] = chunk_iter
+            self.treestore.append(chunk_iter, PLACEHOLDER_ROW)
 
-    def get_selected_files(self):
-        """Returns a list of file indexes that are selected."""
+        for index in table.files(folder):
+            name = table.names[index]
+            progress = table.progress[index] * 100
+            try:
+                priority = table.priorities[index]
+            except IndexError:
+                priority = FILE_PRIORITY['Normal']
+            self.file_iters[index] = self.treestore.append(
+                parent_iter,
+                [
+                    name,
+                    table.sizes[index],
+                    '%i%%' % progress,
+                    progress,
+                    priority,
+                    index,
+                    file_icon(name),
+                    -1,
+                ],
+            )
 
-        def get_iter_children(itr, selected):
-            i = self.treestore.iter_children(itr)
-            while i:
-                selected.append(self.treestore[i][5])
-                if self.treestore.iter_has_child(i):
-                    get_iter_children(i, selected)
-                i = self.treestore.iter_next(i)
+    def populate_folder(self, folder_iter):
+        """Replace the placeholder of a folder row with its children."""
+        child = self.treestore.iter_children(folder_iter)
+        if child is None or self.treestore[child][7] != PLACEHOLDER:
+            return
+        # Sort once after adding the rows rather than on each insert.
+        sort_id, sort_order = self.treestore.get_sort_column_id()
+        if sort_id is not None:
+            self.treestore.set_sort_column_id(
+                Gtk.TREE_SORTABLE_UNSORTED_SORT_COLUMN_ID, sort_order
+            )
+        self.add_rows(folder_iter, self.treestore[folder_iter][7])
+        self.treestore.remove(child)
+        if sort_id is not None:
+            self.treestore.set_sort_column_id(sort_id, sort_order)
+
+    def populate_all(self, folder_iter=None):
+        """Add the rows of every folder below a folder row."""
+        if folder_iter is not None:
+            self.populate_folder(folder_iter)
+        child = self.treestore.iter_children(folder_iter)
+        while child:
+            if self.treestore[child][5] == -1:
+                self.populate_all(child)
+            child = self.treestore.iter_next(child)
+
+    def _on_test_expand_row(self, treeview, folder_iter, path):
+        self.populate_folder(folder_iter)
+        return False
+
+    def _clear_rows(self):
+        self.treestore.clear()
+        self.files_table = None
+        self.file_iters = {}
+        self.folder_iters = {}
+        self._pending_files = set()
+        self._pending_folders = set()
 
+    def get_selected_files(self):
+        """Returns a list of file indexes that are selected."""
         selected = []
         paths = self.listview.get_selection().get_selected_rows()[1]
         for path in paths:
-            i = self.treestore.get_iter(path)
-            selected.append(self.treestore[i][5])
-            if self.treestore.iter_has_child(i):
-                get_iter_children(i, selected)
-
+            row = self.treestore[path]
+            if row[5] != -1:
+                selected.append(row[5])
+            elif row[7] >= 0:
+                selected.extend(self.files_table.all_files(row[7]))
         return selected
 
-    def get_files_from_tree(self, rows, files_list, indent):
-        if not rows:
-            return None
-
-        for row in rows:
-            if row[5] > -1:
-                files_list.append((row[5], row))
-            self.get_files_from_tree(row.iterchildren(), files_list, indent + 1)
-        return None
-
-    def update_folder_percentages(self):
-        """Go through the tree and update the folder complete percentages."""
-        root = self.treestore.get_iter_first()
-        if root is None or self.treestore[root][5] != -1:
-            return
-
-        def get_completed_bytes(row):
-            completed_bytes = 0
-            parent = self.treestore.iter_parent(row)
-            while row:
-                if self.treestore.iter_children(row):
-                    completed_bytes += get_completed_bytes(
-                        self.treestore.iter_children(row)
-                    )
-                else:
-                    completed_bytes += (
-                        self.treestore[row][1] * self.treestore[row][3] / 100
-                    )
-
-                row = self.treestore.iter_next(row)
-
-            try:
-                value = completed_bytes / self.treestore[parent][1] * 100
-            except ZeroDivisionError:
-                # Catch the unusal error found when moving folders around
-                value = 0
-            self.treestore[parent][3] = value
-            self.treestore[parent][2] = '%i%%' % value
-            return completed_bytes
-
-        get_completed_bytes(self.treestore.iter_children(root))
-
     def _on_get_torrent_status(self, status, torrent_id):
         # Check stored torrent id matches the callback id
         if self.torrent_id != torrent_id:
@@ -469,30 +522,40 @@ def _on_get_torrent_status(self, status, torrent_id):
             self.files_list[self.torrent_id] = status['files']
             self.update_files()
 
-        # (index, iter)
-        files_list = []
-        self.get_files_from_tree(self.treestore, files_list, 0)
-        files_list.sort()
-        for index, row in files_list:
+        table = self.files_table
+        if not table:
+            return
+
+        # Only the rows of the files which changed are updated.
+        changed, folders = table.update_progress(status['file_progress'])
+        files = self._pending_files.union(changed)
+        files.update(table.update_priorities(status['file_priorities']))
+        folders.update(self._pending_folders)
+        self._pending_files = set()
+        self._pending_folders = set()
+
+        for index in files:
+            row = self.file_iters.get(index)
+            if row is None:
+                continue
             # Do not update a row that is being edited
-            if self._editing_index == row[5]:
+            if self._editing_index == index:
+                self._pending_files.add(index)
                 continue
+            progress = table.progress[index] * 100
+            self.treestore.set(
+                row, 2, '%i%%' % progress, 3, progress, 4, table.priorities[index]
+            )
 
-            try:
-                progress_string = '%i%%' % (status['file_progress'][index] * 100)
-            except IndexError:
-                continue
-            if row[2] != progress_string:
-                row[2] = progress_string
-            progress_value = status['file_progress'][index] * 100
-            if row[3] != progress_value:
-                row[3] = progress_value
-            file_priority = status['file_priorities'][index]
-            if row[4] != file_priority:
-                row[4] = file_priority
-        if self._editing_index != -1:
+        if self._editing_index == -1:
             # Only update if no folder is being edited
-            self.update_folder_percentages()
+            self._pending_folders = folders
+            return
+        for folder in folders:
+            row = self.folder_iters.get(folder)
+            if row is not None:
+                progress = table.folder_progress(folder)
+                self.treestore.set(row, 2, '%i%%' % progress, 3, progress)
 
     def _on_button_press_event(self, widget, event):
         """This is a callback for showing the right-click context menu."""
@@ -549,18 +612,11 @@ def on_menuitem_show_file_activate(self, menuitem):
 
     def _set_file_priorities_on_user_change(self, selected, priority):
         """Sets the file priorities in the core. It will change the selected with the 'priority'"""
-        file_priorities = []
-
-        def set_file_priority(model, path, _iter, data):
-            index = model.get_value(_iter, 5)
-            if index in selected and index != -1:
-                file_priorities.append((index, priority))
-            elif index != -1:
-                file_priorities.append((index, model.get_value(_iter, 4)))
-
-        self.treestore.foreach(set_file_priority, None)
-        file_priorities.sort()
-        priorities = [p[1] for p in file_priorities]
+        if not self.files_table or not self.files_table.priorities:
+            return
+        priorities = list(self.files_table.priorities)
+        for index in selected:
+            priorities[index] = priority
         log.debug('priorities: %s', priorities)
         client.core.set_torrent_options(
             [self.torrent_id], {'file_priorities': priorities}
@@ -587,6 +643,7 @@ def on_menuitem_high_activate(self, menuitem):
         )
 
     def on_menuitem_expand_all_activate(self, menuitem):
+        self.populate_all()
         self.listview.expand_all()
 
     def _on_filename_edited(self, renderer, path, new_text):
@@ -648,101 +705,29 @@ def _on_torrentfilerenamed_event(self, torrent_id, index, name):
         if torrent_id not in self.files_list:
             return
 
-        old_name = self.files_list[torrent_id][index]['path']
         self.files_list[torrent_id][index]['path'] = name
 
         # We need to update the filename displayed if we're currently viewing
         # this torrents files.
-        if torrent_id != self.torrent_id:
+        if torrent_id != self.torrent_id or not self.files_table:
             return
 
-        old_name_parent = old_name.split('/')[:-1]
-        parent_path = name.split('/')[:-1]
-
-        if old_name_parent != parent_path:
-            if parent_path:
-                for i, p in enumerate(parent_path):
-                    p_itr = self.get_iter_at_path('/'.join(parent_path[: i + 1]) + '/')
-                    if not p_itr:
-                        p_itr = self.get_iter_at_path('/'.join(parent_path[:i]) + '/')
-                        p_itr = self.treestore.append(
-                            p_itr,
-                            [parent_path[i] + '/', 0, '', 0, 0, -1, G_ICON_DIRECTORY],
-                        )
-                p_itr = self.get_iter_at_path('/'.join(parent_path) + '/')
-                old_name_itr = self.get_iter_at_path(old_name)
-                self.treestore.append(
-                    p_itr,
-                    self.treestore.get(
-                        old_name_itr, *range(self.treestore.get_n_columns())
-                    ),
-                )
-                self.treestore.remove(old_name_itr)
-
-                # Remove old parent path
-                p_itr = self.get_iter_at_path('/'.join(old_name_parent) + '/')
-                self.remove_childless_folders(p_itr)
-            else:
-                new_folders = name.split('/')[:-1]
-                parent_iter = None
-                for f in new_folders:
-                    parent_iter = self.treestore.append(
-                        parent_iter, [f + '/', 0, '', 0, 0, -1, G_ICON_DIRECTORY]
-                    )
-                child = self.get_iter_at_path(old_name)
-                self.treestore.append(
-                    parent_iter,
-                    self.treestore.get(child, *range(self.treestore.get_n_columns())),
-                )
-                self.treestore.remove(child)
-
-        else:
-            # This is just changing a filename without any folder changes
-            def set_file_name(model, path, itr, user_data):
-                if model[itr][5] == index:
-                    model[itr][0] = os.path.split(name)[-1]
-                    return True
-
-            self.treestore.foreach(set_file_name, None)
-
-    def get_iter_at_path(self, filepath):
-        """Returns the gtkTreeIter for filepath."""
-        log.debug('get_iter_at_path: %s', filepath)
-        is_dir = False
-        if filepath[-1] == '/':
-            is_dir = True
-
-        filepath = filepath.split('/')
-        if '' in filepath:
-            filepath.remove('')
-
-        path_iter = None
-        itr = self.treestore.iter_children(None)
-        level = 0
-        while itr:
-            ipath = self.treestore[itr][0]
-            if (level + 1) != len(filepath) and ipath == filepath[level] + '/':
-                # We're not at the last index, but we do have a match
-                itr = self.treestore.iter_children(itr)
-                level += 1
-                continue
-            elif (level + 1) == len(filepath) and ipath == (
-                filepath[level] + '/' if is_dir else filepath[level]
-            ):
-                # This is the iter we've been searching for
-                path_iter = itr
-                break
-            else:
-                itr = self.treestore.iter_next(itr)
-                continue
-        return path_iter
+        if self.files_table.rename_file(index, name):
+            row = self.file_iters.get(index)
+            if row:
+                name = self.files_table.names[index]
+                self.treestore.set(row, [0, 6], [name, file_icon(name)])
+        elif not (self._update_files_call and self._update_files_call.active()):
+            # The file moved to another folder. Renaming a folder sends an
+            # event for each file, so the rows are built once for all of them.
+            self._update_files_call = reactor.callLater(
+                0.1, self._on_files_moved, torrent_id
+            )
 
-    def remove_childless_folders(self, itr):
-        """Goes up the tree removing childless itrs starting at itr."""
-        while not self.treestore.iter_children(itr):
-            parent = self.treestore.iter_parent(itr)
-            self.treestore.remove(itr)
-            itr = parent
+    def _on_files_moved(self, torrent_id):
+        self._update_files_call = None
+        if torrent_id == self.torrent_id:
+            self.update_files(keep_expanded=True)
 
     def _on_torrentfolderrenamed_event(self, torrent_id, old_folder, new_folder):
         log.debug('on_torrent_folder_renamed_signal')
@@ -762,57 +747,7 @@ def _on_torrentfolderrenamed_event(self, torrent_id, old_folder, new_folder):
                 fd['path'] = fd['path'].replace(old_folder, new_folder, 1)
 
         if torrent_id == self.torrent_id:
-
-            old_split = old_folder.split('/')
-            try:
-                old_split.remove('')
-            except ValueError:
-                pass
-
-            new_split = new_folder.split('/')
-            try:
-                new_split.remove('')
-            except ValueError:
-                pass
-
-            old_folder_iter = self.get_iter_at_path(old_folder)
-            old_folder_iter_parent = self.treestore.iter_parent(old_folder_iter)
-
-            new_folder_iter = self.get_iter_at_path(new_folder) if new_folder else None
-
-            if len(new_split) == len(old_split):
-                # These are at the same tree depth, so it's a simple rename
-                self.treestore[old_folder_iter][0] = new_split[-1] + '/'
-                return
-            if new_folder_iter:
-                # This means that a folder by this name already exists
-                reparent_iter(
-                    self.treestore,
-                    self.treestore.iter_children(old_folder_iter),
-                    new_folder_iter,
-                )
-            else:
-                parent = old_folder_iter_parent
-                if new_split:
-                    for ns in new_split[:-1]:
-                        parent = self.treestore.append(
-                            parent, [ns + '/', 0, '', 0, 0, -1, G_ICON_DIRECTORY]
-                        )
-
-                    self.treestore[old_folder_iter][0] = new_split[-1] + '/'
-                    reparent_iter(self.treestore, old_folder_iter, parent)
-                else:
-                    child_itr = self.treestore.iter_children(old_folder_iter)
-                    reparent_iter(
-                        self.treestore,
-                        child_itr,
-                        old_folder_iter_parent,
-                        move_siblings=True,
-                    )
-
-            # We need to check if the old_folder_iter no longer has children
-            # and if so, we delete it
-            self.remove_childless_folders(old_folder_iter)
+            self.update_files(keep_expanded=True)
 
     def _on_torrentremoved_event(self, torrent_id):
         if torrent_id in self.files_list:
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""The folders of the files of a torrent and the bytes completed in each."""
+
+from __future__ import division, unicode_literals
+
+# The parent of the top level files and folders.
+ROOT = -1
+
+
+class FilesTable(object):
+    """A flat table of the files and folders of a torrent.
+
+    The folders are built from the file paths in a single pass and keep the
+    total and completed bytes of the files below them. Progress updates only
+    walk up from the files which changed, so the folder percentages are
+    available without visiting the whole tree.
+
+    Args:
+        files (list): The torrent files, dicts with the 'path' and 'size'.
+
+    """
+
+    def __init__(self, files):
+        self.sizes = []
+        self.names = []
+        # The folder of each file.
+        self.parents = []
+        self.progress = [0.0] * len(files)
+        self.priorities = []
+
+        # The folders by id, the path ends with a slash.
+        self.folder_paths = []
+        self.folder_parents = []
+        self.folder_sizes = []
+        self.completed = []
+        # Dict of folder: (subfolders, files), ROOT for the top level.
+        self.children = {ROOT: ([], [])}
+        # Dict of path: folder
+        self.folder_ids = {}
+
+        for index, torrent_file in enumerate(files):
+            size = torrent_file['size']
+            parts = torrent_file['path'].split('/')
+            parent = ROOT
+            path = ''
+            for part in parts[:-1]:
+                path += part + '/'
+                folder = self.folder_ids.get(path)
+                if folder is None:
+                    folder = self._add_folder(path, parent)
+                self.folder_sizes[folder] += size
+                parent = folder
+            self.sizes.append(size)
+            self.names.append(parts[-1])
+            self.parents.append(parent)
+            self.children[parent][1].append(index)
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def _add_folder(self, path, parent):
+        folder = len(self.folder_paths)
+        self.folder_paths.append(path)
+        self.folder_parents.append(parent)
+        self.folder_sizes.append(0)
+        self.completed.append(0.0)
+        self.children[folder] = ([], [])
+        self.children[parent][0].append(folder)
+        self.folder_ids[path] = folder
+        return folder
+
+    def folder_name(self, folder):
+        """The last component of a folder path, with the trailing slash."""
+        path = self.folder_paths[folder]
+        return path[path.rfind('/', 0, -1) + 1 :]
+
+    def rename_file(self, index, path):
+        """Rename a file within its folder.
+
+        Args:
+            index (int): The index of the file.
+            path (str): The new path of the file.
+
+        Returns:
+            bool: True if renamed, False if the path is in another folder and
+                the table has to be built again.
+
+        """
+        parent = self.parents[index]
+        folder_path = '' if parent == ROOT else self.folder_paths[parent]
+        folder_path_len = len(folder_path)
+        if path[:folder_path_len] != folder_path or '/' in path[folder_path_len:]:
+            return False
+        self.names[index] = path[folder_path_len:]
+        return True
+
+    def subfolders(self, folder=ROOT):
+        return self.children[folder][0]
+
+    def files(self, folder=ROOT):
+        return self.children[folder][1]
+
+    def all_files(self, folder):
+        """The indexes of every file below a folder."""
+        indexes = []
+        folders = [folder]
+        while folders:
+            subfolders, files = self.children[folders.pop()]
+            indexes.extend(files)
+            folders.extend(subfolders)
+        return indexes
+
+    def folder_progress(self, folder):
+        """The percentage of the bytes of a folder completed."""
+        try:
+            value = self.completed[folder] / self.folder_sizes[folder] * 100
+        except ZeroDivisionError:
+            return 0.0
+        return min(max(value, 0.0), 100.0)
+
+    def update_progress(self, file_progress):
+        """Set the progress of the files.
+
+        Args:
+            file_progress (list): The fraction completed of each file.
+
+        Returns:
+            tuple: The indexes of the files which changed and the set of
+                folders containing them.
+
+        """
+        changed = []
+        folders = set()
+        if file_progress == self.progress:
+            return changed, folders
+        progress = self.progress
+        for index, value in enumerate(file_progress[: len(progress)]):
+            if value == progress[index]:
+                continue
+            changed.append(index)
+            completed = (value - progress[index]) * self.sizes[index]
+            progress[index] = value
+            folder = self.parents[index]
+            while folder != ROOT:
+                self.completed[folder] += completed
+                folders.add(folder)
+                folder = self.folder_parents[folder]
+        return changed, folders
+
+    def update_priorities(self, file_priorities):
+        """Set the priorities of the files.
+
+        Returns:
+            list: The indexes of the files which changed.
+
+        """
+        if len(self.priorities) != len(file_priorities):
+            self.priorities = list(file_priorities)
+            return list(range(len(file_priorities)))
+        changed = [
+            index
+            for index, (value, prev) in enumerate(zip(file_priorities, self.priorities))
+            if value != prev
+        ]
+        self.priorities = list(file_priorities)
+        return changed
@@ -114,9 +114,21 @@ class "GtkTreeView" style "treeview-style" """
         self.cat_nodes = {}
         self.filters = {}
 
+        # The version of the filter tree shown and the options it is for.
+        self.tree_version = None
+        self.tree_options = None
+        # False if the daemon has no get_filter_tree_changes.
+        self.use_tree_changes = True
+
     def start(self):
         self.cat_nodes = {}
         self.filters = {}
+        self.tree_version = None
+        self.tree_options = None
+        self.use_tree_changes = True
+        client.register_event_handler(
+            'FilterTreeChangedEvent', self.on_filtertreechanged_event
+        )
         # initial order of state filter:
         self.cat_nodes['state'] = self.treestore.append(
             None, ['cat', 'state', _('States'), 0, None, False]
@@ -143,6 +155,9 @@ def start(self):
         self.selected_path = None
 
     def stop(self):
+        client.deregister_event_handler(
+            'FilterTreeChangedEvent', self.on_filtertreechanged_event
+        )
         self.treestore.clear()
 
     def create_model_filter(self):
@@ -150,16 +165,19 @@ def create_model_filter(self):
         self.model_filter.set_visible_column(FILTER_COLUMN)
         self.treeview.set_model(self.model_filter)
 
+    def add_category(self, cat):
+        label = _(cat)
+        if cat == 'label':
+            label = _('Labels')
+        self.cat_nodes[cat] = self.treestore.append(
+            None, ['cat', cat, label, 0, None, False]
+        )
+
     def cb_update_filter_tree(self, filter_items):
         # create missing cat_nodes
         for cat in filter_items:
             if cat not in self.cat_nodes:
-                label = _(cat)
-                if cat == 'label':
-                    label = _('Labels')
-                self.cat_nodes[cat] = self.treestore.append(
-                    None, ['cat', cat, label, 0, None, False]
-                )
+                self.add_category(cat)
 
         # update rows
         visible_filters = []
@@ -188,6 +206,45 @@ def cb_update_filter_tree(self, filter_items):
         if not self.selected_path:
             self.select_default_filter()
 
+    def cb_filter_tree_changes(self, result):
+        """Apply the changes of the filter tree since the version shown."""
+        if result['full']:
+            self.tree_version = result['version']
+            self.cb_update_filter_tree(result['changes'])
+            return
+        if self.tree_version is None or result['version'] < self.tree_version:
+            # A reply overtaken by a newer one.
+            return
+        self.tree_version = result['version']
+
+        for cat, filters in result['changes'].items():
+            if cat not in self.cat_nodes:
+                self.add_category(cat)
+            self.treestore.set_value(self.cat_nodes[cat], FILTER_COLUMN, True)
+            for value, count in filters:
+                self.update_row(cat, value, count)
+
+        for cat, values in result['removed'].items():
+            for value in values:
+                if (cat, value) in self.filters:
+                    self.treestore.set_value(
+                        self.filters[(cat, value)], FILTER_COLUMN, False
+                    )
+
+    def on_filter_tree_changes_error(self, failure):
+        log.debug(
+            'Unable to get the filter tree changes: %s', failure.getErrorMessage()
+        )
+        # An older daemon, poll the whole tree instead.
+        self.use_tree_changes = False
+        self.update()
+
+    def request_tree_changes(self):
+        show_zero, hide_cat = self.tree_options
+        client.core.get_filter_tree_changes(
+            self.tree_version, show_zero, hide_cat
+        ).addCallbacks(self.cb_filter_tree_changes, self.on_filter_tree_changes_error)
+
     def update_row(self, cat, value, count, label=None):
         def on_get_icon(icon):
             if icon:
@@ -291,12 +348,27 @@ def update(self):
                 hide_cat.append('tracker_host')
             if not self.config['sidebar_show_owners']:
                 hide_cat.append('owner')
-            client.core.get_filter_tree(
-                self.config['sidebar_show_zero'], hide_cat
-            ).addCallback(self.cb_update_filter_tree)
+            if not self.use_tree_changes:
+                client.core.get_filter_tree(
+                    self.config['sidebar_show_zero'], hide_cat
+                ).addCallback(self.cb_update_filter_tree)
+                return
+
+            options = (self.config['sidebar_show_zero'], hide_cat)
+            if options != self.tree_options:
+                # The whole tree is requested for the new options.
+                self.tree_options = options
+                self.tree_version = None
+            if self.tree_version is None:
+                self.request_tree_changes()
+            # Otherwise the changes are requested when the daemon sends them.
         except Exception as ex:
             log.debug(ex)
 
+    def on_filtertreechanged_event(self, version):
+        if self.tree_options and version != self.tree_version:
+            self.request_tree_changes()
+
     # Callbacks #
     def on_button_press_event(self, widget, event):
         """This is a callback for showing the right-click context menu."""
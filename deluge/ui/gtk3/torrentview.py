@@ -11,25 +11,33 @@
 from __future__ import unicode_literals
 
 import logging
+from contextlib import contextmanager
 from locale import strcoll
 
 from gi.repository.Gdk import ModifierType, keyval_name
 from gi.repository.GLib import idle_add
 from gi.repository.GObject import TYPE_UINT64
-from gi.repository.Gtk import EntryIconPosition
+from gi.repository.Gtk import (
+    TREE_SORTABLE_UNSORTED_SORT_COLUMN_ID,
+    EntryIconPosition,
+)
 from twisted.internet import reactor
 
 import deluge.component as component
-from deluge.common import decode_bytes
 from deluge.ui.client import client
 
 from . import torrentview_data_funcs as funcs
 from .common import cmp
 from .listview import ListView
 from .removetorrentdialog import RemoveTorrentDialog
+from .torrentview_rows import TorrentRows
 
 log = logging.getLogger(__name__)
 
+# Sorting is disabled while updating more rows than this and the model is
+# sorted once afterwards, instead of moving each changed row in turn.
+SORT_BATCH_ROWS = 100
+
 try:
     CTRL_ALT_MASK = ModifierType.CONTROL_MASK | ModifierType.MOD1_MASK
 except TypeError:
@@ -243,6 +251,8 @@ def __init__(self):
         component.Component.__init__(
             self, 'TorrentView', interval=2, depend=['SessionProxy']
         )
+        # The rows of the torrents, set before the ListView creates the model.
+        self.rows = TorrentRows()
         main_builder = component.get('MainWindow').get_builder()
         # Call the ListView constructor
         ListView.__init__(
@@ -256,9 +266,6 @@ def __init__(self):
         # This is where status updates are put
         self.status = {}
 
-        # We keep a copy of the previous status to compare for changes
-        self.prev_status = {}
-
         # Register the columns menu with the listview so it gets updated accordingly.
         self.register_checklist_menu(main_builder.get_object('menu_columns'))
 
@@ -510,7 +517,7 @@ def stop(self):
         # so column sort details are correctly saved.
         self.save_state()
         self.liststore.clear()
-        self.prev_status = {}
+        self.rows.clear()
         self.filter = None
         self.search_box.hide()
 
@@ -628,9 +635,9 @@ def update_view(self, load_new_list=False):
             self.treeview.freeze_child_notify()
 
         # Get the columns to update from one of the torrents
+        fields_to_update = []
         if status:
-            torrent_id = list(status)[0]
-            fields_to_update = []
+            torrent_id = next(iter(status))
             for column in self.columns_to_update:
                 column_index = self.get_column_index(column)
                 for i, status_field in enumerate(self.columns[column].status_field):
@@ -638,38 +645,22 @@ def update_view(self, load_new_list=False):
                     if status_field in status[torrent_id]:
                         fields_to_update.append((column_index[i], status_field))
 
-        for row in self.liststore:
-            torrent_id = row[self.columns['torrent_id'].column_indices[0]]
-            # We expect the torrent_id to be in status and prev_status,
-            # as it will be as long as the list isn't changed by the user
-
-            torrent_id_in_status = False
-            try:
-                torrent_status = status[torrent_id]
-                torrent_id_in_status = True
-                if torrent_status == self.prev_status[torrent_id]:
-                    # The status dict is the same, so do nothing to update for this torrent
-                    continue
-            except KeyError:
-                pass
-
-            if not torrent_id_in_status:
-                if row[filter_column] is True:
-                    row[filter_column] = False
-            else:
-                if row[filter_column] is False:
-                    row[filter_column] = True
-
-                # Find the fields to update
-                to_update = []
-                for i, status_field in fields_to_update:
-                    row_value = status[torrent_id][status_field]
-                    if decode_bytes(row[i]) != row_value:
-                        to_update.append(i)
-                        to_update.append(row_value)
-                # Update fields in the liststore
-                if to_update:
-                    self.liststore.set(row.iter, *to_update)
+        # Only the rows of the torrents which changed are updated.
+        changes, show, hide = self.rows.update(status, fields_to_update)
+        batch = not load_new_list and (
+            len(changes) + len(show) + len(hide) > SORT_BATCH_ROWS
+        )
+        with self.sorting_disabled(batch):
+            for torrent_id in show:
+                self.liststore.set_value(
+                    self.rows.get_iter(torrent_id), filter_column, True
+                )
+            for torrent_id in hide:
+                self.liststore.set_value(
+                    self.rows.get_iter(torrent_id), filter_column, False
+                )
+            for torrent_id, to_update in changes.items():
+                self.liststore.set(self.rows.get_iter(torrent_id), *to_update)
 
         if load_new_list:
             # Create the model filter. This sets the model for the treeview and enables sorting.
@@ -678,27 +669,54 @@ def update_view(self, load_new_list=False):
             self.treeview.thaw_child_notify()
 
         component.get('MenuBar').update_menu()
-        self.prev_status = status
+
+    @contextmanager
+    def sorting_disabled(self, disable=True):
+        """Unsort the model while updating rows and sort it once afterwards."""
+        sort = self.model_filter.get_sort_column_id() if self.model_filter else None
+        if not disable or sort in (None, (None, None)):
+            yield
+            return
+
+        # Keep the recorded order of the sorted rows for the stable sort.
+        self.model_filter.handler_block_by_func(self.on_model_sort_changed)
+        self.model_filter.set_sort_column_id(
+            TREE_SORTABLE_UNSORTED_SORT_COLUMN_ID, sort[1]
+        )
+        try:
+            yield
+        finally:
+            self.model_filter.set_sort_column_id(*sort)
+            self.model_filter.handler_unblock_by_func(self.on_model_sort_changed)
 
     def _on_get_torrents_status(self, status, select_row=False):
         """Callback function for get_torrents_status().  'status' should be a
         dictionary of {torrent_id: {key, value}}."""
         self.status = status
         if self.search_box.prefiltered is not None:
+            # The rows the search box flipped are corrected by the update.
+            self.rows.toggle_visible(self.search_box.prefiltered)
             self.search_box.prefiltered = None
 
-        if self.status == self.prev_status and self.prev_status:
-            # We do not bother updating since the status hasn't changed
-            self.prev_status = self.status
-            return
         self.update_view()
 
+    def create_new_liststore(self):
+        ListView.create_new_liststore(self)
+        if self.rows:
+            # The rows were copied to the new liststore.
+            torrent_id_column = self.columns['torrent_id'].column_indices[0]
+            self.rows.iters = {
+                row[torrent_id_column]: row.iter for row in self.liststore
+            }
+
     def add_rows(self, torrent_ids):
         """Accepts a list of torrent_ids to add to self.liststore"""
         torrent_id_column = self.columns['torrent_id'].column_indices[0]
         dirty_column = self.columns['dirty'].column_indices[0]
         filter_column = self.columns['filter'].column_indices[0]
         for torrent_id in torrent_ids:
+            if torrent_id in self.rows:
+                continue
             # Insert a new row to the liststore
             row = self.liststore.append()
             self.liststore.set(
@@ -710,26 +728,25 @@ def add_rows(self, torrent_ids):
                 filter_column,
                 True,
             )
+            self.rows.add(torrent_id, row)
 
     def remove_row(self, torrent_id):
         """Removes a row with torrent_id"""
-        for row in self.liststore:
-            if row[self.columns['torrent_id'].column_indices[0]] == torrent_id:
-                self.liststore.remove(row.iter)
-                # Force an update of the torrentview
-                self.update(select_row=True)
-                break
+        row = self.rows.remove(torrent_id)
+        if row is not None:
+            self.liststore.remove(row)
+            # Force an update of the torrentview
+            self.update(select_row=True)
 
     def mark_dirty(self, torrent_id=None):
+        dirty_column = self.columns['dirty'].column_indices[0]
+        if torrent_id:
+            row = self.rows.get_iter(torrent_id)
+            if row is not None:
+                self.liststore.set_value(row, dirty_column, True)
+            return
         for row in self.liststore:
-            if (
-                not torrent_id
-                or row[self.columns['torrent_id'].column_indices[0]] == torrent_id
-            ):
-                # log.debug('marking %s dirty', torrent_id)
-                row[self.columns['dirty'].column_indices[0]] = True
-                if torrent_id:
-                    break
+            row[dirty_column] = True
 
     def get_selected_torrent(self):
         """Returns a torrent_id or None.  If multiple torrents are selected,
@@ -842,10 +859,8 @@ def on_torrentremoved_event(self, torrent_id):
 
     def on_torrentstatechanged_event(self, torrent_id, state):
         # Update the torrents state
-        for row in self.liststore:
-            if torrent_id != row[self.columns['torrent_id'].column_indices[0]]:
-                continue
-
+        row = self.rows.get_iter(torrent_id)
+        if row is not None:
             for name in self.columns_to_update:
                 if not self.columns[name].status_field:
                     continue
@@ -853,7 +868,11 @@ def on_torrentstatechanged_event(self, torrent_id, state):
                     # Update all columns that use the state field to current state
                     if status_field != 'state':
                         continue
-                    row[self.get_column_index(name)[idx]] = state
+                    self.liststore.set_value(
+                        row, self.get_column_index(name)[idx], state
+                    )
+            # The row no longer shows the last status.
+            self.rows.invalidate(torrent_id)
 
             if self.filter.get('state', None) is not None:
                 # We have a filter set, let's see if theres anything to hide
@@ -862,7 +881,10 @@ def on_torrentstatechanged_event(self, torrent_id, state):
                     torrent_id in self.status
                     and self.status[torrent_id]['state'] != state
                 ):
-                    row[self.columns['filter'].column_indices[0]] = False
+                    self.liststore.set_value(
+                        row, self.columns['filter'].column_indices[0], False
+                    )
+                    self.rows.set_visible(torrent_id, False)
                     del self.status[torrent_id]
 
         self.mark_dirty(torrent_id)
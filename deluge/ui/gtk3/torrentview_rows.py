@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""The changes of the torrent status to apply to the torrent view rows."""
+
+from __future__ import unicode_literals
+
+_MISSING = object()
+
+
+def status_changes(status, prev_status, fields):
+    """The model values of the torrents changed since the previous status.
+
+    Args:
+        status (dict): The torrent_id: status dict of the shown torrents.
+        prev_status (dict): The torrent_id: status dict last written to
+            the rows.
+        fields (list): The (model column, status key) of the updated columns.
+
+    Returns:
+        dict: The torrent_id: [column, value, ...] of the changed rows, in the
+            order of the arguments of `Gtk.ListStore.set`.
+
+    """
+    changes = {}
+    for torrent_id, torrent_status in status.items():
+        prev = prev_status.get(torrent_id, _MISSING)
+        if prev == torrent_status:
+            continue
+        if prev is _MISSING:
+            prev = {}
+        values = []
+        for column, key in fields:
+            value = torrent_status.get(key, _MISSING)
+            if value is not _MISSING and prev.get(key, _MISSING) != value:
+                values.append(column)
+                values.append(value)
+        if values:
+            changes[torrent_id] = values
+    return changes
+
+
+class TorrentRows(object):
+    """The model rows of the torrents and the status last written to them.
+
+    Keeps the iter of each torrent row so a status update only touches the
+    rows of the torrents which changed, instead of scanning the whole model.
+    """
+
+    def __init__(self):
+        # Dict of torrent_id: model iter
+        self.iters = {}
+        # The torrents with the filter column set.
+        self.visible = set()
+        # Dict of torrent_id: the status dict written to the row.
+        self.prev_status = {}
+        self.fields = set()
+
+    def __len__(self):
+        return len(self.iters)
+
+    def __contains__(self, torrent_id):
+        return torrent_id in self.iters
+
+    def add(self, torrent_id, row_iter, visible=True):
+        self.iters[torrent_id] = row_iter
+        if visible:
+            self.visible.add(torrent_id)
+        # The new row has no values yet.
+        self.prev_status.pop(torrent_id, None)
+
+    def remove(self, torrent_id):
+        """Forget a torrent row.
+
+        Returns:
+            The iter of the row or None if there is no row for the torrent.
+
+        """
+        self.visible.discard(torrent_id)
+        self.prev_status.pop(torrent_id, None)
+        return self.iters.pop(torrent_id, None)
+
+    def clear(self):
+        self.iters = {}
+        self.visible = set()
+        self.prev_status = {}
+
+    def get_iter(self, torrent_id):
+        return self.iters.get(torrent_id)
+
+    def set_visible(self, torrent_id, visible):
+        if visible:
+            self.visible.add(torrent_id)
+        else:
+            self.visible.discard(torrent_id)
+
+    def invalidate(self, torrent_id):
+        """Write every value of a row on the next update."""
+        self.prev_status.pop(torrent_id, None)
+
+    def toggle_visible(self, torrent_ids):
+        """Record the rows whose filter column was flipped outside of :meth:`update`."""
+        self.visible.symmetric_difference_update(torrent_ids)
+
+    def update(self, status, fields):
+        """The changes to apply to the rows for a new status.
+
+        The rows of torrents missing from `status` are hidden, e.g. those not
+        matching the torrent filter.
+
+        Args:
+            status (dict): The torrent_id: status dict of the shown torrents.
+            fields (list): The (model column, status key) of the updated
+                columns, when changed every value is written again.
+
+        Returns:
+            tuple: The :func:`status_changes` of the rows, the torrent ids of
+                the rows to show and those to hide.
+
+        """
+        shown = set(status)
+        if not shown.issubset(self.iters):
+            # The status of torrents added before their rows.
+            shown.intersection_update(self.iters)
+            status = {torrent_id: status[torrent_id] for torrent_id in shown}
+
+        if set(fields) != self.fields:
+            self.fields = set(fields)
+            self.prev_status = {}
+
+        changes = status_changes(status, self.prev_status, fields)
+        show = shown - self.visible
+        hide = self.visible - shown
+        self.visible = shown
+        # Hidden rows keep their values, only those shown are updated.
+        self.prev_status.update(status)
+        return changes, show, hide
@@ -10,15 +10,19 @@
 from __future__ import unicode_literals
 
 import hashlib
+import heapq
+import json
 import logging
 import os
 import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from email.utils import formatdate
 
+from twisted.internet import defer, threads
 from twisted.internet.task import LoopingCall
 
-from deluge.common import AUTH_LEVEL_ADMIN, AUTH_LEVEL_NONE
+from deluge.common import AUTH_LEVEL_ADMIN, AUTH_LEVEL_NONE, JSON_FORMAT
 from deluge.error import NotAuthorizedError
 from deluge.ui.web.json_api import JSONComponent, export
 
@@ -58,34 +62,225 @@ def make_expires(timeout):
     return expires, expires_str
 
 
+class SessionStore(object):
+    """
+    In-memory store of the web sessions.
+
+    Sessions are kept in a dict keyed by session id with a heap of expiry
+    times alongside it, so removing the expired sessions only ever looks at
+    the sessions that are due. Refreshing a session only updates its dict
+    entry; the stale heap entry is re-queued with the new expiry time when
+    it comes up.
+
+    The store is written to disk by :meth:`save` in a separate thread and
+    only when it has changed since the last save.
+
+    :param filename: the file to persist the sessions to, None to keep them
+        in memory only
+    :type filename: string
+    """
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.sessions = {}
+        self._expiry_heap = []
+        self._logins = {}
+        self.is_dirty = False
+        self.is_saving = False
+
+    def __contains__(self, session_id):
+        return session_id in self.sessions
+
+    def __getitem__(self, session_id):
+        return self.sessions[session_id]
+
+    def __iter__(self):
+        return iter(self.sessions)
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def add(self, session_id, session, max_per_login=0):
+        """
+        Add a session to the store.
+
+        :param session_id: the session id
+        :type session_id: string
+        :param session: the session dict with login, level and expires keys
+        :type session: dict
+        :param max_per_login: the maximum number of sessions allowed for the
+            login, the oldest sessions are removed to make room. 0 for no limit.
+        :type max_per_login: int
+        """
+        login_sessions = self._logins.setdefault(session['login'], OrderedDict())
+        if max_per_login > 0:
+            while len(login_sessions) >= max_per_login:
+                oldest_id = next(iter(login_sessions))
+                log.debug('Session limit reached for %s', session['login'])
+                self.remove(oldest_id)
+
+        self.sessions[session_id] = session
+        login_sessions[session_id] = None
+        heapq.heappush(self._expiry_heap, (session['expires'], session_id))
+        self.is_dirty = True
+
+    def remove(self, session_id):
+        """
+        Remove a session from the store. The expiry heap entry is discarded
+        when it is next reached.
+
+        :param session_id: the session id
+        :type session_id: string
+        """
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return
+        login_sessions = self._logins.get(session['login'], {})
+        login_sessions.pop(session_id, None)
+        if not login_sessions:
+            self._logins.pop(session['login'], None)
+        self.is_dirty = True
+
+    def touch(self, session_id, expires):
+        """
+        Update the expiry time of a session.
+
+        :param session_id: the session id
+        :type session_id: string
+        :param expires: the new expiry time, seconds since the epoch
+        :type expires: float
+        """
+        self.sessions[session_id]['expires'] = expires
+        self.is_dirty = True
+
+    def clean(self, now=None):
+        """
+        Remove all the expired sessions.
+
+        :param now: the current time, seconds since the epoch
+        :type now: float
+        :returns: the number of sessions removed
+        :rtype: int
+        """
+        if now is None:
+            now = time.time()
+
+        removed = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            __, session_id = heapq.heappop(self._expiry_heap)
+            session = self.sessions.get(session_id)
+            if session is None:
+                continue
+            if session['expires'] > now:
+                heapq.heappush(self._expiry_heap, (session['expires'], session_id))
+                continue
+            self.remove(session_id)
+            removed += 1
+        return removed
+
+    def load(self, sessions=None):
+        """
+        Load sessions into the store, from the sessions file if none given.
+
+        :param sessions: the sessions to load, keyed by session id
+        :type sessions: dict
+        """
+        if sessions is None:
+            if not self.filename or not os.path.isfile(self.filename):
+                return
+            try:
+                with open(self.filename, 'r') as _file:
+                    sessions = json.load(_file)
+            except (IOError, ValueError) as ex:
+                log.warning('Unable to load sessions file %s: %s', self.filename, ex)
+                return
+
+        for session_id, session in sessions.items():
+            if session_id in self.sessions:
+                continue
+            if 'expires' not in session or 'login' not in session:
+                continue
+            self.add(session_id, session)
+
+    def save(self):
+        """
+        Save the sessions to disk in a separate thread to avoid blocking the
+        reactor. Ignored if the store has not changed or a save is running.
+
+        :returns: A Deferred fired once the save is complete
+        :rtype: twisted.internet.defer.Deferred
+        """
+        if not self.filename or not self.is_dirty or self.is_saving:
+            return defer.succeed(None)
+
+        self.is_saving = True
+        self.is_dirty = False
+        # Copy on the reactor thread so the worker never sees a changing dict.
+        snapshot = {
+            session_id: dict(session) for session_id, session in self.sessions.items()
+        }
+        d = threads.deferToThread(self._save, snapshot)
+
+        def on_saved(result):
+            self.is_saving = False
+            return result
+
+        d.addBoth(on_saved)
+        return d
+
+    def _save(self, sessions):
+        filename_tmp = self.filename + '.tmp'
+        try:
+            with open(filename_tmp, 'w') as _file:
+                json.dump(sessions, _file, **JSON_FORMAT)
+                _file.flush()
+                os.fsync(_file.fileno())
+            os.rename(filename_tmp, self.filename)
+        except (IOError, OSError) as ex:
+            log.error('Unable to save sessions file %s: %s', self.filename, ex)
+            self.is_dirty = True
+
+
 class Auth(JSONComponent):
     """
     The component that implements authentification into the JSON interface.
+
+    :param config: the web config
+    :type config: deluge.config.Config
+    :param sessions_file: the file the sessions are persisted to, None to keep
+        the sessions in memory only
+    :type sessions_file: string
     """
 
-    def __init__(self, config):
+    def __init__(self, config, sessions_file=None):
         super(Auth, self).__init__('Auth')
         self.worker = LoopingCall(self._clean_sessions)
+        self.save_worker = LoopingCall(self._save_sessions)
         self.config = config
+        self.sessions = SessionStore(sessions_file)
 
     def start(self):
+        # Migrate any sessions stored in the config by older versions.
+        if self.config['sessions']:
+            self.sessions.load(dict(self.config['sessions']))
+            self.config['sessions'] = {}
+        self.sessions.load()
         self.worker.start(5)
+        self.save_worker.start(60, now=False)
 
     def stop(self):
         self.worker.stop()
+        self.save_worker.stop()
+        if self.sessions.filename and self.sessions.is_dirty:
+            # Save synchronously as the reactor may be shutting down.
+            self.sessions.is_dirty = False
+            self.sessions._save(dict(self.sessions.sessions))
 
     def _clean_sessions(self):
-        now = time.gmtime()
-        for session_id in list(self.config['sessions']):
-            session = self.config['sessions'][session_id]
+        self.sessions.clean()
 
-            if 'expires' not in session:
-                del self.config['sessions'][session_id]
-                continue
-
-            if time.gmtime(session['expires']) < now:
-                del self.config['sessions'][session_id]
-                continue
+    def _save_sessions(self):
+        return self.sessions.save()
 
     def _create_session(self, request, login='admin'):
         """
@@ -111,14 +306,11 @@ def _create_session(self, request, login='admin'):
 
         log.debug('Creating session for %s', login)
 
-        if isinstance(self.config['sessions'], list):
-            self.config['sessions'] = {}
-
-        self.config['sessions'][session_id] = {
-            'login': login,
-            'level': AUTH_LEVEL_ADMIN,
-            'expires': expires,
-        }
+        self.sessions.add(
+            session_id,
+            {'login': login, 'level': AUTH_LEVEL_ADMIN, 'expires': expires},
+            max_per_login=self.config.get('session_max_per_login', 10),
+        )
         return True
 
     def check_password(self, password):
@@ -152,14 +344,13 @@ def check_request(self, request, method=None, level=None):
         else:
             session_id = None
 
-        if session_id not in self.config['sessions']:
+        if session_id not in self.sessions:
             auth_level = AUTH_LEVEL_NONE
             session_id = None
         else:
-            session = self.config['sessions'][session_id]
-            auth_level = session['level']
+            auth_level = self.sessions[session_id]['level']
             expires, expires_str = make_expires(self.config['session_timeout'])
-            session['expires'] = expires
+            self.sessions.touch(session_id, expires)
 
             _session_id = request.getCookie(b'_session_id')
             request.addCookie(
@@ -236,7 +427,7 @@ def delete_session(self):
         :param session_id: the id for the session to remove
         :type session_id: string
         """
-        del self.config['sessions'][__request__.session_id]
+        self.sessions.remove(__request__.session_id)
         return True
 
     @export(AUTH_LEVEL_NONE)
@@ -165,6 +165,59 @@ Deluge.FilterPanel = Ext.extend(Ext.Panel, {
             this.list.select(0);
         }
     },
+
+    /**
+     * Update the changed states in the FilterPanel, only the records of the
+     * changed counts are updated unless states are added or removed.
+     * @param {Array} changes the [value, count] of the changed states
+     * @param {Array} removed the values of the states no longer present
+     */
+    updateChanges: function(changes, removed) {
+        var show_zero =
+            this.show_zero == null
+                ? deluge.config.sidebar_show_zero
+                : this.show_zero;
+        var store = this.getStore();
+        var rebuild = removed && removed.length > 0;
+
+        Ext.each(
+            changes,
+            function(state) {
+                var record = store.getById(state[0]);
+                var shown = show_zero || state[1] > 0 || state[0] == 'All';
+                if (!(state[0] in this.states) || Boolean(record) != shown) {
+                    rebuild = true;
+                }
+                this.states[state[0]] = state[1];
+                if (record && shown) {
+                    record.set('count', state[1]);
+                }
+            },
+            this
+        );
+        store.commitChanges();
+
+        if (rebuild) {
+            Ext.each(
+                removed,
+                function(value) {
+                    delete this.states[value];
+                },
+                this
+            );
+            var states = [];
+            for (var value in this.states) {
+                states.push([value, this.states[value]]);
+            }
+            if (this.filterType != 'state') {
+                // New values are added in the order of the core.
+                states.sort(function(a, b) {
+                    return a[0] < b[0] ? -1 : a[0] > b[0] ? 1 : 0;
+                });
+            }
+            this.updateStates(states);
+        }
+    },
 });
 
 Deluge.FilterPanel.templates = {
@@ -117,6 +117,29 @@ Deluge.Sidebar = Ext.extend(Ext.Panel, {
         deluge.ui.update();
     },
 
+    /**
+     * Apply the changed counts of the filters.
+     * @param {Object} changes the changed [value, count] of each filter
+     * @param {Object} removed the values no longer in each filter
+     */
+    updateChanges: function(changes, removed) {
+        for (var filter in changes) {
+            if (this.panels[filter]) {
+                this.panels[filter].updateChanges(
+                    changes[filter],
+                    removed[filter]
+                );
+            } else {
+                this.createFilter(filter, changes[filter]);
+            }
+        }
+        for (var filter in removed) {
+            if (this.panels[filter] && !changes[filter]) {
+                this.panels[filter].updateChanges([], removed[filter]);
+            }
+        }
+    },
+
     update: function(filters) {
         for (var filter in filters) {
             var states = filters[filter];
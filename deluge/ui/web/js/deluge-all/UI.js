@@ -38,6 +38,9 @@ deluge.ui = {
 
     filters: null,
 
+    // The version of the filter tree shown in the sidebar, 0 for none.
+    filtersVersion: 0,
+
     /**
      * @description Create all the interface components, the json-rpc client
      * and set up various events that the UI will utilise.
@@ -126,11 +129,16 @@ deluge.ui = {
         this.oldFilters = this.filters;
         this.filters = filters;
 
-        deluge.client.web.update_ui(Deluge.Keys.Grid, filters, {
-            success: this.onUpdate,
-            failure: this.onUpdateError,
-            scope: this,
-        });
+        deluge.client.web.update_ui(
+            Deluge.Keys.Grid,
+            filters,
+            this.filtersVersion,
+            {
+                success: this.onUpdate,
+                failure: this.onUpdateError,
+                scope: this,
+            }
+        );
         deluge.details.update();
     },
 
@@ -190,10 +198,25 @@ deluge.ui = {
             deluge.torrents.update(data['torrents'], true);
         }
         deluge.statusbar.update(data['stats']);
-        deluge.sidebar.update(data['filters']);
+        this.updateFilters(data['filters']);
         this.errorCount = 0;
     },
 
+    /**
+     * @static
+     * @private
+     * Apply the filter tree changes to the sidebar.
+     */
+    updateFilters: function(filters) {
+        if (!filters) return;
+        if (filters.full) {
+            deluge.sidebar.update(filters.changes);
+        } else {
+            deluge.sidebar.updateChanges(filters.changes, filters.removed);
+        }
+        this.filtersVersion = filters.version;
+    },
+
     /**
      * @static
      * @private
@@ -282,6 +305,7 @@ deluge.ui = {
         if (this.running) {
             clearInterval(this.running);
             this.running = false;
+            this.filtersVersion = 0;
             deluge.torrents.getStore().removeAll();
         }
     },
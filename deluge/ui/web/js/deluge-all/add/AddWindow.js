@@ -272,16 +272,12 @@ Deluge.add.AddWindow = Ext.extend(Deluge.add.Window, {
             return;
         }
 
-        upload.result.files.forEach(
-            function(filename, i) {
-                deluge.client.web.get_torrent_info(filename, {
-                    success: this.onGotInfo,
-                    scope: this,
-                    filename: filename,
-                    torrentId: upload.options.torrentIds[i],
-                });
-            }.bind(this)
-        );
+        deluge.client.web.get_torrents_info(upload.result.files, {
+            success: this.onGotInfos,
+            scope: this,
+            filenames: upload.result.files,
+            torrentIds: upload.options.torrentIds,
+        });
         this.fileUploadForm.reset();
     },
 
@@ -298,10 +294,13 @@ Deluge.add.AddWindow = Ext.extend(Deluge.add.Window, {
         this.fireEvent('addfailed', this.torrentId);
     },
 
-    onGotInfo: function(info, obj, response, request) {
-        info.filename = request.options.filename;
-        torrentId = request.options.torrentId;
-        this.onTorrentAdd(torrentId, info);
+    onGotInfos: function(infos, obj, response, request) {
+        infos.forEach(function(info, i) {
+            if (info) {
+                info.filename = request.options.filenames[i];
+            }
+            this.onTorrentAdd(request.options.torrentIds[i], info);
+        }, this);
     },
 
     onTorrentBeforeAdd: function(torrentId, text) {
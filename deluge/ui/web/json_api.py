@@ -18,7 +18,7 @@
 from types import FunctionType
 from xml.sax.saxutils import escape as xml_escape
 
-from twisted.internet import defer, reactor
+from twisted.internet import defer, reactor, threads
 from twisted.internet.defer import Deferred, DeferredList
 from twisted.web import http, resource, server
 
@@ -28,7 +28,7 @@
 from deluge.error import NotAuthorizedError
 from deluge.i18n import get_languages
 from deluge.ui.client import Client, client
-from deluge.ui.common import FileTree2, TorrentInfo
+from deluge.ui.common import FileTree2, TorrentInfo, parse_torrent_files
 from deluge.ui.coreconfig import CoreConfig
 from deluge.ui.hostlist import HostList
 from deluge.ui.sessionproxy import SessionProxy
@@ -389,6 +389,8 @@ def __init__(self):
             self.sessionproxy = component.get('SessionProxy')
         except KeyError:
             self.sessionproxy = SessionProxy()
+        # The latest filter tree version sent by the daemon.
+        self.filter_tree_version = None
 
     def disable(self):
         client.deregister_event_handler(
@@ -444,13 +446,45 @@ def _on_client_disconnect(self, *args):
 
     def start(self):
         self.core_config.start()
+        self.filter_tree_version = None
+        client.register_event_handler(
+            'FilterTreeChangedEvent', self._on_filter_tree_changed
+        )
         return self.sessionproxy.start()
 
     def stop(self):
         self.core_config.stop()
         self.sessionproxy.stop()
+        client.deregister_event_handler(
+            'FilterTreeChangedEvent', self._on_filter_tree_changed
+        )
         return defer.succeed(True)
 
+    def _on_filter_tree_changed(self, version):
+        self.filter_tree_version = version
+
+    def _get_filter_tree_changes(self, version):
+        """The changes of the filter tree since the version of a browser."""
+        if version and version == self.filter_tree_version:
+            # Nothing changed since the last version sent by the daemon.
+            return defer.succeed(
+                {'version': version, 'full': False, 'changes': {}, 'removed': {}}
+            )
+
+        def on_error(failure):
+            # An older daemon, send the whole tree.
+            log.debug('Unable to get filter tree changes: %s', failure)
+            return client.core.get_filter_tree().addCallback(
+                lambda tree: {
+                    'version': 0,
+                    'full': True,
+                    'changes': tree,
+                    'removed': {},
+                }
+            )
+
+        return client.core.get_filter_tree_changes(version).addErrback(on_error)
+
     @export
     def connect(self, host_id):
         """Connect the web client to a daemon.
@@ -490,7 +524,7 @@ def on_disconnect(reason):
         return d
 
     @export
-    def update_ui(self, keys, filter_dict):
+    def update_ui(self, keys, filter_dict, filters_version=None):
         """
         Gather the information required for updating the web interface.
 
@@ -498,6 +532,9 @@ def update_ui(self, keys, filter_dict):
         :type keys: list
         :param filter_dict: the filters to apply when selecting torrents.
         :type filter_dict: dictionary
+        :param filters_version: the version of the filter tree shown, 0 for
+            none, to get only the changes, see `core.get_filter_tree_changes`.
+        :type filters_version: int
         :returns: The torrent and UI information.
         :rtype: dictionary
         """
@@ -550,7 +587,10 @@ def on_complete(result):
         d1 = component.get('SessionProxy').get_torrents_status(filter_dict, keys)
         d1.addCallback(got_torrents)
 
-        d2 = client.core.get_filter_tree()
+        if filters_version is None:
+            d2 = client.core.get_filter_tree()
+        else:
+            d2 = self._get_filter_tree_changes(filters_version)
         d2.addCallback(got_filters)
 
         d3 = client.core.get_session_status(
@@ -713,6 +753,36 @@ def get_torrent_info(self, filename):
             log.error(ex)
             return False
 
+    @export
+    def get_torrents_info(self, filenames):
+        """
+        Return information about several torrents on the filesystem, parsed
+        in worker processes outside of the reactor thread.
+
+        :param filenames: the paths to the torrents
+        :type filenames: list
+
+        :returns: the information about each torrent as returned by
+            `get_torrent_info`, False for the invalid ones.
+        :rtype: list
+        """
+
+        def parse():
+            infos = []
+            for filename, info in parse_torrent_files(
+                [filename.strip() for filename in filenames],
+                2,
+                keys=('name', 'info_hash', 'files_tree'),
+            ):
+                if isinstance(info, Exception):
+                    log.error(info)
+                    infos.append(False)
+                else:
+                    infos.append(info)
+            return infos
+
+        return threads.deferToThread(parse)
+
     @export
     def get_magnet_info(self, uri):
         """Parse a magnet URI for hash and name."""
@@ -42,6 +42,7 @@
     'pwd_salt': 'c26ab3bbd8b137f99cd83c2c1c0963bcc1a35cad',
     'pwd_sha1': '2ce1a410bcdcc53064129b6d950f2e9fee4edc1e',
     'session_timeout': 3600,
+    'session_max_per_login': 10,
     'sessions': {},
     # UI Settings
     'sidebar_show_zero': False,
@@ -696,7 +697,7 @@ def __init__(self, options=None, daemon=True):
         self.web_api = WebApi()
         self.web_utils = WebUtils()
 
-        self.auth = Auth(self.config)
+        self.auth = Auth(self.config, configmanager.get_config_dir('web.sessions'))
         self.daemon = daemon
         # Initalize the plugins
         self.plugins = PluginManager()
@@ -489,6 +489,10 @@ def run(self):
     'deluge-web = deluge.ui.web:start',
     'deluged = deluge.core.daemon_entry:start_daemon',
 ]
+if not windows_check():
+    _entry_points['console_scripts'].append(
+        'deluge-client-agent = deluge.ui.clientagent:start'
+    )
 if windows_check():
     _entry_points['console_scripts'].extend(
         [